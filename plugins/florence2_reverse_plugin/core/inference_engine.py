@@ -10,6 +10,11 @@ import logging
 from pathlib import Path
 from PIL import Image
 import numpy as np
+from functools import partial
+from contextlib import nullcontext
+
+from picman.plugins.image_prefetch import ImagePrefetcher, load_image, processor_image_size
+from picman.plugins.caption_cache import make_caption_key, model_revision, shared_caption_cache
 
 # 导入transformers库
 try:
@@ -22,6 +27,10 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# 批量推理时每张图片（激活值+KV缓存）的显存估计，用于按可用显存限制批大小
+ESTIMATED_BYTES_PER_IMAGE = 384 * 1024 * 1024
+MAX_BATCH_SIZE = 32
+
 
 class InferenceEngine:
     """Florence2推理引擎"""
@@ -97,15 +106,16 @@ class InferenceEngine:
             self._update_progress("loading", 0, f"模型获取失败: {str(e)}")
             return False
     
-    def _preprocess_image(self, image_path: str) -> Optional[torch.Tensor]:
+    def _image_loader(self) -> Callable[[str], Image.Image]:
+        """按processor输入尺寸缩小解码（草稿模式）并按EXIF方向摆正"""
+        return partial(load_image, size=processor_image_size(self.processor))
+    
+    def _preprocess_image(self, image_path: str) -> Optional[Image.Image]:
         """预处理图片"""
         try:
-            # 加载图片
-            image = Image.open(image_path).convert('RGB')
-            
             # 对于Florence2模型，我们直接返回PIL图像，让_generate_description方法处理
             # 这样可以避免重复的processor调用导致的缓存问题
-            return image
+            return self._image_loader()(image_path)
                 
         except Exception as e:
             logger.error(f"图片预处理失败 {image_path}: {str(e)}")
@@ -240,66 +250,207 @@ class InferenceEngine:
             logger.error(f"生成描述失败: {str(e)}")
             return f"描述生成失败: {str(e)}"
     
+    def _is_git_model(self) -> bool:
+        return hasattr(self.model, 'git') or 'git' in str(type(self.model)).lower()
+    
+    def resolve_batch_size(self, batch_size: Optional[int] = None) -> int:
+        """确定批大小：参数 > performance.batch_size，并按当前可用显存限制"""
+        if not batch_size:
+            performance_config = self.config_manager.get_performance_config() if self.config_manager else {}
+            batch_size = performance_config.get("batch_size", 4)
+        batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+        
+        if self.device is not None and self.device.type == "cuda":
+            try:
+                free_bytes, _ = torch.cuda.mem_get_info(self.device)
+                batch_size = max(1, min(batch_size, int(free_bytes // ESTIMATED_BYTES_PER_IMAGE)))
+            except Exception as e:
+                logger.warning(f"读取可用显存失败，使用配置的批大小: {str(e)}")
+        return batch_size
+    
+    def _generate_batch(self, images: List[Image.Image], description_level: str,
+                        model_dtype, inference_config: Dict[str, Any]) -> List[str]:
+        """对一批图片执行一次processor和一次generate（填充对齐，启用KV缓存）"""
+        prompt = self._generate_prompt(description_level)
+        inputs = self.processor(
+            text=[prompt] * len(images),
+            images=images,
+            return_tensors="pt",
+            padding=True,
+            do_rescale=False
+        )
+        inputs = {
+            'input_ids': inputs['input_ids'].to(self.device, dtype=torch.long),
+            'attention_mask': inputs['attention_mask'].to(self.device, dtype=torch.long),
+            'pixel_values': inputs['pixel_values'].to(self.device, dtype=model_dtype)
+        }
+        
+        tokenizer = getattr(self.processor, 'tokenizer', None)
+        eos_token_id = tokenizer.eos_token_id if tokenizer is not None else None
+        with torch.no_grad():
+            generated_ids = self.model.generate(
+                **inputs,
+                max_new_tokens=inference_config.get("max_new_tokens", 50),
+                do_sample=False,  # 使用贪婪解码
+                num_beams=1,  # 不使用beam search
+                pad_token_id=tokenizer.pad_token_id if tokenizer is not None and tokenizer.pad_token_id is not None else eos_token_id,
+                eos_token_id=eos_token_id,
+                use_cache=True,
+            )
+        
+        decoder = tokenizer if tokenizer is not None else self.processor
+        texts = decoder.batch_decode(generated_ids, skip_special_tokens=True)
+        return [str(text).replace('</s>', '').replace('<s>', '').strip() for text in texts]
+    
+    def _infer_batch(self, images: List[Image.Image], description_level: str,
+                     model_dtype, inference_config: Dict[str, Any]) -> List[str]:
+        """推理一批图片；显存不足时拆成两半重试"""
+        try:
+            return self._generate_batch(images, description_level, model_dtype, inference_config)
+        except RuntimeError as e:
+            if "out of memory" not in str(e).lower() or len(images) == 1:
+                raise
+            logger.warning(f"批量推理显存不足，拆分批次重试 - 批大小: {len(images)}")
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            half = len(images) // 2
+            return (self._infer_batch(images[:half], description_level, model_dtype, inference_config)
+                    + self._infer_batch(images[half:], description_level, model_dtype, inference_config))
+    
     def infer_images(self, image_paths: List[str], 
                     model_name: str,
                     description_level: str = "normal",
-                    progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
-        """推理图片"""
+                    progress_callback: Optional[Callable] = None,
+                    batch_size: Optional[int] = None,
+                    batch_callback: Optional[Callable[[List[Dict[str, Any]]], bool]] = None,
+                    use_caption_cache: bool = True) -> List[Dict[str, Any]]:
+        """推理图片
+        
+        图片按批处理：每批只调用一次processor和model.generate，下一批图片在后台线程中
+        预先解码。结果与image_paths一一对应。batch_size为空时使用performance.batch_size，
+        并按可用显存限制。batch_callback在每批完成后以该批结果调用，返回False时停止。
+        use_caption_cache时先查描述缓存（按图片内容哈希），命中的图片作为第一批返回，不再推理。
+        """
+        # 推理期间在共享模型注册表中固定模型，避免被其他插件加载模型时淘汰
+        with self.model_manager.model_in_use() if self.model_manager else nullcontext():
+            try:
+                return self._infer_images(image_paths, model_name, description_level, progress_callback,
+                                          batch_size, batch_callback, use_caption_cache)
+            finally:
+                # 模型由注册表持有；推理结束后释放引用，淘汰时内存才能真正回收
+                self.model = None
+                self.processor = None
+    
+    def _infer_images(self, image_paths: List[str], model_name: str, description_level: str,
+                      progress_callback: Optional[Callable], batch_size: Optional[int],
+                      batch_callback: Optional[Callable[[List[Dict[str, Any]]], bool]],
+                      use_caption_cache: bool) -> List[Dict[str, Any]]:
         try:
             if progress_callback:
                 self.set_progress_callback(progress_callback)
             
-            logger.info(f"开始推理图片 - 图片数量: {len(image_paths)}, 模型: {model_name}, 描述级别: {description_level}")
-            
             # 加载模型
             if not self.load_model(model_name):
                 raise RuntimeError("模型加载失败")
             
+            batch_size = self.resolve_batch_size(batch_size)
+            logger.info(f"开始推理图片 - 图片数量: {len(image_paths)}, 模型: {model_name}, 描述级别: {description_level}, 批大小: {batch_size}")
+            
+            # 每次调用只读取一次模型精度和推理配置
+            model_dtype = next(self.model.parameters()).dtype
+            inference_config = self.config_manager.get_inference_config()
+            batched = not self._is_git_model()
+            
+            def failure(image_path: str, error: str) -> Dict[str, Any]:
+                return {
+                    "image_path": image_path,
+                    "success": False,
+                    "error": error,
+                    "model_name": model_name,
+                    "description_level": description_level
+                }
+            
             results = []
             total_images = len(image_paths)
+            positions_by_path = {image_path: index for index, image_path in reversed(list(enumerate(image_paths)))}
             
-            for i, image_path in enumerate(image_paths):
-                try:
-                    self._update_progress("inference", int((i / total_images) * 100), f"正在处理: {Path(image_path).name}")
-                    
-                    # 预处理图片
-                    image_tensor = self._preprocess_image(image_path)
-                    if image_tensor is None:
-                        results.append({
-                            "image_path": image_path,
-                            "success": False,
-                            "error": "图片预处理失败",
-                            "model_name": model_name,
-                            "description_level": description_level
-                        })
-                        continue
-                    
-                    # 生成描述
-                    description = self._generate_description(image_tensor, description_level)
-                    
-                    # 保存结果
-                    result = {
+            cache = shared_caption_cache() if use_caption_cache else None
+            cache_key = None
+            pending_paths = image_paths
+            if cache is not None:
+                cache_key = make_caption_key(model_name, model_revision(self.model), description_level, {
+                    "prompt": self._generate_prompt(description_level),
+                    "max_new_tokens": inference_config.get("max_new_tokens", 50),
+                })
+                cached = cache.lookup(image_paths, cache_key)
+                if cached:
+                    pending_paths = [image_path for image_path in image_paths if image_path not in cached]
+                    cached_results = [{
                         "image_path": image_path,
                         "success": True,
-                        "result": description,
+                        "result": cached[image_path],
                         "model_name": model_name,
                         "description_level": description_level,
-                        "processed": True
-                    }
-                    results.append(result)
+                        "processed": True,
+                        "cached": True
+                    } for image_path in image_paths if image_path in cached]
+                    results.extend(cached_results)
+                    if batch_callback is not None and batch_callback(cached_results) is False:
+                        pending_paths = []
+            
+            # 预取两批：当前批推理时下一批在后台解码
+            with ImagePrefetcher(pending_paths, self._image_loader(), prefetch=batch_size * 2) as prefetcher:
+                for batch in prefetcher.batches(batch_size):
+                    self._update_progress("inference", int((len(results) / total_images) * 100),
+                                          f"正在处理: {Path(batch[0][0]).name} 等 {len(batch)} 张")
                     
-                    logger.info(f"图片推理完成: {Path(image_path).name}")
+                    # 解码失败的图片不进入批次
+                    batch_results: Dict[int, Dict[str, Any]] = {}
+                    images, positions = [], []
+                    for offset, (image_path, image, error) in enumerate(batch):
+                        if image is None:
+                            batch_results[offset] = failure(image_path, f"图片预处理失败: {error}")
+                        else:
+                            images.append(image)
+                            positions.append(offset)
                     
-                except Exception as e:
-                    logger.error(f"图片推理失败 {image_path}: {str(e)}")
-                    results.append({
-                        "image_path": image_path,
-                        "success": False,
-                        "error": str(e),
-                        "model_name": model_name,
-                        "description_level": description_level
-                    })
+                    try:
+                        if batched and images:
+                            descriptions = self._infer_batch(images, description_level, model_dtype, inference_config)
+                        else:
+                            descriptions = [self._generate_description(image, description_level) for image in images]
+                        
+                        for offset, description in zip(positions, descriptions):
+                            batch_results[offset] = {
+                                "image_path": batch[offset][0],
+                                "success": True,
+                                "result": description,
+                                "model_name": model_name,
+                                "description_level": description_level,
+                                "processed": True
+                            }
+                        
+                    except Exception as e:
+                        logger.error(f"批量推理失败 - 起始图片: {batch[0][0]}, 批大小: {len(images)}, 错误: {str(e)}")
+                        for offset in positions:
+                            batch_results[offset] = failure(batch[offset][0], str(e))
+                    
+                    finally:
+                        for image in images:
+                            image.close()
+                    
+                    batch_output = [batch_results[offset] for offset in range(len(batch))]
+                    results.extend(batch_output)
+                    if cache is not None:
+                        # 生成失败时_generate_description返回的提示文字不写入缓存
+                        cache.store(cache_key, [(r["image_path"], r["result"]) for r in batch_output
+                                                if r["success"] and not r["result"].startswith("描述生成失败")])
+                    if batch_callback is not None and batch_callback(batch_output) is False:
+                        logger.info(f"推理已停止 - 已处理: {len(results)}/{total_images}")
+                        break
             
+            # 缓存命中的结果先返回，这里恢复与image_paths一致的顺序
+            results.sort(key=lambda r: positions_by_path[r["image_path"]])
             self._update_progress("inference", 100, "推理完成")
             logger.info(f"推理完成 - 成功: {sum(1 for r in results if r['success'])}, 失败: {sum(1 for r in results if not r['success'])}")
             return results
@@ -25,6 +25,10 @@ from plugins.florence2_reverse_plugin.core.config_manager import ConfigManager
 from plugins.florence2_reverse_plugin.core.proxy_manager import ProxyManager
 from plugins.florence2_reverse_plugin.utils.file_utils import FileUtils
 from plugins.florence2_reverse_plugin.utils.gpu_utils import GPUUtils
+from picman.plugins.model_registry import estimate_model_bytes, get_model_registry
+
+# 在共享模型注册表中的所有者名称，键为 "Florence2:<模型名称>"
+REGISTRY_OWNER = "Florence2"
 
 # 基于ComfyUI-Florence2的flash_attn绕过方法
 def fixed_get_imports(filename: str | os.PathLike) -> list[str]:
@@ -67,8 +71,8 @@ class ModelManager:
         # 代理管理器
         self.proxy_manager = ProxyManager()
         
-        # 模型缓存管理
-        self.model_cache = {}  # 缓存已加载的模型
+        # 模型缓存管理：模型登记在各插件共享的ModelRegistry中，由它按内存预算淘汰
+        self.registry = get_model_registry()
         self.cache_info = {}   # 缓存信息（加载时间、使用次数等）
         self.max_cache_size = 2  # 最大缓存模型数量
         self.cache_timeout = 3600  # 缓存超时时间（秒）
@@ -573,8 +577,10 @@ class ModelManager:
                 if model_path is None:
                     raise RuntimeError("模型下载后仍无法找到")
             
-            # 4. 加载模型到GPU/CPU
+            # 4. 加载模型到GPU/CPU（先按权重文件大小在共享内存预算中腾出空间）
             self._update_progress("loading", 50, "加载模型文件...")
+            if use_cache:
+                self.registry.make_room(estimate_model_bytes(model_path))
             
             from transformers import AutoModelForCausalLM, AutoProcessor
             
@@ -817,10 +823,18 @@ class ModelManager:
     
     # ==================== 缓存管理方法 ====================
     
+    def _registry_key(self, model_name: str) -> str:
+        return f"{REGISTRY_OWNER}:{model_name}"
+    
+    def model_in_use(self):
+        """推理期间固定当前模型，不被共享注册表淘汰"""
+        return self.registry.using(self._registry_key(self.current_model_name or ""))
+    
     def get_cached_model(self, model_name: str) -> Optional[Dict[str, Any]]:
         """获取缓存的模型"""
         try:
-            if model_name in self.model_cache:
+            model_data = self.registry.get(self._registry_key(model_name))
+            if model_data is not None:
                 cache_info = self.cache_info.get(model_name, {})
                 
                 # 检查缓存是否过期
@@ -833,7 +847,7 @@ class ModelManager:
                 self._update_cache_info(model_name)
                 
                 self.logger.info(f"使用缓存模型: {model_name}")
-                return self.model_cache[model_name]
+                return model_data
             
             return None
             
@@ -842,14 +856,15 @@ class ModelManager:
             return None
     
     def add_to_cache(self, model_name: str, model_data: Dict[str, Any]):
-        """添加模型到缓存"""
+        """添加模型到缓存（登记到共享模型注册表）"""
         try:
             # 检查缓存大小，如果超出限制则清理
-            if len(self.model_cache) >= self.max_cache_size:
+            if len(self.registry.keys(REGISTRY_OWNER)) >= self.max_cache_size:
                 self._cleanup_cache()
             
             # 添加到缓存
-            self.model_cache[model_name] = model_data
+            self.registry.put(self._registry_key(model_name), model_data, owner=REGISTRY_OWNER,
+                              on_evict=self._on_model_evicted)
             self.cache_info[model_name] = {
                 'loaded_at': datetime.now(),
                 'use_count': 0,
@@ -861,26 +876,34 @@ class ModelManager:
         except Exception as e:
             self.logger.error(f"添加模型到缓存失败: {str(e)}")
     
+    def _on_model_evicted(self, key: str, model_data: Dict[str, Any]):
+        """共享注册表为腾出内存淘汰了本插件的模型：释放本插件持有的引用"""
+        model_name = key.split(":", 1)[1]
+        self.cache_info.pop(model_name, None)
+        model_data.pop('model', None)
+        model_data.pop('processor', None)
+        if self.current_model_name == model_name:
+            self.model = None
+            self.processor = None
+            self.model_loaded = False
+        self.logger.info(f"模型已被共享内存预算淘汰: {model_name}")
+    
     def _remove_from_cache(self, model_name: str):
         """从缓存中移除模型"""
         try:
-            if model_name in self.model_cache:
+            model_data = self.registry.peek(self._registry_key(model_name))
+            if model_data is not None:
                 # 清理模型内存
-                model_data = self.model_cache[model_name]
                 if 'model' in model_data:
                     del model_data['model']
                 if 'processor' in model_data:
                     del model_data['processor']
                 
-                # 从缓存中移除
-                del self.model_cache[model_name]
+                # 从缓存中移除（注册表负责回收内存和清理GPU缓存）
+                self.registry.remove(self._registry_key(model_name))
                 if model_name in self.cache_info:
                     del self.cache_info[model_name]
                 
-                # 清理GPU缓存
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-                
                 self.logger.info(f"模型已从缓存移除: {model_name}")
             
         except Exception as e:
@@ -915,7 +938,7 @@ class ModelManager:
     def _cleanup_cache(self):
         """清理缓存"""
         try:
-            if not self.model_cache:
+            if not self.registry.keys(REGISTRY_OWNER):
                 return
             
             # 按使用次数和最后使用时间排序
@@ -931,7 +954,7 @@ class ModelManager:
             cache_items.sort(key=lambda x: (-x['use_count'], x['last_used']))
             
             # 移除最少使用的模型
-            while len(self.model_cache) >= self.max_cache_size and cache_items:
+            while len(self.registry.keys(REGISTRY_OWNER)) >= self.max_cache_size and cache_items:
                 least_used = cache_items.pop()
                 self._remove_from_cache(least_used['name'])
             
@@ -943,7 +966,7 @@ class ModelManager:
     def clear_all_cache(self):
         """清除所有缓存"""
         try:
-            model_names = list(self.model_cache.keys())
+            model_names = [key.split(":", 1)[1] for key in self.registry.keys(REGISTRY_OWNER)]
             for model_name in model_names:
                 self._remove_from_cache(model_name)
             
@@ -956,7 +979,7 @@ class ModelManager:
         """获取缓存信息"""
         try:
             cache_stats = {
-                'total_models': len(self.model_cache),
+                'total_models': len(self.registry.keys(REGISTRY_OWNER)),
                 'max_cache_size': self.max_cache_size,
                 'cache_timeout': self.cache_timeout,
                 'cached_models': {}
@@ -0,0 +1,57 @@
+"""
+Florence2推理进程任务
+在独立的推理进程中运行（见picman.plugins.inference_worker），组件和已加载的模型在进程内复用
+"""
+
+import logging
+from typing import Dict, Any, List
+
+from plugins.florence2_reverse_plugin.core.config_manager import ConfigManager
+from plugins.florence2_reverse_plugin.core.model_manager import ModelManager
+from plugins.florence2_reverse_plugin.core.inference_engine import InferenceEngine
+
+# 提交任务时使用的导入路径
+CAPTION_IMAGES_JOB = "plugins.florence2_reverse_plugin.core.worker_jobs:caption_images"
+
+logger = logging.getLogger("plugins.florence2_reverse_plugin.core.worker_jobs")
+
+_components = None
+
+
+def _get_components():
+    """进程内只创建一次配置、模型管理器和推理引擎，模型在任务之间保持加载"""
+    global _components
+    if _components is None:
+        config_manager = ConfigManager()
+        config_manager.initialize()
+        model_manager = ModelManager(config_manager)
+        inference_engine = InferenceEngine()
+        inference_engine.initialize(config_manager, model_manager)
+        _components = (model_manager, inference_engine)
+    return _components
+
+
+def caption_images(job, image_paths: List[str], config: Dict[str, Any]) -> Dict[str, Any]:
+    """加载模型并分批推理；每批结果通过job.emit立即返回，取消后在下一批之前停止"""
+    model_manager, inference_engine = _get_components()
+    model_manager.set_progress_callback(job.progress)
+    inference_engine.set_progress_callback(job.progress)
+
+    model_name = config['model_name']
+    if not model_manager.load_model(model_name, config.get('custom_path'), config.get('use_cache', True)):
+        raise RuntimeError(f"模型加载失败: {model_name}")
+
+    def on_batch_done(batch_results: List[Dict[str, Any]]) -> bool:
+        job.emit(batch_results)
+        return not job.cancelled
+
+    results = inference_engine.infer_images(
+        image_paths,
+        model_name,
+        config['description_level'],
+        batch_size=config.get('batch_size'),
+        batch_callback=on_batch_done,
+        use_caption_cache=config.get('use_caption_cache', True)
+    )
+    logger.info(f"推理任务完成 - 图片数量: {len(results)}, 已取消: {job.cancelled}")
+    return {"processed": len(results)}
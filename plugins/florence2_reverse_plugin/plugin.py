@@ -20,6 +20,8 @@ from plugins.florence2_reverse_plugin.core.config_manager import ConfigManager
 from plugins.florence2_reverse_plugin.core.model_manager import ModelManager
 from plugins.florence2_reverse_plugin.core.inference_engine import InferenceEngine
 from plugins.florence2_reverse_plugin.core.result_processor import ResultProcessor
+from plugins.florence2_reverse_plugin.core.worker_jobs import CAPTION_IMAGES_JOB
+from picman.plugins.inference_worker import InferenceWorkerError, get_inference_worker
 from plugins.florence2_reverse_plugin.ui.config_dialog import Florence2ConfigDialog
 from plugins.florence2_reverse_plugin.ui.progress_dialog import ReverseInferenceProgressDialog
 from plugins.florence2_reverse_plugin.ui.image_selection_dialog import ImageSelectionDialog
@@ -504,65 +506,82 @@ class ReverseInferenceThread(QThread):
         self.config = config
         self.image_paths = image_paths
         self.is_cancelled = False
+        self.logger = logging.getLogger("picman.plugins.Florence2ReversePlugin.ReverseInferenceThread")
         
         # 设置进度回调
         self.model_manager.set_progress_callback(self._on_model_progress)
         self.inference_engine.set_progress_callback(self._on_inference_progress)
     
     def run(self):
-        """运行推理线程"""
+        """运行推理线程
+        
+        启用推理进程时，模型加载和推理在独立进程中执行，本线程只等待结果并处理（写入
+        文件/数据库）；否则在本线程中推理。
+        """
         try:
             results = []
+            total = len(self.image_paths)
             
-            # 1. 加载模型
-            if not self._load_model():
-                return
-            
-            # 2. 处理每张图片
-            for i, image_path in enumerate(self.image_paths):
-                if self.is_cancelled:
-                    break
-                
-                try:
-                    # 更新进度
-                    self.inference_progress_updated.emit(i + 1, len(self.image_paths), Path(image_path).name)
-                    
-                    # 执行推理
-                    inference_results = self.inference_engine.infer_images(
-                        [image_path], 
-                        self.config['model_name'],
-                        self.config['description_level']
-                    )
-                    
-                    if inference_results and inference_results[0]['success']:
-                        result = inference_results[0]
+            def on_batch_done(batch_results: List[Dict[str, Any]]) -> bool:
+                successful = [result for result in batch_results if result['success']]
+                if successful:
+                    try:
                         # 处理结果 - 传递配置参数
-                        processed_results = self.result_processor.process_results(
-                            [result], 
+                        self.result_processor.process_results(
+                            successful, 
                             self.config['description_level'],
                             self.config  # 传递配置参数
                         )
-                        
+                    except Exception as e:
+                        self.logger.error(f"处理推理结果失败: {str(e)}")
+                
+                for result in batch_results:
+                    if result['success']:
                         results.append({
-                            'image_path': image_path,
+                            'image_path': result['image_path'],
                             'result': result['result'],
                             'success': True
                         })
                     else:
                         results.append({
-                            'image_path': image_path,
+                            'image_path': result['image_path'],
                             'result': None,
                             'success': False,
-                            'error': '推理失败'
+                            'error': result.get('error', '推理失败')
                         })
-                        
-                except Exception as e:
-                    results.append({
-                        'image_path': image_path,
-                        'result': None,
-                        'success': False,
-                        'error': str(e)
-                    })
+                
+                # 更新进度
+                self.inference_progress_updated.emit(len(results), total, Path(batch_results[-1]['image_path']).name)
+                return not self.is_cancelled
+            
+            worker = get_inference_worker()
+            if worker is not None:
+                if not self._run_in_worker(worker, on_batch_done):
+                    return
+            else:
+                # 1. 加载模型
+                if not self._load_model():
+                    return
+                
+                # 2. 按批处理图片：每批一次processor和generate调用，下一批在后台预先解码
+                if total and not self.is_cancelled:
+                    self.inference_progress_updated.emit(0, total, Path(self.image_paths[0]).name)
+                    self.inference_engine.infer_images(
+                        self.image_paths, 
+                        self.config['model_name'],
+                        self.config['description_level'],
+                        batch_size=self.config.get('batch_size'),
+                        batch_callback=on_batch_done,
+                        use_caption_cache=self.config.get('use_caption_cache', True)
+                    )
+            
+            if total and not results and not self.is_cancelled:
+                results.extend({
+                    'image_path': image_path,
+                    'result': None,
+                    'success': False,
+                    'error': '推理失败'
+                } for image_path in self.image_paths)
             
             # 3. 发送完成信号
             if not self.is_cancelled:
@@ -571,6 +590,24 @@ class ReverseInferenceThread(QThread):
         except Exception as e:
             self.error_occurred.emit(str(e))
     
+    def _run_in_worker(self, worker, on_batch_done) -> bool:
+        """在推理进程中加载模型并推理，每批结果返回后由on_batch_done处理；失败时返回False"""
+        if self.image_paths:
+            self.inference_progress_updated.emit(0, len(self.image_paths), Path(self.image_paths[0]).name)
+        try:
+            worker.run(
+                CAPTION_IMAGES_JOB,
+                {"image_paths": self.image_paths, "config": self.config},
+                on_progress=self._on_inference_progress,
+                on_results=on_batch_done,
+                should_cancel=lambda: self.is_cancelled
+            )
+            return True
+        except InferenceWorkerError as e:
+            self.logger.error(f"推理进程任务失败: {str(e)}")
+            self.error_occurred.emit(f"推理失败: {str(e).splitlines()[0]}")
+            return False
+    
     def _load_model(self) -> bool:
         """加载模型"""
         try:
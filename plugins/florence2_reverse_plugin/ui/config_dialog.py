@@ -11,7 +11,7 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QGroupBox,
     QComboBox, QLineEdit, QPushButton, QLabel, QRadioButton,
     QButtonGroup, QFileDialog, QMessageBox, QTextEdit, QCheckBox,
-    QListWidget, QListWidgetItem, QSplitter, QFrame
+    QListWidget, QListWidgetItem, QSplitter, QFrame, QSpinBox
 )
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFont, QPixmap
@@ -237,6 +237,17 @@ class Florence2ConfigDialog(QDialog):
         layout.addWidget(self.normal_radio)
         layout.addWidget(self.detailed_radio)
         
+        # 批大小：每次generate处理的图片数，实际值还会按可用显存限制
+        batch_layout = QHBoxLayout()
+        batch_layout.addWidget(QLabel("批大小:"))
+        self.batch_size_spin = QSpinBox()
+        self.batch_size_spin.setRange(1, 32)
+        self.batch_size_spin.setValue(4)
+        self.batch_size_spin.setToolTip("每批一起推理的图片数量，显存不足时会自动减小")
+        batch_layout.addWidget(self.batch_size_spin)
+        batch_layout.addStretch()
+        layout.addLayout(batch_layout)
+        
         group.setLayout(layout)
         return group
     
@@ -316,6 +327,9 @@ class Florence2ConfigDialog(QDialog):
                 self.detailed_radio.setChecked(True)
             else:
                 self.normal_radio.setChecked(True)
+            
+            # 设置批大小
+            self.batch_size_spin.setValue(int(self.config_manager.get_config("performance.batch_size", 4)))
                 
         except Exception as e:
             QMessageBox.warning(self, "配置加载失败", f"加载配置时发生错误：{str(e)}")
@@ -444,6 +458,7 @@ class Florence2ConfigDialog(QDialog):
             "model_name": self.selected_model,
             "description_level": self.description_level,
             "image_paths": self.selected_images.copy(),  # 添加选中的图片路径
+            "batch_size": self.batch_size_spin.value(),
         }
         
         if self.use_custom_path_cb.isChecked() and self.custom_path:
@@ -533,6 +548,7 @@ class Florence2ConfigDialog(QDialog):
                 self.config_manager.set_config("models.custom_path", "")
             
             self.config_manager.set_config("inference.default_level", config["description_level"])
+            self.config_manager.set_config("performance.batch_size", config["batch_size"])
             
             # 强制保存配置到文件
             self.config_manager.save_config()
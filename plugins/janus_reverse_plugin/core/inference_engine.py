@@ -8,8 +8,15 @@ import numpy as np
 from PIL import Image
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Callable
+from functools import partial
 from .model_manager import ModelManager
 
+from picman.plugins.image_prefetch import ImagePrefetcher, load_image, processor_image_size
+from picman.plugins.caption_cache import make_caption_key, model_revision, shared_caption_cache
+
+# 批量反推时预先解码的图片数量
+PREFETCH_IMAGES = 4
+
 # 尝试导入Janus库
 try:
     from transformers import AutoModelForCausalLM
@@ -91,11 +98,18 @@ class InferenceEngine:
             self.logger.error(f"推理引擎初始化失败: {str(e)}")
             return False
     
+    def image_loader(self) -> Callable[[str], Image.Image]:
+        """缩小解码（草稿模式）并按EXIF方向摆正；长边不小于processor的输入尺寸，保持宽高比"""
+        processor = self.model_manager.current_processor if self.model_manager else None
+        size = processor_image_size(processor)
+        return partial(load_image, max_side=max(size) if size else 0)
+    
     def reverse_inference(self, image_path: str, question: str, 
                          temperature: float = 0.1, top_p: float = 0.95,
                          max_new_tokens: int = 512, seed: int = 666666666666666,
-                         progress_callback: Optional[Callable] = None) -> Optional[str]:
-        """图片反推推理"""
+                         progress_callback: Optional[Callable] = None,
+                         image: Optional[Image.Image] = None) -> Optional[str]:
+        """图片反推推理（image为已解码的图片时不再读取image_path）"""
         if not self.JANUS_AVAILABLE:
             self.logger.warning("Janus库不可用，无法执行推理")
             return "Janus库不可用，请先安装Janus库"
@@ -104,7 +118,7 @@ class InferenceEngine:
             if not self.model_manager or not self.model_manager.is_model_ready():
                 self.logger.error("模型未加载")
                 return None
-            if not image_path or not Path(image_path).exists():
+            if image is None and (not image_path or not Path(image_path).exists()):
                 self.logger.error(f"图片不存在: {image_path}")
                 return None
 
@@ -127,7 +141,7 @@ class InferenceEngine:
                 progress_callback("preparing", 5, "加载图片...")
 
             # 读取并规范化图像
-            pil_image = Image.open(image_path).convert("RGB")
+            pil_image = image if image is not None else self.image_loader()(image_path)
 
             # 构造对话
             conversation = [
@@ -232,37 +246,71 @@ class InferenceEngine:
             return None
         return None
     
+    def caption_cache_key(self, question: str, temperature: float, top_p: float,
+                          max_new_tokens: int, seed: int):
+        """描述缓存键：当前模型、权重版本、问题和采样参数"""
+        model_manager = self.model_manager
+        return make_caption_key(
+            getattr(model_manager, "current_model_id", None) or "",
+            model_revision(getattr(model_manager, "current_model", None)),
+            "",
+            {
+                "question": question,
+                "temperature": temperature,
+                "top_p": top_p,
+                "max_new_tokens": max_new_tokens,
+                "seed": seed,
+            })
+    
     def batch_reverse_inference(self, image_paths: List[str], question: str,
                               temperature: float = 0.1, top_p: float = 0.95,
                               max_new_tokens: int = 512, seed: int = 666666666666666,
-                              progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
-        """批量图片反推推理"""
+                              progress_callback: Optional[Callable] = None,
+                              use_caption_cache: bool = True) -> List[Dict[str, Any]]:
+        """批量图片反推推理（use_caption_cache时先查描述缓存，命中的图片不再推理）"""
         if not self.JANUS_AVAILABLE:
             self.logger.warning("Janus库不可用，无法执行批量推理")
             return [{"error": "Janus库不可用，请先安装Janus库"}]
-        results: List[Dict[str, Any]] = []
         total = len(image_paths)
-        for idx, path in enumerate(image_paths):
-            if progress_callback:
-                pct = int((idx / max(1, total)) * 100)
-                progress_callback("processing", pct, f"处理: {Path(path).name}")
-            text = self.reverse_inference(
-                image_path=path,
-                question=question,
-                temperature=temperature,
-                top_p=top_p,
-                max_new_tokens=max_new_tokens,
-                seed=seed,
-                progress_callback=progress_callback,
-            )
-            results.append({
-                "image_path": path,
-                "result": text,
-                "success": text is not None
-            })
+        cache = shared_caption_cache() if use_caption_cache else None
+        cached: Dict[str, str] = {}
+        if cache is not None:
+            cache_key = self.caption_cache_key(question, temperature, top_p, max_new_tokens, seed)
+            cached = cache.lookup(image_paths, cache_key)
+        pending_paths = [path for path in image_paths if path not in cached]
+        inferred: Dict[str, Dict[str, Any]] = {}
+        # 推理期间在共享模型注册表中固定模型，避免被其他插件加载模型时淘汰
+        with self.model_manager.model_in_use(), \
+                ImagePrefetcher(pending_paths, self.image_loader(), prefetch=PREFETCH_IMAGES) as prefetcher:
+            for idx, (path, image, error) in enumerate(prefetcher, start=total - len(pending_paths)):
+                if progress_callback:
+                    pct = int((idx / max(1, total)) * 100)
+                    progress_callback("processing", pct, f"处理: {Path(path).name}")
+                if image is None:
+                    inferred[path] = {"image_path": path, "result": None, "success": False, "error": error}
+                    continue
+                text = self.reverse_inference(
+                    image_path=path,
+                    question=question,
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_new_tokens=max_new_tokens,
+                    seed=seed,
+                    progress_callback=progress_callback,
+                    image=image,
+                )
+                image.close()
+                if text is not None and cache is not None:
+                    cache.store(cache_key, [(path, text)])
+                inferred[path] = {
+                    "image_path": path,
+                    "result": text,
+                    "success": text is not None
+                }
         if progress_callback:
             progress_callback("done", 100, "批量完成")
-        return results
+        return [{"image_path": path, "result": cached[path], "success": True, "cached": True}
+                if path in cached else inferred[path] for path in image_paths]
     
     def batch_generate_images(self, prompts: List[str], seed: int = 666666666666666,
                             batch_size: int = 1, cfg_weight: float = 5.0,
@@ -9,6 +9,11 @@ import torch
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple, List
 
+from picman.plugins.model_registry import estimate_model_bytes, get_model_registry
+
+# 在共享模型注册表中的所有者名称，键为 "Janus:<模型ID>"
+REGISTRY_OWNER = "Janus"
+
 # 尝试导入Janus库
 try:
     from transformers import AutoModelForCausalLM
@@ -72,6 +77,9 @@ class ModelManager:
         self.current_model_id = None
         self.is_model_loaded = False
         
+        # 已加载的模型登记在各插件共享的ModelRegistry中，由它按内存预算淘汰
+        self.registry = get_model_registry()
+        
         # Janus库可用性
         self.JANUS_AVAILABLE = JANUS_AVAILABLE
         
@@ -177,6 +185,11 @@ class ModelManager:
             return False
         
         try:
+            if self.is_model_ready() and self.current_model_id == model_id \
+                    and self.registry.get(self._registry_key(model_id)) is not None:
+                self.logger.info(f"模型已加载，使用缓存: {model_id}")
+                return True
+            
             self.logger.info(f"开始加载模型: {model_id}")
             
             # 1) 解析模型路径（优先使用自定义路径）
@@ -224,6 +237,10 @@ class ModelManager:
                 self.logger.error(f"模型目录无效: {model_path}")
                 return False
             
+            # 先卸载当前模型，并按权重文件大小在共享内存预算中腾出空间
+            self.unload_model()
+            self.registry.make_room(estimate_model_bytes(model_path))
+            
             # 加载模型和处理器（失败则自动尝试重新下载一次）
             def _do_load() -> bool:
                 # 优先使用GPU（如可用），否则回退CPU；并显式log设备与dtype
@@ -284,6 +301,9 @@ class ModelManager:
             # 更新状态
             self.current_model_id = model_id
             self.is_model_loaded = True
+            self.registry.put(self._registry_key(model_id),
+                              {"model": self.current_model, "processor": self.current_processor},
+                              owner=REGISTRY_OWNER, on_evict=self._on_model_evicted)
             
             self.logger.info(f"模型加载成功: {model_id}")
             return True
@@ -292,16 +312,34 @@ class ModelManager:
             self.logger.error(f"加载模型失败: {model_id}, 错误: {str(e)}")
             return False
     
+    def _registry_key(self, model_id: str) -> str:
+        return f"{REGISTRY_OWNER}:{model_id}"
+    
+    def model_in_use(self):
+        """推理期间固定当前模型，不被共享注册表淘汰"""
+        return self.registry.using(self._registry_key(self.current_model_id or ""))
+    
+    def _on_model_evicted(self, key: str, model_data: Dict[str, Any]):
+        """共享注册表为腾出内存淘汰了模型：释放本插件持有的引用"""
+        model_data.clear()
+        if self.current_model_id and key == self._registry_key(self.current_model_id):
+            self.current_model = None
+            self.current_processor = None
+            self.current_model_id = None
+            self.is_model_loaded = False
+        self.logger.info(f"模型已被共享内存预算淘汰: {key}")
+    
     def unload_model(self) -> bool:
         """卸载模型"""
         if self.is_model_loaded:
+            model_id = self.current_model_id
             self.current_model = None
             self.current_processor = None
             self.current_model_id = None
             self.is_model_loaded = False
             
-            # 清理GPU内存
-            if torch.cuda.is_available():
+            # 从共享注册表移除（注册表负责垃圾回收和清理GPU缓存）
+            if not self.registry.remove(self._registry_key(model_id or "")) and torch.cuda.is_available():
                 torch.cuda.empty_cache()
             
             self.logger.info("模型已卸载")
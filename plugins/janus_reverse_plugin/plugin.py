@@ -17,7 +17,9 @@ sys.path.insert(0, str(project_root / "src"))
 from picman.plugins.base import Plugin, PluginInfo
 from .core.config_manager import ConfigManager
 from .core.model_manager import ModelManager
-from .core.inference_engine import InferenceEngine
+from .core.inference_engine import InferenceEngine, PREFETCH_IMAGES
+from picman.plugins.image_prefetch import ImagePrefetcher
+from picman.plugins.caption_cache import shared_caption_cache
 from .core.result_processor import ResultProcessor
 from .ui.config_dialog import JanusConfigDialog
 
@@ -724,43 +726,72 @@ class ReverseInferenceThread(QThread):
             
             results = []
             total = len(self.image_paths)
-            
-            for i, image_path in enumerate(self.image_paths):
-                if self.is_cancelled:
-                    self.logger.info("反推推理被取消")
-                    break
-                
-                try:
-                    # 更新进度
-                    progress = int((i / total) * 100)
-                    self.progress_updated.emit("processing", progress, f"正在处理: {Path(image_path).name}")
-                    
-                    # 执行反推
-                    reverse_config = self.config.get("reverse_inference", {})
-                    result = self.inference_engine.reverse_inference(
-                        image_path=image_path,
-                        question=reverse_config.get("question", "Describe this image in detail."),
-                        temperature=reverse_config.get("temperature", 0.1),
-                        top_p=reverse_config.get("top_p", 0.95),
-                        max_new_tokens=reverse_config.get("max_new_tokens", 512),
-                        seed=reverse_config.get("seed", 666666666),
-                        progress_callback=self.on_progress_callback
-                    )
+            reverse_config = self.config.get("reverse_inference", {})
+            question = reverse_config.get("question", "Describe this image in detail.")
+            temperature = reverse_config.get("temperature", 0.1)
+            top_p = reverse_config.get("top_p", 0.95)
+            max_new_tokens = reverse_config.get("max_new_tokens", 512)
+            seed = reverse_config.get("seed", 666666666)
+            
+            # 先查描述缓存，命中的图片直接作为结果，不再推理
+            cache = shared_caption_cache() if reverse_config.get("use_caption_cache", True) else None
+            cached = {}
+            if cache is not None:
+                cache_key = self.inference_engine.caption_cache_key(question, temperature, top_p, max_new_tokens, seed)
+                cached = cache.lookup(self.image_paths, cache_key)
+                results.extend({"image_path": image_path, "result": cached[image_path], "success": True, "cached": True}
+                               for image_path in self.image_paths if image_path in cached)
+            pending_paths = [image_path for image_path in self.image_paths if image_path not in cached]
+            
+            # 当前图片推理时，后续图片在后台线程中解码；模型在共享注册表中固定，不会被淘汰
+            with self.model_manager.model_in_use(), \
+                    ImagePrefetcher(pending_paths, self.inference_engine.image_loader(),
+                                    prefetch=PREFETCH_IMAGES) as prefetcher:
+                for i, (image_path, image, error) in enumerate(prefetcher, start=len(results)):
+                    if self.is_cancelled:
+                        self.logger.info("反推推理被取消")
+                        break
                     
-                    results.append({
-                        "image_path": image_path,
-                        "result": result,
-                        "success": result is not None
-                    })
+                    try:
+                        # 更新进度
+                        progress = int((i / total) * 100)
+                        self.progress_updated.emit("processing", progress, f"正在处理: {Path(image_path).name}")
+                        
+                        if image is None:
+                            raise RuntimeError(f"图片加载失败: {error}")
+                        
+                        # 执行反推
+                        result = self.inference_engine.reverse_inference(
+                            image_path=image_path,
+                            question=question,
+                            temperature=temperature,
+                            top_p=top_p,
+                            max_new_tokens=max_new_tokens,
+                            seed=seed,
+                            progress_callback=self.on_progress_callback,
+                            image=image
+                        )
+                        if result is not None and cache is not None:
+                            cache.store(cache_key, [(image_path, result)])
+                        
+                        results.append({
+                            "image_path": image_path,
+                            "result": result,
+                            "success": result is not None
+                        })
+                        
+                    except Exception as e:
+                        self.logger.error(f"处理图片失败: {image_path}, 错误: {str(e)}")
+                        results.append({
+                            "image_path": image_path,
+                            "result": None,
+                            "success": False,
+                            "error": str(e)
+                        })
                     
-                except Exception as e:
-                    self.logger.error(f"处理图片失败: {image_path}, 错误: {str(e)}")
-                    results.append({
-                        "image_path": image_path,
-                        "result": None,
-                        "success": False,
-                        "error": str(e)
-                    })
+                    finally:
+                        if image is not None:
+                            image.close()
             
             # 发送完成信号
             self.finished.emit(results)
@@ -6,8 +6,17 @@ JoyCaption插件推理引擎
 import logging
 import torch
 from PIL import Image
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable
 from pathlib import Path
+from functools import partial
+
+from picman.plugins.image_prefetch import ImagePrefetcher, load_image, processor_image_size
+from picman.plugins.caption_cache import make_caption_key, model_revision, shared_caption_cache
+from picman.plugins.model_registry import get_model_registry
+from .model_manager import registry_key
+
+# 批量推理时预先解码的图片数量
+PREFETCH_IMAGES = 4
 
 
 class InferenceEngine:
@@ -16,6 +25,7 @@ class InferenceEngine:
     def __init__(self):
         self.logger = logging.getLogger("plugins.joycaption_reverse_plugin.core.inference_engine")
         self.current_model_info = None
+        self.model_loader = None
         
         # 检查GPU可用性
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -24,15 +34,24 @@ class InferenceEngine:
         else:
             self.logger.info("使用CPU进行推理")
     
-    def setup_model(self, model_info: Dict[str, Any]):
-        """设置模型"""
+    def setup_model(self, model_info: Dict[str, Any],
+                    model_loader: Optional[Callable[[], Optional[Dict[str, Any]]]] = None):
+        """设置模型；model_loader用于模型被共享注册表淘汰后重新加载"""
         try:
             self.current_model_info = model_info
+            self.model_loader = model_loader
             self.logger.info("推理引擎模型设置完成")
         except Exception as e:
             self.logger.error(f"设置模型失败: {str(e)}")
             raise
     
+    def _ensure_model(self) -> Optional[Dict[str, Any]]:
+        """返回可用的模型信息；模型已被淘汰时通过model_loader重新加载"""
+        if self.current_model_info and self.current_model_info.get("evicted"):
+            self.logger.info(f"模型已被淘汰，重新加载: {self.current_model_info.get('model_id')}")
+            self.current_model_info = self.model_loader() if self.model_loader else None
+        return self.current_model_info
+    
     def build_prompt(self, caption_type: str, caption_length: str, extra_options: List[str] = None, name_input: str = "") -> str:
         """构建提示词"""
         try:
@@ -94,54 +113,37 @@ class InferenceEngine:
             self.logger.error(f"构建提示词失败: {str(e)}")
             return "Write a description for this image."
     
+    def _image_loader(self):
+        """缩小解码（草稿模式）、按EXIF方向摆正，并resize到模型期望尺寸"""
+        target_size = None
+        if self.current_model_info:
+            target_size = processor_image_size(self.current_model_info.get("processor"))
+        return partial(load_image, size=target_size, resample=Image.Resampling.LANCZOS)
+    
     def preprocess_image(self, image_path: str) -> Optional[Image.Image]:
         """预处理图片"""
         try:
-            # 加载图片
-            image = Image.open(image_path)
-            
-            # 转换为RGB模式
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # 确保图片是有效的
-            if image.size[0] == 0 or image.size[1] == 0:
-                self.logger.error(f"图片尺寸无效: {image.size}")
-                return None
-            
-            # 如果模型期望尺寸已知，则resize到期望尺寸
-            if hasattr(self, 'current_model_info') and self.current_model_info:
-                processor = self.current_model_info.get("processor")
-                if processor and hasattr(processor, 'image_processor'):
-                    expected_size = None
-                    if hasattr(processor.image_processor, 'size'):
-                        expected_size = processor.image_processor.size
-                    elif hasattr(processor.image_processor, 'crop_size'):
-                        expected_size = processor.image_processor.crop_size
-                    
-                    if expected_size:
-                        target_size = (expected_size['width'], expected_size['height'])
-                        self.logger.info(f"将图片从 {image.size} resize到 {target_size}")
-                        image = image.resize(target_size, Image.Resampling.LANCZOS)
-            
-            return image
+            return self._image_loader()(image_path)
             
         except Exception as e:
             self.logger.error(f"图片预处理失败 {image_path}: {str(e)}")
             return None
     
-    def inference(self, image_path: str, config: Dict[str, Any]) -> Optional[str]:
-        """执行推理"""
+    def inference(self, image_path: str, config: Dict[str, Any],
+                  image: Optional[Image.Image] = None) -> Optional[str]:
+        """执行推理（image为已预处理的图片时不再解码image_path）"""
         try:
-            if not self.current_model_info:
+            model_info = self._ensure_model()
+            if not model_info:
                 self.logger.error("模型未设置")
                 return None
             
-            model = self.current_model_info["model"]
-            processor = self.current_model_info["processor"]
+            model = model_info["model"]
+            processor = model_info["processor"]
             
             # 预处理图片
-            image = self.preprocess_image(image_path)
+            if image is None:
+                image = self.preprocess_image(image_path)
             if image is None:
                 return None
             
@@ -257,45 +259,111 @@ class InferenceEngine:
             self.logger.error(f"详细错误信息: {traceback.format_exc()}")
             return None
     
-    def batch_inference(self, image_paths: List[str], config: Dict[str, Any], progress_callback=None) -> List[Dict[str, Any]]:
-        """批量推理"""
-        results = []
+    def _caption_cache_key(self, config: Dict[str, Any]):
+        """描述缓存键：模型、权重版本、精度、提示词和采样参数"""
+        caption_type = config.get("caption_type", "Descriptive")
+        caption_length = config.get("caption_length", "any")
+        return make_caption_key(
+            self.current_model_info.get("model_id", ""),
+            model_revision(self.current_model_info.get("model")),
+            config.get("description_level", "normal"),
+            {
+                "prompt": self.build_prompt(caption_type, caption_length,
+                                            config.get("extra_options", []), config.get("name_input", "")),
+                "precision": self.current_model_info.get("precision"),
+                "max_new_tokens": config.get("max_new_tokens", 512),
+                "temperature": config.get("temperature", 0.6),
+                "top_p": config.get("top_p", 0.9),
+                "top_k": config.get("top_k", 0),
+            })
+    
+    def batch_inference(self, image_paths: List[str], config: Dict[str, Any], progress_callback=None,
+                        result_callback: Optional[Callable[[List[Dict[str, Any]]], bool]] = None) -> List[Dict[str, Any]]:
+        """批量推理（后续图片在后台线程中预先解码）
+        
+        config中use_caption_cache不为False时先查描述缓存，命中的图片不再推理。推理期间模型在
+        共享模型注册表中被固定，不会因其他插件加载模型而被淘汰。
+        result_callback依次收到缓存命中的结果和每张推理完成的结果，返回False时停止，
+        此时只返回已完成的图片。
+        """
+        model_info = self._ensure_model() or {}
+        with get_model_registry().using(registry_key(model_info.get("model_id", ""), model_info.get("precision", ""))):
+            return self._batch_inference(image_paths, config, progress_callback, result_callback)
+    
+    def _batch_inference(self, image_paths: List[str], config: Dict[str, Any], progress_callback,
+                         result_callback) -> List[Dict[str, Any]]:
         total_images = len(image_paths)
         
-        for i, image_path in enumerate(image_paths):
-            try:
-                # 更新进度
-                if progress_callback:
-                    progress = int((i / total_images) * 100)
-                    progress_callback("inference", progress, f"处理图片 {i+1}/{total_images}: {Path(image_path).name}")
-                
-                # 执行推理
-                result_text = self.inference(image_path, config)
-                
-                result = {
-                    "image_path": image_path,
-                    "success": result_text is not None,
-                    "text": result_text or "",
-                    "error": None
-                }
-                
-                if result_text is None:
-                    result["error"] = "推理失败"
-                
-                results.append(result)
+        cache = shared_caption_cache() if self.current_model_info and config.get("use_caption_cache", True) else None
+        cached: Dict[str, str] = {}
+        if cache is not None:
+            cache_key = self._caption_cache_key(config)
+            cached = cache.lookup(image_paths, cache_key)
+        
+        def cached_result(image_path: str) -> Dict[str, Any]:
+            return {
+                "image_path": image_path,
+                "success": True,
+                "text": cached[image_path],
+                "error": None,
+                "cached": True
+            }
+        
+        pending_paths = [image_path for image_path in image_paths if image_path not in cached]
+        if result_callback is not None and cached:
+            if not result_callback([cached_result(image_path) for image_path in image_paths if image_path in cached]):
+                pending_paths = []
+        inferred: Dict[str, Dict[str, Any]] = {}
+        with ImagePrefetcher(pending_paths, self._image_loader(), prefetch=PREFETCH_IMAGES) as prefetcher:
+            for i, (image_path, image, error) in enumerate(prefetcher, start=len(image_paths) - len(pending_paths)):
+                try:
+                    # 更新进度
+                    if progress_callback:
+                        progress = int((i / total_images) * 100)
+                        progress_callback("inference", progress, f"处理图片 {i+1}/{total_images}: {Path(image_path).name}")
+                    
+                    if image is None:
+                        raise RuntimeError(f"图片预处理失败: {error}")
+                    
+                    # 执行推理
+                    result_text = self.inference(image_path, config, image)
+                    
+                    result = {
+                        "image_path": image_path,
+                        "success": result_text is not None,
+                        "text": result_text or "",
+                        "error": None
+                    }
+                    
+                    if result_text is None:
+                        result["error"] = "推理失败"
+                    elif cache is not None:
+                        cache.store(cache_key, [(image_path, result_text)])
+                    
+                    inferred[image_path] = result
+                    
+                    self.logger.info(f"图片推理完成 {i+1}/{total_images}: {Path(image_path).name}")
+                    
+                except Exception as e:
+                    self.logger.error(f"批量推理失败 {image_path}: {str(e)}")
+                    inferred[image_path] = {
+                        "image_path": image_path,
+                        "success": False,
+                        "text": "",
+                        "error": str(e)
+                    }
                 
-                self.logger.info(f"图片推理完成 {i+1}/{total_images}: {Path(image_path).name}")
+                finally:
+                    if image is not None:
+                        image.close()
                 
-            except Exception as e:
-                self.logger.error(f"批量推理失败 {image_path}: {str(e)}")
-                results.append({
-                    "image_path": image_path,
-                    "success": False,
-                    "text": "",
-                    "error": str(e)
-                })
+                if result_callback is not None and not result_callback([inferred[image_path]]):
+                    self.logger.info(f"批量推理已停止: {len(inferred)}/{len(pending_paths)}")
+                    break
         
-        return results
+        # 按输入顺序合并缓存命中和推理结果
+        return [cached_result(image_path) if image_path in cached else inferred[image_path]
+                for image_path in image_paths if image_path in cached or image_path in inferred]
     
     def get_system_prompt(self) -> str:
         """获取系统提示词"""
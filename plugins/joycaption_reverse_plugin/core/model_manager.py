@@ -12,11 +12,21 @@ from typing import Dict, Any, Optional, List
 from huggingface_hub import snapshot_download, hf_hub_download
 from transformers import AutoProcessor, LlavaForConditionalGeneration, BitsAndBytesConfig
 
+from picman.plugins.model_registry import estimate_model_bytes, get_model_registry
+
 try:
     from .proxy_manager import ProxyManager
 except ImportError:
     ProxyManager = None
 
+# 在共享模型注册表中的所有者名称
+REGISTRY_OWNER = "JoyCaption"
+
+
+def registry_key(model_id: str, precision: str) -> str:
+    """共享模型注册表中的键：所有者 + 模型ID + 精度"""
+    return f"{REGISTRY_OWNER}:{model_id}_{precision}"
+
 
 class ModelManager:
     """JoyCaption模型管理器"""
@@ -35,8 +45,8 @@ class ModelManager:
         self.models_dir.mkdir(parents=True, exist_ok=True)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # 模型缓存
-        self.loaded_models = {}
+        # 已加载的模型登记在各插件共享的ModelRegistry中，由它按内存预算淘汰
+        self.registry = get_model_registry()
         self.model_info = {}
         
         self.logger.info(f"模型目录初始化完成 - 插件目录: {self.plugin_dir}, 缓存目录: {self.cache_dir}")
@@ -251,10 +261,11 @@ class ModelManager:
         """加载模型"""
         try:
             # 检查模型是否已加载
-            cache_key = f"{model_id}_{precision}"
-            if cache_key in self.loaded_models:
+            key = registry_key(model_id, precision)
+            cached_info = self.registry.get(key)
+            if cached_info is not None:
                 self.logger.info(f"模型已加载，使用缓存: {model_id}")
-                return self.loaded_models[cache_key]
+                return cached_info
             
             # 检查模型是否已下载或本地可用
             if not self.is_model_downloaded(model_id, custom_paths):
@@ -271,6 +282,9 @@ class ModelManager:
                 self.logger.info(f"使用插件目录模型路径: {model_path}")
             self.logger.info(f"开始加载模型: {model_id}, 精度: {precision}")
             
+            # 按权重文件大小在共享内存预算中腾出空间
+            self.registry.make_room(estimate_model_bytes(model_path))
+            
             # 设置设备
             device = "cuda" if torch.cuda.is_available() else "cpu"
             
@@ -358,7 +372,7 @@ class ModelManager:
                 "model_id": model_id
             }
             
-            self.loaded_models[cache_key] = model_info
+            self.registry.put(key, model_info, owner=REGISTRY_OWNER, on_evict=self._on_model_evicted)
             self.logger.info(f"模型加载完成: {model_id}, 精度: {precision}")
             
             return model_info
@@ -372,10 +386,9 @@ class ModelManager:
     def unload_model(self, model_id: str, precision: str = "Balanced (8-bit)"):
         """卸载模型"""
         try:
-            cache_key = f"{model_id}_{precision}"
-            if cache_key in self.loaded_models:
-                model_info = self.loaded_models[cache_key]
-                
+            key = registry_key(model_id, precision)
+            model_info = self.registry.peek(key)
+            if model_info is not None:
                 # 清理模型内存
                 if "model" in model_info:
                     del model_info["model"]
@@ -383,24 +396,25 @@ class ModelManager:
                 if "processor" in model_info:
                     del model_info["processor"]
                 
-                # 从缓存中移除
-                del self.loaded_models[cache_key]
-                
-                # 强制垃圾回收
-                import gc
-                gc.collect()
-                
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
+                # 从缓存中移除（注册表负责垃圾回收和清理GPU缓存）
+                self.registry.remove(key)
                 
                 self.logger.info(f"模型已卸载: {model_id}")
                 
         except Exception as e:
             self.logger.error(f"模型卸载失败 {model_id}: {str(e)}")
     
+    def _on_model_evicted(self, key: str, model_info: Dict[str, Any]):
+        """共享注册表为腾出内存淘汰了模型；推理引擎持有同一字典，标记为已淘汰并释放引用，
+        推理引擎下次使用时重新加载"""
+        model_info["evicted"] = True
+        model_info.pop("model", None)
+        model_info.pop("processor", None)
+        self.logger.info(f"模型已被共享内存预算淘汰: {key}")
+    
     def get_loaded_models(self) -> List[str]:
         """获取已加载的模型列表"""
-        return list(self.loaded_models.keys())
+        return [key.split(":", 1)[1] for key in self.registry.keys(REGISTRY_OWNER)]
     
     def get_model_info(self, model_id: str) -> Optional[Dict[str, Any]]:
         """获取模型信息"""
@@ -453,7 +467,7 @@ class ModelManager:
         """清理缓存"""
         try:
             # 卸载所有已加载的模型
-            for cache_key in list(self.loaded_models.keys()):
+            for cache_key in self.get_loaded_models():
                 model_id, precision = cache_key.rsplit('_', 1)
                 self.unload_model(model_id, precision)
             
@@ -0,0 +1,52 @@
+"""
+JoyCaption推理进程任务
+在独立的推理进程中运行（见picman.plugins.inference_worker），模型在任务之间保持加载
+"""
+
+import logging
+from typing import Dict, Any, List
+
+from .config_manager import ConfigManager
+from .model_manager import ModelManager
+from .inference_engine import InferenceEngine
+
+# 提交任务时使用的导入路径
+CAPTION_IMAGES_JOB = "plugins.joycaption_reverse_plugin.core.worker_jobs:caption_images"
+
+logger = logging.getLogger("plugins.joycaption_reverse_plugin.core.worker_jobs")
+
+_components = None
+
+
+def _get_components():
+    """进程内只创建一次模型管理器和推理引擎"""
+    global _components
+    if _components is None:
+        config_manager = ConfigManager()
+        _components = (ModelManager(config_manager), InferenceEngine())
+    return _components
+
+
+def caption_images(job, image_paths: List[str], config: Dict[str, Any]) -> Dict[str, Any]:
+    """加载模型并逐张推理；结果通过job.emit立即返回，取消后在下一张之前停止"""
+    model_manager, inference_engine = _get_components()
+    model_id = config.get("model_id")
+    job.progress("load", 0, "正在加载模型...")
+
+    def load_model():
+        return model_manager.load_model(model_id, config.get("precision", "Balanced (8-bit)"),
+                                        config.get("custom_local_paths", []))
+
+    model_info = load_model()
+    if not model_info:
+        raise RuntimeError(f"模型加载失败: {model_id}")
+    inference_engine.setup_model(model_info, load_model)
+
+    def on_results(results: List[Dict[str, Any]]) -> bool:
+        job.emit(results)
+        return not job.cancelled
+
+    results = inference_engine.batch_inference(image_paths, config, job.progress, on_results)
+    logger.info(f"推理任务完成 - 图片数量: {len(results)}, 已取消: {job.cancelled}")
+    # 结果已通过job.emit逐张返回，这里只返回摘要，避免再次跨进程传输
+    return {"processed": len(results)}
@@ -45,8 +45,10 @@ from .core.config_manager import ConfigManager
 from .core.model_manager import ModelManager
 from .core.inference_engine import InferenceEngine
 from .core.result_processor import ResultProcessor
+from .core.worker_jobs import CAPTION_IMAGES_JOB
 from .ui.config_dialog import JoyCaptionConfigDialog
 from .ui.progress_dialog import JoyCaptionProgressDialog
+from picman.plugins.inference_worker import InferenceWorkerError, get_inference_worker
 
 
 class JoyCaptionReversePlugin(Plugin):
@@ -67,6 +69,7 @@ class JoyCaptionReversePlugin(Plugin):
         # 状态变量
         self.is_initialized = False
         self.current_model_info = None
+        self.processing_thread = None
         
         self.logger.info("JoyCaption插件实例创建")
     
@@ -167,7 +170,8 @@ class JoyCaptionReversePlugin(Plugin):
             QMessageBox.critical(parent, "错误", f"显示配置对话框失败: {str(e)}")
             return None
     
-    def process_single_image(self, image_path: str, config: Dict[str, Any], progress_callback: Callable = None) -> Optional[str]:
+    def process_single_image(self, image_path: str, config: Dict[str, Any], progress_callback: Callable = None,
+                             should_cancel: Callable = None) -> Optional[str]:
         """
         处理单张图片，使用JoyCaption模型生成图片描述
         
@@ -175,6 +179,7 @@ class JoyCaptionReversePlugin(Plugin):
             image_path (str): 图片文件路径
             config (Dict[str, Any]): 处理配置，包含模型ID、精度、推理参数等
             progress_callback (Callable, optional): 进度回调函数，用于报告处理进度
+            should_cancel (Callable, optional): 等待推理进程时定期调用，返回True时取消
             
         Returns:
             Optional[str]: 生成的图片描述文本，失败时返回None
@@ -213,6 +218,18 @@ class JoyCaptionReversePlugin(Plugin):
                     self.logger.error(f"模型下载失败: {model_id}")
                     return None
             
+            description_level = config.get("description_level", "normal")
+            worker = get_inference_worker()
+            if worker is not None:
+                # 结果在返回时已通过save_result_to_file保存
+                results = self._process_in_worker(worker, [image_path], config, description_level,
+                                                  progress_callback, should_cancel)
+                if results and results[0]["success"]:
+                    self.logger.info(f"图片处理完成: {image_path}")
+                    return results[0]["text"]
+                self.logger.error(f"推理失败: {image_path}")
+                return None
+            
             # 加载模型
             if progress_callback:
                 progress_callback("load", 0, "正在加载模型...")
@@ -223,7 +240,12 @@ class JoyCaptionReversePlugin(Plugin):
                 return None
             
             # 设置推理引擎
-            self.inference_engine.setup_model(model_info)
+            self.inference_engine.setup_model(
+                model_info, lambda: self.model_manager.load_model(model_id, precision, custom_paths))
+            
+            if should_cancel and should_cancel():
+                self.logger.info(f"处理已取消: {image_path}")
+                return None
             
             # 执行推理
             if progress_callback:
@@ -246,7 +268,8 @@ class JoyCaptionReversePlugin(Plugin):
             self.logger.error(f"处理单张图片失败 {image_path}: {str(e)}")
             return None
     
-    def process_multiple_images(self, image_paths: List[str], config: Dict[str, Any], progress_callback: Callable = None) -> List[Dict[str, Any]]:
+    def process_multiple_images(self, image_paths: List[str], config: Dict[str, Any], progress_callback: Callable = None,
+                                should_cancel: Callable = None) -> List[Dict[str, Any]]:
         """
         批量处理多张图片，使用JoyCaption模型生成图片描述
         
@@ -254,6 +277,7 @@ class JoyCaptionReversePlugin(Plugin):
             image_paths (List[str]): 图片文件路径列表
             config (Dict[str, Any]): 处理配置，包含模型ID、精度、推理参数等
             progress_callback (Callable, optional): 进度回调函数，用于报告处理进度
+            should_cancel (Callable, optional): 等待推理进程时定期调用，返回True时取消
             
         Returns:
             List[Dict[str, Any]]: 处理结果列表，每个元素包含图片路径、成功状态、描述文本等
@@ -262,6 +286,7 @@ class JoyCaptionReversePlugin(Plugin):
             - 会自动过滤不存在的图片文件
             - 使用批量推理提高处理效率
             - 所有结果都会自动保存到文件
+            - 启用推理进程时模型加载和推理在独立进程中执行，结果随到随存
         """
         try:
             if not self.is_initialized:
@@ -301,6 +326,12 @@ class JoyCaptionReversePlugin(Plugin):
                     self.logger.error(f"模型下载失败: {model_id}")
                     return []
             
+            description_level = config.get("description_level", "normal")
+            worker = get_inference_worker()
+            if worker is not None:
+                return self._process_in_worker(worker, valid_paths, config, description_level,
+                                               progress_callback, should_cancel)
+            
             # 加载模型
             if progress_callback:
                 progress_callback("load", 0, "正在加载模型...")
@@ -311,13 +342,14 @@ class JoyCaptionReversePlugin(Plugin):
                 return []
             
             # 设置推理引擎
-            self.inference_engine.setup_model(model_info)
+            self.inference_engine.setup_model(
+                model_info, lambda: self.model_manager.load_model(model_id, precision, custom_paths))
             
-            # 执行批量推理
-            results = self.inference_engine.batch_inference(valid_paths, config, progress_callback)
+            # 执行批量推理；取消后在下一张之前停止，只保存已完成的结果
+            result_callback = (lambda results: not should_cancel()) if should_cancel else None
+            results = self.inference_engine.batch_inference(valid_paths, config, progress_callback, result_callback)
             
             # 保存结果
-            description_level = config.get("description_level", "normal")
             self.result_processor.save_batch_results(results, description_level)
             
             self.logger.info(f"批量处理完成: 成功 {len([r for r in results if r['success']])}/{len(results)}")
@@ -327,6 +359,30 @@ class JoyCaptionReversePlugin(Plugin):
             self.logger.error(f"批量处理失败: {str(e)}")
             return []
     
+    def _process_in_worker(self, worker, image_paths: List[str], config: Dict[str, Any], description_level: str,
+                           progress_callback: Callable = None, should_cancel: Callable = None) -> List[Dict[str, Any]]:
+        """在推理进程中批量推理，结果返回后立即保存；取消或失败时返回已完成的结果"""
+        completed = []
+        
+        def on_results(results: List[Dict[str, Any]]):
+            self.result_processor.save_batch_results(results, description_level)
+            completed.extend(results)
+        
+        try:
+            worker.run(
+                CAPTION_IMAGES_JOB,
+                {"image_paths": image_paths, "config": config},
+                on_progress=progress_callback,
+                on_results=on_results,
+                should_cancel=should_cancel
+            )
+        except InferenceWorkerError as e:
+            self.logger.error(f"推理进程任务失败: {str(e)}")
+            return completed
+        
+        self.logger.info(f"批量处理完成: 成功 {len([r for r in completed if r['success']])}/{len(completed)}")
+        return completed
+    
     def process_directory(self, directory_path: str, config: Dict[str, Any], progress_callback: Callable = None) -> List[Dict[str, Any]]:
         """处理目录中的所有图片"""
         try:
@@ -392,6 +448,11 @@ class JoyCaptionReversePlugin(Plugin):
     def shutdown(self) -> bool:
         """清理资源"""
         try:
+            # 停止正在进行的处理
+            if self.processing_thread is not None and self.processing_thread.isRunning():
+                self.processing_thread.cancel_operation()
+                self.processing_thread.wait()
+            
             # 清理推理引擎
             if self.inference_engine:
                 self.inference_engine.cleanup()
@@ -458,30 +519,41 @@ class JoyCaptionReversePlugin(Plugin):
                 QMessageBox.warning(parent, "错误", "没有选择图片")
                 return
             
-            # 创建进度对话框
+            if self.processing_thread is not None and self.processing_thread.isRunning():
+                QMessageBox.warning(parent, "提示", "JoyCaption正在处理，请等待当前任务完成")
+                return
+            
+            # 创建进度对话框（非模态：处理期间照片网格仍可操作）
             progress_dialog = self.show_progress_dialog(parent, "JoyCaption处理进度")
+            progress_dialog.setModal(False)
             
-            # 根据图片数量选择处理方式
-            if len(image_paths) == 1:
-                # 单张图片处理
-                result = self.process_single_image(image_paths[0], config, progress_dialog.update_progress)
-                if result:
-                    QMessageBox.information(parent, "成功", f"处理完成：{result[:100]}...")
-                else:
-                    QMessageBox.warning(parent, "失败", "图片处理失败")
-            else:
-                # 多张图片处理
-                results = self.process_multiple_images(image_paths, config, progress_dialog.update_progress)
-                if results:
-                    success_count = sum(1 for r in results if r.get('success', False))
-                    QMessageBox.information(parent, "成功", f"处理完成：{success_count}/{len(results)} 张图片成功")
-                else:
-                    QMessageBox.warning(parent, "失败", "批量处理失败")
+            # 在后台线程中处理，界面线程不等待推理结果
+            thread = JoyCaptionProcessingThread(self, image_paths, config)
+            thread.progress_updated.connect(progress_dialog.update_progress)
+            progress_dialog.cancel_button.clicked.connect(thread.cancel_operation)
+            thread.finished.connect(lambda result: self.on_processing_finished(image_paths, result, parent))
+            self.processing_thread = thread
+            progress_dialog.show()
+            thread.start()
             
         except Exception as e:
             self.logger.error(f"开始JoyCaption处理失败: {str(e)}")
             QMessageBox.critical(parent, "错误", f"开始JoyCaption处理失败: {str(e)}")
     
+    def on_processing_finished(self, image_paths: List[str], result, parent=None):
+        """处理完成回调"""
+        if len(image_paths) == 1:
+            if result:
+                QMessageBox.information(parent, "成功", f"处理完成：{result[:100]}...")
+            else:
+                QMessageBox.warning(parent, "失败", "图片处理失败")
+        else:
+            if result:
+                success_count = sum(1 for r in result if r.get('success', False))
+                QMessageBox.information(parent, "成功", f"处理完成：{success_count}/{len(result)} 张图片成功")
+            else:
+                QMessageBox.warning(parent, "失败", "批量处理失败")
+    
     def joycaption_quick_process(self, parent=None):
         """JC快速处理 - 使用JoyCaption默认配置对当前图片进行反推"""
         try:
@@ -626,4 +698,40 @@ class JoyCaptionReversePlugin(Plugin):
             
         except Exception as e:
             self.logger.error(f"验证图片文件失败 {image_path}: {str(e)}")
-            return False 
\ No newline at end of file
+            return False 
+
+
+class JoyCaptionProcessingThread(QThread):
+    """JoyCaption处理线程：加载模型并推理（或等待推理进程的结果），不阻塞界面线程"""
+    
+    progress_updated = pyqtSignal(str, int, str)  # stage, progress, message
+    finished = pyqtSignal(object)  # 单张图片: 描述文本或None；多张图片: 结果列表
+    
+    def __init__(self, plugin: JoyCaptionReversePlugin, image_paths: List[str], config: Dict[str, Any]):
+        super().__init__()
+        self.plugin = plugin
+        self.image_paths = image_paths
+        self.config = config
+        self.is_cancelled = False
+        self.logger = logging.getLogger("plugins.joycaption_reverse_plugin.JoyCaptionProcessingThread")
+    
+    def run(self):
+        """运行处理线程"""
+        try:
+            if len(self.image_paths) == 1:
+                result = self.plugin.process_single_image(
+                    self.image_paths[0], self.config, self.progress_updated.emit, self.should_cancel)
+            else:
+                result = self.plugin.process_multiple_images(
+                    self.image_paths, self.config, self.progress_updated.emit, self.should_cancel)
+            self.finished.emit(result)
+        except Exception as e:
+            self.logger.error(f"JoyCaption处理线程失败: {str(e)}")
+            self.finished.emit(None)
+    
+    def should_cancel(self) -> bool:
+        return self.is_cancelled
+    
+    def cancel_operation(self):
+        """取消操作"""
+        self.is_cancelled = True
@@ -17,6 +17,11 @@ class DatabaseConfig:
     backup_enabled: bool = True
     backup_interval_hours: int = 24
     auto_vacuum: bool = True
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_kb: int = 65536
+    mmap_size_mb: int = 256
+    statement_cache_size: int = 256
 
 @dataclass
 class ThumbnailConfig:
@@ -26,6 +31,14 @@ class ThumbnailConfig:
     format: str = "JPEG"
     cache_size: int = 1000
     generate_on_import: bool = True
+    # 与主缩略图一起生成的金字塔级别：网格、预览、大预览
+    pyramid_sizes: List[Tuple[int, int]] = field(default_factory=lambda: [(180, 135), (640, 640), (1280, 1280)])
+    preview_levels: bool = False  # 是否同时生成大于主缩略图的预览级别（640/1280），会增加每张照片的编码开销
+    storage: str = "files"  # files: 每个缩略图一个文件；pack: 追加写入包文件并建立偏移索引
+    pack_max_size_mb: int = 256
+    service_workers: int = 2  # 后台缩略图服务线程数
+    service_batch_size: int = 32  # 后台缩略图服务批量写回数据库的条数
+    memory_cache_mb: int = 128  # 网格中已解码缩略图的内存缓存上限
 
 @dataclass
 class UIConfig:
@@ -34,6 +47,7 @@ class UIConfig:
     window_size: Tuple[int, int] = (1400, 900)
     window_position: Optional[Tuple[int, int]] = None
     thumbnail_grid_columns: int = 6
+    viewer_cache_mb: int = 256  # 大图查看器已解码图片的内存缓存上限
     show_image_info: bool = True
     auto_save_layout: bool = True
     layout: Optional[Dict[str, Any]] = field(default_factory=dict)
@@ -46,6 +60,13 @@ class ImportConfig:
     preserve_directory_structure: bool = True
     extract_exif: bool = True
     generate_thumbnails: bool = True
+    hash_buffer_kb: int = 1024
+    hash_mmap_threshold_mb: int = 64
+    hash_sample_kb: int = 64
+    hash_use_processes: bool = False
+    extract_workers: int = 0  # 0表示按CPU核数自动确定
+    extract_use_processes: bool = True
+    pipeline_queue_depth: int = 4  # 流式导入各阶段之间的队列长度（批次数）
     
     def __post_init__(self):
         if self.supported_formats is None:
@@ -58,6 +79,13 @@ class PluginConfig:
     plugin_directory: str = "plugins"
     auto_load: bool = True
     sandbox_enabled: bool = True
+    caption_cache_path: str = "data/caption_cache.db"
+    caption_cache_max_mb: int = 64
+    caption_cache_max_age_days: int = 180
+    model_memory_budget_mb: int = 0  # 只统计内存中的模型权重（显存不计入）；0: 物理内存的一半
+    model_idle_offload_minutes: int = 0  # 0: 不自动释放空闲模型
+    inference_worker_enabled: bool = True  # 在独立进程中运行反推推理
+    inference_worker_max_jobs: int = 1
     
     def __post_init__(self):
         if self.enabled_plugins is None:
@@ -113,16 +113,28 @@ class AIMetadataExtractor:
             
             # 打开图片
             with Image.open(image_path) as img:
-                # 检查PNG文本块
-                if img.format == 'PNG':
-                    metadata = self._extract_png_metadata(img, metadata)
-                
-                # 检查EXIF数据
-                if hasattr(img, 'getexif') and img.getexif():
-                    metadata = self._extract_exif_metadata(img, metadata)
-                
-                # 检查文件名中的信息
-                metadata = self._extract_filename_metadata(image_path.name, metadata)
+                return self.extract_from_image(img, image_path)
+            
+        except Exception as e:
+            self.logger.error("Failed to extract AI metadata: path=%s, error=%s", str(image_path), str(e))
+            return AIMetadata()
+    
+    def extract_from_image(self, img: Image.Image, image_path) -> AIMetadata:
+        """从已打开的图片中提取AI元数据（导入流程复用同一次打开）"""
+        try:
+            metadata = AIMetadata()
+            image_path = Path(image_path)
+            
+            # 检查PNG文本块
+            if img.format == 'PNG':
+                metadata = self._extract_png_metadata(img, metadata)
+            
+            # 检查EXIF数据
+            if hasattr(img, 'getexif') and img.getexif():
+                metadata = self._extract_exif_metadata(img, metadata)
+            
+            # 检查文件名中的信息
+            metadata = self._extract_filename_metadata(image_path.name, metadata)
             
             # 判断是否为AI生成图片
             metadata.is_ai_generated = self._is_ai_generated(metadata)
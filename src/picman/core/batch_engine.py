@@ -0,0 +1,353 @@
+"""
+Batch image processing engine.
+
+A batch job is an ordered chain of operations (resize, rotate, brightness,
+contrast, convert) applied to every file with a single decode and a single
+encode. Files are processed in a process pool; outputs whose source and
+operation chain are unchanged since the last run are skipped, and the time
+spent decoding, processing and encoding is reported per stage.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from PIL import Image
+
+from .edit_pipeline import EditState, render
+from .import_worker import default_worker_count
+
+
+logger = logging.getLogger("picman.core.batch_engine")
+
+Operation = Dict[str, Any]  # {"op": "resize", "width": 800, ...}
+
+OPERATIONS = ("resize", "rotate", "brightness", "contrast", "convert")
+STAGES = ("decode", "process", "encode")
+MANIFEST_NAME = ".picman_batch.json"  # 输出目录中记录每个输出对应的源文件与操作链
+
+# 扩展名与PIL格式名
+_FORMAT_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "BMP": ".bmp", "TIFF": ".tiff", "WEBP": ".webp"}
+
+
+def describe_operation(operation: Operation) -> str:
+    """Short human-readable label for an operation."""
+    name = operation.get("op")
+    if name == "resize":
+        suffix = "" if operation.get("maintain_aspect", True) else " (拉伸)"
+        return f"调整大小 {operation.get('width')}x{operation.get('height')}{suffix}"
+    if name == "rotate":
+        return f"旋转 {operation.get('angle')}°"
+    if name == "brightness":
+        return f"亮度 ×{operation.get('factor')}"
+    if name == "contrast":
+        return f"对比度 ×{operation.get('factor')}"
+    if name == "convert":
+        return f"转换为 {operation.get('format')} (质量 {operation.get('quality', 95)})"
+    return str(name)
+
+
+def chain_signature(operations: List[Operation]) -> str:
+    """Stable hash of an operation chain (used to detect up-to-date outputs)."""
+    data = json.dumps(operations, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def output_path_for(input_path: str, output_dir: str, operations: List[Operation]) -> str:
+    """Output file for an input: same name, suffix of the last convert operation."""
+    output_path = Path(output_dir) / Path(input_path).name
+    for operation in operations:
+        if operation.get("op") == "convert":
+            format_name = str(operation.get("format", "JPEG")).upper()
+            output_path = output_path.with_suffix(_FORMAT_SUFFIXES.get(format_name, f".{format_name.lower()}"))
+    return str(output_path)
+
+
+def _draft_size(operations: List[Operation]) -> Optional[Tuple[int, int]]:
+    """Size the decoder may reduce to when the chain starts by shrinking the image.
+
+    Only tone adjustments and right-angle rotations may precede the resize;
+    the draft is square on the larger target side so any rotation still
+    leaves enough pixels.
+    """
+    for operation in operations:
+        name = operation.get("op")
+        if name == "resize":
+            side = max(int(operation.get("width", 0)), int(operation.get("height", 0)))
+            return (side, side) if side > 0 else None
+        if name == "rotate" and int(operation.get("angle", 0)) % 90:
+            return None
+        if name not in ("rotate", "brightness", "contrast"):
+            return None
+    return None
+
+
+def _fold_adjustments(operations: List[Operation]) -> List[Any]:
+    """Merge runs of brightness/contrast/right-angle rotations into one EditState.
+
+    render() applies brightness before contrast, so a brightness that
+    follows a contrast starts a new step.
+    """
+    steps: List[Any] = []
+    state: Optional[EditState] = None
+    for operation in operations:
+        name = operation.get("op")
+        angle = int(operation.get("angle", 0)) if name == "rotate" else 0
+        foldable = name in ("brightness", "contrast") or (name == "rotate" and angle % 90 == 0)
+        if not foldable:
+            if state is not None:
+                steps.append(state)
+                state = None
+            steps.append(operation)
+            continue
+        if state is None or (name == "brightness" and state.contrast != 1.0):
+            if state is not None:
+                steps.append(state)
+            state = EditState()
+        if name == "rotate":
+            state = replace(state, rotation=(state.rotation + angle) % 360)
+        else:
+            setting = getattr(state, name) * float(operation.get("factor", 1.0))
+            state = replace(state, **{name: setting})
+    if state is not None:
+        steps.append(state)
+    return steps
+
+
+def apply_operations(image: Image.Image, operations: List[Operation]) -> Image.Image:
+    """Apply a chain to a decoded image (convert only affects encoding)."""
+    for step in _fold_adjustments(operations):
+        if isinstance(step, EditState):
+            if not step.is_identity():
+                image = render(image, step)
+            continue
+        name = step.get("op")
+        if name == "resize":
+            size = (int(step.get("width", 800)), int(step.get("height", 600)))
+            if step.get("maintain_aspect", True):
+                image.thumbnail(size, Image.Resampling.LANCZOS)
+            else:
+                image = image.resize(size, Image.Resampling.LANCZOS)
+        elif name == "rotate":
+            image = image.rotate(float(step.get("angle", 0)), expand=True)
+    return image
+
+
+def _save_options(operations: List[Operation], output_path: str) -> Tuple[Optional[str], int]:
+    format_name, quality = None, 95
+    for operation in operations:
+        if operation.get("op") == "convert":
+            format_name = str(operation.get("format", "JPEG")).upper()
+            quality = int(operation.get("quality", 95))
+    if format_name is None:
+        format_name = Image.registered_extensions().get(Path(output_path).suffix.lower())
+    return format_name, quality
+
+
+def process_image(task: Tuple[str, str, List[Operation]]) -> Dict[str, Any]:
+    """Decode, transform and encode one file.
+
+    Args:
+        task: (input_path, output_path, operations)
+
+    Returns:
+        Dict with input_path, output_path, status ("done" or "error"),
+        error, and the seconds spent in each stage under "timings".
+    """
+    input_path, output_path, operations = task
+    timings = dict.fromkeys(STAGES, 0.0)
+    result = {"input_path": input_path, "output_path": output_path, "status": "done", "timings": timings}
+    try:
+        started = time.perf_counter()
+        with Image.open(input_path) as img:
+            draft_size = _draft_size(operations)
+            if draft_size:
+                img.draft(img.mode, draft_size)
+            img.load()
+            decoded = time.perf_counter()
+            timings["decode"] = decoded - started
+
+            image = apply_operations(img, operations)
+            format_name, quality = _save_options(operations, output_path)
+            if format_name == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+                image = image.convert("RGB")
+            processed = time.perf_counter()
+            timings["process"] = processed - decoded
+
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            image.save(output_path, format=format_name, quality=quality, optimize=True)
+            timings["encode"] = time.perf_counter() - processed
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    return result
+
+
+class BatchManifest:
+    """Per-output-directory record of which source and chain produced each output."""
+
+    def __init__(self, output_dir: str):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+        except Exception as e:
+            logger.warning("Failed to read batch manifest: path=%s, error=%s", self.path, str(e))
+            self.entries = {}
+
+    @staticmethod
+    def _source_stamp(input_path: str) -> List[Any]:
+        stat = os.stat(input_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_up_to_date(self, input_path: str, output_path: str, signature: str) -> bool:
+        entry = self.entries.get(Path(output_path).name)
+        if not entry or not os.path.exists(output_path):
+            return False
+        try:
+            return (entry.get("source") == os.path.abspath(input_path)
+                    and entry.get("stamp") == self._source_stamp(input_path)
+                    and entry.get("signature") == signature)
+        except OSError:
+            return False
+
+    def record(self, input_path: str, output_path: str, signature: str):
+        try:
+            self.entries[Path(output_path).name] = {
+                "source": os.path.abspath(input_path),
+                "stamp": self._source_stamp(input_path),
+                "signature": signature,
+            }
+        except OSError:
+            pass
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning("Failed to write batch manifest: path=%s, error=%s", self.path, str(e))
+
+
+class BatchEngine:
+    """Runs an operation chain over many files in a process pool.
+
+    run() blocks, so call it from a worker thread; progress is reported
+    through a callback and cancel() stops queued files (files already being
+    encoded finish).
+    """
+
+    def __init__(self, max_workers: int = 0, use_processes: bool = True):
+        self.max_workers = max_workers or default_worker_count()
+        self.use_processes = use_processes
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _create_executor(self):
+        if self.use_processes:
+            try:
+                return ProcessPoolExecutor(max_workers=self.max_workers)
+            except (OSError, NotImplementedError, ValueError) as e:
+                logger.warning("Process pool unavailable, processing in threads: %s", str(e))
+                self.use_processes = False
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def run(self, input_paths: List[str], output_dir: str, operations: List[Operation],
+            skip_up_to_date: bool = True,
+            progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Process input_paths into output_dir.
+
+        Returns:
+            Dict with total, success_count, skipped_count, error_count,
+            cancelled, errors [(path, message)], stage timings summed over
+            all files, and elapsed wall time.
+        """
+        started = time.perf_counter()
+        self._cancel_event.clear()
+        signature = chain_signature(operations)
+        manifest = BatchManifest(output_dir)
+        total = len(input_paths)
+        summary = {
+            "total": total,
+            "success_count": 0,
+            "skipped_count": 0,
+            "error_count": 0,
+            "cancelled": False,
+            "errors": [],
+            "timings": dict.fromkeys(STAGES, 0.0),
+        }
+
+        tasks = []
+        for input_path in input_paths:
+            output_path = output_path_for(input_path, output_dir, operations)
+            if not input_path or not os.path.exists(input_path):
+                summary["error_count"] += 1
+                summary["errors"].append((input_path, "文件不存在"))
+            elif skip_up_to_date and manifest.is_up_to_date(input_path, output_path, signature):
+                summary["skipped_count"] += 1
+            else:
+                tasks.append((input_path, output_path, operations))
+
+        done_count = total - len(tasks)
+        if progress_callback:
+            progress_callback(done_count, total)
+
+        if tasks:
+            executor = self._create_executor()
+            try:
+                # 只保持有限数量的任务在途，取消时无需等待整个队列
+                window = self.max_workers * 2
+                queue = iter(tasks)
+                in_flight = set()
+                while True:
+                    while not self.cancelled and len(in_flight) < window:
+                        task = next(queue, None)
+                        if task is None:
+                            break
+                        in_flight.add(executor.submit(process_image, task))
+                    if not in_flight:
+                        break
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {"status": "error", "error": str(e), "input_path": "", "timings": {}}
+                        for stage, seconds in result.get("timings", {}).items():
+                            summary["timings"][stage] += seconds
+                        if result["status"] == "done":
+                            summary["success_count"] += 1
+                            manifest.record(result["input_path"], result["output_path"], signature)
+                        else:
+                            summary["error_count"] += 1
+                            summary["errors"].append((result["input_path"], result.get("error", "")))
+                        done_count += 1
+                    if progress_callback:
+                        progress_callback(done_count, total)
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+                manifest.save()
+
+        summary["cancelled"] = self.cancelled
+        summary["elapsed"] = time.perf_counter() - started
+        logger.info("Batch finished: total=%s, success=%s, skipped=%s, errors=%s, cancelled=%s, "
+                    "elapsed=%.2fs, decode=%.2fs, process=%.2fs, encode=%.2fs",
+                    total, summary["success_count"], summary["skipped_count"], summary["error_count"],
+                    summary["cancelled"], summary["elapsed"], summary["timings"]["decode"],
+                    summary["timings"]["process"], summary["timings"]["encode"])
+        return summary
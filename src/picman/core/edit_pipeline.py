@@ -0,0 +1,175 @@
+"""
+Non-destructive edit pipeline.
+
+Edits are recorded as an operation list; the current parameters are obtained
+by replaying it, so undo/redo only moves a cursor and never copies images.
+render() applies the parameters to any image: brightness and contrast are
+fused into one lookup table (built with NumPy from the luma histogram) and
+saturation is one blend against the luma image, so the same code renders a
+downscaled preview while editing and the full resolution image on save.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+
+
+FILTER_NONE = "无滤镜"
+
+
+@dataclass(frozen=True)
+class EditState:
+    """Parameters of an edit; factors of 1.0 leave the image unchanged."""
+    brightness: float = 1.0
+    contrast: float = 1.0
+    saturation: float = 1.0
+    sharpness: float = 1.0
+    rotation: int = 0  # 逆时针角度，与PIL的rotate一致
+    filter_name: str = FILTER_NONE
+
+    def is_identity(self) -> bool:
+        return self == EditState()
+
+
+class EditHistory:
+    """Operation list with an undo/redo cursor.
+
+    Operations are (name, value) pairs: brightness, contrast, saturation,
+    sharpness and filter set a value, rotate adds an angle, reset restores
+    the defaults. Consecutive changes of the same slider are merged so one
+    drag is one undo step.
+    """
+
+    MERGEABLE = ("brightness", "contrast", "saturation", "sharpness")
+
+    def __init__(self):
+        self.operations: List[Tuple[str, Any]] = []
+        self.cursor = 0
+
+    def push(self, name: str, value: Any = None, merge: bool = True):
+        del self.operations[self.cursor:]
+        if merge and name in self.MERGEABLE and self.operations and self.operations[-1][0] == name:
+            self.operations[-1] = (name, value)
+        else:
+            self.operations.append((name, value))
+        self.cursor = len(self.operations)
+
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.operations)
+
+    def undo(self) -> bool:
+        if not self.can_undo():
+            return False
+        self.cursor -= 1
+        return True
+
+    def redo(self) -> bool:
+        if not self.can_redo():
+            return False
+        self.cursor += 1
+        return True
+
+    def state(self) -> EditState:
+        """Parameters after replaying the operations up to the cursor."""
+        state = EditState()
+        for name, value in self.operations[:self.cursor]:
+            if name == "reset":
+                state = EditState()
+            elif name == "rotate":
+                state = replace(state, rotation=(state.rotation + value) % 360)
+            elif name == "filter":
+                state = replace(state, filter_name=value)
+            else:
+                state = replace(state, **{name: value})
+        return state
+
+
+def make_proxy(image: Image.Image, max_side: int) -> Image.Image:
+    """Downscaled copy used for interactive previews."""
+    proxy = image.copy()
+    proxy.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return proxy
+
+
+def tone_lut(image: Image.Image, brightness: float, contrast: float) -> List[int]:
+    """Brightness followed by contrast as one 256-entry table per channel.
+
+    Matches ImageEnhance: brightness scales towards black, contrast blends
+    with the mean gray level of the brightened image. That mean is taken
+    from the luma histogram, so no intermediate image is built.
+    """
+    levels = np.arange(256, dtype=np.float32)
+    brightened = np.clip(levels * brightness, 0, 255)
+    histogram = np.asarray(image.convert("L").histogram(), dtype=np.float64)
+    total = histogram.sum()
+    mean = int((histogram * brightened).sum() / total + 0.5) if total else 128
+    toned = np.clip(mean + contrast * (np.rint(brightened) - mean), 0, 255)
+    return np.rint(toned).astype(np.uint8).tolist() * 3
+
+
+def adjust_saturation(rgb: Image.Image, saturation: float) -> Image.Image:
+    """Blend each pixel with its luma (same result as ImageEnhance.Color).
+
+    Image.blend runs in C; an equivalent float NumPy pass was several
+    times slower on full-resolution images.
+    """
+    return Image.blend(rgb.convert("L").convert("RGB"), rgb, saturation)
+
+
+def apply_filter(image: Image.Image, filter_name: str) -> Image.Image:
+    if filter_name == "黑白":
+        return image.convert("L").convert("RGB")
+    if filter_name == "复古":
+        return ImageEnhance.Contrast(adjust_saturation(image, 0.8)).enhance(1.2)
+    if filter_name == "冷色调":
+        return adjust_saturation(image, 0.7)
+    if filter_name == "暖色调":
+        return adjust_saturation(image, 1.3)
+    if filter_name == "模糊":
+        return image.filter(ImageFilter.BLUR)
+    if filter_name == "锐化":
+        return image.filter(ImageFilter.SHARPEN)
+    return image
+
+
+_ROTATIONS = {
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270,
+}
+
+
+def render(image: Image.Image, state: EditState) -> Image.Image:
+    """Apply an edit to an image; the input is not modified.
+
+    Order: brightness/contrast, saturation, filter, sharpness, rotation.
+    Alpha is carried through untouched; other modes are rendered as RGB.
+    """
+    alpha: Optional[Image.Image] = None
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        alpha = image.getchannel("A")
+    rgb = image.convert("RGB") if image.mode != "RGB" else image
+
+    if state.brightness != 1.0 or state.contrast != 1.0:
+        rgb = rgb.point(tone_lut(rgb, state.brightness, state.contrast))
+    if state.saturation != 1.0:
+        rgb = adjust_saturation(rgb, state.saturation)
+    if state.filter_name != FILTER_NONE:
+        rgb = apply_filter(rgb, state.filter_name)
+    if state.sharpness != 1.0:
+        rgb = ImageEnhance.Sharpness(rgb).enhance(state.sharpness)
+
+    if alpha is not None:
+        rgb.putalpha(alpha)
+
+    if state.rotation in _ROTATIONS:
+        rgb = rgb.transpose(_ROTATIONS[state.rotation])
+    elif state.rotation:
+        rgb = rgb.rotate(state.rotation, expand=True)
+    return rgb
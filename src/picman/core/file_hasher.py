@@ -0,0 +1,259 @@
+"""
+File content hashing for PyPhotoManager.
+
+Full digests stay SHA-256 so they match the file_hash values already stored
+in the database; BLAKE2b is available for in-memory deduplication where
+compatibility does not matter. A cheap size + head/tail signature lets
+callers rule out non-matching files before reading them in full. Imports
+hash through one HashPool so the executor is not recreated for every batch.
+"""
+
+import hashlib
+import mmap
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+
+PathLike = Union[str, Path]
+
+DEFAULT_ALGORITHM = "sha256"
+SUPPORTED_ALGORITHMS = ("sha256", "blake2b")
+
+
+def _new_digest(algorithm: str):
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+    return hashlib.new(algorithm)
+
+
+def compute_file_digest(file_path: PathLike, algorithm: str = DEFAULT_ALGORITHM,
+                        buffer_size: int = 1024 * 1024,
+                        mmap_threshold: int = 64 * 1024 * 1024) -> str:
+    """Hash a whole file.
+
+    Reads through a reusable buffer with readinto() so no per-chunk bytes
+    objects are allocated; files above mmap_threshold are mapped instead.
+    hashlib releases the GIL for large updates, so this scales across
+    threads as well as processes.
+    """
+    digest = _new_digest(algorithm)
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if mmap_threshold and size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, buffer_size):
+                        digest.update(view[offset:offset + buffer_size])
+                finally:
+                    view.release()
+        else:
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def compute_quick_signature(file_path: PathLike, sample_size: int = 64 * 1024) -> str:
+    """Size plus a BLAKE2b digest of the first and last sample_size bytes.
+
+    Two files with different signatures cannot have the same content; equal
+    signatures still need a full digest to confirm.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        digest.update(f.read(sample_size))
+        if size > sample_size * 2:
+            f.seek(-sample_size, os.SEEK_END)
+            digest.update(f.read(sample_size))
+        elif size > sample_size:
+            digest.update(f.read())
+    return f"{size}:{digest.hexdigest()}"
+
+
+def _hash_worker(args) -> tuple:
+    """Process-pool entry point (must be module level to be picklable)."""
+    file_path, algorithm, buffer_size, mmap_threshold = args
+    try:
+        return file_path, compute_file_digest(file_path, algorithm, buffer_size, mmap_threshold), None
+    except Exception as e:
+        return file_path, None, str(e)
+
+
+class FileHasher:
+    """Hashing front-end used by PhotoManager and the GUI tools."""
+
+    def __init__(self, config_manager=None, algorithm: str = DEFAULT_ALGORITHM):
+        self.logger = logging.getLogger("picman.core.file_hasher")
+        get = config_manager.get if config_manager is not None else (lambda key, default=None: default)
+
+        self.algorithm = algorithm
+        self.buffer_size = max(64, int(get("import_settings.hash_buffer_kb", 1024))) * 1024
+        self.mmap_threshold = int(get("import_settings.hash_mmap_threshold_mb", 64)) * 1024 * 1024
+        self.sample_size = max(4, int(get("import_settings.hash_sample_kb", 64))) * 1024
+        self.use_processes = bool(get("import_settings.hash_use_processes", False))
+
+    def hash_file(self, file_path: PathLike, algorithm: Optional[str] = None) -> str:
+        """Full content digest; SHA-256 unless another algorithm is requested."""
+        return compute_file_digest(file_path, algorithm or self.algorithm,
+                                   self.buffer_size, self.mmap_threshold)
+
+    def fast_hash(self, file_path: PathLike) -> str:
+        """BLAKE2b content digest for deduplication that is not persisted."""
+        return self.hash_file(file_path, "blake2b")
+
+    def quick_signature(self, file_path: PathLike) -> str:
+        """Cheap size + head/tail signature; see compute_quick_signature."""
+        return compute_quick_signature(file_path, self.sample_size)
+
+    def open_pool(self, max_workers: int = 4, use_processes: Optional[bool] = None) -> "HashPool":
+        """Pool for hashing many batches; use as a context manager."""
+        return HashPool(self, max_workers, self.use_processes if use_processes is None else use_processes)
+
+    def hash_files(self, file_paths: Iterable[Path], max_workers: int = 4,
+                   algorithm: Optional[str] = None,
+                   use_processes: Optional[bool] = None) -> Dict[Path, str]:
+        """Hash many files in parallel with a pool opened for this call only."""
+        with self.open_pool(max_workers, use_processes) as pool:
+            return pool.hash_files(file_paths, algorithm)
+
+    def _group_by_signature(self, file_paths: Iterable[Path],
+                            expected_size: Optional[int] = None) -> List[List[Path]]:
+        """Bucket files by size, then by head/tail signature (unreadable files are dropped).
+
+        Files whose size differs from expected_size are rejected from stat() alone.
+        """
+        by_size: Dict[int, List[Path]] = {}
+        for file_path in file_paths:
+            try:
+                size = file_path.stat().st_size
+            except OSError:
+                continue
+            if expected_size is None or size == expected_size:
+                by_size.setdefault(size, []).append(file_path)
+
+        groups = []
+        for same_size in by_size.values():
+            if len(same_size) < 2:
+                groups.append(same_size)
+                continue
+            by_signature: Dict[str, List[Path]] = {}
+            for file_path in same_size:
+                try:
+                    by_signature.setdefault(self.quick_signature(file_path), []).append(file_path)
+                except OSError as e:
+                    self.logger.warning("Failed to read candidate file: path=%s, error=%s", str(file_path), str(e))
+            groups.extend(by_signature.values())
+        return groups
+
+    def find_matching_file(self, candidates: Iterable[Path], expected_hash: str,
+                           expected_size: Optional[int] = None) -> Optional[Path]:
+        """Return a candidate whose SHA-256 equals expected_hash.
+
+        Candidates are grouped by size and head/tail signature and one file
+        per group is hashed first; the other members of a group (most likely
+        copies of the representative) are only hashed if no representative
+        matched.
+        """
+        groups = self._group_by_signature(candidates, expected_size)
+        ordered = [group[0] for group in groups] + [file_path for group in groups for file_path in group[1:]]
+        for file_path in ordered:
+            try:
+                if self.hash_file(file_path) == expected_hash:
+                    return file_path
+            except OSError as e:
+                self.logger.warning("Failed to hash candidate file: path=%s, error=%s", str(file_path), str(e))
+        return None
+
+    def group_duplicates(self, file_paths: Iterable[Path], max_workers: int = 4) -> List[List[Path]]:
+        """Group files with identical content.
+
+        Files are bucketed by size, then by head/tail signature, and only
+        the remaining collisions are fully hashed with BLAKE2b.
+        """
+        groups = []
+        with self.open_pool(max_workers) as pool:
+            for same_signature in self._group_by_signature(file_paths):
+                if len(same_signature) < 2:
+                    continue
+                by_digest: Dict[str, List[Path]] = {}
+                for file_path, digest in pool.hash_files(same_signature, "blake2b").items():
+                    by_digest.setdefault(digest, []).append(file_path)
+                groups.extend(group for group in by_digest.values() if len(group) > 1)
+        return groups
+
+
+class HashPool:
+    """Executor running _hash_worker, with a thread fallback.
+
+    Use as a context manager so one pool serves every batch of an import.
+    """
+
+    def __init__(self, hasher: FileHasher, max_workers: int = 4, use_processes: bool = False):
+        self.hasher = hasher
+        self.max_workers = max(1, max_workers)
+        self.use_processes = use_processes
+        self._executor = None
+
+    def __enter__(self) -> "HashPool":
+        self._start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def _start(self):
+        if self.use_processes:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                return
+            except (OSError, NotImplementedError, ValueError) as e:
+                self.hasher.logger.warning("Process pool unavailable, hashing in threads: %s", str(e))
+                self.use_processes = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def hash_files(self, file_paths: Iterable[Path], algorithm: Optional[str] = None) -> Dict[Path, str]:
+        """Hash many files in parallel; files that fail to hash are omitted."""
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        if self._executor is None:
+            self._start()
+
+        algorithm = algorithm or self.hasher.algorithm
+        tasks = [(file_path, algorithm, self.hasher.buffer_size, self.hasher.mmap_threshold)
+                 for file_path in file_paths]
+
+        file_hashes = {}
+        try:
+            futures = [self._executor.submit(_hash_worker, task) for task in tasks]
+            for future in as_completed(futures):
+                file_path, file_hash, error = future.result()
+                if file_hash:
+                    file_hashes[file_path] = file_hash
+                else:
+                    self.hasher.logger.error("Error calculating hash for %s: %s", str(file_path), error)
+        except Exception as e:
+            if not self.use_processes:
+                raise
+            # 工作进程异常退出（BrokenProcessPool等）时退回线程池重跑本批
+            self.hasher.logger.warning("Process pool hashing failed, falling back to threads: %s", str(e))
+            self.shutdown()
+            self.use_processes = False
+            self._start()
+            return self.hash_files(file_paths, algorithm)
+
+        return file_hashes
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -5,7 +5,7 @@ Image processing utilities.
 import os
 import logging
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List
 from PIL import Image, ImageEnhance, ImageFilter, ImageOps
 
 # 配置日志
@@ -13,6 +13,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 from ..config.manager import ConfigManager
+from .batch_engine import process_image
 
 
 class ImageProcessor:
@@ -121,6 +122,19 @@ class ImageProcessor:
             self.logger.error(f"Failed to convert image format: path={image_path}, error={str(e)}")
             return False
     
+    def process_chain(self, image_path: str, output_path: str, operations: List[Dict[str, Any]]) -> bool:
+        """Apply an ordered chain of operations with a single decode and encode.
+        
+        Operations use the batch engine format, e.g.
+        [{"op": "resize", "width": 800, "height": 600}, {"op": "convert", "format": "PNG"}].
+        """
+        result = process_image((image_path, output_path, operations))
+        if result["status"] != "done":
+            self.logger.error(f"Failed to process image: path={image_path}, error={result.get('error')}")
+            return False
+        self.logger.info(f"Image processed: input={image_path}, output={output_path}, operations={len(operations)}")
+        return True
+    
     def get_image_info(self, image_path: str) -> Optional[Dict[str, Any]]:
         """Get detailed image information."""
         try:
@@ -0,0 +1,187 @@
+"""
+Single-pass photo extraction for imports.
+
+Each file is opened once and yields dimensions, EXIF, AI metadata and the
+thumbnail together. Extraction runs in a process pool so PIL decoding and
+EXIF/JSON coercion are not serialized on the GIL; only compact,
+JSON-ready dicts travel back to the parent for batched insertion.
+"""
+
+import os
+import logging
+from pathlib import Path
+from datetime import datetime, date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+from .ai_metadata_extractor import AIMetadataExtractor
+from .thumbnail_generator import render_thumbnails
+
+
+logger = logging.getLogger("picman.core.import_worker")
+
+# 每个工作进程复用一个AI元数据提取器
+_worker_ai_extractor: Optional[AIMetadataExtractor] = None
+
+
+def _get_ai_extractor() -> AIMetadataExtractor:
+    global _worker_ai_extractor
+    if _worker_ai_extractor is None:
+        _worker_ai_extractor = AIMetadataExtractor()
+    return _worker_ai_extractor
+
+
+def _init_worker():
+    """Process pool initializer: keep worker logging quiet and warm up."""
+    logging.getLogger("picman.core.ai_metadata_extractor").setLevel(logging.WARNING)
+    _get_ai_extractor()
+
+
+def default_worker_count() -> int:
+    """One worker per core, leaving one for the GUI/DB thread."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _to_json_value(value: Any) -> Any:
+    """Convert non-serializable EXIF values for JSON storage."""
+    if isinstance(value, bytes):
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if not isinstance(value, (str, int, float, bool, list, dict, type(None))):
+        return str(value)
+    return value
+
+
+def extract_image_metadata(img: Image.Image) -> Dict[str, Any]:
+    """Dimensions, format, EXIF and date taken of an open image."""
+    metadata = {
+        "width": img.width,
+        "height": img.height,
+        "format": img.format or "",
+        "date_taken": "",
+        "exif_data": {}
+    }
+
+    exif = img._getexif() if hasattr(img, '_getexif') else None
+    if exif:
+        exif_dict = {TAGS.get(tag_id, tag_id): _to_json_value(value) for tag_id, value in exif.items()}
+        metadata["exif_data"] = exif_dict
+
+        # Extract date taken
+        date_taken = exif_dict.get("DateTime") or exif_dict.get("DateTimeOriginal")
+        if date_taken:
+            try:
+                metadata["date_taken"] = datetime.strptime(date_taken, "%Y:%m:%d %H:%M:%S").isoformat()
+            except (ValueError, TypeError):
+                pass
+
+    return metadata
+
+
+def extract_photo_record(task: Tuple[str, Optional[str], List[Tuple[str, Tuple[int, int]]], int, bool]) -> Dict[str, Any]:
+    """Open a file once and extract everything the import needs.
+
+    Args:
+        task: (file_path, thumbnail reference or None to skip thumbnails,
+               [(path, size)] pyramid levels to render, quality,
+               pack: return rendered levels as bytes instead of writing files)
+
+    Returns:
+        Dict with file_path and either "error" or width/height/format/
+        date_taken/exif_data/ai_metadata/is_ai_generated/thumbnail_path,
+        plus "thumbnails" [(key, bytes)] when pack is set.
+    """
+    file_path, thumb_ref, targets, thumb_quality, pack = task
+    try:
+        with Image.open(file_path) as img:
+            result = extract_image_metadata(img)
+
+            ai_metadata = _get_ai_extractor().extract_from_image(img, file_path)
+            result["ai_metadata"] = ai_metadata.to_dict()
+            result["is_ai_generated"] = ai_metadata.is_ai_generated
+
+            # 缩略图放在最后：草稿模式解码和thumbnail()会原地缩小图像
+            result["thumbnail_path"] = ""
+            if thumb_ref:
+                targets = [(Path(path), size) for path, size in targets]
+                if not pack:
+                    targets = [(path, size) for path, size in targets if not path.exists()]
+                # 打包存储只能由父进程写入：把编码好的JPEG带回去
+                packed = []
+                sink = (lambda path, data: packed.append((path.stem, data))) if pack else None
+                try:
+                    if targets:
+                        orientation = result["exif_data"].get("Orientation", 1)
+                        render_thumbnails(img, targets, thumb_quality,
+                                          orientation if isinstance(orientation, int) else 1, sink)
+                    result["thumbnail_path"] = thumb_ref
+                    if pack:
+                        result["thumbnails"] = packed
+                except Exception as e:
+                    logger.error("Failed to generate thumbnail: path=%s, error=%s", file_path, str(e))
+
+        result["file_path"] = file_path
+        return result
+
+    except Exception as e:
+        return {"file_path": file_path, "error": str(e)}
+
+
+class ExtractionPool:
+    """Process pool running extract_photo_record, with a thread fallback.
+
+    Use as a context manager so one pool serves every batch of an import.
+    """
+
+    def __init__(self, max_workers: int = 0, use_processes: bool = True):
+        self.max_workers = max_workers or default_worker_count()
+        self.use_processes = use_processes
+        self._executor = None
+
+    def __enter__(self) -> "ExtractionPool":
+        self._start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def _start(self):
+        if self.use_processes:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+                return
+            except (OSError, NotImplementedError, ValueError) as e:
+                logger.warning("Process pool unavailable, extracting in threads: %s", str(e))
+                self.use_processes = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def map(self, tasks: Iterable[Tuple]) -> Iterator[Dict[str, Any]]:
+        """Extract records for tasks, yielding results in task order."""
+        tasks = list(tasks)
+        if not tasks:
+            return iter(())
+        if self._executor is None:
+            self._start()
+        chunksize = max(1, len(tasks) // (self.max_workers * 4)) if self.use_processes else 1
+        try:
+            return iter(list(self._executor.map(extract_photo_record, tasks, chunksize=chunksize)))
+        except Exception as e:
+            if not self.use_processes:
+                raise
+            # 工作进程异常退出（BrokenProcessPool等）时退回线程池重跑本批
+            logger.warning("Process pool extraction failed, retrying batch in threads: %s", str(e))
+            self.shutdown()
+            self.use_processes = False
+            self._start()
+            return iter(list(self._executor.map(extract_photo_record, tasks)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -2,24 +2,28 @@
 Core photo management functionality.
 """
 
-import hashlib
 import os
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime, date
 import logging
 from PIL import Image, ExifTags
 from PIL.ExifTags import TAGS
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from threading import Lock, Event, Thread
+import queue
 import time
 
 from ..database.manager import DatabaseManager
+from ..database.records import Photo
 from ..config.manager import ConfigManager
 from .thumbnail_generator import ThumbnailGenerator
+from .thumbnail_service import ThumbnailService
 from .directory_scanner import DirectoryScanner
 from .ai_metadata_extractor import AIMetadataExtractor
+from .file_hasher import FileHasher
+from .import_worker import ExtractionPool, extract_image_metadata, extract_photo_record
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -29,16 +33,66 @@ logger = logging.getLogger(__name__)
 class PhotoManager:
     """Core photo management class."""
     
+    # 文件内容变化后重新导入时从提取结果更新的字段
+    REEXTRACTED_FIELDS = (
+        "file_size", "file_mtime_ns", "file_inode", "file_hash", "width", "height", "format",
+        "date_taken", "exif_data", "ai_metadata", "is_ai_generated", "thumbnail_path"
+    )
+    
     def __init__(self, config_manager: ConfigManager, db_manager: DatabaseManager):
         self.config = config_manager
         self.db = db_manager
-        self.thumbnail_gen = ThumbnailGenerator(config_manager)
+        self.thumbnail_gen = ThumbnailGenerator(config_manager, db_manager)
         self.directory_scanner = DirectoryScanner(config_manager)
         self.ai_extractor = AIMetadataExtractor()
+        self.hasher = FileHasher(config_manager)
         # 配置标准logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger("picman.core.photo_manager")
         self._import_lock = Lock()  # 用于线程安全的导入操作
+        self._migrate_thumbnail_layout()
+        self._migrate_thumbnail_storage()
+        # 后台缩略图服务：导入时未生成的缩略图在此排队补齐（工作线程按需启动）
+        self.thumbnail_service = ThumbnailService(db_manager, self.thumbnail_gen, config_manager)
+    
+    def _migrate_thumbnail_layout(self):
+        """一次性迁移：把旧版平铺目录中的缩略图移动到按内容哈希分片的新路径"""
+        try:
+            layout_version = self.thumbnail_gen.LAYOUT_VERSION
+            if self.db.get_setting("thumbnail_layout_version") == layout_version:
+                return
+            start_time = time.time()
+            result = self.thumbnail_gen.migrate_legacy_thumbnails(self.db.get_thumbnail_records())
+            self.db.update_thumbnail_paths(result["updates"])
+            self.db.set_setting("thumbnail_layout_version", layout_version)
+            self.logger.info("Thumbnail layout migrated: migrated=%s, removed=%s, time=%.2fs",
+                             result["migrated"], result["removed"], time.time() - start_time)
+        except Exception as e:
+            self.logger.error("Failed to migrate thumbnail layout: %s", str(e))
+    
+    def _migrate_thumbnail_storage(self):
+        """启用打包存储（thumbnail.storage: pack）后，一次性把已有缩略图文件移入包文件"""
+        try:
+            if self.thumbnail_gen.pack_store is None or self.db.get_setting("thumbnail_storage") == "pack":
+                return
+            start_time = time.time()
+            result = self.thumbnail_gen.migrate_to_pack(self.db.get_thumbnail_records())
+            self.db.update_thumbnail_paths(result["updates"])
+            self.db.set_setting("thumbnail_storage", "pack")
+            self.logger.info("Thumbnail storage migrated to packs: photos=%s, levels=%s, time=%.2fs",
+                             len(result["updates"]), result["packed"], time.time() - start_time)
+        except Exception as e:
+            self.logger.error("Failed to migrate thumbnail storage: %s", str(e))
+    
+    def cleanup_thumbnail_cache(self, compact: bool = True) -> Dict[str, Any]:
+        """删除已不在照片库中的缩略图（文件缓存和包存储），并按需压缩包文件"""
+        try:
+            result = self.thumbnail_gen.collect_garbage(self.db.get_all_file_hashes(), compact)
+            self.logger.info("Thumbnail cache cleaned: %s", result)
+            return {"success": True, **result}
+        except Exception as e:
+            self.logger.error("Failed to clean thumbnail cache: %s", str(e))
+            return {"success": False, "error": str(e)}
         
     def import_photo(self, file_path: str) -> Optional[int]:
         """Import a single photo into the database."""
@@ -83,7 +137,7 @@ class PhotoManager:
                     # 如果缩略图不存在，重新生成
                     if not existing_photo.get("thumbnail_path") or not Path(existing_photo["thumbnail_path"]).exists():
                         if self.config.get("thumbnail.generate_on_import", True):
-                            thumbnail_path = self.thumbnail_gen.generate_thumbnail(file_path)
+                            thumbnail_path = self.thumbnail_gen.generate_thumbnail(file_path, file_hash)
                             if thumbnail_path:
                                 update_data["thumbnail_path"] = thumbnail_path
                                 self.logger.info("Regenerated thumbnail for moved file: photo_id=%s", existing_photo["id"])
@@ -98,31 +152,29 @@ class PhotoManager:
                 
                 return existing_photo["id"]
             
-            # Extract image metadata
-            metadata = self._extract_metadata(file_path)
-            
-            # Extract AI metadata
-            ai_metadata = self.ai_extractor.extract_metadata(str(file_path))
-            
-            # Generate thumbnail
-            thumbnail_path = None
-            if self.config.get("thumbnail.generate_on_import", True):
-                thumbnail_path = self.thumbnail_gen.generate_thumbnail(file_path)
+            # 单次打开文件，同时提取元数据、AI元数据并生成缩略图
+            metadata = extract_photo_record(self._extraction_task(file_path, file_hash))
+            self.thumbnail_gen.store_packed(metadata.pop("thumbnails", None))
+            if "error" in metadata:
+                self.logger.warning("Failed to extract metadata: path=%s, error=%s", str(file_path), metadata["error"])
             
             # Prepare photo data
+            file_stat = file_path.stat()
             photo_data = {
                 "filename": file_path.name,
                 "filepath": str(file_path.absolute()),
-                "file_size": file_path.stat().st_size,
+                "file_size": file_stat.st_size,
+                "file_mtime_ns": file_stat.st_mtime_ns,
+                "file_inode": file_stat.st_ino,
                 "file_hash": file_hash,
                 "width": metadata.get("width", 0),
                 "height": metadata.get("height", 0),
                 "format": metadata.get("format", ""),
                 "date_taken": metadata.get("date_taken", ""),
                 "exif_data": metadata.get("exif_data", {}),
-                "ai_metadata": ai_metadata.to_dict(),
-                "is_ai_generated": ai_metadata.is_ai_generated,
-                "thumbnail_path": thumbnail_path or "",
+                "ai_metadata": metadata.get("ai_metadata", {}),
+                "is_ai_generated": metadata.get("is_ai_generated", False),
+                "thumbnail_path": metadata.get("thumbnail_path", ""),
                 "rating": 0,
                 "is_favorite": False,
                 "tags": [],
@@ -131,6 +183,8 @@ class PhotoManager:
             
             # Add to database
             photo_id = self.db.add_photo(photo_data)
+            if photo_id and not photo_data["thumbnail_path"]:
+                self.thumbnail_service.enqueue([photo_id])
             
             self.logger.info("Photo imported successfully: photo_id=%s, filename=%s", photo_id, file_path.name)
             
@@ -178,7 +232,7 @@ class PhotoManager:
             existing_photos = {}
             if file_hashes:
                 hash_list = list(file_hashes.values())
-                with self.db.get_connection() as conn:
+                with self.db.read_connection() as conn:
                     # 分批查询，避免SQL参数过多
                     batch_size = 100
                     for i in range(0, len(hash_list), batch_size):
@@ -212,7 +266,7 @@ class PhotoManager:
                         current_path = str(Path(file_path).absolute())
                         if existing_photo['filepath'] != current_path:
                             # 更新路径
-                            with self.db.get_connection() as conn:
+                            with self.db.write_connection() as conn:
                                 conn.execute("UPDATE photos SET filepath = ? WHERE id = ?", 
                                            [current_path, photo_id])
                             self.logger.debug(f"Photo path updated for file {file_path_str}, photo_id {photo_id}")
@@ -501,8 +555,15 @@ class PhotoManager:
                      date_to: str = "",
                      album_ids: List[int] = None,
                      limit: int = 100,
-                     offset: int = 0) -> List[Dict[str, Any]]:
-        """Search photos with various filters including album filtering."""
+                     offset: int = 0,
+                     use_fts: bool = True,
+                     exact_tags: List[str] = None,
+                     summary_only: bool = False) -> List[Dict[str, Any]]:
+        """Search photos with various filters including album filtering.
+        
+        Text matching uses the database full-text index (BM25-ranked) unless
+        use_fts is False.
+        """
         try:
             self.logger.info(f"Searching photos with album_ids: {album_ids}")
             return self.db.search_photos(
@@ -519,12 +580,33 @@ class PhotoManager:
                 date_to=date_to,
                 album_ids=album_ids,
                 limit=limit,
-                offset=offset
+                offset=offset,
+                use_fts=use_fts,
+                exact_tags=exact_tags,
+                summary_only=summary_only
             )
         except Exception as e:
             self.logger.error(f"Failed to search photos: {str(e)}")
             return []
     
+    def search_photos_page(self, page_size: int = 100, cursor: Optional[str] = None,
+                           summary_only: bool = False, **filters) -> Dict[str, Any]:
+        """Fetch one page of search results; see DatabaseManager.search_photos_page."""
+        try:
+            return self.db.search_photos_page(page_size=page_size, cursor=cursor,
+                                              summary_only=summary_only, **filters)
+        except Exception as e:
+            self.logger.error(f"Failed to fetch search page: {str(e)}")
+            return {"photos": [], "next_cursor": None, "has_more": False}
+    
+    def count_search_results(self, exact: bool = True, **filters) -> Dict[str, Any]:
+        """Count search results; see DatabaseManager.count_search_results."""
+        try:
+            return self.db.count_search_results(exact=exact, **filters)
+        except Exception as e:
+            self.logger.error(f"Failed to count search results: {str(e)}")
+            return {"count": 0, "exact": False}
+    
     def delete_photo(self, photo_id: int, delete_file: bool = False) -> bool:
         """Delete photo from database and optionally from disk."""
         try:
@@ -564,24 +646,41 @@ class PhotoManager:
     
     def _calculate_file_hash(self, file_path: Path) -> str:
         """Calculate SHA-256 hash of file."""
-        hash_sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
+        return self.hasher.hash_file(file_path)
+    
+    def find_photo_by_file(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Look up the database record for a file on disk.
+        
+        Tries the stored path and the (size, mtime, inode) fingerprint first
+        and only hashes the file when some photo has the same size, so
+        lookups for files that are not in the library never read them.
+        """
+        try:
+            file_path = Path(file_path)
+            stat = file_path.stat()
+            
+            for record in self.db.get_file_fingerprints(filepaths=[str(file_path)]) + \
+                    self.db.get_file_fingerprints(inodes=[stat.st_ino]):
+                if self._fingerprint_matches(record, stat):
+                    return self.db.get_photo(record["id"])
+            
+            if not self.db.fetch_one("SELECT 1 FROM photos WHERE file_size = ? LIMIT 1", (stat.st_size,)):
+                return None
+            
+            return self._find_by_hash(self._calculate_file_hash(file_path))
+            
+        except Exception as e:
+            self.logger.error("Failed to find photo by file: path=%s, error=%s", str(file_path), str(e))
+            return None
     
     def _find_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
         """Find photo by file hash."""
         try:
-            with self.db.get_connection() as conn:
+            with self.db.read_connection() as conn:
                 cursor = conn.execute("SELECT * FROM photos WHERE file_hash = ?", [file_hash])
                 row = cursor.fetchone()
-                if row:
-                    photo_dict = dict(row)
-                    photo_dict["exif_data"] = json.loads(photo_dict["exif_data"])
-                    photo_dict["tags"] = json.loads(photo_dict["tags"])
-                    return photo_dict
-            return None
+            # JSON字段按需解析
+            return Photo(row) if row else None
         except Exception as e:
             self.logger.error("Failed to find photo by hash: file_hash=%s, error=%s", file_hash, str(e))
             return None
@@ -598,46 +697,10 @@ class PhotoManager:
         
         try:
             with Image.open(file_path) as img:
-                metadata["width"] = img.width
-                metadata["height"] = img.height
-                metadata["format"] = img.format or ""
-                
-                # Extract EXIF data
-                if hasattr(img, '_getexif') and img._getexif():
-                    exif_dict = {}
-                    exif = img._getexif()
-                    
-                    for tag_id, value in exif.items():
-                        tag = TAGS.get(tag_id, tag_id)
-                        
-                        # Convert non-serializable types for JSON serialization
-                        if isinstance(value, bytes):
-                            try:
-                                value = value.decode('utf-8')
-                            except UnicodeDecodeError:
-                                value = str(value)
-                        elif isinstance(value, (datetime, date)):
-                            value = value.isoformat()
-                        elif not isinstance(value, (str, int, float, bool, list, dict, type(None))):
-                            value = str(value)
-                        
-                        exif_dict[tag] = value
-                    
-                    metadata["exif_data"] = exif_dict
-                    
-                    # Extract date taken
-                    date_taken = exif_dict.get("DateTime") or exif_dict.get("DateTimeOriginal")
-                    if date_taken:
-                        try:
-                            # Convert to ISO format
-                            dt = datetime.strptime(date_taken, "%Y:%m:%d %H:%M:%S")
-                            metadata["date_taken"] = dt.isoformat()
-                        except ValueError:
-                            pass
+                metadata = extract_image_metadata(img)
                 
         except Exception as e:
-            self.logger.warning("Failed to extract metadata: path=%s", str(file_path), 
-                              error=str(e))
+            self.logger.warning("Failed to extract metadata: path=%s, error=%s", str(file_path), str(e))
         
         return metadata
     
@@ -716,7 +779,7 @@ class PhotoManager:
             # 如果缩略图不存在，重新生成
             if not photo.get("thumbnail_path") or not Path(photo["thumbnail_path"]).exists():
                 if self.config.get("thumbnail.generate_on_import", True):
-                    thumbnail_path = self.thumbnail_gen.generate_thumbnail(new_path)
+                    thumbnail_path = self.thumbnail_gen.generate_thumbnail(new_path, file_hash)
                     if thumbnail_path:
                         update_data["thumbnail_path"] = thumbnail_path
             
@@ -751,7 +814,8 @@ class PhotoManager:
                     missing_files.append(photo)
                     
                     # 尝试通过文件名查找文件
-                    found_file = self._find_file_by_name(photo["filename"], photo["file_hash"])
+                    found_file = self._find_file_by_name(photo["filename"], photo["file_hash"],
+                                                         photo.get("file_size"))
                     if found_file:
                         # 更新文件路径
                         if self.update_photo_filepath(photo["id"], str(found_file)):
@@ -789,12 +853,15 @@ class PhotoManager:
                 "error_details": [{"error": str(e)}]
             }
     
-    def _find_file_by_name(self, filename: str, expected_hash: str) -> Optional[Path]:
+    def _find_file_by_name(self, filename: str, expected_hash: str,
+                           expected_size: Optional[int] = None) -> Optional[Path]:
         """Find a file by name and verify its hash.
         
         Args:
             filename: Name of the file to find
             expected_hash: Expected SHA256 hash of the file
+            expected_size: Expected file size; candidates of another size are
+                rejected without being read
             
         Returns:
             Path to the found file if hash matches, None otherwise
@@ -819,27 +886,18 @@ class PhotoManager:
                 if not search_dir.exists():
                     continue
                 
-                # 递归搜索文件
-                for file_path in search_dir.rglob(filename):
-                    if file_path.is_file():
-                        # 验证文件哈希值
-                        try:
-                            file_hash = self._calculate_file_hash(file_path)
-                            if file_hash == expected_hash:
-                                self.logger.info("Found missing file: filename=%s", filename,
-                                               path=str(file_path))
-                                return file_path
-                        except Exception as e:
-                            self.logger.warning("Failed to calculate hash for found file: path=%s", str(file_path),
-                                              error=str(e))
-                            continue
+                # 递归搜索文件，先按文件大小过滤再验证哈希值
+                candidates = (file_path for file_path in search_dir.rglob(filename) if file_path.is_file())
+                found_file = self.hasher.find_matching_file(candidates, expected_hash, expected_size)
+                if found_file:
+                    self.logger.info("Found missing file: filename=%s, path=%s", filename, str(found_file))
+                    return found_file
             
             self.logger.warning("Could not find file: filename=%s", filename)
             return None
             
         except Exception as e:
-            self.logger.error("Failed to search for file: filename=%s", filename,
-                            error=str(e))
+            self.logger.error("Failed to search for file: filename=%s, error=%s", filename, str(e))
             return None
     
     def import_photo_with_tags(self, file_path: str, tag_settings: dict = None) -> Optional[int]:
@@ -1447,18 +1505,28 @@ class PhotoManager:
     
     def import_directory_optimized(self, directory_path: str, recursive: bool = True, 
                                  album_id: Optional[int] = None, tag_settings: Optional[dict] = None,
-                                 max_workers: int = 4, batch_size: int = 50) -> Dict[str, Any]:
+                                 max_workers: int = 4, batch_size: int = 50,
+                                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                 batch_callback: Optional[Callable[[List[int]], None]] = None,
+                                 cancel_event: Optional[Event] = None) -> Dict[str, Any]:
         """
-        高性能批量导入目录中的所有照片。
-        使用多线程处理和批量数据库操作来提升性能。
+        高性能流式导入目录中的所有照片。
+        
+        扫描 → 指纹/哈希 → 查重 → 提取 → 批量写库，各阶段在独立线程中运行，
+        通过有界队列逐批传递（队列满时上游阻塞，形成背压）。每批写库提交后
+        立即回调，照片无需等待整个目录扫描和哈希完成即可显示；内存占用只与
+        队列深度和批量大小有关，与目录规模无关。
         
         Args:
             directory_path: 目录路径
             recursive: 是否递归扫描子目录
             album_id: 相册ID
             tag_settings: 标签设置
-            max_workers: 最大工作线程数
+            max_workers: 哈希计算线程数
             batch_size: 批量处理大小
+            progress_callback: 进度回调，参数为统计字典（scanned/processed/imported/skipped/errors/rate）
+            batch_callback: 每批新照片提交后回调，参数为新照片ID列表
+            cancel_event: 设置后停止导入（已提交的批次保留）
             
         Returns:
             导入结果字典
@@ -1470,106 +1538,267 @@ class PhotoManager:
                 self.logger.error("Directory not found: path=%s", str(directory))
                 return {"success": False, "error": "Directory not found"}
             
-            # 获取所有图片文件
-            start_time = time.time()
-            image_files = list(self.directory_scanner.scan_directory(directory_path, recursive))
-            scan_time = time.time() - start_time
-            total_files = len(image_files)
-            
-            if total_files == 0:
-                self.logger.warning("No image files found in directory: path=%s", str(directory))
-                return {"success": True, "imported": 0, "skipped": 0, "errors": 0, "total_processed": 0}
-            
-            self.logger.info("Starting optimized directory import: path=%s, total_files=%s, max_workers=%s, batch_size=%s, scan_time=%s, import_tags=%s", 
-                           str(directory), total_files, max_workers, batch_size, f"{scan_time:.2f}s", 
+            self.logger.info("Starting streaming directory import: path=%s, max_workers=%s, batch_size=%s, import_tags=%s", 
+                           str(directory), max_workers, batch_size,
                            tag_settings.get("import_tags", False) if tag_settings else False)
             
-            # 预处理：检查重复文件
+            queue_depth = max(1, int(self.config.get("import_settings.pipeline_queue_depth", 4)))
+            scan_queue = queue.Queue(maxsize=queue_depth)     # 待分类的文件批次
+            extract_queue = queue.Queue(maxsize=queue_depth)  # 待提取的新文件批次
+            insert_queue = queue.Queue(maxsize=queue_depth)   # 待写库的照片数据批次
+            abort = Event()
+            cancel_event = cancel_event or Event()
+            stage_errors = []
+            
+            stats_lock = Lock()
+            stats = {
+                "scanned": 0, "processed": 0, "imported": 0, "skipped": 0, "errors": 0,
+                "fingerprint_skipped": 0, "moved": 0, "hashed": 0, "modified": 0, "new": 0,
+                "scan_time": 0.0, "stat_time": 0.0, "hash_time": 0.0,
+                "preprocess_time": 0.0, "import_time": 0.0
+            }
             start_time = time.time()
-            file_hashes = self._batch_calculate_hashes(image_files, max_workers)
-            existing_hashes = self._batch_check_existing_hashes(list(file_hashes.values()))
-            preprocess_time = time.time() - start_time
             
-            self.logger.info("Preprocessing completed: preprocess_time=%s, existing_files=%s", f"{preprocess_time:.2f}s", len(existing_hashes))
+            def add_stats(**values):
+                with stats_lock:
+                    for key, value in values.items():
+                        stats[key] += value
+            
+            def report_progress(stage: str):
+                if not progress_callback:
+                    return
+                with stats_lock:
+                    snapshot = dict(stats)
+                elapsed = time.time() - start_time
+                snapshot["stage"] = stage
+                snapshot["elapsed"] = elapsed
+                snapshot["rate"] = snapshot["processed"] / elapsed if elapsed > 0 else 0.0
+                try:
+                    progress_callback(snapshot)
+                except Exception as e:
+                    self.logger.warning("Import progress callback failed: %s", str(e))
             
-            # 分离新文件和已存在的文件
-            new_files = []
-            existing_files = []
+            def stopped() -> bool:
+                return abort.is_set() or cancel_event.is_set()
             
-            for file_path, file_hash in file_hashes.items():
-                if file_hash in existing_hashes:
-                    existing_files.append((file_path, file_hash))
-                else:
-                    new_files.append((file_path, file_hash))
+            def put(target: queue.Queue, item) -> bool:
+                """带背压的入队；中止时放弃并返回False"""
+                while not stopped():
+                    try:
+                        target.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
             
-            self.logger.info("File classification completed: new_files=%s, existing_files=%s", len(new_files), len(existing_files))
+            def get(source: queue.Queue):
+                """出队；中止时返回None以结束本阶段"""
+                while not stopped():
+                    try:
+                        return source.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                return None
             
-            # 批量处理新文件
-            imported_count = 0
-            error_count = 0
-            imported_photo_ids = []
+            def run_stage(name: str, body, downstream: Optional[queue.Queue]):
+                try:
+                    body()
+                except Exception as e:
+                    self.logger.error("Import pipeline stage failed: stage=%s, error=%s", name, str(e))
+                    stage_errors.append(f"{name}: {str(e)}")
+                    abort.set()
+                finally:
+                    # 结束标记：确保下游阶段能够退出
+                    if downstream is not None:
+                        put(downstream, None)
+            
+            # 阶段1：扫描目录，按批次送入分类队列
+            def scan_stage():
+                scan_start = time.time()
+                batch = []
+                for file_path in self.directory_scanner.scan_directory(directory_path, recursive):
+                    if stopped():
+                        return
+                    batch.append(file_path)
+                    if len(batch) >= batch_size:
+                        add_stats(scanned=len(batch), scan_time=time.time() - scan_start)
+                        if not put(scan_queue, batch):
+                            return
+                        batch = []
+                        scan_start = time.time()
+                if batch:
+                    add_stats(scanned=len(batch))
+                    put(scan_queue, batch)
+                add_stats(scan_time=time.time() - scan_start)
+            
+            # 阶段2：指纹快速路径 + 哈希 + 查重，已存在的文件在此就地处理
+            def classify_stage():
+                with self.hasher.open_pool(max_workers) as hash_pool:
+                    classify_batches(hash_pool)
+            
+            def classify_batches(hash_pool):
+                while True:
+                    batch = get(scan_queue)
+                    if batch is None:
+                        return
+                    
+                    stage_start = time.time()
+                    file_stats = self._batch_stat_files(batch)
+                    unchanged_files, moved_files, files_to_hash, known_records = self._classify_by_fingerprint(file_stats)
+                    stat_time = time.time() - stage_start
+                    
+                    hash_start = time.time()
+                    file_hashes = self._batch_calculate_hashes(files_to_hash, max_workers, hash_pool)
+                    existing_hashes = self._batch_check_existing_hashes(list(file_hashes.values()))
+                    hash_time = time.time() - hash_start
+                    
+                    new_files = []
+                    existing_files = []
+                    rehashed_files = []
+                    modified_files = []
+                    fingerprint_updates = []
+                    
+                    for file_path, file_hash in file_hashes.items():
+                        # 先按路径判断，内容与其他照片相同的修改文件也要更新原记录
+                        record = known_records.get(str(file_path))
+                        if record is not None and record["file_hash"] == file_hash:
+                            # 内容未变，只是指纹失效（如修改时间变化）：回填指纹
+                            rehashed_files.append((file_path, record["id"]))
+                            fingerprint_updates.append(self._fingerprint_entry(file_path, file_stats[file_path]))
+                        elif record is not None:
+                            # 同一路径内容已变化：重新提取元数据和缩略图并更新原记录，而不是重复插入；
+                            # 哈希与指纹随提取结果一起写入，提取失败时下次导入会重试
+                            modified_files.append((file_path, file_hash, record["id"]))
+                        elif file_hash in existing_hashes:
+                            existing_files.append((file_path, file_hash))
+                            fingerprint_updates.append(self._fingerprint_entry(file_path, file_stats[file_path]))
+                        else:
+                            new_files.append((file_path, file_hash, None))
+                    
+                    self._process_existing_batch(unchanged_files + rehashed_files, existing_files, moved_files,
+                                                 [photo_id for _, _, photo_id in modified_files],
+                                                 fingerprint_updates, file_stats, album_id, tag_settings, max_workers)
+                    
+                    skipped = len(unchanged_files) + len(rehashed_files) + len(existing_files) + len(moved_files)
+                    add_stats(processed=skipped, skipped=skipped,
+                              errors=len(batch) - len(file_stats) + len(files_to_hash) - len(file_hashes),
+                              fingerprint_skipped=len(unchanged_files), moved=len(moved_files),
+                              hashed=len(file_hashes), modified=len(modified_files), new=len(new_files),
+                              stat_time=stat_time, hash_time=hash_time,
+                              preprocess_time=time.time() - stage_start)
+                    report_progress("classifying")
+                    
+                    files_to_extract = new_files + modified_files
+                    if files_to_extract and not put(extract_queue, files_to_extract):
+                        return
+            
+            # 阶段3：进程池单次打开提取元数据/AI元数据/缩略图（新文件和内容已变化的文件）
+            def extract_stage():
+                extract_workers = self.config.get("import_settings.extract_workers", 0)
+                use_processes = self.config.get("import_settings.extract_use_processes", True)
+                with ExtractionPool(extract_workers, use_processes) as pool:
+                    while True:
+                        files = get(extract_queue)
+                        if files is None:
+                            return
+                        
+                        stage_start = time.time()
+                        sources = {str(file_path): (file_hash, photo_id) for file_path, file_hash, photo_id in files}
+                        photos_data = []
+                        updated_photos = []
+                        failed = 0
+                        for record in pool.map(self._extraction_task(file_path, file_hash) for file_path, file_hash, _ in files):
+                            file_hash, photo_id = sources[record["file_path"]]
+                            photo_data = self._build_photo_data(record, file_hash, tag_settings)
+                            if not photo_data:
+                                failed += 1
+                            elif photo_id is None:
+                                photos_data.append(photo_data)
+                            else:
+                                updated_photos.append((photo_id, photo_data))
+                        add_stats(errors=failed, processed=failed, import_time=time.time() - stage_start)
+                        
+                        if (photos_data or updated_photos) and not put(insert_queue, (photos_data, updated_photos)):
+                            return
             
-            if new_files:
-                start_time = time.time()
-                batch_results = self._batch_import_photos(new_files, max_workers, batch_size, tag_settings)
-                import_time = time.time() - start_time
-                
-                imported_count = batch_results["imported"]
-                error_count = batch_results["errors"]
-                imported_photo_ids = batch_results["photo_ids"]
-                
-                self.logger.info("Batch import completed: import_time=%s, imported=%s, errors=%s", f"{import_time:.2f}s", imported_count, error_count)
-            
-            # 处理已存在的文件（更新路径等）
-            skipped_count = len(existing_files)
-            if existing_files:
-                start_time = time.time()
-                update_results = self._batch_update_existing_files(existing_files, max_workers)
-                update_time = time.time() - start_time
-                
-                self.logger.info("Existing files update completed: update_time=%s, updated=%s", f"{update_time:.2f}s", update_results["updated"])
+            threads = [
+                Thread(target=run_stage, args=("scan", scan_stage, scan_queue), name="import-scan", daemon=True),
+                Thread(target=run_stage, args=("classify", classify_stage, extract_queue), name="import-classify", daemon=True),
+                Thread(target=run_stage, args=("extract", extract_stage, insert_queue), name="import-extract", daemon=True),
+            ]
+            for thread in threads:
+                thread.start()
             
-            # 关联相册 - 处理新导入的照片
-            if album_id and imported_photo_ids:
-                start_time = time.time()
-                self._batch_associate_album(imported_photo_ids, album_id)
-                associate_time = time.time() - start_time
-                
-                self.logger.info("Album association for new photos completed: associate_time=%s, album_id=%s, photo_count=%s", 
-                               f"{associate_time:.2f}s", album_id, len(imported_photo_ids))
-            
-            # 关联相册 - 处理已存在的照片（重要修复）
-            if album_id and existing_files:
-                start_time = time.time()
-                existing_photo_ids = self._get_photo_ids_by_hashes([file_hash for _, file_hash in existing_files])
-                if existing_photo_ids:
-                    # 如果设置了清空已存在照片的标签，先清空标签
-                    self.logger.info("DEBUG: tag_settings=%s", tag_settings)
-                    if tag_settings and tag_settings.get("clear_existing_tags", False):
-                        self.logger.info("DEBUG: Clearing tags for existing photos: photo_count=%s", len(existing_photo_ids))
-                        self._batch_clear_photo_tags(existing_photo_ids)
-                        self.logger.info("Cleared tags for existing photos: photo_count=%s", len(existing_photo_ids))
-                    else:
-                        self.logger.info("DEBUG: Not clearing tags - clear_existing_tags=%s", tag_settings.get("clear_existing_tags", False) if tag_settings else "tag_settings is None")
-                    
-                    self._batch_associate_album(existing_photo_ids, album_id)
-                    associate_existing_time = time.time() - start_time
+            # 阶段4（当前线程）：批量写库，每批提交后通知界面
+            # 写库失败时也要让各阶段退出：否则它们阻塞在有界队列的put上
+            try:
+                while True:
+                    batch = get(insert_queue)
+                    if batch is None:
+                        break
+                    photos_data, updated_photos = batch
                     
-                    self.logger.info("Album association for existing photos completed: associate_time=%s, album_id=%s, photo_count=%s", 
-                                   f"{associate_existing_time:.2f}s", album_id, len(existing_photo_ids))
+                    insert_start = time.time()
+                    if updated_photos:
+                        updated_ids = self._update_modified_photos(updated_photos)
+                        add_stats(processed=len(updated_photos), errors=len(updated_photos) - len(updated_ids),
+                                  import_time=time.time() - insert_start)
+                    if not photos_data:
+                        report_progress("importing")
+                        continue
+                    batch_result = self.db.batch_insert_photos(photos_data)
+                    if batch_result["success"]:
+                        inserted_ids = batch_result["inserted_ids"]
+                        if album_id and inserted_ids:
+                            self._batch_associate_album(inserted_ids, album_id)
+                        self._queue_missing_thumbnails(inserted_ids)
+                        add_stats(imported=batch_result["inserted"], errors=batch_result["errors"],
+                                  processed=len(photos_data), import_time=time.time() - insert_start)
+                        if batch_callback and inserted_ids:
+                            try:
+                                batch_callback(inserted_ids)
+                            except Exception as e:
+                                self.logger.warning("Import batch callback failed: %s", str(e))
+                    else:
+                        add_stats(errors=len(photos_data), processed=len(photos_data))
+                        self.logger.error("Batch insert failed: error=%s", batch_result.get("error"))
+                    report_progress("importing")
+            finally:
+                abort.set()
+                for thread in threads:
+                    thread.join()
             
             total_time = time.time() - start_time
+            
+            if stage_errors:
+                return {"success": False, "error": "; ".join(stage_errors),
+                        "imported": stats["imported"], "skipped": stats["skipped"], "errors": stats["errors"],
+                        "total_processed": stats["scanned"]}
+            
+            if stats["scanned"] == 0 and not cancel_event.is_set():
+                self.logger.warning("No image files found in directory: path=%s", str(directory))
+                return {"success": True, "imported": 0, "skipped": 0, "errors": 0, "total_processed": 0}
+            
             result = {
                 "success": True,
-                "imported": imported_count,
-                "skipped": skipped_count,
-                "errors": error_count,
-                "total_processed": total_files,
+                "cancelled": cancel_event.is_set(),
+                "imported": stats["imported"],
+                "skipped": stats["skipped"],
+                "errors": stats["errors"],
+                "total_processed": stats["scanned"],
                 "performance": {
-                    "scan_time": f"{scan_time:.2f}s",
-                    "preprocess_time": f"{preprocess_time:.2f}s",
-                    "import_time": f"{import_time:.2f}s" if new_files else "0.00s",
-                    "total_time": f"{total_time:.2f}s"
+                    "scan_time": f"{stats['scan_time']:.2f}s",
+                    "stat_time": f"{stats['stat_time']:.2f}s",
+                    "hash_time": f"{stats['hash_time']:.2f}s",
+                    "preprocess_time": f"{stats['preprocess_time']:.2f}s",
+                    "fingerprint_skipped": stats["fingerprint_skipped"],
+                    "moved": stats["moved"],
+                    "hashed": stats["hashed"],
+                    "modified": stats["modified"],
+                    "new": stats["new"],
+                    "import_time": f"{stats['import_time']:.2f}s",
+                    "total_time": f"{total_time:.2f}s",
+                    "throughput": f"{stats['processed'] / total_time:.1f} files/s" if total_time > 0 else "0.0 files/s"
                 }
             }
             
@@ -1580,27 +1809,146 @@ class PhotoManager:
             self.logger.error("Failed to import directory: path=%s, error=%s", str(directory_path), str(e))
             return {"success": False, "error": str(e)}
     
-    def _batch_calculate_hashes(self, image_files: List[Path], max_workers: int) -> Dict[Path, str]:
-        """批量计算文件哈希值"""
-        file_hashes = {}
+    def _update_modified_photos(self, updated_photos: List[Tuple[int, Dict[str, Any]]]) -> List[int]:
+        """把重新提取的文件信息写回内容已变化的照片（评分、收藏、标签、备注等保持不变）"""
+        updated_ids = []
+        thumbnails = []
+        for photo_id, photo_data in updated_photos:
+            if self.db.update_photo(photo_id, {field: photo_data[field] for field in self.REEXTRACTED_FIELDS}):
+                updated_ids.append(photo_id)
+                if photo_data["thumbnail_path"]:
+                    thumbnails.append((photo_id, photo_data["thumbnail_path"]))
+        if updated_ids:
+            self.logger.info("Modified files re-extracted: updated=%s", len(updated_ids))
+            # 已显示的旧缩略图需要重新加载；导入时未生成缩略图的交给后台服务
+            self.thumbnail_service.notify_generated(thumbnails)
+            self._queue_missing_thumbnails(updated_ids)
+        return updated_ids
+    
+    def _process_existing_batch(self, unchanged_files: List[Tuple[Path, int]],
+                                existing_files: List[Tuple[Path, str]],
+                                moved_files: List[Tuple[Path, int]],
+                                modified_ids: List[int],
+                                fingerprint_updates: List[Dict[str, Any]],
+                                file_stats: Dict[Path, os.stat_result],
+                                album_id: Optional[int], tag_settings: Optional[dict],
+                                max_workers: int):
+        """处理一批已存在的文件：更新路径、回填指纹、清空标签并关联相册"""
+        # 被移动的文件按记录id更新路径（内容重复的照片共用哈希，不能按哈希查找）
+        if moved_files:
+            moved_count = self._batch_update_moved_files(moved_files)
+            self.logger.info("Moved files update completed: updated=%s", moved_count)
+        
+        # 处理已存在的文件（更新路径等）
+        if existing_files:
+            update_results = self._batch_update_existing_files(existing_files, max_workers)
+            self.logger.info("Existing files update completed: updated=%s", update_results["updated"])
+        
+        # 回填指纹（路径更新之后按新路径写入），下次导入即可走快速路径
+        fingerprint_updates = fingerprint_updates + [self._fingerprint_entry(file_path, file_stats[file_path])
+                                                     for file_path, _ in moved_files]
+        if fingerprint_updates:
+            self.db.update_file_fingerprints(fingerprint_updates)
         
-        def calculate_hash(file_path):
+        # 关联相册 - 处理已存在的照片（重要修复）
+        if album_id and (existing_files or unchanged_files or moved_files or modified_ids):
+            existing_photo_ids = [photo_id for _, photo_id in unchanged_files + moved_files] + list(modified_ids)
+            existing_photo_ids += self._get_photo_ids_by_hashes(
+                [file_hash for _, file_hash in existing_files])
+            if existing_photo_ids:
+                # 如果设置了清空已存在照片的标签，先清空标签
+                if tag_settings and tag_settings.get("clear_existing_tags", False):
+                    self._batch_clear_photo_tags(existing_photo_ids)
+                    self.logger.info("Cleared tags for existing photos: photo_count=%s", len(existing_photo_ids))
+                
+                self._batch_associate_album(existing_photo_ids, album_id)
+                self.logger.info("Album association for existing photos completed: album_id=%s, photo_count=%s", 
+                               album_id, len(existing_photo_ids))
+    
+    def _batch_stat_files(self, image_files: List[Path]) -> Dict[Path, os.stat_result]:
+        """批量获取文件stat信息（指纹快速路径只依赖stat，不读取文件内容）"""
+        file_stats = {}
+        for file_path in image_files:
             try:
-                return file_path, self._calculate_file_hash(file_path)
-            except Exception as e:
-                self.logger.error("Error calculating hash for %s: %s", str(file_path), str(e))
-                return file_path, None
+                file_stats[file_path] = file_path.stat()
+            except OSError as e:
+                self.logger.error("Error reading file stat for %s: %s", str(file_path), str(e))
+        return file_stats
+    
+    @staticmethod
+    def _fingerprint_matches(record: Dict[str, Any], stat: os.stat_result) -> bool:
+        """比较数据库记录与当前文件的(size, mtime, inode)指纹"""
+        return (record.get("file_mtime_ns") is not None
+                and record.get("file_size") == stat.st_size
+                and record.get("file_mtime_ns") == stat.st_mtime_ns
+                and record.get("file_inode") == stat.st_ino)
+    
+    @staticmethod
+    def _fingerprint_entry(file_path: Path, stat: os.stat_result, file_hash: str = None) -> Dict[str, Any]:
+        """构造用于写回数据库的指纹条目"""
+        entry = {
+            "filepath": str(file_path),
+            "file_size": stat.st_size,
+            "file_mtime_ns": stat.st_mtime_ns,
+            "file_inode": stat.st_ino
+        }
+        if file_hash:
+            entry["file_hash"] = file_hash
+        return entry
+    
+    def _classify_by_fingerprint(self, file_stats: Dict[Path, os.stat_result]):
+        """
+        按文件指纹分类，决定哪些文件需要计算哈希。
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_file = {executor.submit(calculate_hash, file_path): file_path 
-                            for file_path in image_files}
-            
-            for future in as_completed(future_to_file):
-                file_path, file_hash = future.result()
-                if file_hash:
-                    file_hashes[file_path] = file_hash
+        Returns:
+            (unchanged_files, moved_files, files_to_hash, known_records)
+            unchanged_files: [(path, photo_id)] 路径和指纹均未变化
+            moved_files: [(path, photo_id)] 原路径已不存在、inode/大小/修改时间一致的文件
+            files_to_hash: [path] 新增、修改过或尚无指纹的文件
+            known_records: {filepath: record} 路径已在数据库中的记录
+        """
+        known_records = {record["filepath"]: record
+                         for record in self.db.get_file_fingerprints(filepaths=[str(p) for p in file_stats])}
+        
+        unchanged_files = []
+        candidates = []
+        for file_path, stat in file_stats.items():
+            record = known_records.get(str(file_path))
+            if record and self._fingerprint_matches(record, stat):
+                unchanged_files.append((file_path, record["id"]))
+            else:
+                candidates.append(file_path)
         
-        return file_hashes
+        # 未知路径按inode查找，识别同一文件系统内被移动/重命名的文件
+        moved_files = []
+        files_to_hash = []
+        unknown = [p for p in candidates if str(p) not in known_records]
+        by_inode = {}
+        if unknown:
+            for record in self.db.get_file_fingerprints(inodes=[file_stats[p].st_ino for p in unknown]):
+                by_inode.setdefault(record["file_inode"], []).append(record)
+        
+        for file_path in candidates:
+            stat = file_stats[file_path]
+            moved_from = None
+            if str(file_path) not in known_records:
+                for record in by_inode.get(stat.st_ino, []):
+                    if self._fingerprint_matches(record, stat) and not Path(record["filepath"]).exists():
+                        moved_from = record
+                        break
+            if moved_from:
+                moved_files.append((file_path, moved_from["id"]))
+            else:
+                files_to_hash.append(file_path)
+        
+        return unchanged_files, moved_files, files_to_hash, known_records
+    
+    def _batch_calculate_hashes(self, image_files: List[Path], max_workers: int,
+                                hash_pool=None) -> Dict[Path, str]:
+        """批量计算文件哈希值（大缓冲区读取，可配置为进程池并行）；导入时复用同一个哈希池"""
+        if hash_pool is not None:
+            return hash_pool.hash_files(image_files)
+        return self.hasher.hash_files(image_files, max_workers)
     
     def _batch_check_existing_hashes(self, file_hashes: List[str]) -> set:
         """批量检查已存在的文件哈希值"""
@@ -1615,88 +1963,81 @@ class PhotoManager:
         
         return existing_hashes
     
-    def _batch_import_photos(self, new_files: List[Tuple[Path, str]], max_workers: int, 
-                           batch_size: int, tag_settings: Optional[dict]) -> Dict[str, Any]:
-        """批量导入新照片"""
-        imported_count = 0
-        error_count = 0
-        photo_ids = []
+    def _extraction_task(self, file_path: Path, file_hash: str) -> Tuple[str, Optional[str], list, int, bool]:
+        """构造单次提取任务：(文件路径, 缩略图引用或None, 待生成的金字塔级别, 质量, 是否打包存储)"""
+        _, quality = self.thumbnail_gen.get_settings()
+        pack = self.thumbnail_gen.pack_store is not None
+        thumb_ref = None
+        targets = []
+        if self.config.get("thumbnail.generate_on_import", True):
+            targets = self.thumbnail_gen.pyramid_targets(file_path, file_hash)
+            thumb_ref = self.thumbnail_gen.thumbnail_reference(targets[0][0])
+            if pack:
+                # 包中已有的级别不再生成
+                targets = self.thumbnail_gen.missing_levels(targets)
+            targets = [(str(path), level_size) for path, level_size in targets]
+        return str(file_path), thumb_ref, targets, quality, pack
+    
+    def _queue_missing_thumbnails(self, photo_ids: List[int]):
+        """把刚写入但没有缩略图的照片交给后台缩略图服务"""
+        if not photo_ids:
+            return
+        sources = self.db.get_thumbnail_sources(photo_ids)
+        missing = [photo_id for photo_id, source in sources.items() if not source.get("thumbnail_path")]
+        if missing:
+            self.thumbnail_service.enqueue(missing)
+    
+    def _build_photo_data(self, record: Dict[str, Any], file_hash: str,
+                          tag_settings: Optional[dict]) -> Optional[Dict[str, Any]]:
+        """将工作进程返回的提取结果组装为照片数据"""
+        file_path = Path(record["file_path"])
+        if "error" in record:
+            self.logger.error("Error processing file %s: %s", str(file_path), record["error"])
+            return None
         
-        # 分批处理
-        for i in range(0, len(new_files), batch_size):
-            batch = new_files[i:i + batch_size]
+        # 打包存储模式下，工作进程带回的缩略图由父进程写入包文件
+        self.thumbnail_gen.store_packed(record.pop("thumbnails", None))
+        
+        try:
+            file_stat = file_path.stat()
             
-            def process_file(file_info):
-                file_path, file_hash = file_info
-                try:
-                    # 提取基本元数据
-                    metadata = self._extract_metadata(file_path)
-                    
-                    # 准备照片数据
-                    photo_data = {
-                        "filename": file_path.name,
-                        "filepath": str(file_path),
-                        "file_size": file_path.stat().st_size,
-                        "file_hash": file_hash,
-                        "width": metadata.get("width", 0),
-                        "height": metadata.get("height", 0),
-                        "format": metadata.get("format", ""),
-                        "date_taken": metadata.get("date_taken", ""),
-                        "date_added": datetime.now().isoformat(),
-                        "date_modified": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                        "exif_data": metadata.get("exif_data", {}),
-                        "ai_metadata": metadata.get("ai_metadata", {}),
-                        "is_ai_generated": metadata.get("is_ai_generated", False),
-                        "tags": [],
-                        "simple_tags": [],
-                        "normal_tags": [],
-                        "detailed_tags": [],
-                        "tag_translations": {},
-                        "rating": 0,
-                        "is_favorite": False,
-                        "thumbnail_path": "",
-                        "notes": ""
-                    }
-                    
-                    # 处理标签（如果需要）
-                    if tag_settings and tag_settings.get("import_tags", False):
-                        self._import_tags_for_photo_data(photo_data, str(file_path), tag_settings)
-                    
-                    return photo_data
-                    
-                except Exception as e:
-                    self.logger.error("Error processing file %s: %s", str(file_path), str(e))
-                    return None
+            # 准备照片数据
+            photo_data = {
+                "filename": file_path.name,
+                "filepath": str(file_path),
+                "file_size": file_stat.st_size,
+                "file_mtime_ns": file_stat.st_mtime_ns,
+                "file_inode": file_stat.st_ino,
+                "file_hash": file_hash,
+                "width": record.get("width", 0),
+                "height": record.get("height", 0),
+                "format": record.get("format", ""),
+                "date_taken": record.get("date_taken", ""),
+                "date_added": datetime.now().isoformat(),
+                "date_modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
+                "exif_data": record.get("exif_data", {}),
+                "ai_metadata": record.get("ai_metadata", {}),
+                "is_ai_generated": record.get("is_ai_generated", False),
+                "tags": [],
+                "simple_tags": [],
+                "normal_tags": [],
+                "detailed_tags": [],
+                "tag_translations": {},
+                "rating": 0,
+                "is_favorite": False,
+                "thumbnail_path": record.get("thumbnail_path", ""),
+                "notes": ""
+            }
             
-            # 并行处理文件
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_file = {executor.submit(process_file, file_info): file_info 
-                                for file_info in batch}
-                
-                batch_photos_data = []
-                for future in as_completed(future_to_file):
-                    photo_data = future.result()
-                    if photo_data:
-                        batch_photos_data.append(photo_data)
-                    else:
-                        error_count += 1
+            # 处理标签（如果需要）
+            if tag_settings and tag_settings.get("import_tags", False):
+                self._import_tags_for_photo_data(photo_data, str(file_path), tag_settings)
             
-            # 批量插入到数据库
-            if batch_photos_data:
-                batch_result = self.db.batch_insert_photos(batch_photos_data)
-                if batch_result["success"]:
-                    imported_count += batch_result["inserted"]
-                    photo_ids.extend(batch_result["inserted_ids"])
-                    error_count += batch_result["errors"]
-                else:
-                    error_count += len(batch_photos_data)
-                    self.logger.error("Batch insert failed: error=%s", batch_result.get("error"))
-        
-        return {
-            "imported": imported_count,
-            "errors": error_count,
-            "photo_ids": photo_ids
-        }
+            return photo_data
+            
+        except Exception as e:
+            self.logger.error("Error processing file %s: %s", str(file_path), str(e))
+            return None
 
     def _import_tags_for_photo_data(self, photo_data: dict, photo_path: str, tag_settings: dict):
         """为照片数据导入标签"""
@@ -1734,6 +2075,17 @@ class PhotoManager:
         except Exception as e:
             self.logger.error("Error importing tags for photo data: photo_path=%s, error=%s", photo_path, str(e))
 
+    def _batch_update_moved_files(self, moved_files: List[Tuple[Path, int]]) -> int:
+        """按记录id把被移动文件的路径改为新路径，返回更新数量"""
+        updated_count = 0
+        for file_path, photo_id in moved_files:
+            try:
+                if self.db.update_photo(photo_id, {"filepath": str(file_path)}):
+                    updated_count += 1
+            except Exception as e:
+                self.logger.error("Error updating moved file %s: %s", str(file_path), str(e))
+        return updated_count
+    
     def _batch_update_existing_files(self, existing_files: List[Tuple[Path, str]], 
                                    max_workers: int) -> Dict[str, Any]:
         """批量更新已存在文件的路径等信息"""
@@ -1848,7 +2200,7 @@ class PhotoManager:
                 return []
             
             photo_ids = []
-            with self.db.get_connection() as conn:
+            with self.db.read_connection() as conn:
                 # 分批查询，避免SQL参数过多
                 batch_size = 100
                 for i in range(0, len(file_hashes), batch_size):
@@ -2,10 +2,13 @@
 Thumbnail generation functionality.
 """
 
+import io
 import os
+import re
+import math
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Callable, Iterable, List, Optional, Sequence, Tuple
 from PIL import Image, ImageOps, ExifTags
 
 # 配置日志
@@ -13,18 +16,207 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 from ..config.manager import ConfigManager
+from .file_hasher import compute_file_digest
+from .thumbnail_store import PACK_URI_PREFIX, get_pack_store
+
+# 缩略图缓存目录
+THUMBNAIL_DIR = Path("data/thumbnails")
+
+# 打包存储（thumbnail.storage: pack）所在目录
+PACK_DIR = THUMBNAIL_DIR / "packs"
+
+# 缩略图金字塔默认级别：网格、预览、大预览（预览级别仅在thumbnail.preview_levels开启时生成）
+DEFAULT_PYRAMID_SIZES = ((180, 135), (640, 640), (1280, 1280))
+
+# 缓存文件名：<file_hash>_<宽>x<高>_q<质量>.jpg
+THUMBNAIL_NAME_PATTERN = re.compile(r"^([0-9a-f]+)_(\d+)x(\d+)_q(\d+)\.jpg$")
+
+# EXIF Orientation标签ID
+ORIENTATION_TAG = next(tag for tag, name in ExifTags.TAGS.items() if name == 'Orientation')
+
+# EXIF方向值对应的变换序列
+ORIENTATION_TRANSPOSES = {
+    2: (Image.Transpose.FLIP_LEFT_RIGHT,),
+    3: (Image.Transpose.ROTATE_180,),
+    4: (Image.Transpose.FLIP_TOP_BOTTOM,),
+    5: (Image.Transpose.FLIP_LEFT_RIGHT, Image.Transpose.ROTATE_90),
+    6: (Image.Transpose.ROTATE_270,),
+    7: (Image.Transpose.FLIP_LEFT_RIGHT, Image.Transpose.ROTATE_270),
+    8: (Image.Transpose.ROTATE_90,),
+}
+
+
+def thumbnail_relpath(file_hash: str, size: Tuple[int, int], quality: int) -> Path:
+    """Stable cache location of a thumbnail, relative to the thumbnail directory.
+    
+    Keyed by the content hash plus the size/quality variant and sharded by
+    the first two hash byte pairs (ab/cd/abcd..._256x256_q85.jpg), so the
+    key survives restarts and file moves and no directory grows too large.
+    """
+    width, height = size
+    return Path(file_hash[:2]) / file_hash[2:4] / f"{file_hash}_{width}x{height}_q{quality}.jpg"
+
+
+def apply_exif_orientation(img: Image.Image, orientation: int) -> Image.Image:
+    """Rotate/flip an image according to an EXIF orientation value."""
+    for method in ORIENTATION_TRANSPOSES.get(orientation, ()):
+        img = img.transpose(method)
+    return img
+
+
+def find_best_thumbnail(file_hash: str, box: Tuple[int, int],
+                        thumbnail_dir: Path = THUMBNAIL_DIR) -> Optional[str]:
+    """Best cached pyramid level of a photo for display in a box.
+    
+    Returns the smallest level whose bounding box covers ``box`` (an exact
+    match needs no rescaling at all), otherwise the largest level present.
+    Only the photo's shard directory is listed, so no configuration is
+    needed and levels from earlier settings are still served.
+    """
+    if not file_hash:
+        return None
+    shard_dir = thumbnail_dir / thumbnail_relpath(file_hash, (0, 0), 0).parent
+    try:
+        names = os.listdir(shard_dir)
+    except OSError:
+        return None
+    
+    covering = []
+    smaller = []
+    for name in names:
+        match = THUMBNAIL_NAME_PATTERN.match(name)
+        if not match or match.group(1) != file_hash:
+            continue
+        width, height = int(match.group(2)), int(match.group(3))
+        level = (width * height, name)
+        if width >= box[0] and height >= box[1]:
+            covering.append(level)
+        else:
+            smaller.append(level)
+    
+    if covering:
+        return str(shard_dir / min(covering)[1])
+    if smaller:
+        return str(shard_dir / max(smaller)[1])
+    return None
+
+
+def read_best_thumbnail(file_hash: str, box: Tuple[int, int]) -> Optional[bytes]:
+    """JPEG bytes of the best cached level for a display box.
+    
+    Looks in the thumbnail pack first (when one exists), then in the loose
+    file cache.
+    """
+    if not file_hash:
+        return None
+    store = get_pack_store(PACK_DIR)
+    if store is not None:
+        key = store.best_key(file_hash, box)
+        data = store.get(key) if key else None
+        if data:
+            return data
+    thumb_path = find_best_thumbnail(file_hash, box)
+    if thumb_path:
+        try:
+            with open(thumb_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+    return None
+
+
+def _fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Size of an image of ``size`` shrunk to fit inside ``box`` (never enlarged)."""
+    scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+
+def _save_jpeg(img: Image.Image, thumb_path: Path, quality: int) -> None:
+    # 先写临时文件再替换，避免并发生成同一内容时读到半个文件
+    thumb_path = Path(thumb_path)
+    thumb_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = thumb_path.with_name(f"{thumb_path.stem}.{os.getpid()}.tmp")
+    img.save(temp_path, "JPEG", quality=quality, optimize=True)
+    os.replace(temp_path, thumb_path)
+
+
+def render_thumbnails(img: Image.Image, targets: Sequence[Tuple[Any, Tuple[int, int]]],
+                      quality: int, orientation: int = 1,
+                      sink: Optional[Callable[[Any, bytes], None]] = None) -> None:
+    """Write several JPEG thumbnails of an already opened image from one decode.
+    
+    JPEG sources are first switched to draft mode at the smallest DCT scale
+    (1/2, 1/4, 1/8) that still covers the largest target, so a 24 MP photo
+    is never decoded at full resolution. Levels are then produced
+    largest-first, each shrunk from the previous one.
+    
+    Args:
+        img: image opened but not yet loaded (otherwise draft mode is skipped)
+        targets: (thumbnail path, bounding box) pairs
+        quality: JPEG quality
+        orientation: EXIF orientation to apply
+        sink: if given, called with (target, JPEG bytes) instead of writing files
+    """
+    if not targets:
+        return
+    
+    # 计算最大级别在原始（未旋转）坐标下所需的解码尺寸
+    transposed = orientation in (5, 6, 7, 8)
+    oriented_size = (img.height, img.width) if transposed else img.size
+    need_width = need_height = 1
+    for _, box in targets:
+        width, height = _fit_size(oriented_size, box)
+        if transposed:
+            width, height = height, width
+        need_width, need_height = max(need_width, width), max(need_height, height)
+    img.draft(None, (need_width, need_height))
+    
+    # Convert to RGB if necessary
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    
+    img = apply_exif_orientation(img, orientation)
+    
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    # 从大到小逐级缩小，每级都从上一级而不是原图缩放
+    for thumb_path, box in sorted(targets, key=lambda target: target[1][0] * target[1][1], reverse=True):
+        img.thumbnail(tuple(box), Image.Resampling.LANCZOS)
+        if sink is None:
+            _save_jpeg(img, thumb_path, quality)
+        else:
+            buffer = io.BytesIO()
+            img.save(buffer, "JPEG", quality=quality, optimize=True)
+            sink(thumb_path, buffer.getvalue())
+
+
+def render_thumbnail(img: Image.Image, thumb_path: Path, size: Tuple[int, int],
+                     quality: int, orientation: int = 1) -> None:
+    """Write a single JPEG thumbnail of an already opened image."""
+    render_thumbnails(img, [(thumb_path, size)], quality, orientation)
 
 
 class ThumbnailGenerator:
     """Generates and manages photo thumbnails."""
     
-    def __init__(self, config_manager: ConfigManager):
+    # 缩略图目录布局版本；变化时PhotoManager会迁移旧缩略图
+    LAYOUT_VERSION = "2"
+    
+    def __init__(self, config_manager: ConfigManager, db_manager=None):
         self.config = config_manager
+        self.db = db_manager
         self.logger = logger
         
         # Create thumbnails directory
-        self.thumbnail_dir = Path("data/thumbnails")
+        self.thumbnail_dir = THUMBNAIL_DIR
         self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 可选的打包存储：缩略图追加到少量包文件中，而不是每级一个小文件
+        self.pack_store = None
+        if self.config.get("thumbnail.storage", "files") == "pack":
+            self.pack_store = get_pack_store(PACK_DIR, create=True,
+                                             max_pack_size_mb=self.config.get("thumbnail.pack_max_size_mb", 256))
     
     def _get_exif_orientation(self, img: Image.Image) -> int:
         """Get EXIF orientation from image."""
@@ -41,27 +233,105 @@ class ThumbnailGenerator:
     
     def _rotate_image_by_exif(self, img: Image.Image) -> Image.Image:
         """Rotate image according to EXIF orientation."""
-        orientation = self._get_exif_orientation(img)
-        
-        if orientation == 2:
-            img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-        elif orientation == 3:
-            img = img.transpose(Image.Transpose.ROTATE_180)
-        elif orientation == 4:
-            img = img.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
-        elif orientation == 5:
-            img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT).transpose(Image.Transpose.ROTATE_90)
-        elif orientation == 6:
-            img = img.transpose(Image.Transpose.ROTATE_270)
-        elif orientation == 7:
-            img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT).transpose(Image.Transpose.ROTATE_270)
-        elif orientation == 8:
-            img = img.transpose(Image.Transpose.ROTATE_90)
-        
-        return img
-    
-    def generate_thumbnail(self, image_path: str) -> Optional[str]:
-        """Generate thumbnail for an image."""
+        return apply_exif_orientation(img, self._get_exif_orientation(img))
+    
+    def resolve_file_hash(self, image_path: str, file_hash: Optional[str] = None) -> str:
+        """Content hash of an image: the given one, else photos.file_hash, else a full digest.
+        
+        The stored hash is used only while the file's size and mtime still
+        match the photo record; hashing the file is the last resort.
+        """
+        if file_hash:
+            return file_hash
+        if self.db is not None:
+            try:
+                stat = os.stat(image_path)
+                records = self.db.get_file_fingerprints(
+                    filepaths=list({str(image_path), os.path.abspath(image_path)}))
+            except OSError:
+                records = []
+            for record in records:
+                if (record.get("file_hash") and record.get("file_size") == stat.st_size
+                        and record.get("file_mtime_ns") in (None, stat.st_mtime_ns)):
+                    return record["file_hash"]
+        return compute_file_digest(image_path)
+    
+    def thumbnail_path_for(self, image_path: str, file_hash: Optional[str] = None,
+                           size: Optional[Tuple[int, int]] = None,
+                           quality: Optional[int] = None) -> Path:
+        """Target thumbnail path for an image (whether or not it exists yet).
+        
+        Pass file_hash when it is already known; see resolve_file_hash.
+        """
+        file_hash = self.resolve_file_hash(image_path, file_hash)
+        default_size, default_quality = self.get_settings()
+        return self.thumbnail_dir / thumbnail_relpath(file_hash, size or default_size,
+                                                      quality or default_quality)
+    
+    def get_settings(self) -> Tuple[Tuple[int, int], int]:
+        """Thumbnail (size, quality) from configuration."""
+        size = self.config.get("thumbnail.size", (256, 256))
+        quality = self.config.get("thumbnail.quality", 85)
+        return tuple(size), quality
+    
+    def get_pyramid_sizes(self, previews: Optional[bool] = None) -> List[Tuple[int, int]]:
+        """Additional pyramid levels generated alongside the main thumbnail.
+        
+        Preview levels (larger than the main thumbnail) cost an extra encode
+        per photo and are only included when thumbnail.preview_levels is on
+        or ``previews`` is passed explicitly.
+        """
+        if previews is None:
+            previews = self.config.get("thumbnail.preview_levels", False)
+        main_size, _ = self.get_settings()
+        sizes = self.config.get("thumbnail.pyramid_sizes", DEFAULT_PYRAMID_SIZES) or ()
+        levels = []
+        for size in sizes:
+            size = tuple(size)
+            if size == main_size or size in levels:
+                continue
+            if not previews and (size[0] > main_size[0] or size[1] > main_size[1]):
+                continue
+            levels.append(size)
+        return levels
+    
+    def pyramid_targets(self, image_path: str, file_hash: Optional[str] = None,
+                        previews: Optional[bool] = None) -> List[Tuple[Path, Tuple[int, int]]]:
+        """(path, size) of every pyramid level, main thumbnail first."""
+        file_hash = self.resolve_file_hash(image_path, file_hash)
+        main_size, quality = self.get_settings()
+        return [(self.thumbnail_dir / thumbnail_relpath(file_hash, size, quality), size)
+                for size in [main_size] + self.get_pyramid_sizes(previews)]
+    
+    def best_thumbnail_path(self, file_hash: str, box: Tuple[int, int]) -> Optional[str]:
+        """Best cached pyramid level for a display box; see find_best_thumbnail."""
+        return find_best_thumbnail(file_hash, box, self.thumbnail_dir)
+    
+    def missing_levels(self, targets: List[Tuple[Path, Tuple[int, int]]]) -> List[Tuple[Path, Tuple[int, int]]]:
+        """Pyramid targets not yet present in the active storage."""
+        if self.pack_store is not None:
+            return [(path, size) for path, size in targets if path.stem not in self.pack_store]
+        return [(path, size) for path, size in targets if not path.exists()]
+    
+    def thumbnail_reference(self, thumb_path: Path) -> str:
+        """Value stored in photos.thumbnail_path for a main thumbnail."""
+        if self.pack_store is not None:
+            return PACK_URI_PREFIX + Path(thumb_path).stem
+        return str(thumb_path)
+    
+    def store_packed(self, items: List[Tuple[str, bytes]]) -> int:
+        """Add (key, JPEG bytes) rendered by an import worker to the pack."""
+        if self.pack_store is None or not items:
+            return 0
+        return self.pack_store.put_many(items)
+    
+    def generate_thumbnail(self, image_path: str, file_hash: Optional[str] = None,
+                           previews: Optional[bool] = None) -> Optional[str]:
+        """Generate the pyramid levels for an image, reusing cached ones with the same content.
+        
+        Returns the main thumbnail reference (a file path, or a pack: key
+        when thumbnail.storage is pack).
+        """
         try:
             image_path = Path(image_path)
             
@@ -69,79 +339,201 @@ class ThumbnailGenerator:
                 self.logger.error("Image file not found: %s", str(image_path))
                 return None
             
-            # Generate thumbnail filename
-            thumb_filename = f"{image_path.stem}_{hash(str(image_path))}.jpg"
-            thumb_path = self.thumbnail_dir / thumb_filename
+            targets = self.pyramid_targets(image_path, file_hash, previews)
+            thumb_path = targets[0][0]
             
-            # Skip if thumbnail already exists
-            if thumb_path.exists():
-                return str(thumb_path)
+            # Skip levels that already exist
+            missing = self.missing_levels(targets)
+            if not missing:
+                return self.thumbnail_reference(thumb_path)
             
-            # Get thumbnail settings
-            size = self.config.get("thumbnail.size", (256, 256))
-            quality = self.config.get("thumbnail.quality", 85)
+            _, quality = self.get_settings()
             
-            # Generate thumbnail
+            # Generate thumbnails from a single (draft-mode) decode
+            packed = []
+            sink = (lambda path, data: packed.append((path.stem, data))) if self.pack_store is not None else None
             with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Apply EXIF orientation correction
-                img = self._rotate_image_by_exif(img)
-                
-                # Create thumbnail with proper aspect ratio
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # Save thumbnail
-                img.save(thumb_path, "JPEG", quality=quality, optimize=True)
+                render_thumbnails(img, missing, quality, self._get_exif_orientation(img), sink)
+            self.store_packed(packed)
             
-            self.logger.info("Thumbnail generated: original=%s, thumbnail=%s", str(image_path), str(thumb_path))
+            self.logger.info("Thumbnail generated: original=%s, thumbnail=%s, levels=%s",
+                             str(image_path), str(thumb_path), len(missing))
             
-            return str(thumb_path)
+            return self.thumbnail_reference(thumb_path)
             
         except Exception as e:
             self.logger.error("Failed to generate thumbnail: path=%s, error=%s", str(image_path), str(e))
             return None
     
-    def get_thumbnail_path(self, image_path: str) -> Optional[str]:
-        """Get thumbnail path for an image."""
-        image_path = Path(image_path)
-        thumb_filename = f"{image_path.stem}_{hash(str(image_path))}.jpg"
-        thumb_path = self.thumbnail_dir / thumb_filename
+    def get_thumbnail_path(self, image_path: str, file_hash: Optional[str] = None) -> Optional[str]:
+        """Get thumbnail path (or pack: reference) for an image."""
+        try:
+            thumb_path = self.thumbnail_path_for(image_path, file_hash)
+        except OSError:
+            return None
         
+        if self.pack_store is not None and thumb_path.stem in self.pack_store:
+            return PACK_URI_PREFIX + thumb_path.stem
         return str(thumb_path) if thumb_path.exists() else None
     
-    def delete_thumbnail(self, image_path: str) -> bool:
-        """Delete thumbnail for an image."""
+    def delete_thumbnail(self, image_path: str, file_hash: Optional[str] = None) -> bool:
+        """Delete every pyramid level cached for an image."""
         try:
-            thumb_path = self.get_thumbnail_path(image_path)
-            if thumb_path and Path(thumb_path).exists():
-                Path(thumb_path).unlink()
-                self.logger.info("Thumbnail deleted: thumbnail=%s", thumb_path)
-                return True
-            return False
+            file_hash = self.resolve_file_hash(image_path, file_hash)
+            deleted = self.pack_store.delete(file_hash) if self.pack_store is not None else 0
+            shard_dir = self.thumbnail_dir / thumbnail_relpath(file_hash, (0, 0), 0).parent
+            for thumb_file in shard_dir.glob(f"{file_hash}_*.jpg"):
+                thumb_file.unlink()
+                deleted += 1
+            if deleted:
+                self.logger.info("Thumbnail deleted: file_hash=%s, levels=%s", file_hash, deleted)
+            return deleted > 0
             
         except Exception as e:
             self.logger.error("Failed to delete thumbnail: path=%s, error=%s", str(image_path), str(e))
             return False
     
-    def cleanup_orphaned_thumbnails(self) -> int:
-        """Remove thumbnails for non-existent images."""
+    def migrate_legacy_thumbnails(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Move thumbnails from the old flat layout into the content-addressed one.
+        
+        Old names used the per-process salted hash() of the path and could
+        never be found again after a restart. Thumbnails still referenced by
+        a photo record are moved to their stable path; unreferenced files
+        left in the flat directory are orphans from earlier runs and removed.
+        
+        Args:
+            records: dicts with id, file_hash and thumbnail_path
+            
+        Returns:
+            {"updates": [(photo_id, new_path)], "migrated": n, "removed": n}
+        """
+        size, quality = self.get_settings()
+        thumbnail_dir = self.thumbnail_dir.resolve()
+        updates: List[Tuple[int, str]] = []
+        referenced = set()
+        removed_count = 0
+        
+        for record in records:
+            if not record.get("thumbnail_path"):
+                continue
+            old_path = Path(record["thumbnail_path"])
+            if old_path.parent.resolve() != thumbnail_dir:
+                continue
+            referenced.add(old_path.name)
+            file_hash = record.get("file_hash")
+            if not file_hash:
+                continue
+            new_path = self.thumbnail_dir / thumbnail_relpath(file_hash, size, quality)
+            try:
+                if old_path.exists():
+                    new_path.parent.mkdir(parents=True, exist_ok=True)
+                    if new_path.exists():
+                        old_path.unlink()
+                    else:
+                        os.replace(old_path, new_path)
+                    updates.append((record["id"], str(new_path)))
+                elif new_path.exists():
+                    updates.append((record["id"], str(new_path)))
+            except OSError as e:
+                self.logger.warning("Failed to migrate thumbnail: path=%s, error=%s", str(old_path), str(e))
+        
+        for thumb_file in self.thumbnail_dir.glob("*.jpg"):
+            if thumb_file.name in referenced:
+                continue
+            try:
+                thumb_file.unlink()
+                removed_count += 1
+            except OSError as e:
+                self.logger.debug("Failed to remove orphaned thumbnail: path=%s, error=%s", str(thumb_file), str(e))
+        
+        self.logger.info("Legacy thumbnails migrated: migrated=%s, removed=%s", len(updates), removed_count)
+        return {"updates": updates, "migrated": len(updates), "removed": removed_count}
+    
+    def cleanup_orphaned_thumbnails(self, valid_hashes: Optional[Iterable[str]] = None) -> int:
+        """Remove cached thumbnails whose content hash is no longer in the library.
+        
+        Args:
+            valid_hashes: file_hash values of all photos; without it nothing is removed
+        """
         try:
             removed_count = 0
+            if valid_hashes is None:
+                return 0
+            valid_hashes = set(valid_hashes)
             
-            for thumb_file in self.thumbnail_dir.glob("*.jpg"):
-                # This is a simplified cleanup - in practice, you'd check against the database
-                if not thumb_file.exists():
+            for thumb_file in self.thumbnail_dir.glob("*/*/*.jpg"):
+                file_hash = thumb_file.stem.split("_", 1)[0]
+                if file_hash in valid_hashes:
                     continue
-                
-                # Check if original image exists (simplified logic)
-                # In a real implementation, you'd query the database
+                try:
+                    thumb_file.unlink()
+                    removed_count += 1
+                except OSError as e:
+                    self.logger.debug("Failed to remove thumbnail: path=%s, error=%s", str(thumb_file), str(e))
                 
             self.logger.info("Thumbnail cleanup completed: removed=%s", removed_count)
             return removed_count
             
         except Exception as e:
             self.logger.error(f"Failed to cleanup thumbnails: {str(e)}")
-            return 0
\ No newline at end of file
+            return 0
+    
+    def migrate_to_pack(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Move loose cached thumbnails of the given photos into the pack store.
+        
+        Args:
+            records: dicts with id and file_hash
+            
+        Returns:
+            {"updates": [(photo_id, pack reference)], "packed": n}
+        """
+        if self.pack_store is None:
+            return {"updates": [], "packed": 0}
+        
+        main_size, quality = self.get_settings()
+        updates: List[Tuple[int, str]] = []
+        packed_count = 0
+        for record in records:
+            file_hash = record.get("file_hash")
+            if not file_hash:
+                continue
+            shard_dir = self.thumbnail_dir / thumbnail_relpath(file_hash, (0, 0), 0).parent
+            thumb_files = list(shard_dir.glob(f"{file_hash}_*.jpg"))
+            try:
+                items = [(thumb_file.stem, thumb_file.read_bytes()) for thumb_file in thumb_files]
+                packed_count += self.pack_store.put_many(items)
+                for thumb_file in thumb_files:
+                    thumb_file.unlink()
+            except OSError as e:
+                self.logger.warning("Failed to pack thumbnails: file_hash=%s, error=%s", file_hash, str(e))
+                continue
+            main_key = thumbnail_relpath(file_hash, main_size, quality).stem
+            if main_key in self.pack_store:
+                updates.append((record["id"], PACK_URI_PREFIX + main_key))
+        
+        # 清理空的分片目录
+        for shard_dir in sorted(self.thumbnail_dir.glob("*/*"), reverse=True):
+            if shard_dir.is_dir() and shard_dir.parent != PACK_DIR and not any(shard_dir.iterdir()):
+                shard_dir.rmdir()
+        for shard_dir in self.thumbnail_dir.glob("*"):
+            if shard_dir.is_dir() and shard_dir != PACK_DIR and not any(shard_dir.iterdir()):
+                shard_dir.rmdir()
+        
+        self.logger.info("Thumbnails moved into pack store: photos=%s, levels=%s", len(updates), packed_count)
+        return {"updates": updates, "packed": packed_count}
+    
+    def collect_garbage(self, valid_hashes: Iterable[str], compact: bool = True) -> Dict[str, Any]:
+        """Remove cached thumbnails of photos no longer in the library.
+        
+        Covers both the loose file cache and the pack store; packs are then
+        compacted when compact is True.
+        """
+        valid_hashes = set(valid_hashes)
+        result = {"removed_files": self.cleanup_orphaned_thumbnails(valid_hashes),
+                  "removed_packed": 0, "packs_compacted": 0, "bytes_reclaimed": 0}
+        store = self.pack_store or get_pack_store(PACK_DIR)
+        if store is not None:
+            result["removed_packed"] = store.collect_garbage(valid_hashes)
+            if compact:
+                result.update(store.compact())
+        return result
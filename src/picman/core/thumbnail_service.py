@@ -0,0 +1,268 @@
+"""
+Background thumbnail generation service.
+
+Photos whose thumbnails are missing are queued (persistently, in the
+thumbnail_queue table) and rendered by worker threads outside the import
+path. Photos currently visible in the grid can be moved to the front of the
+queue; those requests are persisted together with the next batch of
+results, so repainting the grid does not write to the database.
+"""
+
+import heapq
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .thumbnail_generator import ThumbnailGenerator
+
+
+# 队列优先级：数值越小越先处理
+PRIORITY_VISIBLE = 0
+PRIORITY_NORMAL = 10
+
+
+class ThumbnailService:
+    """Priority-queued background thumbnail generator.
+
+    Worker threads start on first use. Pending work survives restarts
+    through the thumbnail_queue table; call resume() at startup to pick it
+    up again.
+    """
+
+    def __init__(self, db_manager, thumbnail_gen: ThumbnailGenerator, config_manager=None,
+                 on_generated: Optional[Callable[[List[Tuple[int, str]]], None]] = None):
+        self.db = db_manager
+        self.thumbnail_gen = thumbnail_gen
+        self.on_generated = on_generated
+        self.logger = logging.getLogger("picman.core.thumbnail_service")
+
+        get = config_manager.get if config_manager is not None else (lambda key, default=None: default)
+        self.max_workers = max(1, int(get("thumbnail.service_workers", 2)))
+        self.flush_batch_size = max(1, int(get("thumbnail.service_batch_size", 32)))
+        self.flush_interval = 1.0
+
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[int, int, int]] = []  # (priority, seq, photo_id)
+        self._pending: Dict[int, int] = {}            # photo_id -> 当前优先级
+        self._in_progress = set()
+        self._seq = 0
+        self._failed_ids = set()  # 本次运行中生成失败的照片，不再因可见而重试
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        self._results_lock = threading.Lock()
+        self._results: List[Tuple[int, str]] = []
+        self._failed: List[int] = []
+        self._queued: Dict[int, int] = {}  # 尚未写入thumbnail_queue的可见照片 photo_id -> 优先级
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.time()
+
+        self._stats_lock = threading.Lock()
+        self._completed = 0
+        self._failed_count = 0
+        self._started_at: Optional[float] = None
+
+    def _push(self, photo_id: int, priority: int) -> bool:
+        """加入内存队列；已排队的照片只在优先级提高时重新入堆（旧条目惰性丢弃）"""
+        current = self._pending.get(photo_id)
+        if photo_id in self._in_progress or (current is not None and current <= priority):
+            return False
+        self._pending[photo_id] = priority
+        self._seq += 1
+        heapq.heappush(self._heap, (priority, self._seq, photo_id))
+        return True
+
+    def enqueue(self, photo_ids: Iterable[int], priority: int = PRIORITY_NORMAL) -> int:
+        """Queue photos for thumbnail generation (persisted for restarts)."""
+        photo_ids = list(photo_ids)
+        if not photo_ids:
+            return 0
+        self.db.enqueue_thumbnails(photo_ids, priority)
+        with self._condition:
+            added = sum(1 for photo_id in photo_ids if self._push(photo_id, priority))
+            self._condition.notify_all()
+        self._ensure_started()
+        return added
+
+    def prioritize(self, photo_ids: Iterable[int]) -> int:
+        """Move queued photos (e.g. those visible in the grid) to the front.
+
+        Photos that are not queued are left alone.
+        """
+        with self._condition:
+            moved = sum(1 for photo_id in photo_ids
+                        if photo_id in self._pending and self._push(photo_id, PRIORITY_VISIBLE))
+            if moved:
+                self._condition.notify_all()
+        return moved
+
+    def request_visible(self, photo_ids: Iterable[int]) -> int:
+        """Queue photos that are on screen without a thumbnail at top priority.
+
+        Called on every paint batch, so the queue rows are only written on the
+        next flush, in the same transaction as the finished thumbnails.
+        """
+        with self._condition:
+            added = [photo_id for photo_id in photo_ids
+                     if photo_id not in self._failed_ids and self._push(photo_id, PRIORITY_VISIBLE)]
+            if not added:
+                return 0
+            with self._results_lock:
+                for photo_id in added:
+                    self._queued[photo_id] = PRIORITY_VISIBLE
+            self._condition.notify_all()
+        self._ensure_started()
+        return len(added)
+
+    def resume(self, include_missing: bool = True) -> int:
+        """Reload the persisted queue, optionally adding photos without a thumbnail."""
+        queued = self.db.get_thumbnail_queue()
+        if include_missing:
+            queued_ids = {photo_id for photo_id, _ in queued}
+            missing = [photo_id for photo_id in self.db.get_photo_ids_without_thumbnail()
+                       if photo_id not in queued_ids]
+            if missing:
+                self.db.enqueue_thumbnails(missing, PRIORITY_NORMAL)
+                queued += [(photo_id, PRIORITY_NORMAL) for photo_id in missing]
+        if not queued:
+            return 0
+        with self._condition:
+            for photo_id, priority in queued:
+                self._push(photo_id, priority)
+            self._condition.notify_all()
+        self._ensure_started()
+        self.logger.info("Thumbnail queue resumed: pending=%s", len(queued))
+        return len(queued)
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._threads or self._stopping:
+                return
+            self._started_at = time.time()
+            for index in range(self.max_workers):
+                thread = threading.Thread(target=self._worker, name=f"thumbnail-service-{index}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _next_photo(self) -> Optional[int]:
+        with self._condition:
+            while not self._stopping:
+                while self._heap:
+                    priority, _, photo_id = heapq.heappop(self._heap)
+                    if self._pending.get(photo_id) == priority:
+                        del self._pending[photo_id]
+                        self._in_progress.add(photo_id)
+                        return photo_id
+                # 队列空闲时写回剩余结果
+                self._condition.release()
+                try:
+                    self._flush()
+                finally:
+                    self._condition.acquire()
+                if not self._heap and not self._stopping:
+                    self._condition.wait(timeout=self.flush_interval)
+            return None
+
+    def _worker(self):
+        while True:
+            photo_id = self._next_photo()
+            if photo_id is None:
+                return
+            try:
+                self._generate(photo_id)
+            except Exception as e:
+                self.logger.error("Thumbnail service failed: photo_id=%s, error=%s", photo_id, str(e))
+                self._record(photo_id, None)
+            finally:
+                with self._condition:
+                    self._in_progress.discard(photo_id)
+
+    def _generate(self, photo_id: int):
+        source = self.db.get_thumbnail_sources([photo_id]).get(photo_id)
+        if not source:
+            # 照片已删除
+            self._record(photo_id, None)
+            return
+        thumbnail_ref = self.thumbnail_gen.generate_thumbnail(source["filepath"], source.get("file_hash"))
+        self._record(photo_id, thumbnail_ref)
+
+    def _record(self, photo_id: int, thumbnail_ref: Optional[str]):
+        with self._results_lock:
+            if thumbnail_ref:
+                self._results.append((photo_id, thumbnail_ref))
+            else:
+                self._failed.append(photo_id)
+                self._failed_ids.add(photo_id)
+            due = (len(self._results) + len(self._failed) >= self.flush_batch_size
+                   or time.time() - self._last_flush >= self.flush_interval)
+        with self._stats_lock:
+            if thumbnail_ref:
+                self._completed += 1
+            else:
+                self._failed_count += 1
+        if due:
+            self._flush()
+
+    def _flush(self):
+        """批量写回缩略图路径、登记可见照片并移出持久化队列（一个写事务）"""
+        # 串行化：避免较早取出的入队请求在较晚的完成记录之后才提交
+        with self._flush_lock:
+            with self._results_lock:
+                results, failed, queued = self._results, self._failed, self._queued
+                self._results, self._failed, self._queued = [], [], {}
+                self._last_flush = time.time()
+            if not results and not failed and not queued:
+                return
+            self.db.complete_thumbnails(results, failed, list(queued.items()))
+        if failed:
+            self.logger.warning("Thumbnail generation failed: photo_ids=%s", failed)
+        self.notify_generated(results)
+
+    def notify_generated(self, results: List[Tuple[int, str]]):
+        """Tell the grids that photos have new thumbnails (also used when an import regenerates them)."""
+        if results and self.on_generated:
+            try:
+                self.on_generated(results)
+            except Exception as e:
+                self.logger.warning("Thumbnail service callback failed: %s", str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count, completed/failed totals and throughput."""
+        with self._condition:
+            queue_depth = len(self._pending)
+            in_progress = len(self._in_progress)
+        with self._stats_lock:
+            completed, failed = self._completed, self._failed_count
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        return {
+            "queue_depth": queue_depth,
+            "in_progress": in_progress,
+            "completed": completed,
+            "failed": failed,
+            "throughput": completed / elapsed if elapsed > 0 else 0.0,
+            "running": bool(self._threads) and not self._stopping,
+        }
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until the queue is empty and results are written; False on timeout."""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            with self._condition:
+                idle = not self._pending and not self._in_progress
+            if idle:
+                self._flush()
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers; unfinished photos stay queued in the database."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._flush()
+        self._threads = []
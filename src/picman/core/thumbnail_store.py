@@ -0,0 +1,301 @@
+"""
+Packed thumbnail storage.
+
+Thumbnails are appended to a few large pack files instead of one small JPEG
+per photo and level. A SQLite index maps each thumbnail key
+(``<file_hash>_<w>x<h>_q<quality>``) to its pack, offset and length, and
+reads are served as slices of memory-mapped packs. Deleted entries only
+leave dead bytes behind; compaction rewrites packs that are mostly dead.
+"""
+
+import os
+import mmap
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger("picman.core.thumbnail_store")
+
+PACK_URI_PREFIX = "pack:"
+
+
+def parse_thumbnail_key(key: str) -> Optional[Tuple[str, int, int, int]]:
+    """(file_hash, width, height, quality) of a key, or None if malformed.
+
+    Keys are the loose cache file names without .jpg.
+    """
+    try:
+        file_hash, dimensions, quality = key.rsplit("_", 2)
+        width, height = dimensions.split("x")
+        return file_hash, int(width), int(height), int(quality[1:])
+    except ValueError:
+        return None
+
+
+class ThumbnailPackStore:
+    """Append-only pack files with a SQLite offset index.
+
+    Thread-safe; only one process should write to a store at a time.
+    """
+
+    INDEX_NAME = "index.db"
+    PACK_NAME = "thumbs-{:04d}.pack"
+
+    def __init__(self, root: Path, max_pack_size_mb: int = 256):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_pack_size = max(1, max_pack_size_mb) * 1024 * 1024
+        self.logger = logger
+        self._lock = threading.RLock()
+        self._maps: Dict[int, Tuple[mmap.mmap, int]] = {}
+        self._write_file = None
+        self._write_pack = None
+
+        self._conn = sqlite3.connect(str(self.root / self.INDEX_NAME), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                key TEXT PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                pack INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                created_date TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_thumbnails_file_hash ON thumbnails(file_hash);
+            CREATE INDEX IF NOT EXISTS idx_thumbnails_pack ON thumbnails(pack);
+        """)
+
+    @staticmethod
+    def exists(root: Path) -> bool:
+        """Whether a pack store has been created at root."""
+        return (Path(root) / ThumbnailPackStore.INDEX_NAME).exists()
+
+    def _pack_path(self, pack: int) -> Path:
+        return self.root / self.PACK_NAME.format(pack)
+
+    def _pack_numbers(self) -> List[int]:
+        numbers = []
+        for pack_file in self.root.glob("thumbs-*.pack"):
+            try:
+                numbers.append(int(pack_file.stem.split("-")[1]))
+            except (IndexError, ValueError):
+                continue
+        return sorted(numbers)
+
+    def _writer(self, length: int):
+        """Current pack opened for append, rolling over to a new pack when full."""
+        if self._write_file is not None and self._write_file.tell() + length > self.max_pack_size:
+            self._close_writer()
+        if self._write_file is None:
+            numbers = self._pack_numbers()
+            pack = numbers[-1] if numbers else 1
+            if numbers and self._pack_path(pack).stat().st_size + length > self.max_pack_size:
+                pack += 1
+            self._write_file = open(self._pack_path(pack), "ab")
+            self._write_pack = pack
+        return self._write_pack, self._write_file
+
+    def _close_writer(self):
+        if self._write_file is not None:
+            self._write_file.close()
+            self._write_file = None
+            self._write_pack = None
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]) -> int:
+        """Append thumbnails and index them in one transaction.
+
+        Args:
+            items: (key, jpeg bytes) pairs; existing keys are replaced
+
+        Returns:
+            Number of thumbnails stored
+        """
+        rows = []
+        with self._lock:
+            for key, data in items:
+                parsed = parse_thumbnail_key(key)
+                if not parsed or not data:
+                    continue
+                pack, pack_file = self._writer(len(data))
+                offset = pack_file.tell()
+                pack_file.write(data)
+                rows.append((key, parsed[0], parsed[1], parsed[2], pack, offset, len(data),
+                             datetime.now().isoformat()))
+            if not rows:
+                return 0
+            # 先落盘数据再写索引，崩溃时最多留下无索引的死字节
+            self._write_file.flush()
+            with self._conn:
+                self._conn.executemany("""
+                    INSERT OR REPLACE INTO thumbnails
+                    (key, file_hash, width, height, pack, offset, length, created_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+        return len(rows)
+
+    def put(self, key: str, data: bytes) -> bool:
+        return self.put_many([(key, data)]) == 1
+
+    def _read(self, pack: int, offset: int, length: int) -> Optional[bytes]:
+        mapped, mapped_size = self._maps.get(pack, (None, 0))
+        if mapped is None or offset + length > mapped_size:
+            # 追加写入后包文件变大，重新映射
+            if mapped is not None:
+                mapped.close()
+            if self._write_pack == pack:
+                self._write_file.flush()
+            with open(self._pack_path(pack), "rb") as pack_file:
+                size = os.fstat(pack_file.fileno()).st_size
+                if size == 0:
+                    return None
+                mapped = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = (mapped, size)
+            if offset + length > size:
+                return None
+        return mapped[offset:offset + length]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Thumbnail bytes for a key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pack, offset, length FROM thumbnails WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            try:
+                return self._read(*row)
+            except (OSError, ValueError) as e:
+                self.logger.warning("Failed to read packed thumbnail: key=%s, error=%s", key, str(e))
+                return None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM thumbnails WHERE key = ?", (key,)).fetchone() is not None
+
+    def levels(self, file_hash: str) -> List[Tuple[str, int, int]]:
+        """(key, width, height) of every stored level of a photo."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, width, height FROM thumbnails WHERE file_hash = ?", (file_hash,)).fetchall()
+
+    def best_key(self, file_hash: str, box: Tuple[int, int]) -> Optional[str]:
+        """Smallest stored level covering box, otherwise the largest level."""
+        levels = self.levels(file_hash)
+        covering = [(width * height, key) for key, width, height in levels if width >= box[0] and height >= box[1]]
+        if covering:
+            return min(covering)[1]
+        if levels:
+            return max((width * height, key) for key, width, height in levels)[1]
+        return None
+
+    def delete(self, file_hash: str) -> int:
+        """Drop every level of a photo from the index."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM thumbnails WHERE file_hash = ?", (file_hash,)).rowcount
+
+    def collect_garbage(self, valid_hashes: Iterable[str]) -> int:
+        """Drop index entries whose file_hash is not in valid_hashes.
+
+        The bytes stay in the packs until compact() rewrites them.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS valid_hashes (file_hash TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM valid_hashes")
+            self._conn.executemany("INSERT OR IGNORE INTO valid_hashes (file_hash) VALUES (?)",
+                                   ((file_hash,) for file_hash in valid_hashes))
+            removed = self._conn.execute(
+                "DELETE FROM thumbnails WHERE file_hash NOT IN (SELECT file_hash FROM valid_hashes)").rowcount
+            self._conn.execute("DELETE FROM valid_hashes")
+        self.logger.info("Thumbnail pack garbage collected: removed=%s", removed)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count plus live and total bytes per pack."""
+        with self._lock:
+            live = dict(self._conn.execute("SELECT pack, SUM(length) FROM thumbnails GROUP BY pack").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM thumbnails").fetchone()[0]
+            packs = {}
+            for pack in self._pack_numbers():
+                packs[pack] = {"live_bytes": live.get(pack, 0) or 0,
+                               "total_bytes": self._pack_path(pack).stat().st_size}
+        return {
+            "entries": entries,
+            "packs": packs,
+            "live_bytes": sum(info["live_bytes"] for info in packs.values()),
+            "total_bytes": sum(info["total_bytes"] for info in packs.values()),
+        }
+
+    def compact(self, min_dead_ratio: float = 0.25) -> Dict[str, Any]:
+        """Rewrite packs whose dead bytes exceed min_dead_ratio.
+
+        Live entries of every selected pack are copied into one new
+        destination pack (rolling over only at max_pack_size), then the old
+        pack files are removed; packs with no live entries are just deleted.
+
+        Returns:
+            {"packs_compacted": n, "bytes_reclaimed": n}
+        """
+        compacted = 0
+        reclaimed = 0
+        with self._lock:
+            packs = self.stats()["packs"]
+            selected = [pack for pack, info in packs.items()
+                        if info["total_bytes"] == 0 or info["live_bytes"] == 0
+                        or (info["total_bytes"] - info["live_bytes"]) / info["total_bytes"] >= min_dead_ratio]
+            if selected:
+                # 所有存活条目写入同一个新包，旧包不再接受写入
+                self._close_writer()
+                self._write_pack = max(packs) + 1
+                self._write_file = open(self._pack_path(self._write_pack), "ab")
+
+            for pack in selected:
+                rows = self._conn.execute(
+                    "SELECT key, offset, length FROM thumbnails WHERE pack = ? ORDER BY offset", (pack,)).fetchall()
+                live_items = [(key, self._read(pack, offset, length)) for key, offset, length in rows]
+                self.put_many((key, data) for key, data in live_items if data)
+
+                mapped, _ = self._maps.pop(pack, (None, 0))
+                if mapped is not None:
+                    mapped.close()
+                self._pack_path(pack).unlink()
+                compacted += 1
+                reclaimed += packs[pack]["total_bytes"] - packs[pack]["live_bytes"]
+
+            if selected and self._write_file.tell() == 0:
+                # 选中的包都没有存活条目时，不留下空的目标包
+                empty_pack = self._write_pack
+                self._close_writer()
+                self._pack_path(empty_pack).unlink()
+
+        self.logger.info("Thumbnail packs compacted: packs=%s, reclaimed=%s bytes", compacted, reclaimed)
+        return {"packs_compacted": compacted, "bytes_reclaimed": reclaimed}
+
+    def close(self):
+        with self._lock:
+            self._close_writer()
+            for mapped, _ in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._conn.close()
+
+
+_shared_stores: Dict[Path, ThumbnailPackStore] = {}
+_shared_lock = threading.Lock()
+
+
+def get_pack_store(root: Path, create: bool = False,
+                   max_pack_size_mb: int = 256) -> Optional[ThumbnailPackStore]:
+    """Process-wide store for root; None if it does not exist and create is False."""
+    root = Path(root).resolve()
+    with _shared_lock:
+        store = _shared_stores.get(root)
+        if store is None and (create or ThumbnailPackStore.exists(root)):
+            store = _shared_stores[root] = ThumbnailPackStore(root, max_pack_size_mb)
+        return store
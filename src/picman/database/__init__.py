@@ -3,5 +3,6 @@ Database management package for PyPhotoManager.
 """
 
 from .manager import DatabaseManager
+from .records import Photo, PhotoSummary
 
-__all__ = ["DatabaseManager"]
\ No newline at end of file
+__all__ = ["DatabaseManager", "Photo", "PhotoSummary"]
\ No newline at end of file
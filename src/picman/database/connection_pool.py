@@ -0,0 +1,202 @@
+"""
+SQLite connection pool for PyPhotoManager.
+Keeps persistent reader connections plus a single serialized writer,
+all opened in WAL mode with tuned pragmas.
+"""
+
+import sqlite3
+import threading
+import queue
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+
+class ConnectionPool:
+    """Pooled SQLite connections: N readers, one writer.
+
+    WAL journaling lets readers proceed while the writer holds a transaction,
+    so GUI queries are not blocked behind import batches. Readers are checked
+    out per thread (nested reads on the same thread reuse the same
+    connection); the writer is guarded by a re-entrant lock and commits when
+    the outermost ``write()`` block exits.
+    """
+
+    def __init__(self, db_path: Path, pool_size: int = 10,
+                 journal_mode: str = "WAL", synchronous: str = "NORMAL",
+                 cache_size_kb: int = 65536, mmap_size_mb: int = 256,
+                 statement_cache_size: int = 256, busy_timeout_ms: int = 5000):
+        self.db_path = Path(db_path)
+        self.pool_size = max(1, int(pool_size))
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.statement_cache_size = statement_cache_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.logger = logging.getLogger("picman.database.pool")
+
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all_readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._local = threading.local()
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+
+        self._closed = False
+        self._stats = {"reader_checkouts": 0, "reader_waits": 0, "writer_checkouts": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection and apply pragmas."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.row_factory = sqlite3.Row
+
+        try:
+            mode = conn.execute(f"PRAGMA journal_mode={self.journal_mode}").fetchone()[0]
+            if str(mode).upper() != str(self.journal_mode).upper():
+                self.logger.warning("Journal mode not applied: requested=%s, actual=%s",
+                                    self.journal_mode, mode)
+        except sqlite3.DatabaseError as e:
+            self.logger.warning("Failed to set journal mode: %s", str(e))
+
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        # 负数表示以KB为单位
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA foreign_keys=OFF")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._readers_lock:
+            if len(self._all_readers) < self.pool_size:
+                conn = self._connect()
+                self._all_readers.append(conn)
+                return conn
+
+        self._stats["reader_waits"] += 1
+        return self._idle_readers.get()
+
+    @contextmanager
+    def read(self):
+        """Check out a reader connection for the current thread."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+
+        # 写事务进行中的线程直接复用写连接，保证能读到自己尚未提交的数据
+        if self._writer_depth and self._writer_owner_is_current():
+            yield self._writer
+            return
+
+        conn = getattr(self._local, "reader", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire_reader()
+        self._stats["reader_checkouts"] += 1
+        self._local.reader = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_readers.put(conn)
+
+    def _writer_owner_is_current(self) -> bool:
+        return getattr(self._local, "writer_owner", False)
+
+    @contextmanager
+    def write(self):
+        """Check out the writer connection; commits on outermost exit."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+
+        with self._writer_lock:
+            conn = self._get_writer()
+            self._writer_depth += 1
+            self._local.writer_owner = True
+            self._stats["writer_checkouts"] += 1
+            try:
+                yield conn
+                if self._writer_depth == 1 and conn.in_transaction:
+                    conn.commit()
+            except Exception:
+                if self._writer_depth == 1 and conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    self._local.writer_owner = False
+
+    def checkpoint(self, mode: str = "PASSIVE") -> bool:
+        """Run a WAL checkpoint on the writer connection."""
+        try:
+            with self.write() as conn:
+                conn.execute(f"PRAGMA wal_checkpoint({mode})")
+            return True
+        except Exception as e:
+            self.logger.error("WAL checkpoint failed: mode=%s, error=%s", mode, str(e))
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool usage statistics."""
+        return {
+            "pool_size": self.pool_size,
+            "open_readers": len(self._all_readers),
+            "idle_readers": self._idle_readers.qsize(),
+            "writer_open": self._writer is not None,
+            **self._stats,
+        }
+
+    def close(self):
+        """Close all pooled connections."""
+        self._closed = True
+        with self._writer_lock:
+            if self._writer is not None:
+                try:
+                    if self._writer.in_transaction:
+                        self._writer.commit()
+                    self._writer.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
+                self._writer.close()
+                self._writer = None
+
+        with self._readers_lock:
+            for conn in self._all_readers:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all_readers.clear()
+            self._idle_readers = queue.LifoQueue()
+
+        self.logger.info("Connection pool closed: %s", str(self.db_path))
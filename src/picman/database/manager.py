@@ -9,6 +9,9 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, date
 import json
+import re
+import base64
+import hashlib
 # import structlog  # 已移除，使用标准logging
 import logging
 from contextlib import contextmanager
@@ -16,6 +19,9 @@ import threading
 import time
 from functools import lru_cache
 
+from .connection_pool import ConnectionPool
+from .records import Photo, PhotoSummary
+
 
 def safe_json_dumps(obj):
     """Safely serialize object to JSON, handling non-serializable types."""
@@ -216,14 +222,54 @@ class UnifiedTagsAccessor:
 class DatabaseManager:
     """Manages SQLite database operations for photo management."""
     
+    # 全文索引覆盖的文本字段（与原LIKE搜索的11个字段一致）
+    FTS_TABLE = "photos_fts"
+    FTS_COLUMNS = (
+        "filename", "notes", "unified_tags", "tag_translations", "ai_metadata",
+        "simple_tags_en", "simple_tags_cn",
+        "general_tags_en", "general_tags_cn",
+        "detailed_tags_en", "detailed_tags_cn"
+    )
+    # search_terms 与 tags 原先只匹配的字段子集
+    FTS_TERM_COLUMNS = ("filename", "notes", "unified_tags", "tag_translations", "ai_metadata")
+    FTS_TAG_COLUMNS = ("unified_tags", "tag_translations")
+    
+    # 规范化标签表：来源字段 -> (分类, 语言)；语言为None时按内容自动识别
+    TAG_SOURCE_FIELDS = {
+        "simple_tags_en": ("simple", "en"),
+        "simple_tags_cn": ("simple", "zh"),
+        "general_tags_en": ("normal", "en"),
+        "general_tags_cn": ("normal", "zh"),
+        "detailed_tags_en": ("detailed", "en"),
+        "detailed_tags_cn": ("detailed", "zh"),
+        "tags": ("custom", None)
+    }
+    TAG_SEPARATORS = re.compile(r"[,，、;；\n]+")
+    MAX_TAG_LENGTH = 64
+    TAG_INDEX_VERSION = "1"
+    
     def __init__(self, db_path: str, config=None):
         self.db_path = Path(db_path)
         self.config = config
         self.logger = logging.getLogger("picman.database")
+        self.fts_enabled = False
+        self.fts_tokenizer = ""
         
         # Ensure database directory exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
+        # Connection pool (WAL + tuned pragmas)
+        db_config = getattr(config, "database", None)
+        self._pool = ConnectionPool(
+            self.db_path,
+            pool_size=getattr(db_config, "pool_size", 10),
+            journal_mode=getattr(db_config, "journal_mode", "WAL"),
+            synchronous=getattr(db_config, "synchronous", "NORMAL"),
+            cache_size_kb=getattr(db_config, "cache_size_kb", 65536),
+            mmap_size_mb=getattr(db_config, "mmap_size_mb", 256),
+            statement_cache_size=getattr(db_config, "statement_cache_size", 256)
+        )
+        
         # Initialize database
         self._init_database()
     
@@ -236,13 +282,12 @@ class DatabaseManager:
                 return self._handle_compatible_update(query, params)
             
             # 普通查询执行
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 if params:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
-                conn.commit()
                 return True
                 
         except Exception as e:
@@ -275,10 +320,9 @@ class DatabaseManager:
                     return self._update_tag_field_with_sync(photo_id, field_name, field_value)
             
             # 不是标签字段更新，直接执行
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(query, params)
-                conn.commit()
                 return True
                 
         except Exception as e:
@@ -323,7 +367,7 @@ class DatabaseManager:
                 updates = UnifiedTagsAccessor.write_unified_tags(unified_tags)
                 
                 # 直接数据库更新，不通过update_photo避免递归
-                with self.get_connection() as conn:
+                with self.write_connection() as conn:
                     cursor = conn.cursor()
                     
                     # 构建UPDATE语句
@@ -339,16 +383,15 @@ class DatabaseManager:
                     
                     query = f"UPDATE photos SET {', '.join(set_clauses)} WHERE id = ?"
                     cursor.execute(query, values)
-                    conn.commit()
+                    self._sync_photo_tags(conn, photo_id)
                 
                 self.logger.debug(f"Successfully synced tag field update: photo_id={photo_id}, field={field_name}")
                 return True
             else:
                 # 非标签字段，直接更新
-                with self.get_connection() as conn:
+                with self.write_connection() as conn:
                     cursor = conn.cursor()
                     cursor.execute(f"UPDATE photos SET {field_name} = ? WHERE id = ?", (field_value, photo_id))
-                    conn.commit()
                     return True
                 
         except Exception as e:
@@ -358,114 +401,407 @@ class DatabaseManager:
     def _init_database(self):
         """Initialize database with required tables."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
-            # Photos table
-            if not db["photos"].exists():
-                db["photos"].create({
-                    "id": int,
-                    "filename": str,
-                    "filepath": str,
-                    "file_size": int,
-                    "file_hash": str,
-                    "width": int,
-                    "height": int,
-                    "format": str,
-                    "date_taken": str,
-                    "date_added": str,
-                    "date_modified": str,
-                    "exif_data": str,  # JSON string
-                    "ai_metadata": str,  # JSON string - AI元数据
-                    "is_ai_generated": bool,  # 是否为AI生成
-                    "tags": str,       # JSON array
-                    "simple_tags": str,    # JSON array - 简单标签
-                    "normal_tags": str,    # JSON array - 普通标签
-                    "detailed_tags": str,  # JSON array - 详细标签
-                    "tag_translations": str,  # JSON object - 标签翻译
-                    "rating": int,
-                    "is_favorite": bool,
-                    "thumbnail_path": str,
-                    "notes": str,
-                    # 新的分离式标签字段
-                    "simple_tags_en": str,    # 简单标签(英文)
-                    "simple_tags_cn": str,    # 简单标签(中文)
-                    "general_tags_en": str,   # 普通标签(英文)
-                    "general_tags_cn": str,   # 普通标签(中文)
-                    "detailed_tags_en": str,  # 详细标签(英文)
-                    "detailed_tags_cn": str,  # 详细标签(中文)
-                    "positive_prompt": str,   # 正向提示词
-                    "negative_prompt": str,   # 负向提示词
-                    "unified_tags": str       # 统一标签字段(JSON)
-                }, pk="id")
-                
-                # Create indexes for performance optimization
-                db["photos"].create_index(["filepath"], unique=True)
-                db["photos"].create_index(["file_hash"])
-                db["photos"].create_index(["date_taken"])
-                db["photos"].create_index(["rating"])
-                db["photos"].create_index(["is_favorite"])
-                # Additional performance indexes
-                db["photos"].create_index(["filename"])
-                db["photos"].create_index(["file_size"])
-                db["photos"].create_index(["date_taken", "rating"])  # Composite index for sorting
-                db["photos"].create_index(["is_favorite", "rating"])  # For favorite photos sorting
-            else:
-                # 检查是否需要添加新字段
-                self._add_new_columns_if_needed(db)
-            
-            # Albums table
-            if not db["albums"].exists():
-                db["albums"].create({
-                    "id": int,
-                    "name": str,
-                    "description": str,
-                    "created_date": str,
-                    "cover_photo_id": int,
-                    "photo_count": int
-                }, pk="id")
-                
-                db["albums"].create_index(["name"], unique=True)
-            
-            # Album photos junction table
-            if not db["album_photos"].exists():
-                db["album_photos"].create({
-                    "album_id": int,
-                    "photo_id": int,
-                    "added_date": str
-                }, pk=["album_id", "photo_id"])
-                
-                db["album_photos"].add_foreign_key("album_id", "albums", "id")
-                db["album_photos"].add_foreign_key("photo_id", "photos", "id")
-            
-            # Tags table
-            if not db["tags"].exists():
-                db["tags"].create({
-                    "id": int,
-                    "name": str,
-                    "color": str,
-                    "usage_count": int
-                }, pk="id")
-                
-                db["tags"].create_index(["name"], unique=True)
-            
-            # Settings table
-            if not db["settings"].exists():
-                db["settings"].create({
-                    "key": str,
-                    "value": str,
-                    "updated_date": str
-                }, pk="key")
-            
-            self.logger.info(f"Database initialized successfully: {str(self.db_path)}")
+            with self.write_connection() as conn:
+                db = sqlite_utils.Database(conn)
+            
+                # Photos table
+                if not db["photos"].exists():
+                    db["photos"].create({
+                        "id": int,
+                        "filename": str,
+                        "filepath": str,
+                        "file_size": int,
+                        "file_hash": str,
+                        "width": int,
+                        "height": int,
+                        "format": str,
+                        "date_taken": str,
+                        "date_added": str,
+                        "date_modified": str,
+                        "exif_data": str,  # JSON string
+                        "ai_metadata": str,  # JSON string - AI元数据
+                        "is_ai_generated": bool,  # 是否为AI生成
+                        "tags": str,       # JSON array
+                        "simple_tags": str,    # JSON array - 简单标签
+                        "normal_tags": str,    # JSON array - 普通标签
+                        "detailed_tags": str,  # JSON array - 详细标签
+                        "tag_translations": str,  # JSON object - 标签翻译
+                        "rating": int,
+                        "is_favorite": bool,
+                        "thumbnail_path": str,
+                        "notes": str,
+                        # 新的分离式标签字段
+                        "simple_tags_en": str,    # 简单标签(英文)
+                        "simple_tags_cn": str,    # 简单标签(中文)
+                        "general_tags_en": str,   # 普通标签(英文)
+                        "general_tags_cn": str,   # 普通标签(中文)
+                        "detailed_tags_en": str,  # 详细标签(英文)
+                        "detailed_tags_cn": str,  # 详细标签(中文)
+                        "positive_prompt": str,   # 正向提示词
+                        "negative_prompt": str,   # 负向提示词
+                        "unified_tags": str,      # 统一标签字段(JSON)
+                        # 文件指纹（增量导入时跳过未变化文件的哈希计算）
+                        "file_mtime_ns": int,
+                        "file_inode": int
+                    }, pk="id")
+                
+                    # Create indexes for performance optimization
+                    db["photos"].create_index(["filepath"], unique=True)
+                    db["photos"].create_index(["file_hash"])
+                    db["photos"].create_index(["date_taken"])
+                    db["photos"].create_index(["rating"])
+                    db["photos"].create_index(["is_favorite"])
+                    # Additional performance indexes
+                    db["photos"].create_index(["filename"])
+                    db["photos"].create_index(["file_size"])
+                    db["photos"].create_index(["date_taken", "rating"])  # Composite index for sorting
+                    db["photos"].create_index(["is_favorite", "rating"])  # For favorite photos sorting
+                else:
+                    # 检查是否需要添加新字段
+                    self._add_new_columns_if_needed(db)
+            
+                # Albums table
+                if not db["albums"].exists():
+                    db["albums"].create({
+                        "id": int,
+                        "name": str,
+                        "description": str,
+                        "created_date": str,
+                        "cover_photo_id": int,
+                        "photo_count": int
+                    }, pk="id")
+                
+                    db["albums"].create_index(["name"], unique=True)
+            
+                # Album photos junction table
+                if not db["album_photos"].exists():
+                    db["album_photos"].create({
+                        "album_id": int,
+                        "photo_id": int,
+                        "added_date": str
+                    }, pk=["album_id", "photo_id"])
+                
+                    db["album_photos"].add_foreign_key("album_id", "albums", "id")
+                    db["album_photos"].add_foreign_key("photo_id", "photos", "id")
+            
+                # Tags table
+                if not db["tags"].exists():
+                    db["tags"].create({
+                        "id": int,
+                        "name": str,
+                        "color": str,
+                        "usage_count": int
+                    }, pk="id")
+                
+                    db["tags"].create_index(["name"], unique=True)
+            
+                # Settings table
+                if not db["settings"].exists():
+                    db["settings"].create({
+                        "key": str,
+                        "value": str,
+                        "updated_date": str
+                    }, pk="key")
+            
+                # 后台缩略图生成队列（重启后继续处理）
+                if not db["thumbnail_queue"].exists():
+                    db["thumbnail_queue"].create({
+                        "photo_id": int,
+                        "priority": int,
+                        "queued_date": str
+                    }, pk="photo_id")
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS photos_thumbnail_queue_ad AFTER DELETE ON photos BEGIN
+                        DELETE FROM thumbnail_queue WHERE photo_id = old.id;
+                    END
+                """)
+            
+                # 文件指纹索引（识别移动/重命名的文件）
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_photos_file_inode ON photos(file_inode)")
+            
+                # 搜索结果默认排序索引（keyset分页按此顺序反向扫描）
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_photos_search_order
+                    ON photos(COALESCE(date_taken, ''), COALESCE(date_added, ''), id)
+                """)
+            
+                # Normalized tag index
+                self._init_tag_index(conn)
+            
+                # Full-text search index
+                self._init_fts_index(conn)
+            
+                self.logger.info(f"Database initialized successfully: {str(self.db_path)}")
             
         except Exception as e:
             self.logger.error(f"Failed to initialize database: {str(e)}")
             raise
     
+    def _init_tag_index(self, conn):
+        """Create the normalized tags/photo_tags schema and migrate existing photos."""
+        try:
+            # 旧的tags表只有name唯一索引，补充语言/分类字段
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(tags)").fetchall()]
+            if "language" not in columns:
+                conn.execute("ALTER TABLE tags ADD COLUMN language TEXT DEFAULT ''")
+            if "category" not in columns:
+                conn.execute("ALTER TABLE tags ADD COLUMN category TEXT DEFAULT ''")
+            
+            for index in conn.execute("PRAGMA index_list(tags)").fetchall():
+                index_name, is_unique = index[1], index[2]
+                if not is_unique or index_name.startswith("sqlite_autoindex"):
+                    continue
+                index_columns = [row[2] for row in conn.execute(f"PRAGMA index_info({index_name})").fetchall()]
+                if index_columns == ["name"]:
+                    conn.execute(f"DROP INDEX {index_name}")
+            
+            conn.executescript("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_tags_name_language_category
+                    ON tags(name COLLATE NOCASE, language, category);
+                CREATE INDEX IF NOT EXISTS idx_tags_usage_count ON tags(usage_count);
+                
+                CREATE TABLE IF NOT EXISTS photo_tags (
+                    photo_id INTEGER NOT NULL,
+                    tag_id INTEGER NOT NULL,
+                    PRIMARY KEY (photo_id, tag_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_photo_tags_tag_id ON photo_tags(tag_id, photo_id);
+                
+                CREATE TRIGGER IF NOT EXISTS photo_tags_ai AFTER INSERT ON photo_tags BEGIN
+                    UPDATE tags SET usage_count = COALESCE(usage_count, 0) + 1 WHERE id = new.tag_id;
+                END;
+                CREATE TRIGGER IF NOT EXISTS photo_tags_ad AFTER DELETE ON photo_tags BEGIN
+                    UPDATE tags SET usage_count = MAX(COALESCE(usage_count, 0) - 1, 0) WHERE id = old.tag_id;
+                END;
+                CREATE TRIGGER IF NOT EXISTS photos_tags_cleanup_ad AFTER DELETE ON photos BEGIN
+                    DELETE FROM photo_tags WHERE photo_id = old.id;
+                END;
+            """)
+            
+            # 一次性迁移：从JSON/逗号文本字段建立photo_tags
+            row = conn.execute("SELECT value FROM settings WHERE key = 'tag_index_version'").fetchone()
+            if not row or row[0] != self.TAG_INDEX_VERSION:
+                start_time = time.time()
+                source_columns = ", ".join(self.TAG_SOURCE_FIELDS)
+                photo_count = 0
+                for photo in conn.execute(f"SELECT id, {source_columns} FROM photos").fetchall():
+                    self._sync_photo_tags(conn, photo["id"], photo)
+                    photo_count += 1
+                conn.execute("""
+                    INSERT OR REPLACE INTO settings (key, value, updated_date) VALUES ('tag_index_version', ?, ?)
+                """, (self.TAG_INDEX_VERSION, datetime.now().isoformat()))
+                self.logger.info("Tag index migrated: photos=%d, time=%.2fs", photo_count, time.time() - start_time)
+            
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to initialize tag index: {str(e)}")
+            raise
+    
+    def _extract_photo_tags(self, photo_data) -> set:
+        """Collect (name, language, category) tuples from a photo's tag fields."""
+        result = set()
+        keys = photo_data.keys()
+        for field_name, (category, language) in self.TAG_SOURCE_FIELDS.items():
+            if field_name not in keys:
+                continue
+            raw_value = photo_data[field_name]
+            if not raw_value:
+                continue
+            
+            if isinstance(raw_value, list):
+                names = raw_value
+            else:
+                raw_value = str(raw_value).strip()
+                names = None
+                if raw_value.startswith("["):
+                    try:
+                        names = json.loads(raw_value)
+                    except json.JSONDecodeError:
+                        names = None
+                if not isinstance(names, list):
+                    names = self.TAG_SEPARATORS.split(raw_value)
+            
+            for name in names:
+                name = str(name).strip()
+                # 过长的片段是描述性文本而不是标签
+                if not name or len(name) > self.MAX_TAG_LENGTH:
+                    continue
+                tag_language = language or ("zh" if re.search(r"[\u4e00-\u9fff]", name) else "en")
+                result.add((name, tag_language, category))
+        return result
+    
+    def _sync_photo_tags(self, conn, photo_id: int, photo_data=None):
+        """Bring photo_tags for one photo in line with its tag fields."""
+        if photo_data is None:
+            source_columns = ", ".join(self.TAG_SOURCE_FIELDS)
+            photo_data = conn.execute(f"SELECT {source_columns} FROM photos WHERE id = ?", (photo_id,)).fetchone()
+            if photo_data is None:
+                return
+        
+        wanted_ids = set()
+        for name, language, category in self._extract_photo_tags(photo_data):
+            conn.execute("""
+                INSERT OR IGNORE INTO tags (name, color, usage_count, language, category)
+                VALUES (?, '', 0, ?, ?)
+            """, (name, language, category))
+            tag_row = conn.execute("""
+                SELECT id FROM tags WHERE name = ? COLLATE NOCASE AND language = ? AND category = ?
+            """, (name, language, category)).fetchone()
+            if tag_row:
+                wanted_ids.add(tag_row[0])
+        
+        current_ids = {row[0] for row in conn.execute(
+            "SELECT tag_id FROM photo_tags WHERE photo_id = ?", (photo_id,)
+        ).fetchall()}
+        
+        removed = current_ids - wanted_ids
+        added = wanted_ids - current_ids
+        if removed:
+            conn.executemany("DELETE FROM photo_tags WHERE photo_id = ? AND tag_id = ?",
+                             [(photo_id, tag_id) for tag_id in removed])
+        if added:
+            conn.executemany("INSERT OR IGNORE INTO photo_tags (photo_id, tag_id) VALUES (?, ?)",
+                             [(photo_id, tag_id) for tag_id in added])
+    
+    def get_photo_ids_by_tags(self, tag_names: List[str], match_all: bool = False,
+                              language: str = None, category: str = None) -> List[int]:
+        """Find photo IDs carrying the given tags via the photo_tags index."""
+        try:
+            names = [name.strip() for name in tag_names if name and name.strip()]
+            if not names:
+                return []
+            
+            placeholders = ",".join(["?"] * len(names))
+            conditions = [f"t.name COLLATE NOCASE IN ({placeholders})"]
+            params = list(names)
+            if language:
+                conditions.append("t.language = ?")
+                params.append(language)
+            if category:
+                conditions.append("t.category = ?")
+                params.append(category)
+            
+            sql = f"""
+                SELECT pt.photo_id FROM photo_tags pt
+                JOIN tags t ON t.id = pt.tag_id
+                WHERE {' AND '.join(conditions)}
+                GROUP BY pt.photo_id
+            """
+            if match_all:
+                sql += " HAVING COUNT(DISTINCT t.name COLLATE NOCASE) = ?"
+                params.append(len({name.lower() for name in names}))
+            
+            with self.read_connection() as conn:
+                return [row[0] for row in conn.execute(sql, params).fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Failed to get photos by tags: {str(e)}")
+            return []
+    
+    def get_photo_tag_list(self, photo_id: int) -> List[Dict[str, Any]]:
+        """Get the normalized tags attached to a photo."""
+        try:
+            with self.read_connection() as conn:
+                cursor = conn.execute("""
+                    SELECT t.id, t.name, t.language, t.category, t.usage_count
+                    FROM photo_tags pt JOIN tags t ON t.id = pt.tag_id
+                    WHERE pt.photo_id = ?
+                    ORDER BY t.category, t.language, t.name
+                """, (photo_id,))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error(f"Failed to get tags for photo {photo_id}: {str(e)}")
+            return []
+    
+    def _init_fts_index(self, conn):
+        """Create the FTS5 index over photo text fields and its sync triggers."""
+        table = self.FTS_TABLE
+        columns = ", ".join(self.FTS_COLUMNS)
+        new_values = ", ".join(f"new.{c}" for c in self.FTS_COLUMNS)
+        old_values = ", ".join(f"old.{c}" for c in self.FTS_COLUMNS)
+        
+        try:
+            existed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone() is not None
+            
+            if existed:
+                sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = ?", (table,)
+                ).fetchone()[0] or ""
+                self.fts_tokenizer = "trigram" if "trigram" in sql else "unicode61"
+            else:
+                # trigram分词器（SQLite 3.34+）可匹配中文子串；不可用时退回unicode61
+                for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+                    try:
+                        conn.execute(f"""
+                            CREATE VIRTUAL TABLE {table} USING fts5(
+                                {columns},
+                                content='photos', content_rowid='id',
+                                tokenize='{tokenizer}'
+                            )
+                        """)
+                        self.fts_tokenizer = tokenizer.split()[0]
+                        break
+                    except sqlite3.OperationalError as e:
+                        self.logger.warning("FTS5 tokenizer unavailable: tokenizer=%s, error=%s", tokenizer, str(e))
+                else:
+                    self.logger.warning("FTS5 not available, search falls back to LIKE scans")
+                    return
+            
+            conn.executescript(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON photos BEGIN
+                    INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON photos BEGIN
+                    INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {columns} ON photos BEGIN
+                    INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                    INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values});
+                END;
+            """)
+            
+            if not existed:
+                # 一次性为已有照片建立索引
+                conn.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+                self.logger.info("FTS index built: tokenizer=%s", self.fts_tokenizer)
+            
+            self.fts_enabled = True
+            
+        except sqlite3.Error as e:
+            self.fts_enabled = False
+            self.logger.error(f"Failed to initialize FTS index: {str(e)}")
+    
+    def rebuild_search_index(self) -> bool:
+        """Rebuild the full-text search index from the photos table."""
+        if not self.fts_enabled:
+            return False
+        try:
+            with self.write_connection() as conn:
+                conn.execute(f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}) VALUES ('rebuild')")
+                conn.execute(f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}) VALUES ('optimize')")
+            self.logger.info("FTS index rebuilt")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to rebuild FTS index: {str(e)}")
+            return False
+    
+    def _fts_min_term_length(self) -> int:
+        """Shortest term the FTS tokenizer can match (trigram needs 3 chars)."""
+        return 3 if self.fts_tokenizer == "trigram" else 1
+    
+    @staticmethod
+    def _fts_phrase(term: str, columns: Tuple[str, ...] = None) -> str:
+        """Quote a term as an FTS5 phrase, optionally restricted to columns."""
+        phrase = '"' + term.replace('"', '""') + '"'
+        if columns:
+            return "{" + " ".join(columns) + "}: " + phrase
+        return phrase
+    
     def _add_new_columns_if_needed(self, db):
         """Add new columns to existing photos table if they don't exist."""
         try:
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 
                 # 检查新字段是否存在
@@ -489,7 +825,10 @@ class DatabaseManager:
                     ("detailed_tags_cn", "TEXT DEFAULT ''"),
                     ("positive_prompt", "TEXT DEFAULT ''"),
                     ("negative_prompt", "TEXT DEFAULT ''"),
-                    ("unified_tags", "TEXT DEFAULT ''")
+                    ("unified_tags", "TEXT DEFAULT ''"),
+                    # 文件指纹
+                    ("file_mtime_ns", "INTEGER"),
+                    ("file_inode", "INTEGER")
                 ]
                 
                 for column_name, column_def in new_columns:
@@ -497,69 +836,91 @@ class DatabaseManager:
                         cursor.execute(f"ALTER TABLE photos ADD COLUMN {column_name} {column_def}")
                         self.logger.info(f"Added new column to photos table: {column_name}")
                 
-                conn.commit()
-                
         except Exception as e:
             self.logger.error(f"Failed to add new columns: {str(e)}")
             raise
     
     @contextmanager
     def get_connection(self):
-        """Get database connection with context manager."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+        """Get database connection with context manager.
+        
+        Kept for legacy read callers; hands out a pooled reader so they do
+        not queue behind writes. Writes go through write_connection().
+        """
+        with self._pool.read() as conn:
+            yield conn
+    
+    @contextmanager
+    def read_connection(self):
+        """Get a pooled reader connection (does not block behind writes)."""
+        with self._pool.read() as conn:
             yield conn
-        finally:
-            conn.close()
+    
+    @contextmanager
+    def write_connection(self):
+        """Get the pooled writer connection; commits when the block exits."""
+        with self._pool.write() as conn:
+            yield conn
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics."""
+        return self._pool.get_stats()
+    
+    def close(self):
+        """Close all pooled database connections."""
+        self._pool.close()
     
     def add_photo(self, photo_data: Dict[str, Any]) -> int:
         """Add a new photo to the database."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
-            # Prepare photo data
-            photo_record = {
-                "filename": photo_data["filename"],
-                "filepath": photo_data["filepath"],
-                "file_size": photo_data.get("file_size", 0),
-                "file_hash": photo_data.get("file_hash", ""),
-                "width": photo_data.get("width", 0),
-                "height": photo_data.get("height", 0),
-                "format": photo_data.get("format", ""),
-                "date_taken": photo_data.get("date_taken", ""),
-                "date_added": datetime.now().isoformat(),
-                "date_modified": datetime.now().isoformat(),
-                "exif_data": safe_json_dumps(photo_data.get("exif_data", {})),
-                "tags": safe_json_dumps(photo_data.get("tags", [])),
-                "simple_tags": safe_json_dumps(photo_data.get("simple_tags", [])),
-                "normal_tags": safe_json_dumps(photo_data.get("normal_tags", [])),
-                "detailed_tags": safe_json_dumps(photo_data.get("detailed_tags", [])),
-                "tag_translations": safe_json_dumps(photo_data.get("tag_translations", {})),
-                "ai_metadata": safe_json_dumps(photo_data.get("ai_metadata", {})),
-                "is_ai_generated": photo_data.get("is_ai_generated", False),
-                "rating": photo_data.get("rating", 0),
-                "is_favorite": photo_data.get("is_favorite", False),
-                "thumbnail_path": photo_data.get("thumbnail_path", ""),
-                "notes": photo_data.get("notes", ""),
-                # 新的分离式标签字段
-                "simple_tags_en": photo_data.get("simple_tags_en", ""),
-                "simple_tags_cn": photo_data.get("simple_tags_cn", ""),
-                "general_tags_en": photo_data.get("general_tags_en", ""),
-                "general_tags_cn": photo_data.get("general_tags_cn", ""),
-                "detailed_tags_en": photo_data.get("detailed_tags_en", ""),
-                "detailed_tags_cn": photo_data.get("detailed_tags_cn", ""),
-                "positive_prompt": photo_data.get("positive_prompt", ""),
-                "negative_prompt": photo_data.get("negative_prompt", ""),
-                "unified_tags": photo_data.get("unified_tags", "")
-            }
+            with self.write_connection() as conn:
+                db = sqlite_utils.Database(conn)
+            
+                # Prepare photo data
+                photo_record = {
+                    "filename": photo_data["filename"],
+                    "filepath": photo_data["filepath"],
+                    "file_size": photo_data.get("file_size", 0),
+                    "file_hash": photo_data.get("file_hash", ""),
+                    "width": photo_data.get("width", 0),
+                    "height": photo_data.get("height", 0),
+                    "format": photo_data.get("format", ""),
+                    "date_taken": photo_data.get("date_taken", ""),
+                    "date_added": datetime.now().isoformat(),
+                    "date_modified": datetime.now().isoformat(),
+                    "exif_data": safe_json_dumps(photo_data.get("exif_data", {})),
+                    "tags": safe_json_dumps(photo_data.get("tags", [])),
+                    "simple_tags": safe_json_dumps(photo_data.get("simple_tags", [])),
+                    "normal_tags": safe_json_dumps(photo_data.get("normal_tags", [])),
+                    "detailed_tags": safe_json_dumps(photo_data.get("detailed_tags", [])),
+                    "tag_translations": safe_json_dumps(photo_data.get("tag_translations", {})),
+                    "ai_metadata": safe_json_dumps(photo_data.get("ai_metadata", {})),
+                    "is_ai_generated": photo_data.get("is_ai_generated", False),
+                    "rating": photo_data.get("rating", 0),
+                    "is_favorite": photo_data.get("is_favorite", False),
+                    "thumbnail_path": photo_data.get("thumbnail_path", ""),
+                    "notes": photo_data.get("notes", ""),
+                    # 新的分离式标签字段
+                    "simple_tags_en": photo_data.get("simple_tags_en", ""),
+                    "simple_tags_cn": photo_data.get("simple_tags_cn", ""),
+                    "general_tags_en": photo_data.get("general_tags_en", ""),
+                    "general_tags_cn": photo_data.get("general_tags_cn", ""),
+                    "detailed_tags_en": photo_data.get("detailed_tags_en", ""),
+                    "detailed_tags_cn": photo_data.get("detailed_tags_cn", ""),
+                    "positive_prompt": photo_data.get("positive_prompt", ""),
+                    "negative_prompt": photo_data.get("negative_prompt", ""),
+                    "unified_tags": photo_data.get("unified_tags", ""),
+                    "file_mtime_ns": photo_data.get("file_mtime_ns"),
+                    "file_inode": photo_data.get("file_inode")
+                }
             
-            result = db["photos"].insert(photo_record)
-            photo_id = result.last_pk
+                result = db["photos"].insert(photo_record)
+                photo_id = result.last_pk
+                self._sync_photo_tags(conn, photo_id, photo_record)
             
-            self.logger.info(f"Photo added to database: ID {photo_id}, filename {photo_data['filename']}")
+                self.logger.info(f"Photo added to database: ID {photo_id}, filename {photo_data['filename']}")
             
-            return photo_id
+                return photo_id
             
         except Exception as e:
             self.logger.error(f"Failed to add photo {photo_data.get('filename', 'unknown')}: {str(e)}")
@@ -568,82 +929,248 @@ class DatabaseManager:
     def get_photo(self, photo_id: int) -> Optional[Dict[str, Any]]:
         """Get photo by ID."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            photo = db["photos"].get(photo_id)
+            with self.read_connection() as conn:
+                db = sqlite_utils.Database(conn)
+                photo = db["photos"].get(photo_id)
             
-            if photo:
-                # Parse JSON fields
-                photo_dict = dict(photo)
-                photo_dict["exif_data"] = json.loads(photo_dict["exif_data"])
-                photo_dict["tags"] = json.loads(photo_dict["tags"])
+                if photo:
+                    # Parse JSON fields
+                    photo_dict = dict(photo)
+                    photo_dict["exif_data"] = json.loads(photo_dict["exif_data"])
+                    photo_dict["tags"] = json.loads(photo_dict["tags"])
                 
-                # 使用统一标签系统读取标签数据
-                try:
-                    unified_tags = UnifiedTagsAccessor.read_unified_tags(photo_dict)
+                    # 使用统一标签系统读取标签数据
+                    try:
+                        unified_tags = UnifiedTagsAccessor.read_unified_tags(photo_dict)
                     
-                    # 为向后兼容，保持原有字段格式
-                    photo_dict["unified_tags_data"] = unified_tags
+                        # 为向后兼容，保持原有字段格式
+                        photo_dict["unified_tags_data"] = unified_tags
                     
-                    # 同时保持分离字段的访问方式（从统一数据中提取）
-                    photo_dict["simple_tags_en"] = unified_tags.get("simple", {}).get("en", "")
-                    photo_dict["simple_tags_cn"] = unified_tags.get("simple", {}).get("zh", "")
-                    photo_dict["general_tags_en"] = unified_tags.get("normal", {}).get("en", "")
-                    photo_dict["general_tags_cn"] = unified_tags.get("normal", {}).get("zh", "")
-                    photo_dict["detailed_tags_en"] = unified_tags.get("detailed", {}).get("en", "")
-                    photo_dict["detailed_tags_cn"] = unified_tags.get("detailed", {}).get("zh", "")
+                        # 同时保持分离字段的访问方式（从统一数据中提取）
+                        photo_dict["simple_tags_en"] = unified_tags.get("simple", {}).get("en", "")
+                        photo_dict["simple_tags_cn"] = unified_tags.get("simple", {}).get("zh", "")
+                        photo_dict["general_tags_en"] = unified_tags.get("normal", {}).get("en", "")
+                        photo_dict["general_tags_cn"] = unified_tags.get("normal", {}).get("zh", "")
+                        photo_dict["detailed_tags_en"] = unified_tags.get("detailed", {}).get("en", "")
+                        photo_dict["detailed_tags_cn"] = unified_tags.get("detailed", {}).get("zh", "")
                     
-                except Exception as e:
-                    self.logger.error(f"Failed to read unified tags for photo {photo_dict.get('id')}: {str(e)}")
-                    # 降级到传统解析方式
-                    unified_tags = UnifiedTagsAccessor._get_empty_structure()
-                    photo_dict["unified_tags_data"] = unified_tags
+                    except Exception as e:
+                        self.logger.error(f"Failed to read unified tags for photo {photo_dict.get('id')}: {str(e)}")
+                        # 降级到传统解析方式
+                        unified_tags = UnifiedTagsAccessor._get_empty_structure()
+                        photo_dict["unified_tags_data"] = unified_tags
                 
-                # 解析传统标签字段 - 保持向后兼容
-                try:
-                    simple_tags_raw = photo_dict.get("simple_tags", "[]")
-                    photo_dict["simple_tags"] = json.loads(simple_tags_raw) if simple_tags_raw.strip() else []
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["simple_tags"] = []
+                    # 解析传统标签字段 - 保持向后兼容
+                    try:
+                        simple_tags_raw = photo_dict.get("simple_tags", "[]")
+                        photo_dict["simple_tags"] = json.loads(simple_tags_raw) if simple_tags_raw.strip() else []
+                    except (json.JSONDecodeError, AttributeError):
+                        photo_dict["simple_tags"] = []
                 
-                try:
-                    normal_tags_raw = photo_dict.get("normal_tags", "[]")
-                    photo_dict["normal_tags"] = json.loads(normal_tags_raw) if normal_tags_raw.strip() else []
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["normal_tags"] = []
+                    try:
+                        normal_tags_raw = photo_dict.get("normal_tags", "[]")
+                        photo_dict["normal_tags"] = json.loads(normal_tags_raw) if normal_tags_raw.strip() else []
+                    except (json.JSONDecodeError, AttributeError):
+                        photo_dict["normal_tags"] = []
                 
-                try:
-                    detailed_tags_raw = photo_dict.get("detailed_tags", "[]")
-                    photo_dict["detailed_tags"] = json.loads(detailed_tags_raw) if detailed_tags_raw.strip() else []
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["detailed_tags"] = []
+                    try:
+                        detailed_tags_raw = photo_dict.get("detailed_tags", "[]")
+                        photo_dict["detailed_tags"] = json.loads(detailed_tags_raw) if detailed_tags_raw.strip() else []
+                    except (json.JSONDecodeError, AttributeError):
+                        photo_dict["detailed_tags"] = []
                 
-                try:
-                    tag_translations_raw = photo_dict.get("tag_translations", "{}")
-                    photo_dict["tag_translations"] = json.loads(tag_translations_raw) if tag_translations_raw.strip() else {}
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["tag_translations"] = {}
-                
-                # 解析AI元数据字段
-                ai_metadata_str = photo_dict.get("ai_metadata")
-                if ai_metadata_str and ai_metadata_str.strip():
                     try:
-                        photo_dict["ai_metadata"] = json.loads(ai_metadata_str)
-                    except (json.JSONDecodeError, TypeError):
-                        self.logger.warning("Failed to parse AI metadata JSON: photo_id=%s", photo_id, 
-                                          ai_metadata_str=ai_metadata_str)
+                        tag_translations_raw = photo_dict.get("tag_translations", "{}")
+                        photo_dict["tag_translations"] = json.loads(tag_translations_raw) if tag_translations_raw.strip() else {}
+                    except (json.JSONDecodeError, AttributeError):
+                        photo_dict["tag_translations"] = {}
+                
+                    # 解析AI元数据字段
+                    ai_metadata_str = photo_dict.get("ai_metadata")
+                    if ai_metadata_str and ai_metadata_str.strip():
+                        try:
+                            photo_dict["ai_metadata"] = json.loads(ai_metadata_str)
+                        except (json.JSONDecodeError, TypeError):
+                            self.logger.warning("Failed to parse AI metadata JSON: photo_id=%s", photo_id, 
+                                              ai_metadata_str=ai_metadata_str)
+                            photo_dict["ai_metadata"] = {}
+                    else:
                         photo_dict["ai_metadata"] = {}
-                else:
-                    photo_dict["ai_metadata"] = {}
-                photo_dict["is_ai_generated"] = bool(photo_dict.get("is_ai_generated", False))
+                    photo_dict["is_ai_generated"] = bool(photo_dict.get("is_ai_generated", False))
                 
-                return photo_dict
+                    return photo_dict
             
-            return None
+                return None
             
         except Exception as e:
             self.logger.error(f"Failed to get photo {photo_id}: {str(e)}")
             return None
     
+    # 搜索结果排序键（全部降序，用于keyset分页的行值比较）
+    SEARCH_SORT_KEYS = (
+        "COALESCE(p.date_taken, '')",
+        "COALESCE(p.date_added, '')",
+        "p.id",
+    )
+    # BM25分值越小越相关；取负后降序排列，仅LIKE命中的结果排在最后
+    SEARCH_RANK_KEY = "COALESCE(-f.fts_rank, -1e300)"
+    SEARCH_COUNT_ESTIMATE_CAP = 10000
+    
+    def _build_search_query(self,
+                            query: str = "",
+                            search_terms: List[str] = None,
+                            tags: List[str] = None,
+                            rating_min: int = 0,
+                            favorites_only: bool = False,
+                            min_width: int = 0,
+                            min_height: int = 0,
+                            min_size_kb: int = 0,
+                            camera_filter: str = "",
+                            date_from: str = "",
+                            date_to: str = "",
+                            album_ids: List[int] = None,
+                            use_fts: bool = True,
+                            exact_tags: List[str] = None) -> Tuple[str, List[str], List[Any], Tuple[str, ...]]:
+        """Build the FROM/JOIN clause, WHERE conditions and sort keys for a search.
+        
+        Returns (from_sql, where_clauses, params, sort_keys); all sort keys
+        are ordered descending.
+        """
+        # 记录搜索参数用于调试
+        self.logger.info(f"Search parameters: query='{query}', search_terms={search_terms}, tags={tags}, rating_min={rating_min}, favorites_only={favorites_only}, min_width={min_width}, min_height={min_height}, min_size_kb={min_size_kb}, camera_filter='{camera_filter}', date_from='{date_from}', date_to='{date_to}', album_ids={album_ids}")
+        
+        sql_conditions = []
+        params = []
+        
+        # 文本搜索：足够长的词走FTS5全文索引，其余（或FTS不可用时）退回LIKE扫描
+        text_conditions = []
+        text_params = []
+        fts_phrases = []
+        fts_min_length = self._fts_min_term_length()
+        
+        def add_text_term(term: str, columns: Tuple[str, ...]):
+            term = term.strip()
+            if not term:
+                return
+            if use_fts and self.fts_enabled and len(term) >= fts_min_length:
+                fts_phrases.append(self._fts_phrase(term, None if columns == self.FTS_COLUMNS else columns))
+            else:
+                text_conditions.append("(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")")
+                text_params.extend([f"%{term}%"] * len(columns))
+        
+        # 基础文本搜索（文件名、备注、统一标签、AI元数据、分离式标签字段）
+        if query:
+            add_text_term(query, self.FTS_COLUMNS)
+        
+        # 智能关键词搜索（支持短句和单词，优化中文搜索）
+        for term in search_terms or []:
+            add_text_term(term, self.FTS_TERM_COLUMNS)
+        
+        # 标签筛选
+        for tag in tags or []:
+            add_text_term(tag, self.FTS_TAG_COLUMNS)
+        
+        # 评分筛选
+        if rating_min > 0:
+            sql_conditions.append("rating >= ?")
+            params.append(rating_min)
+        
+        # 收藏筛选
+        if favorites_only:
+            sql_conditions.append("is_favorite = 1")
+        
+        # 尺寸筛选
+        if min_width > 0:
+            sql_conditions.append("width >= ?")
+            params.append(min_width)
+        
+        if min_height > 0:
+            sql_conditions.append("height >= ?")
+            params.append(min_height)
+        
+        # 文件大小筛选（转换为字节）
+        if min_size_kb > 0:
+            min_size_bytes = min_size_kb * 1024
+            sql_conditions.append("file_size >= ?")
+            params.append(min_size_bytes)
+        
+        # 相机信息筛选
+        if camera_filter:
+            sql_conditions.append("exif_data LIKE ?")
+            params.append(f"%{camera_filter}%")
+        
+        # 日期范围筛选
+        if date_from:
+            sql_conditions.append("date_taken >= ?")
+            params.append(date_from)
+        
+        if date_to:
+            sql_conditions.append("date_taken <= ?")
+            params.append(date_to)
+        
+        # 相册筛选
+        if album_ids:
+            # 构建相册筛选的SQL条件
+            album_placeholders = ",".join(["?" for _ in album_ids])
+            sql_conditions.append(f"""
+                id IN (
+                    SELECT DISTINCT photo_id 
+                    FROM album_photos 
+                    WHERE album_id IN ({album_placeholders})
+                )
+            """)
+            params.extend(album_ids)
+        
+        # 精确标签筛选（规范化标签表索引连接）
+        if exact_tags:
+            for tag_name in exact_tags:
+                sql_conditions.append("""
+                    id IN (
+                        SELECT pt.photo_id FROM photo_tags pt
+                        JOIN tags t ON t.id = pt.tag_id
+                        WHERE t.name = ? COLLATE NOCASE
+                    )
+                """)
+                params.append(tag_name.strip())
+        
+        # 构建SQL查询 - 文本搜索条件使用OR，其他筛选使用AND
+        from_sql = "photos p"
+        join_params = []
+        sort_keys = self.SEARCH_SORT_KEYS
+        if fts_phrases:
+            from_sql += f"""
+                LEFT JOIN (
+                    SELECT rowid AS fts_rowid, bm25({self.FTS_TABLE}) AS fts_rank
+                    FROM {self.FTS_TABLE} WHERE {self.FTS_TABLE} MATCH ?
+                ) f ON f.fts_rowid = p.id
+            """
+            join_params.append(" OR ".join(fts_phrases))
+            text_conditions.insert(0, "f.fts_rowid IS NOT NULL")
+            sort_keys = (self.SEARCH_RANK_KEY,) + sort_keys
+        
+        where_clauses = []
+        if text_conditions:
+            where_clauses.append(f"({' OR '.join(text_conditions)})")
+        if sql_conditions:
+            where_clauses.append(f"({' AND '.join(sql_conditions)})")
+        
+        return from_sql, where_clauses, join_params + text_params + params, sort_keys
+    
+    def _parse_search_row(self, row, summary_only: bool = False):
+        """Convert a photos row from a search query into a record.
+        
+        Returns a PhotoSummary for projected grid queries, otherwise a Photo
+        whose JSON columns are decoded on first access.
+        """
+        if summary_only:
+            return PhotoSummary.from_row(row)
+        photo = Photo(row)
+        # 去掉keyset分页附带的排序键列
+        for key in row.keys():
+            if key.startswith("_sort_key_"):
+                photo.pop(key, None)
+        return photo
+    
     def search_photos(self, 
                      query: str = "",
                      search_terms: List[str] = None,
@@ -658,276 +1185,235 @@ class DatabaseManager:
                      date_to: str = "",
                      album_ids: List[int] = None,
                      limit: int = 100,
-                     offset: int = 0) -> List[Dict[str, Any]]:
-        """Enhanced search photos with various filters."""
+                     offset: int = 0,
+                     use_fts: bool = True,
+                     exact_tags: List[str] = None,
+                     summary_only: bool = False) -> List[Dict[str, Any]]:
+        """Enhanced search photos with various filters.
+        
+        Text terms are matched through the FTS5 index and ranked by BM25
+        when available; terms shorter than the tokenizer minimum fall back
+        to LIKE scans. exact_tags restricts results to photos carrying all
+        of the given tags, resolved through the photo_tags index.
+        
+        For scrolling through large result sets prefer search_photos_page(),
+        which pages by cursor instead of OFFSET. With summary_only the query
+        selects only the grid columns and returns PhotoSummary rows;
+        otherwise rows are lazily decoded Photo records.
+        """
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
-            # 记录搜索参数用于调试
-            self.logger.info(f"Search parameters: query='{query}', search_terms={search_terms}, tags={tags}, rating_min={rating_min}, favorites_only={favorites_only}, min_width={min_width}, min_height={min_height}, min_size_kb={min_size_kb}, camera_filter='{camera_filter}', date_from='{date_from}', date_to='{date_to}', album_ids={album_ids}")
-            
-            sql_conditions = []
-            params = []
-            
-            # 基础文本搜索（文件名、备注、统一标签、AI元数据、分离式标签字段）
-            if query:
-                # 使用更安全的搜索方式，避免JSON格式错误
-                sql_conditions.append("""
-                    (filename LIKE ? OR notes LIKE ? OR 
-                     unified_tags LIKE ? OR
-                     tag_translations LIKE ? OR
-                     ai_metadata LIKE ? OR
-                     simple_tags_en LIKE ? OR
-                     simple_tags_cn LIKE ? OR
-                     general_tags_en LIKE ? OR
-                     general_tags_cn LIKE ? OR
-                     detailed_tags_en LIKE ? OR
-                     detailed_tags_cn LIKE ?)
-                """)
-                params.extend([f"%{query}%"] * 11)
-            
-            # 智能关键词搜索（支持短句和单词，优化中文搜索）
-            if search_terms:
-                term_conditions = []
-                for term in search_terms:
-                    # 使用更安全的搜索方式，避免JSON格式错误
-                    term_conditions.append("""
-                        (filename LIKE ? OR notes LIKE ? OR 
-                         unified_tags LIKE ? OR
-                         tag_translations LIKE ? OR
-                         ai_metadata LIKE ?)
-                    """)
-                    params.extend([f"%{term}%"] * 5)
-                
-                if term_conditions:
-                    sql_conditions.append(f"({' OR '.join(term_conditions)})")
-            
-            # 标签筛选
-            if tags:
-                tag_conditions = []
-                for tag in tags:
-                    # 使用更安全的搜索方式，避免JSON格式错误
-                    tag_conditions.append("""
-                        (unified_tags LIKE ? OR
-                         tag_translations LIKE ?)
-                    """)
-                    params.extend([f"%{tag}%"] * 2)
-                
-                if tag_conditions:
-                    sql_conditions.append(f"({' OR '.join(tag_conditions)})")
-            
-            # 评分筛选
-            if rating_min > 0:
-                sql_conditions.append("rating >= ?")
-                params.append(rating_min)
-            
-            # 收藏筛选
-            if favorites_only:
-                sql_conditions.append("is_favorite = 1")
-            
-            # 尺寸筛选
-            if min_width > 0:
-                sql_conditions.append("width >= ?")
-                params.append(min_width)
-            
-            if min_height > 0:
-                sql_conditions.append("height >= ?")
-                params.append(min_height)
-            
-            # 文件大小筛选（转换为字节）
-            if min_size_kb > 0:
-                min_size_bytes = min_size_kb * 1024
-                sql_conditions.append("file_size >= ?")
-                params.append(min_size_bytes)
-            
-            # 相机信息筛选
-            if camera_filter:
-                sql_conditions.append("exif_data LIKE ?")
-                params.append(f"%{camera_filter}%")
-            
-            # 日期范围筛选
-            if date_from:
-                sql_conditions.append("date_taken >= ?")
-                params.append(date_from)
-            
-            if date_to:
-                sql_conditions.append("date_taken <= ?")
-                params.append(date_to)
-            
-            # 相册筛选
-            if album_ids:
-                # 构建相册筛选的SQL条件
-                album_placeholders = ",".join(["?" for _ in album_ids])
-                sql_conditions.append(f"""
-                    id IN (
-                        SELECT DISTINCT photo_id 
-                        FROM album_photos 
-                        WHERE album_id IN ({album_placeholders})
-                    )
-                """)
-                params.extend(album_ids)
-            
-            # 构建SQL查询 - 使用更灵活的OR逻辑
-            sql = "SELECT * FROM photos"
-            if sql_conditions:
-                # 将搜索条件分组：文本搜索使用OR，其他筛选使用AND
-                text_conditions = []
-                filter_conditions = []
-                
-                for condition in sql_conditions:
-                    if "LIKE" in condition and ("filename" in condition or "notes" in condition or "unified_tags" in condition or "tag_translations" in condition):
-                        text_conditions.append(condition)
-                    else:
-                        filter_conditions.append(condition)
-                
-                where_clauses = []
-                
-                # 文本搜索条件使用OR连接
-                if text_conditions:
-                    where_clauses.append(f"({' OR '.join(text_conditions)})")
-                
-                # 其他筛选条件使用AND连接
-                if filter_conditions:
-                    where_clauses.append(f"({' AND '.join(filter_conditions)})")
-                
-                if where_clauses:
-                    sql += " WHERE " + " AND ".join(where_clauses)
-            
-            sql += " ORDER BY date_taken DESC, date_added DESC"
-            sql += f" LIMIT {limit} OFFSET {offset}"
+            from_sql, where_clauses, params, sort_keys = self._build_search_query(
+                query=query, search_terms=search_terms, tags=tags,
+                rating_min=rating_min, favorites_only=favorites_only,
+                min_width=min_width, min_height=min_height, min_size_kb=min_size_kb,
+                camera_filter=camera_filter, date_from=date_from, date_to=date_to,
+                album_ids=album_ids, use_fts=use_fts, exact_tags=exact_tags)
+            
+            columns = PhotoSummary.select_list("p") if summary_only else "p.*"
+            sql = f"SELECT {columns} FROM {from_sql}"
+            if where_clauses:
+                sql += " WHERE " + " AND ".join(where_clauses)
+            sql += " ORDER BY " + ", ".join(f"{key} DESC" for key in sort_keys)
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [int(limit), int(offset)]
             
             # 记录SQL查询用于调试
             self.logger.info(f"SQL query: {sql}, params: {params}")
             
-            with self.get_connection() as conn:
-                cursor = conn.execute(sql, params)
-                photos = []
-                
-                for row in cursor.fetchall():
-                    photo_dict = dict(row)
-                    
-                    # 安全解析JSON字段
-                    try:
-                        photo_dict["exif_data"] = json.loads(photo_dict.get("exif_data", "{}"))
-                    except:
-                        photo_dict["exif_data"] = {}
-                    
-                    try:
-                        photo_dict["tags"] = json.loads(photo_dict.get("tags", "[]"))
-                    except:
-                        photo_dict["tags"] = []
-                    
-                    # 解析新的标签字段
-                    try:
-                        photo_dict["simple_tags"] = json.loads(photo_dict.get("simple_tags", "[]"))
-                    except:
-                        photo_dict["simple_tags"] = []
-                    
-                    try:
-                        photo_dict["normal_tags"] = json.loads(photo_dict.get("normal_tags", "[]"))
-                    except:
-                        photo_dict["normal_tags"] = []
-                    
-                    try:
-                        photo_dict["detailed_tags"] = json.loads(photo_dict.get("detailed_tags", "[]"))
-                    except:
-                        photo_dict["detailed_tags"] = []
-                    
-                    try:
-                        photo_dict["tag_translations"] = json.loads(photo_dict.get("tag_translations", "{}"))
-                    except:
-                        photo_dict["tag_translations"] = {}
-                    
-                    # 解析AI元数据字段
-                    try:
-                        photo_dict["ai_metadata"] = json.loads(photo_dict.get("ai_metadata", "{}"))
-                    except:
-                        photo_dict["ai_metadata"] = {}
-                    
-                    try:
-                        photo_dict["is_ai_generated"] = bool(photo_dict.get("is_ai_generated", False))
-                    except:
-                        photo_dict["is_ai_generated"] = False
-                    
-                    photos.append(photo_dict)
-                
-                self.logger.info(f"Search results: {len(photos)}")
-                return photos
+            with self.read_connection() as conn:
+                photos = [self._parse_search_row(row, summary_only) for row in conn.execute(sql, params)]
+            
+            self.logger.info(f"Search results: {len(photos)}")
+            return photos
                 
         except Exception as e:
             self.logger.error(f"Failed to search photos: {str(e)}")
             return []
     
+    @staticmethod
+    def _search_fingerprint(filters: Dict[str, Any]) -> str:
+        """Short digest of search filters, used to tie cursors to their query."""
+        payload = json.dumps(filters, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+    
+    @staticmethod
+    def _encode_search_cursor(fingerprint: str, last_keys: List[Any]) -> str:
+        payload = json.dumps({"f": fingerprint, "k": list(last_keys)}, ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def _decode_search_cursor(cursor: str) -> Dict[str, Any]:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        if not isinstance(payload, dict) or not isinstance(payload.get("k"), list):
+            raise ValueError("malformed search cursor")
+        return payload
+    
+    def search_photos_page(self, page_size: int = 100, cursor: Optional[str] = None,
+                           summary_only: bool = False, **filters) -> Dict[str, Any]:
+        """Fetch one page of search results using keyset pagination.
+        
+        Accepts the same filters as search_photos(). Pass the returned
+        next_cursor back in to fetch the following page; it is None when
+        there are no more results. Each page costs the same regardless of
+        depth because the query seeks past the last row of the previous
+        page instead of skipping OFFSET rows.
+        
+        Returns a dict with photos, next_cursor and has_more.
+        """
+        empty_page = {"photos": [], "next_cursor": None, "has_more": False}
+        try:
+            page_size = max(1, int(page_size))
+            fingerprint = self._search_fingerprint(filters)
+            from_sql, where_clauses, params, sort_keys = self._build_search_query(**filters)
+            
+            if cursor:
+                try:
+                    state = self._decode_search_cursor(cursor)
+                except Exception as e:
+                    self.logger.error("Invalid search cursor: %s", str(e))
+                    return empty_page
+                if state.get("f") != fingerprint or len(state["k"]) != len(sort_keys):
+                    self.logger.warning("Search cursor does not match current filters, ignoring")
+                    return empty_page
+                # 行值比较：(k1, k2, ...) < (v1, v2, ...)，与降序排序一致
+                where_clauses = where_clauses + [
+                    f"({', '.join(sort_keys)}) < ({', '.join('?' for _ in sort_keys)})"
+                ]
+                params = params + list(state["k"])
+            
+            key_columns = ", ".join(f"{key} AS _sort_key_{i}" for i, key in enumerate(sort_keys))
+            columns = PhotoSummary.select_list("p") if summary_only else "p.*"
+            sql = f"SELECT {columns}, {key_columns} FROM {from_sql}"
+            if where_clauses:
+                sql += " WHERE " + " AND ".join(where_clauses)
+            sql += " ORDER BY " + ", ".join(f"{key} DESC" for key in sort_keys)
+            sql += " LIMIT ?"
+            params = params + [page_size + 1]
+            
+            with self.read_connection() as conn:
+                rows = conn.execute(sql, params).fetchall()
+            
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            photos = []
+            last_keys = None
+            for row in rows:
+                photos.append(self._parse_search_row(row, summary_only))
+            if rows:
+                last_keys = [rows[-1][f"_sort_key_{i}"] for i in range(len(sort_keys))]
+            
+            next_cursor = self._encode_search_cursor(fingerprint, last_keys) if has_more else None
+            self.logger.info("Search page: count=%d, has_more=%s", len(photos), has_more)
+            return {"photos": photos, "next_cursor": next_cursor, "has_more": has_more}
+            
+        except Exception as e:
+            self.logger.error("Failed to fetch search page: %s", str(e))
+            return empty_page
+    
+    def count_search_results(self, exact: bool = True,
+                             estimate_cap: int = None, **filters) -> Dict[str, Any]:
+        """Count the results of a search with the same filters as search_photos().
+        
+        With exact=False counting stops at estimate_cap rows, which keeps the
+        call cheap for broad queries over large libraries; the returned
+        "exact" flag is False when the cap was reached.
+        
+        Returns a dict with count and exact.
+        """
+        try:
+            from_sql, where_clauses, params, _ = self._build_search_query(**filters)
+            inner = f"SELECT 1 FROM {from_sql}"
+            if where_clauses:
+                inner += " WHERE " + " AND ".join(where_clauses)
+            
+            cap = None
+            if not exact:
+                cap = int(estimate_cap or self.SEARCH_COUNT_ESTIMATE_CAP)
+                inner += " LIMIT ?"
+                params = params + [cap]
+            
+            with self.read_connection() as conn:
+                count = conn.execute(f"SELECT COUNT(*) FROM ({inner})", params).fetchone()[0]
+            
+            return {"count": count, "exact": cap is None or count < cap}
+            
+        except Exception as e:
+            self.logger.error("Failed to count search results: %s", str(e))
+            return {"count": 0, "exact": False}
+    
     def update_photo(self, photo_id: int, updates: Dict[str, Any]) -> bool:
         """Update photo record with unified tags support."""
         try:
-            db = sqlite_utils.Database(self.db_path)
+            with self.write_connection() as conn:
+                db = sqlite_utils.Database(conn)
             
-            # Prepare updates
-            update_data = updates.copy()
-            update_data["date_modified"] = datetime.now().isoformat()
+                # Prepare updates
+                update_data = updates.copy()
+                update_data["date_modified"] = datetime.now().isoformat()
             
-            # 检查是否包含统一标签更新
-            if "unified_tags_data" in update_data:
-                try:
-                    # 处理统一标签更新 - 双写策略
-                    unified_tags = update_data.pop("unified_tags_data")
-                    dual_write_updates = UnifiedTagsAccessor.write_unified_tags(unified_tags)
-                    update_data.update(dual_write_updates)
-                    self.logger.info(f"Applied unified tags dual-write for photo {photo_id}")
-                except Exception as e:
-                    self.logger.error(f"Failed to process unified tags update for photo {photo_id}: {str(e)}")
-            
-            # Handle JSON fields
-            if "exif_data" in update_data and isinstance(update_data["exif_data"], dict):
-                update_data["exif_data"] = safe_json_dumps(update_data["exif_data"])
-            
-            if "tags" in update_data and isinstance(update_data["tags"], list):
-                update_data["tags"] = safe_json_dumps(update_data["tags"])
-            
-            # 处理新的标签字段
-            if "simple_tags" in update_data and isinstance(update_data["simple_tags"], list):
-                update_data["simple_tags"] = safe_json_dumps(update_data["simple_tags"])
-            
-            if "normal_tags" in update_data and isinstance(update_data["normal_tags"], list):
-                update_data["normal_tags"] = safe_json_dumps(update_data["normal_tags"])
-            
-            if "detailed_tags" in update_data and isinstance(update_data["detailed_tags"], list):
-                update_data["detailed_tags"] = safe_json_dumps(update_data["detailed_tags"])
-            
-            if "tag_translations" in update_data and isinstance(update_data["tag_translations"], dict):
-                update_data["tag_translations"] = safe_json_dumps(update_data["tag_translations"])
-            
-            # 处理新的分离式标签字段（英文/中文）
-            if "simple_tags_en" in update_data:
-                update_data["simple_tags_en"] = str(update_data["simple_tags_en"])
-            if "simple_tags_cn" in update_data:
-                update_data["simple_tags_cn"] = str(update_data["simple_tags_cn"])
-            if "general_tags_en" in update_data:
-                update_data["general_tags_en"] = str(update_data["general_tags_en"])
-            if "general_tags_cn" in update_data:
-                update_data["general_tags_cn"] = str(update_data["general_tags_cn"])
-            if "detailed_tags_en" in update_data:
-                update_data["detailed_tags_en"] = str(update_data["detailed_tags_en"])
-            if "detailed_tags_cn" in update_data:
-                update_data["detailed_tags_cn"] = str(update_data["detailed_tags_cn"])
-            
-            # 处理其他新字段
-            if "notes" in update_data:
-                update_data["notes"] = str(update_data["notes"])
-            if "positive_prompt" in update_data:
-                update_data["positive_prompt"] = str(update_data["positive_prompt"])
-            if "negative_prompt" in update_data:
-                update_data["negative_prompt"] = str(update_data["negative_prompt"])
-            
-            # 处理AI元数据字段
-            if "ai_metadata" in update_data and isinstance(update_data["ai_metadata"], dict):
-                update_data["ai_metadata"] = safe_json_dumps(update_data["ai_metadata"])
-            
-            db["photos"].update(photo_id, update_data)
-            
-            self.logger.info(f"Photo updated: ID {photo_id}")
-            return True
+                # 检查是否包含统一标签更新
+                if "unified_tags_data" in update_data:
+                    try:
+                        # 处理统一标签更新 - 双写策略
+                        unified_tags = update_data.pop("unified_tags_data")
+                        dual_write_updates = UnifiedTagsAccessor.write_unified_tags(unified_tags)
+                        update_data.update(dual_write_updates)
+                        self.logger.info(f"Applied unified tags dual-write for photo {photo_id}")
+                    except Exception as e:
+                        self.logger.error(f"Failed to process unified tags update for photo {photo_id}: {str(e)}")
+            
+                # Handle JSON fields
+                if "exif_data" in update_data and isinstance(update_data["exif_data"], dict):
+                    update_data["exif_data"] = safe_json_dumps(update_data["exif_data"])
+            
+                if "tags" in update_data and isinstance(update_data["tags"], list):
+                    update_data["tags"] = safe_json_dumps(update_data["tags"])
+            
+                # 处理新的标签字段
+                if "simple_tags" in update_data and isinstance(update_data["simple_tags"], list):
+                    update_data["simple_tags"] = safe_json_dumps(update_data["simple_tags"])
+            
+                if "normal_tags" in update_data and isinstance(update_data["normal_tags"], list):
+                    update_data["normal_tags"] = safe_json_dumps(update_data["normal_tags"])
+            
+                if "detailed_tags" in update_data and isinstance(update_data["detailed_tags"], list):
+                    update_data["detailed_tags"] = safe_json_dumps(update_data["detailed_tags"])
+            
+                if "tag_translations" in update_data and isinstance(update_data["tag_translations"], dict):
+                    update_data["tag_translations"] = safe_json_dumps(update_data["tag_translations"])
+            
+                # 处理新的分离式标签字段（英文/中文）
+                if "simple_tags_en" in update_data:
+                    update_data["simple_tags_en"] = str(update_data["simple_tags_en"])
+                if "simple_tags_cn" in update_data:
+                    update_data["simple_tags_cn"] = str(update_data["simple_tags_cn"])
+                if "general_tags_en" in update_data:
+                    update_data["general_tags_en"] = str(update_data["general_tags_en"])
+                if "general_tags_cn" in update_data:
+                    update_data["general_tags_cn"] = str(update_data["general_tags_cn"])
+                if "detailed_tags_en" in update_data:
+                    update_data["detailed_tags_en"] = str(update_data["detailed_tags_en"])
+                if "detailed_tags_cn" in update_data:
+                    update_data["detailed_tags_cn"] = str(update_data["detailed_tags_cn"])
+            
+                # 处理其他新字段
+                if "notes" in update_data:
+                    update_data["notes"] = str(update_data["notes"])
+                if "positive_prompt" in update_data:
+                    update_data["positive_prompt"] = str(update_data["positive_prompt"])
+                if "negative_prompt" in update_data:
+                    update_data["negative_prompt"] = str(update_data["negative_prompt"])
+            
+                # 处理AI元数据字段
+                if "ai_metadata" in update_data and isinstance(update_data["ai_metadata"], dict):
+                    update_data["ai_metadata"] = safe_json_dumps(update_data["ai_metadata"])
+            
+                db["photos"].update(photo_id, update_data)
+                if any(field in update_data for field in self.TAG_SOURCE_FIELDS):
+                    self._sync_photo_tags(conn, photo_id)
+            
+                self.logger.info(f"Photo updated: ID {photo_id}")
+                return True
             
         except Exception as e:
             self.logger.error("Failed to update photo: photo_id=%s, error=%s", photo_id, str(e))
@@ -936,16 +1422,17 @@ class DatabaseManager:
     def delete_photo(self, photo_id: int) -> bool:
         """Delete photo from database."""
         try:
-            db = sqlite_utils.Database(self.db_path)
+            with self.write_connection() as conn:
+                db = sqlite_utils.Database(conn)
             
-            # Remove from albums first
-            db["album_photos"].delete_where("photo_id = ?", [photo_id])
+                # Remove from albums first
+                db["album_photos"].delete_where("photo_id = ?", [photo_id])
             
-            # Delete photo record
-            db["photos"].delete(photo_id)
+                # Delete photo record
+                db["photos"].delete(photo_id)
             
-            self.logger.info(f"Photo deleted: ID {photo_id}")
-            return True
+                self.logger.info(f"Photo deleted: ID {photo_id}")
+                return True
             
         except Exception as e:
             self.logger.error("Failed to delete photo: photo_id=%s, error=%s", photo_id, str(e))
@@ -954,17 +1441,18 @@ class DatabaseManager:
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
-            stats = {
-                "total_photos": db["photos"].count,
-                "total_albums": db["albums"].count,
-                "total_tags": db["tags"].count,
-                "favorites_count": db["photos"].count_where("is_favorite = 1"),
-                "db_size": self.db_path.stat().st_size if self.db_path.exists() else 0
-            }
+            with self.read_connection() as conn:
+                db = sqlite_utils.Database(conn)
+            
+                stats = {
+                    "total_photos": db["photos"].count,
+                    "total_albums": db["albums"].count,
+                    "total_tags": db["tags"].count,
+                    "favorites_count": db["photos"].count_where("is_favorite = 1"),
+                    "db_size": self.db_path.stat().st_size if self.db_path.exists() else 0
+                }
             
-            return stats
+                return stats
             
         except Exception as e:
             self.logger.error(f"Failed to get stats: {str(e)}")
@@ -976,7 +1464,7 @@ class DatabaseManager:
             backup_file = Path(backup_path)
             backup_file.parent.mkdir(parents=True, exist_ok=True)
             
-            with self.get_connection() as source:
+            with self.read_connection() as source:
                 backup_conn = sqlite3.connect(backup_file)
                 source.backup(backup_conn)
                 backup_conn.close()
@@ -995,13 +1483,14 @@ class DatabaseManager:
         
         while retry_count < max_retries:
             try:
-                db = sqlite_utils.Database(self.db_path)
-                db["album_photos"].insert({
-                    "album_id": album_id,
-                    "photo_id": photo_id,
-                    "added_date": datetime.now().isoformat()
-                })
-                return True
+                with self.write_connection() as conn:
+                    db = sqlite_utils.Database(conn)
+                    db["album_photos"].insert({
+                        "album_id": album_id,
+                        "photo_id": photo_id,
+                        "added_date": datetime.now().isoformat()
+                    })
+                    return True
             except Exception as e:
                 retry_count += 1
                 self.logger.error(f"Failed to add photo to album (attempt {retry_count})", 
@@ -1019,61 +1508,24 @@ class DatabaseManager:
         
         return False
     
-    def get_album_photos(self, album_id: int) -> List[Dict[str, Any]]:
-        """Get all photos in an album."""
+    def get_album_photos(self, album_id: int, summary_only: bool = False) -> List[Dict[str, Any]]:
+        """Get all photos in an album.
+        
+        With summary_only only the grid columns are selected and PhotoSummary
+        rows are returned; otherwise rows are Photo records whose JSON
+        columns are decoded on first access.
+        """
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
-            photos = db.query("""
-                SELECT p.* FROM photos p
-                INNER JOIN album_photos ap ON p.id = ap.photo_id
-                WHERE ap.album_id = ?
-                ORDER BY ap.added_date DESC
-            """, [album_id])
-            
-            result = []
-            for photo in photos:
-                photo_dict = dict(photo)
-                photo_dict["exif_data"] = json.loads(photo_dict["exif_data"])
-                photo_dict["tags"] = json.loads(photo_dict["tags"])
-                
-                # 解析新的标签字段 - 安全处理空字符串
-                try:
-                    simple_tags_raw = photo_dict.get("simple_tags", "[]")
-                    photo_dict["simple_tags"] = json.loads(simple_tags_raw) if simple_tags_raw.strip() else []
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["simple_tags"] = []
-                
-                try:
-                    normal_tags_raw = photo_dict.get("normal_tags", "[]")
-                    photo_dict["normal_tags"] = json.loads(normal_tags_raw) if normal_tags_raw.strip() else []
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["normal_tags"] = []
-                
-                try:
-                    detailed_tags_raw = photo_dict.get("detailed_tags", "[]")
-                    photo_dict["detailed_tags"] = json.loads(detailed_tags_raw) if detailed_tags_raw.strip() else []
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["detailed_tags"] = []
-                
-                try:
-                    tag_translations_raw = photo_dict.get("tag_translations", "{}")
-                    photo_dict["tag_translations"] = json.loads(tag_translations_raw) if tag_translations_raw.strip() else {}
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["tag_translations"] = {}
-                
-                # 解析AI元数据字段 - 安全处理
-                try:
-                    ai_metadata_raw = photo_dict.get("ai_metadata", "{}")
-                    photo_dict["ai_metadata"] = json.loads(ai_metadata_raw) if ai_metadata_raw.strip() else {}
-                except (json.JSONDecodeError, AttributeError):
-                    photo_dict["ai_metadata"] = {}
-                
-                photo_dict["is_ai_generated"] = bool(photo_dict.get("is_ai_generated", False))
-                
-                result.append(photo_dict)
+            columns = PhotoSummary.select_list("p") if summary_only else "p.*"
+            with self.read_connection() as conn:
+                rows = conn.execute(f"""
+                    SELECT {columns} FROM photos p
+                    INNER JOIN album_photos ap ON p.id = ap.photo_id
+                    WHERE ap.album_id = ?
+                    ORDER BY ap.added_date DESC
+                """, [album_id]).fetchall()
             
-            return result
+            return [self._parse_search_row(row, summary_only) for row in rows]
             
         except Exception as e:
             self.logger.error(f"Failed to get album photos: {str(e)}")
@@ -1082,15 +1534,13 @@ class DatabaseManager:
     def create_album(self, album_data: Dict[str, Any]) -> int:
         """Create a new album with automatic name conflict resolution."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
             # 检查名称是否重复，如果重复则自动重命名
             base_name = album_data["name"]
             final_name = base_name
             counter = 1
             
             # 检查名称是否已存在
-            with self.get_connection() as conn:
+            with self.read_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT id FROM albums WHERE name = ?", (final_name,))
                 existing_album = cursor.fetchone()
@@ -1104,7 +1554,7 @@ class DatabaseManager:
                     final_name = f"{base_name}_{int(time.time())}"
                     break
                 
-                with self.get_connection() as conn:
+                with self.read_connection() as conn:
                     cursor = conn.cursor()
                     cursor.execute("SELECT id FROM albums WHERE name = ?", (final_name,))
                     existing_album = cursor.fetchone()
@@ -1121,8 +1571,10 @@ class DatabaseManager:
                 "photo_count": 0
             }
             
-            result = db["albums"].insert(album_record)
-            album_id = result.last_pk
+            with self.write_connection() as conn:
+                db = sqlite_utils.Database(conn)
+                result = db["albums"].insert(album_record)
+                album_id = result.last_pk
             
             self.logger.info(f"Album created: ID {album_id}, name '{final_name}'")
             return album_id
@@ -1134,12 +1586,13 @@ class DatabaseManager:
     def get_album(self, album_id: int) -> Optional[Dict[str, Any]]:
         """Get album by ID."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            album = db["albums"].get(album_id)
+            with self.read_connection() as conn:
+                db = sqlite_utils.Database(conn)
+                album = db["albums"].get(album_id)
             
-            if album:
-                return dict(album)
-            return None
+                if album:
+                    return dict(album)
+                return None
             
         except Exception as e:
             self.logger.error(f"Failed to get album {album_id}: {str(e)}")
@@ -1148,17 +1601,18 @@ class DatabaseManager:
     def get_all_albums(self) -> List[Dict[str, Any]]:
         """Get all albums with photo count."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            
-            albums = db.query("""
-                SELECT a.*, COUNT(ap.photo_id) as photo_count
-                FROM albums a
-                LEFT JOIN album_photos ap ON a.id = ap.album_id
-                GROUP BY a.id
-                ORDER BY a.created_date DESC
-            """)
+            with self.read_connection() as conn:
+                db = sqlite_utils.Database(conn)
+            
+                albums = db.query("""
+                    SELECT a.*, COUNT(ap.photo_id) as photo_count
+                    FROM albums a
+                    LEFT JOIN album_photos ap ON a.id = ap.album_id
+                    GROUP BY a.id
+                    ORDER BY a.created_date DESC
+                """)
             
-            return [dict(album) for album in albums]
+                return [dict(album) for album in albums]
             
         except Exception as e:
             self.logger.error(f"Failed to get albums: {str(e)}")
@@ -1167,11 +1621,12 @@ class DatabaseManager:
     def update_album(self, album_id: int, updates: Dict[str, Any]) -> bool:
         """Update album information."""
         try:
-            db = sqlite_utils.Database(self.db_path)
-            db["albums"].update(album_id, updates)
+            with self.write_connection() as conn:
+                db = sqlite_utils.Database(conn)
+                db["albums"].update(album_id, updates)
             
-            self.logger.info(f"Album updated: ID {album_id}")
-            return True
+                self.logger.info(f"Album updated: ID {album_id}")
+                return True
             
         except Exception as e:
             self.logger.error(f"Failed to update album {album_id}: {str(e)}")
@@ -1180,15 +1635,16 @@ class DatabaseManager:
     def get_photo_albums(self, photo_id: int) -> List[Dict[str, Any]]:
         """Get all albums that contain a specific photo."""
         try:
-            db = sqlite_utils.Database(self.db_path)
+            with self.read_connection() as conn:
+                db = sqlite_utils.Database(conn)
             
-            albums = db.query("""
-                SELECT a.* FROM albums a
-                JOIN album_photos ap ON a.id = ap.album_id
-                WHERE ap.photo_id = ?
-            """, [photo_id])
+                albums = db.query("""
+                    SELECT a.* FROM albums a
+                    JOIN album_photos ap ON a.id = ap.album_id
+                    WHERE ap.photo_id = ?
+                """, [photo_id])
             
-            return [dict(album) for album in albums]
+                return [dict(album) for album in albums]
             
         except Exception as e:
             self.logger.error(f"Failed to get photo albums {photo_id}: {str(e)}")
@@ -1202,7 +1658,7 @@ class DatabaseManager:
         while retry_count < max_retries:
             try:
                 # Use context manager for better connection handling
-                with self.get_connection() as conn:
+                with self.write_connection() as conn:
                     # Get all photo IDs in this album first
                     photo_ids = [row[0] for row in conn.execute(
                         "SELECT photo_id FROM album_photos WHERE album_id = ?", [album_id]
@@ -1233,8 +1689,6 @@ class DatabaseManager:
                     # Delete the album record
                     conn.execute("DELETE FROM albums WHERE id = ?", [album_id])
                     
-                    conn.commit()
-                
                 self.logger.info("Album deleted with complete cleanup: album_id=%s, photos_in_album=%d, tags_deleted=%d, photos_deleted=%d", 
                                album_id, len(photo_ids), tags_deleted, photos_deleted)
                 return True
@@ -1271,7 +1725,7 @@ class DatabaseManager:
         
         while retry_count < max_retries:
             try:
-                with self.get_connection() as conn:
+                with self.write_connection() as conn:
                     # Get album names for logging
                     album_names = {}
                     placeholders = ','.join(['?'] * len(album_ids))
@@ -1315,8 +1769,6 @@ class DatabaseManager:
                     # Delete the album records
                     conn.execute(f"DELETE FROM albums WHERE id IN ({placeholders})", album_ids)
                     
-                    conn.commit()
-                
                 result = {
                     "success": True,
                     "deleted_albums": len(album_ids),
@@ -1356,9 +1808,8 @@ class DatabaseManager:
         while retry_count < max_retries:
             try:
                 # Use context manager for better connection handling
-                with self.get_connection() as conn:
+                with self.write_connection() as conn:
                     conn.execute("DELETE FROM album_photos WHERE album_id = ?", [album_id])
-                    conn.commit()
                 
                 self.logger.info(f"Removed all photos from album: ID {album_id}")
                 return True
@@ -1381,7 +1832,7 @@ class DatabaseManager:
     def fetch_one(self, query: str, params: tuple = ()) -> Optional[tuple]:
         """Execute a query and return a single row."""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection() as conn:
                 cursor = conn.execute(query, params)
                 return cursor.fetchone()
         except Exception as e:
@@ -1391,7 +1842,7 @@ class DatabaseManager:
     def fetch_all(self, query: str, params: tuple = ()) -> List[tuple]:
         """Execute a query and return all rows."""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection() as conn:
                 cursor = conn.execute(query, params)
                 return cursor.fetchall()
         except Exception as e:
@@ -1422,7 +1873,7 @@ class DatabaseManager:
                 placeholders = ','.join(['?' for _ in batch_hashes])
                 query = f"SELECT file_hash FROM photos WHERE file_hash IN ({placeholders})"
                 
-                with self.get_connection() as conn:
+                with self.read_connection() as conn:
                     cursor = conn.cursor()
                     cursor.execute(query, batch_hashes)
                     results = cursor.fetchall()
@@ -1439,6 +1890,227 @@ class DatabaseManager:
             self.logger.error(f"Failed to find existing hashes: {str(e)}")
             return set()
 
+    
+    def get_file_fingerprints(self, filepaths: List[str] = None, inodes: List[int] = None,
+                              batch_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        批量查询照片记录的文件指纹（大小、修改时间、inode）。
+        
+        Args:
+            filepaths: 按文件路径查询
+            inodes: 按inode查询（用于识别被移动/重命名的文件）
+            batch_size: 每批查询的大小
+            
+        Returns:
+            记录列表，包含id, filepath, file_hash, file_size, file_mtime_ns, file_inode
+        """
+        try:
+            column, values = ("filepath", filepaths) if filepaths is not None else ("file_inode", inodes)
+            records = []
+            
+            with self.read_connection() as conn:
+                for i in range(0, len(values or []), batch_size):
+                    batch = values[i:i + batch_size]
+                    placeholders = ','.join(['?' for _ in batch])
+                    cursor = conn.execute(f"""
+                        SELECT id, filepath, file_hash, file_size, file_mtime_ns, file_inode
+                        FROM photos WHERE {column} IN ({placeholders})
+                    """, batch)
+                    records.extend(dict(row) for row in cursor.fetchall())
+            
+            return records
+            
+        except Exception as e:
+            self.logger.error("Failed to get file fingerprints: error=%s", str(e))
+            return []
+    
+    def update_file_fingerprints(self, fingerprints: List[Dict[str, Any]]) -> int:
+        """
+        批量写入文件指纹；条目中含file_hash时同时更新内容哈希。
+        
+        Args:
+            fingerprints: 字典列表，包含filepath, file_size, file_mtime_ns, file_inode，可选file_hash
+            
+        Returns:
+            更新的记录数
+        """
+        try:
+            if not fingerprints:
+                return 0
+            
+            updated = 0
+            with self.write_connection() as conn:
+                for entry in fingerprints:
+                    if entry.get("file_hash"):
+                        cursor = conn.execute("""
+                            UPDATE photos SET file_size = ?, file_mtime_ns = ?, file_inode = ?,
+                                file_hash = ?, date_modified = ?
+                            WHERE filepath = ?
+                        """, (entry["file_size"], entry["file_mtime_ns"], entry["file_inode"],
+                              entry["file_hash"], datetime.now().isoformat(), entry["filepath"]))
+                    else:
+                        cursor = conn.execute("""
+                            UPDATE photos SET file_size = ?, file_mtime_ns = ?, file_inode = ?
+                            WHERE filepath = ?
+                        """, (entry["file_size"], entry["file_mtime_ns"], entry["file_inode"],
+                              entry["filepath"]))
+                    updated += cursor.rowcount
+            
+            return updated
+            
+        except Exception as e:
+            self.logger.error("Failed to update file fingerprints: error=%s", str(e))
+            return 0
+    
+    def get_setting(self, key: str, default: Any = None) -> Any:
+        """读取settings表中的值"""
+        row = self.fetch_one("SELECT value FROM settings WHERE key = ?", (key,))
+        return row[0] if row else default
+    
+    def set_setting(self, key: str, value: Any) -> bool:
+        """写入settings表中的值"""
+        try:
+            with self.write_connection() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO settings (key, value, updated_date) VALUES (?, ?, ?)
+                """, (key, str(value), datetime.now().isoformat()))
+            return True
+        except Exception as e:
+            self.logger.error("Failed to save setting: key=%s, error=%s", key, str(e))
+            return False
+    
+    def get_thumbnail_records(self) -> List[Dict[str, Any]]:
+        """所有照片的缩略图信息：id, file_hash, thumbnail_path"""
+        try:
+            with self.read_connection() as conn:
+                cursor = conn.execute("SELECT id, file_hash, thumbnail_path FROM photos")
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error("Failed to get thumbnail records: error=%s", str(e))
+            return []
+    
+    def enqueue_thumbnails(self, photo_ids: List[int], priority: int = 10) -> int:
+        """
+        把照片加入后台缩略图队列；已在队列中的照片保留较高（数值较小）的优先级。
+        
+        Returns:
+            写入的记录数
+        """
+        try:
+            if not photo_ids:
+                return 0
+            now = datetime.now().isoformat()
+            with self.write_connection() as conn:
+                conn.executemany("""
+                    INSERT INTO thumbnail_queue (photo_id, priority, queued_date) VALUES (?, ?, ?)
+                    ON CONFLICT(photo_id) DO UPDATE SET priority = MIN(priority, excluded.priority)
+                """, [(photo_id, priority, now) for photo_id in photo_ids])
+            return len(photo_ids)
+        except Exception as e:
+            self.logger.error("Failed to enqueue thumbnails: error=%s", str(e))
+            return 0
+    
+    def get_thumbnail_queue(self) -> List[Tuple[int, int]]:
+        """待生成缩略图的 (photo_id, priority) 列表"""
+        try:
+            with self.read_connection() as conn:
+                cursor = conn.execute("SELECT photo_id, priority FROM thumbnail_queue ORDER BY priority, queued_date")
+                return [(row[0], row[1]) for row in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error("Failed to get thumbnail queue: error=%s", str(e))
+            return []
+    
+    def complete_thumbnails(self, updates: List[Tuple[int, str]], failed_ids: List[int] = None,
+                            queued: List[Tuple[int, int]] = None) -> int:
+        """
+        批量写回生成的缩略图路径，并把已处理（含失败）的照片移出队列。
+        
+        Args:
+            updates: (photo_id, thumbnail_path) 列表
+            failed_ids: 生成失败的照片ID
+            queued: 同一事务中先加入队列的 (photo_id, priority)，如网格可见照片
+            
+        Returns:
+            更新的记录数
+        """
+        try:
+            done_ids = [photo_id for photo_id, _ in updates] + list(failed_ids or [])
+            if not done_ids and not queued:
+                return 0
+            with self.write_connection() as conn:
+                if queued:
+                    now = datetime.now().isoformat()
+                    conn.executemany("""
+                        INSERT INTO thumbnail_queue (photo_id, priority, queued_date) VALUES (?, ?, ?)
+                        ON CONFLICT(photo_id) DO UPDATE SET priority = MIN(priority, excluded.priority)
+                    """, [(photo_id, priority, now) for photo_id, priority in queued])
+                conn.executemany("UPDATE photos SET thumbnail_path = ? WHERE id = ?",
+                                 [(thumbnail_path, photo_id) for photo_id, thumbnail_path in updates])
+                conn.executemany("DELETE FROM thumbnail_queue WHERE photo_id = ?",
+                                 [(photo_id,) for photo_id in done_ids])
+            return len(updates)
+        except Exception as e:
+            self.logger.error("Failed to complete thumbnails: error=%s", str(e))
+            return 0
+    
+    def get_thumbnail_sources(self, photo_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """按ID批量读取生成缩略图所需的 filepath, file_hash, thumbnail_path"""
+        try:
+            sources = {}
+            with self.read_connection() as conn:
+                for i in range(0, len(photo_ids), 500):
+                    batch = photo_ids[i:i + 500]
+                    placeholders = ','.join(['?' for _ in batch])
+                    cursor = conn.execute(f"""
+                        SELECT id, filepath, file_hash, thumbnail_path FROM photos WHERE id IN ({placeholders})
+                    """, batch)
+                    sources.update((row["id"], dict(row)) for row in cursor.fetchall())
+            return sources
+        except Exception as e:
+            self.logger.error("Failed to get thumbnail sources: error=%s", str(e))
+            return {}
+    
+    def get_photo_ids_without_thumbnail(self) -> List[int]:
+        """缩略图路径为空的照片ID"""
+        try:
+            with self.read_connection() as conn:
+                cursor = conn.execute("SELECT id FROM photos WHERE thumbnail_path IS NULL OR thumbnail_path = ''")
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error("Failed to get photos without thumbnail: error=%s", str(e))
+            return []
+    
+    def get_all_file_hashes(self) -> List[str]:
+        """照片库中所有照片的内容哈希"""
+        try:
+            with self.read_connection() as conn:
+                cursor = conn.execute("SELECT DISTINCT file_hash FROM photos WHERE file_hash IS NOT NULL")
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error("Failed to get file hashes: error=%s", str(e))
+            return []
+    
+    def update_thumbnail_paths(self, updates: List[Tuple[int, str]]) -> int:
+        """
+        批量更新照片的缩略图路径。
+        
+        Args:
+            updates: (photo_id, thumbnail_path) 列表
+            
+        Returns:
+            更新的记录数
+        """
+        try:
+            if not updates:
+                return 0
+            with self.write_connection() as conn:
+                conn.executemany("UPDATE photos SET thumbnail_path = ? WHERE id = ?",
+                                 [(thumbnail_path, photo_id) for photo_id, thumbnail_path in updates])
+            return len(updates)
+        except Exception as e:
+            self.logger.error("Failed to update thumbnail paths: error=%s", str(e))
+            return 0
+    
     def batch_add_photos_to_album(self, photo_ids: List[int], album_id: int) -> Dict[str, Any]:
         """
         批量将照片添加到相册。
@@ -1458,60 +2130,48 @@ class DatabaseManager:
             skipped_count = 0
             error_count = 0
             
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 
-                # 开始事务
-                cursor.execute("BEGIN TRANSACTION")
-                
-                try:
-                    # 检查相册是否存在
-                    cursor.execute("SELECT id FROM albums WHERE id = ?", (album_id,))
-                    if not cursor.fetchone():
-                        raise ValueError(f"Album with ID {album_id} does not exist")
+                # 检查相册是否存在
+                cursor.execute("SELECT id FROM albums WHERE id = ?", (album_id,))
+                if not cursor.fetchone():
+                    raise ValueError(f"Album with ID {album_id} does not exist")
                     
-                    # 检查哪些照片已经在相册中
-                    placeholders = ','.join(['?' for _ in photo_ids])
-                    cursor.execute(f"""
-                        SELECT photo_id FROM album_photos 
-                        WHERE album_id = ? AND photo_id IN ({placeholders})
-                    """, [album_id] + photo_ids)
+                # 检查哪些照片已经在相册中
+                placeholders = ','.join(['?' for _ in photo_ids])
+                cursor.execute(f"""
+                    SELECT photo_id FROM album_photos 
+                    WHERE album_id = ? AND photo_id IN ({placeholders})
+                """, [album_id] + photo_ids)
                     
-                    existing_photo_ids = {row[0] for row in cursor.fetchall()}
+                existing_photo_ids = {row[0] for row in cursor.fetchall()}
                     
-                    # 批量插入新照片
-                    current_time = datetime.now().isoformat()
-                    for photo_id in photo_ids:
-                        if photo_id in existing_photo_ids:
-                            skipped_count += 1
-                            continue
+                # 批量插入新照片
+                current_time = datetime.now().isoformat()
+                for photo_id in photo_ids:
+                    if photo_id in existing_photo_ids:
+                        skipped_count += 1
+                        continue
                         
-                        try:
-                            cursor.execute("""
-                                INSERT INTO album_photos (album_id, photo_id, added_date)
-                                VALUES (?, ?, ?)
-                            """, (album_id, photo_id, current_time))
-                            added_count += 1
-                        except Exception as e:
-                            self.logger.error("Failed to add photo to album: photo_id=%s, album_id=%s, error=%s", photo_id, album_id, str(e))
-                            error_count += 1
-                    
-                    # 更新相册照片数量
-                    cursor.execute("""
-                        UPDATE albums 
-                        SET photo_count = (
-                            SELECT COUNT(*) FROM album_photos WHERE album_id = ?
-                        )
-                        WHERE id = ?
-                    """, (album_id, album_id))
-                    
-                    # 提交事务
-                    cursor.execute("COMMIT")
+                    try:
+                        cursor.execute("""
+                            INSERT INTO album_photos (album_id, photo_id, added_date)
+                            VALUES (?, ?, ?)
+                        """, (album_id, photo_id, current_time))
+                        added_count += 1
+                    except Exception as e:
+                        self.logger.error("Failed to add photo to album: photo_id=%s, album_id=%s, error=%s", photo_id, album_id, str(e))
+                        error_count += 1
                     
-                except Exception as e:
-                    # 回滚事务
-                    cursor.execute("ROLLBACK")
-                    raise e
+                # 更新相册照片数量
+                cursor.execute("""
+                    UPDATE albums 
+                    SET photo_count = (
+                        SELECT COUNT(*) FROM album_photos WHERE album_id = ?
+                    )
+                    WHERE id = ?
+                """, (album_id, album_id))
             
             result = {
                 "success": True,
@@ -1555,79 +2215,71 @@ class DatabaseManager:
             error_count = 0
             inserted_ids = []
             
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 
-                # 开始事务
-                cursor.execute("BEGIN TRANSACTION")
-                
-                try:
-                    for photo_data in photos_data:
-                        try:
-                            # 准备照片数据
-                            photo_record = {
-                                "filename": photo_data["filename"],
-                                "filepath": photo_data["filepath"],
-                                "file_size": photo_data.get("file_size", 0),
-                                "file_hash": photo_data.get("file_hash", ""),
-                                "width": photo_data.get("width", 0),
-                                "height": photo_data.get("height", 0),
-                                "format": photo_data.get("format", ""),
-                                "date_taken": photo_data.get("date_taken", ""),
-                                "date_added": photo_data.get("date_added", datetime.now().isoformat()),
-                                "date_modified": photo_data.get("date_modified", ""),
-                                "exif_data": safe_json_dumps(photo_data.get("exif_data", {})),
-                                "ai_metadata": safe_json_dumps(photo_data.get("ai_metadata", {})),
-                                "is_ai_generated": photo_data.get("is_ai_generated", False),
-                                "tags": safe_json_dumps(photo_data.get("tags", [])),
-                                "simple_tags": safe_json_dumps(photo_data.get("simple_tags", [])),
-                                "normal_tags": safe_json_dumps(photo_data.get("normal_tags", [])),
-                                "detailed_tags": safe_json_dumps(photo_data.get("detailed_tags", [])),
-                                "tag_translations": safe_json_dumps(photo_data.get("tag_translations", {})),
-                                "rating": photo_data.get("rating", 0),
-                                "is_favorite": photo_data.get("is_favorite", False),
-                                "thumbnail_path": photo_data.get("thumbnail_path", ""),
-                                "notes": photo_data.get("notes", "")
-                            }
+                for photo_data in photos_data:
+                    try:
+                        # 准备照片数据
+                        photo_record = {
+                            "filename": photo_data["filename"],
+                            "filepath": photo_data["filepath"],
+                            "file_size": photo_data.get("file_size", 0),
+                            "file_hash": photo_data.get("file_hash", ""),
+                            "width": photo_data.get("width", 0),
+                            "height": photo_data.get("height", 0),
+                            "format": photo_data.get("format", ""),
+                            "date_taken": photo_data.get("date_taken", ""),
+                            "date_added": photo_data.get("date_added", datetime.now().isoformat()),
+                            "date_modified": photo_data.get("date_modified", ""),
+                            "exif_data": safe_json_dumps(photo_data.get("exif_data", {})),
+                            "ai_metadata": safe_json_dumps(photo_data.get("ai_metadata", {})),
+                            "is_ai_generated": photo_data.get("is_ai_generated", False),
+                            "tags": safe_json_dumps(photo_data.get("tags", [])),
+                            "simple_tags": safe_json_dumps(photo_data.get("simple_tags", [])),
+                            "normal_tags": safe_json_dumps(photo_data.get("normal_tags", [])),
+                            "detailed_tags": safe_json_dumps(photo_data.get("detailed_tags", [])),
+                            "tag_translations": safe_json_dumps(photo_data.get("tag_translations", {})),
+                            "rating": photo_data.get("rating", 0),
+                            "is_favorite": photo_data.get("is_favorite", False),
+                            "thumbnail_path": photo_data.get("thumbnail_path", ""),
+                            "notes": photo_data.get("notes", ""),
+                            "file_mtime_ns": photo_data.get("file_mtime_ns"),
+                            "file_inode": photo_data.get("file_inode")
+                        }
                             
-                            # 插入照片
-                            cursor.execute("""
-                                INSERT INTO photos (
-                                    filename, filepath, file_size, file_hash, width, height,
-                                    format, date_taken, date_added, date_modified, exif_data,
-                                    ai_metadata, is_ai_generated, tags, simple_tags, normal_tags,
-                                    detailed_tags, tag_translations, rating, is_favorite,
-                                    thumbnail_path, notes
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, (
-                                photo_record["filename"], photo_record["filepath"],
-                                photo_record["file_size"], photo_record["file_hash"],
-                                photo_record["width"], photo_record["height"],
-                                photo_record["format"], photo_record["date_taken"],
-                                photo_record["date_added"], photo_record["date_modified"],
-                                photo_record["exif_data"], photo_record["ai_metadata"],
-                                photo_record["is_ai_generated"], photo_record["tags"],
-                                photo_record["simple_tags"], photo_record["normal_tags"],
-                                photo_record["detailed_tags"], photo_record["tag_translations"],
-                                photo_record["rating"], photo_record["is_favorite"],
-                                photo_record["thumbnail_path"], photo_record["notes"]
-                            ))
+                        # 插入照片
+                        cursor.execute("""
+                            INSERT INTO photos (
+                                filename, filepath, file_size, file_hash, width, height,
+                                format, date_taken, date_added, date_modified, exif_data,
+                                ai_metadata, is_ai_generated, tags, simple_tags, normal_tags,
+                                detailed_tags, tag_translations, rating, is_favorite,
+                                thumbnail_path, notes, file_mtime_ns, file_inode
+                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, (
+                            photo_record["filename"], photo_record["filepath"],
+                            photo_record["file_size"], photo_record["file_hash"],
+                            photo_record["width"], photo_record["height"],
+                            photo_record["format"], photo_record["date_taken"],
+                            photo_record["date_added"], photo_record["date_modified"],
+                            photo_record["exif_data"], photo_record["ai_metadata"],
+                            photo_record["is_ai_generated"], photo_record["tags"],
+                            photo_record["simple_tags"], photo_record["normal_tags"],
+                            photo_record["detailed_tags"], photo_record["tag_translations"],
+                            photo_record["rating"], photo_record["is_favorite"],
+                            photo_record["thumbnail_path"], photo_record["notes"],
+                            photo_record["file_mtime_ns"], photo_record["file_inode"]
+                        ))
                             
-                            photo_id = cursor.lastrowid
-                            inserted_ids.append(photo_id)
-                            inserted_count += 1
+                        photo_id = cursor.lastrowid
+                        self._sync_photo_tags(conn, photo_id, photo_record)
+                        inserted_ids.append(photo_id)
+                        inserted_count += 1
                             
-                        except Exception as e:
-                            self.logger.error("Failed to insert photo: filepath=%s, error=%s", photo_data.get("filepath"), str(e))
-                            error_count += 1
-                    
-                    # 提交事务
-                    cursor.execute("COMMIT")
-                    
-                except Exception as e:
-                    # 回滚事务
-                    cursor.execute("ROLLBACK")
-                    raise e
+                    except Exception as e:
+                        self.logger.error("Failed to insert photo: filepath=%s, error=%s", photo_data.get("filepath"), str(e))
+                        error_count += 1
             
             result = {
                 "success": True,
@@ -1652,20 +2304,27 @@ class DatabaseManager:
                 "error": str(e)
             }
 
-    def get_all_tags(self) -> List[Dict[str, Any]]:
-        """获取所有标签"""
+    def get_all_tags(self, language: str = None, category: str = None) -> List[Dict[str, Any]]:
+        """获取所有标签（来自规范化标签表的使用计数）"""
         try:
-            with self.get_connection() as conn:
+            conditions = ["usage_count > 0"]
+            params = []
+            if language:
+                conditions.append("language = ?")
+                params.append(language)
+            if category:
+                conditions.append("category = ?")
+                params.append(category)
+            
+            with self.read_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT DISTINCT 
-                        json_extract(tags.value, '$') as tag_name,
-                        COUNT(*) as usage_count
-                    FROM photos, json_each(photos.tags) as tags
-                    WHERE photos.tags IS NOT NULL AND photos.tags != '[]'
-                    GROUP BY tag_name
-                    ORDER BY usage_count DESC, tag_name
-                """)
+                cursor.execute(f"""
+                    SELECT name, SUM(usage_count) AS usage_count
+                    FROM tags
+                    WHERE {' AND '.join(conditions)}
+                    GROUP BY name COLLATE NOCASE
+                    ORDER BY usage_count DESC, name
+                """, params)
                 
                 tags = []
                 for row in cursor.fetchall():
@@ -1683,7 +2342,7 @@ class DatabaseManager:
     def save_photo_tags(self, photo_id: int, tags_data: Dict[str, Any]) -> bool:
         """保存照片标签"""
         try:
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 
                 # 准备标签数据 - 支持新的分离式标签结构
@@ -1730,7 +2389,8 @@ class DatabaseManager:
                 """
                 
                 cursor.execute(query, values)
-                conn.commit()
+                if cursor.rowcount > 0:
+                    self._sync_photo_tags(conn, photo_id)
                 
                 if cursor.rowcount > 0:
                     self.logger.info(f"Successfully saved tags for photo {photo_id}")
@@ -1746,7 +2406,7 @@ class DatabaseManager:
     def update_photo_field(self, photo_id: int, field_name: str, field_value: str) -> bool:
         """更新照片的单个字段"""
         try:
-            with self.get_connection() as conn:
+            with self.write_connection() as conn:
                 cursor = conn.cursor()
                 
                 # 验证字段名是否安全（防止SQL注入）
@@ -1764,8 +2424,8 @@ class DatabaseManager:
                 # 使用参数化查询更新字段
                 query = f"UPDATE photos SET {field_name} = ? WHERE id = ?"
                 cursor.execute(query, (field_value, photo_id))
-                
-                conn.commit()
+                if field_name in self.TAG_SOURCE_FIELDS and cursor.rowcount > 0:
+                    self._sync_photo_tags(conn, photo_id)
                 
                 if cursor.rowcount > 0:
                     self.logger.info(f"Updated photo {photo_id} field {field_name}")
@@ -1781,7 +2441,7 @@ class DatabaseManager:
     def get_photo_albums(self, photo_id: int) -> List[Dict[str, Any]]:
         """获取照片所属的相册列表"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -1810,7 +2470,7 @@ class DatabaseManager:
     def get_photo_by_id(self, photo_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取照片信息"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -1864,7 +2524,7 @@ class DatabaseManager:
     def get_recent_albums(self, limit: int = 5) -> List[Dict[str, Any]]:
         """获取最近使用的相册列表"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -0,0 +1,214 @@
+"""
+Row types returned by DatabaseManager list queries.
+
+PhotoSummary carries only the columns the thumbnail grid and list views
+need; Photo is a full record that defers decoding of its JSON columns until
+they are first read.
+"""
+
+import json
+from typing import Any, Dict, Iterator
+
+
+# 缩略图网格/列表视图所需的列
+SUMMARY_COLUMNS = (
+    "id",
+    "filename",
+    "filepath",
+    "thumbnail_path",
+    "file_hash",
+    "file_size",
+    "width",
+    "height",
+    "date_taken",
+    "rating",
+    "is_favorite",
+)
+
+# JSON列及其解析失败/为空时的默认值类型
+JSON_COLUMNS = {
+    "exif_data": dict,
+    "tags": list,
+    "simple_tags": list,
+    "normal_tags": list,
+    "detailed_tags": list,
+    "tag_translations": dict,
+    "ai_metadata": dict,
+}
+
+
+def decode_json_column(raw: Any, default_type: type) -> Any:
+    """Decode a JSON column value, falling back to an empty default."""
+    if isinstance(raw, (dict, list)):
+        return raw
+    if not isinstance(raw, (str, bytes)) or not raw.strip():
+        return default_type()
+    try:
+        value = json.loads(raw)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return default_type()
+    return value if value is not None else default_type()
+
+
+class PhotoSummary:
+    """Lightweight, slots-based photo row for grid and list views.
+
+    Supports the read-only mapping access (``get``, ``[]``, ``in``) the GUI
+    already uses on photo dicts, so it can be handed to ThumbnailWidget
+    directly.
+    """
+
+    __slots__ = SUMMARY_COLUMNS
+
+    def __init__(self, **values):
+        for column in SUMMARY_COLUMNS:
+            setattr(self, column, values.get(column))
+        self.is_favorite = bool(self.is_favorite)
+        self.rating = self.rating or 0
+
+    @classmethod
+    def from_row(cls, row) -> "PhotoSummary":
+        """Build a summary from a sqlite3.Row or dict containing SUMMARY_COLUMNS."""
+        return cls(**{column: row[column] for column in SUMMARY_COLUMNS})
+
+    @staticmethod
+    def select_list(alias: str = "") -> str:
+        """Column list for a projected SELECT, optionally table-qualified."""
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(f"{prefix}{column}" for column in SUMMARY_COLUMNS)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in SUMMARY_COLUMNS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key in SUMMARY_COLUMNS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in SUMMARY_COLUMNS
+
+    def keys(self):
+        return SUMMARY_COLUMNS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {column: getattr(self, column) for column in SUMMARY_COLUMNS}
+
+    def replace(self, **changes) -> "PhotoSummary":
+        """Copy with some columns changed; summaries are not modified in place."""
+        return PhotoSummary(**{**self.to_dict(), **changes})
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PhotoSummary):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"PhotoSummary(id={self.id!r}, filename={self.filename!r})"
+
+
+class Photo(dict):
+    """Full photo record whose JSON columns are decoded on first access.
+
+    Behaves as a regular dict. Raw JSON strings are held aside until the
+    key is read; iterating, copying or serializing the record decodes the
+    remaining columns first, so callers never see undecoded values.
+    """
+
+    __slots__ = ("_pending",)
+
+    def __init__(self, row=(), **kwargs):
+        super().__init__(row, **kwargs)
+        self._pending: Dict[str, Any] = {}
+        for column in JSON_COLUMNS:
+            if dict.__contains__(self, column):
+                self._pending[column] = dict.pop(self, column)
+        if dict.__contains__(self, "is_ai_generated"):
+            dict.__setitem__(self, "is_ai_generated", bool(dict.__getitem__(self, "is_ai_generated")))
+
+    def _decode(self, key: str) -> Any:
+        value = decode_json_column(self._pending.pop(key), JSON_COLUMNS[key])
+        dict.__setitem__(self, key, value)
+        return value
+
+    def materialize(self) -> "Photo":
+        """Decode every pending JSON column."""
+        for key in list(self._pending):
+            self._decode(key)
+        return self
+
+    @property
+    def decoded(self) -> bool:
+        return not self._pending
+
+    def __missing__(self, key: str) -> Any:
+        if key in self._pending:
+            return self._decode(key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._pending:
+            return self._decode(key)
+        return dict.get(self, key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._pending or dict.__contains__(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        self._pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: str):
+        if key in self._pending:
+            del self._pending[key]
+            return
+        dict.__delitem__(self, key)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self._pending:
+            self._decode(key)
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key in self._pending:
+            return self._decode(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        for key in other:
+            self._pending.pop(key, None)
+        dict.update(self, other)
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + len(self._pending)
+
+    def __iter__(self) -> Iterator[str]:
+        return dict.__iter__(self.materialize())
+
+    def keys(self):
+        return dict.keys(self.materialize())
+
+    def values(self):
+        return dict.values(self.materialize())
+
+    def items(self):
+        return dict.items(self.materialize())
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self.materialize())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Photo):
+            other.materialize()
+        return dict.__eq__(self.materialize(), other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return dict.__repr__(self.materialize())
+
+    def __reduce__(self):
+        return (Photo, (dict(self.materialize()),))
@@ -748,7 +748,7 @@ class AlbumManager(QWidget):
             total_photos = 0
             
             for album_id in selected_album_ids:
-                album_photos = self.db_manager.get_album_photos(album_id)
+                album_photos = self.db_manager.get_album_photos(album_id, summary_only=True)
                 all_photos.extend(album_photos)
                 total_photos += len(album_photos)
             
@@ -875,7 +875,7 @@ class AlbumManager(QWidget):
     def load_album_photos(self, album_id: int):
         """Load photos for the specified album."""
         try:
-            photos = self.db_manager.get_album_photos(album_id)
+            photos = self.db_manager.get_album_photos(album_id, summary_only=True)
             self.thumbnail_widget.display_photos(photos)
             
             self.logger.info("Loaded album photos: album_id=%s, photo_count=%s", album_id, len(photos))
@@ -1324,8 +1324,8 @@ class AlbumManager(QWidget):
     def load_album_photos(self, album_id: int):
         """Load photos for the selected album."""
         try:
-            # Get photos from database
-            photos = self.db_manager.get_album_photos(album_id)
+            # Get photos from database (grid columns only)
+            photos = self.db_manager.get_album_photos(album_id, summary_only=True)
             
             # Display photos in thumbnail widget
             self.thumbnail_widget.display_photos(photos)
@@ -1346,7 +1346,7 @@ class AlbumManager(QWidget):
         try:
             all_photos = []
             for album_id in album_ids:
-                photos = self.db_manager.get_album_photos(album_id)
+                photos = self.db_manager.get_album_photos(album_id, summary_only=True)
                 all_photos.extend(photos)
             
             # Display all photos in thumbnail widget
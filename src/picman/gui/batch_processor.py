@@ -14,98 +14,39 @@ from PyQt6.QtCore import Qt, pyqtSignal, QThread
 import logging
 
 from ..core.image_processor import ImageProcessor
+from ..core.batch_engine import BatchEngine, describe_operation
 from ..core.photo_manager import PhotoManager
 from ..config.manager import ConfigManager
 
 
 class BatchWorker(QThread):
-    """Worker thread for batch processing."""
+    """Worker thread driving the batch engine (files are processed in a process pool)."""
     
     progress = pyqtSignal(int, int)  # current, total
     finished = pyqtSignal(dict)  # result
     error = pyqtSignal(str)
     
-    def __init__(self, processor: ImageProcessor, operation: str, 
-                photos: List[Dict[str, Any]], params: Dict[str, Any]):
+    def __init__(self, operations: List[Dict[str, Any]], photos: List[Dict[str, Any]],
+                 output_dir: str, skip_up_to_date: bool = True):
         super().__init__()
-        self.processor = processor
-        self.operation = operation
+        self.operations = operations
         self.photos = photos
-        self.params = params
+        self.output_dir = output_dir
+        self.skip_up_to_date = skip_up_to_date
+        self.engine = BatchEngine()
+    
+    def cancel(self):
+        """Stop after the files currently being processed."""
+        self.engine.cancel()
     
     def run(self):
         """Run the batch operation."""
         try:
-            total = len(self.photos)
-            success_count = 0
-            error_count = 0
-            
-            for i, photo in enumerate(self.photos):
-                self.progress.emit(i + 1, total)
-                
-                try:
-                    # Get file path
-                    file_path = photo.get("filepath", "")
-                    if not file_path or not Path(file_path).exists():
-                        error_count += 1
-                        continue
-                    
-                    # Generate output path
-                    output_dir = self.params.get("output_dir", "data/processed")
-                    Path(output_dir).mkdir(parents=True, exist_ok=True)
-                    
-                    filename = Path(file_path).name
-                    output_path = str(Path(output_dir) / filename)
-                    
-                    # Apply operation
-                    result = False
-                    
-                    if self.operation == "resize":
-                        width = self.params.get("width", 800)
-                        height = self.params.get("height", 600)
-                        maintain_aspect = self.params.get("maintain_aspect", True)
-                        result = self.processor.resize_image(
-                            file_path, output_path, (width, height), maintain_aspect
-                        )
-                    
-                    elif self.operation == "rotate":
-                        angle = self.params.get("angle", 0)
-                        result = self.processor.rotate_image(file_path, output_path, angle)
-                    
-                    elif self.operation == "brightness":
-                        factor = self.params.get("factor", 1.0)
-                        result = self.processor.adjust_brightness(file_path, output_path, factor)
-                    
-                    elif self.operation == "contrast":
-                        factor = self.params.get("factor", 1.0)
-                        result = self.processor.adjust_contrast(file_path, output_path, factor)
-                    
-                    elif self.operation == "convert":
-                        format_name = self.params.get("format", "JPEG")
-                        quality = self.params.get("quality", 95)
-                        
-                        # Adjust output path for format change
-                        output_path = str(Path(output_path).with_suffix(f".{format_name.lower()}"))
-                        
-                        result = self.processor.convert_format(
-                            file_path, output_path, format_name, quality
-                        )
-                    
-                    if result:
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        
-                except Exception as e:
-                    error_count += 1
-            
-            result = {
-                "success": True,
-                "total": total,
-                "success_count": success_count,
-                "error_count": error_count
-            }
-            
+            input_paths = [photo.get("filepath", "") for photo in self.photos]
+            result = self.engine.run(input_paths, self.output_dir, self.operations,
+                                     skip_up_to_date=self.skip_up_to_date,
+                                     progress_callback=self.progress.emit)
+            result["success"] = True
             self.finished.emit(result)
             
         except Exception as e:
@@ -288,6 +229,7 @@ class BatchProcessorDialog(QDialog):
         self.photo_manager = photo_manager
         self.image_processor = image_processor
         self.selected_photos = selected_photos or []
+        self.operations: List[Dict[str, Any]] = []  # 处理链，按顺序对每张照片执行
         # 配置标准logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger("picman.gui.batch_processor")
@@ -333,6 +275,31 @@ class BatchProcessorDialog(QDialog):
         
         layout.addWidget(self.param_tabs)
         
+        # Operation chain
+        chain_group = QGroupBox("处理链（按顺序执行，每张照片只解码和编码一次）")
+        chain_layout = QVBoxLayout(chain_group)
+        
+        self.chain_list = QListWidget()
+        chain_layout.addWidget(self.chain_list)
+        
+        chain_buttons = QHBoxLayout()
+        add_btn = QPushButton("添加到处理链")
+        add_btn.clicked.connect(self.add_operation)
+        chain_buttons.addWidget(add_btn)
+        remove_btn = QPushButton("移除")
+        remove_btn.clicked.connect(self.remove_operation)
+        chain_buttons.addWidget(remove_btn)
+        clear_btn = QPushButton("清空")
+        clear_btn.clicked.connect(self.clear_operations)
+        chain_buttons.addWidget(clear_btn)
+        chain_layout.addLayout(chain_buttons)
+        
+        hint = QLabel("处理链为空时只执行当前选择的操作")
+        hint.setStyleSheet("color: gray;")
+        chain_layout.addWidget(hint)
+        
+        layout.addWidget(chain_group)
+        
         # Output directory
         output_group = QGroupBox("输出设置")
         output_layout = QFormLayout(output_group)
@@ -349,6 +316,10 @@ class BatchProcessorDialog(QDialog):
         
         output_layout.addRow("输出目录:", dir_layout)
         
+        self.skip_up_to_date = QCheckBox("跳过已是最新的输出（源文件和处理链均未改变）")
+        self.skip_up_to_date.setChecked(True)
+        output_layout.addRow("", self.skip_up_to_date)
+        
         layout.addWidget(output_group)
         
         # Photo list
@@ -381,7 +352,24 @@ class BatchProcessorDialog(QDialog):
     
     def on_operation_changed(self, index):
         """Handle operation selection change."""
-        self.param_tabs.setCurrentIndex(index)
+        # 亮度和对比度共用调整页
+        self.param_tabs.setCurrentIndex([0, 1, 2, 2, 3][index])
+    
+    def add_operation(self):
+        """Append the current operation to the chain."""
+        operation = self.get_current_operation()
+        self.operations.append(operation)
+        self.chain_list.addItem(QListWidgetItem(describe_operation(operation)))
+    
+    def remove_operation(self):
+        row = self.chain_list.currentRow()
+        if row >= 0:
+            del self.operations[row]
+            self.chain_list.takeItem(row)
+    
+    def clear_operations(self):
+        self.operations.clear()
+        self.chain_list.clear()
     
     def browse_output_dir(self):
         """Browse for output directory."""
@@ -391,28 +379,22 @@ class BatchProcessorDialog(QDialog):
         if directory:
             self.output_dir.setText(directory)
     
-    def get_operation_params(self) -> Dict[str, Any]:
-        """Get parameters for the selected operation."""
-        params = {
-            "output_dir": self.output_dir.text()
-        }
+    def get_current_operation(self) -> Dict[str, Any]:
+        """The selected operation with its parameters, in batch engine format."""
+        operation = self.get_operation_name()
+        
+        if operation == "resize":
+            params = self.resize_tab.get_params()
+        elif operation == "rotate":
+            params = self.rotate_tab.get_params()
+        elif operation == "brightness":
+            params = {"factor": self.adjust_tab.get_params()["brightness_factor"]}
+        elif operation == "contrast":
+            params = {"factor": self.adjust_tab.get_params()["contrast_factor"]}
+        else:
+            params = self.convert_tab.get_params()
         
-        operation = self.operation_combo.currentIndex()
-        
-        if operation == 0:  # Resize
-            params.update(self.resize_tab.get_params())
-        elif operation == 1:  # Rotate
-            params.update(self.rotate_tab.get_params())
-        elif operation == 2:  # Brightness
-            params.update(self.adjust_tab.get_params())
-            params["operation"] = "brightness"
-        elif operation == 3:  # Contrast
-            params.update(self.adjust_tab.get_params())
-            params["operation"] = "contrast"
-        elif operation == 4:  # Convert
-            params.update(self.convert_tab.get_params())
-        
-        return params
+        return {"op": operation, **params}
     
     def get_operation_name(self) -> str:
         """Get the name of the selected operation."""
@@ -431,25 +413,29 @@ class BatchProcessorDialog(QDialog):
             QMessageBox.warning(self, "无照片", "未选择照片进行处理。")
             return
         
-        # Get operation parameters
-        operation = self.get_operation_name()
-        params = self.get_operation_params()
+        operations = list(self.operations) or [self.get_current_operation()]
         
         # Create and start worker
         self.batch_worker = BatchWorker(
-            self.image_processor, operation, self.selected_photos, params
+            operations, self.selected_photos, self.output_dir.text(),
+            self.skip_up_to_date.isChecked()
         )
         
         # Create progress dialog
         progress = QProgressDialog("正在处理照片...", "取消", 0, len(self.selected_photos), self)
         progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
         
         # Connect signals
-        self.batch_worker.progress.connect(progress.setValue)
+        self.batch_worker.progress.connect(lambda current, total: progress.setValue(current))
         self.batch_worker.finished.connect(lambda result: self.on_processing_finished(result, progress))
         self.batch_worker.error.connect(lambda error: self.on_processing_error(error, progress))
+        progress.canceled.connect(self.batch_worker.cancel)
         
         # Start processing
+        self.logger.info("Batch processing started: photos=%s, operations=%s",
+                         len(self.selected_photos), [op["op"] for op in operations])
         self.batch_worker.start()
         progress.show()
     
@@ -458,8 +444,18 @@ class BatchProcessorDialog(QDialog):
         progress.close()
         
         if result.get("success", False):
-            message = f"处理完成！\n成功: {result['success_count']}\n错误: {result['error_count']}"
-            QMessageBox.information(self, "处理完成", message)
+            timings = result.get("timings", {})
+            title = "处理已取消" if result.get("cancelled") else "处理完成"
+            message = (
+                f"{title}！\n成功: {result['success_count']}\n"
+                f"跳过（已是最新）: {result.get('skipped_count', 0)}\n错误: {result['error_count']}\n\n"
+                f"用时: {result.get('elapsed', 0.0):.1f} 秒\n"
+                f"解码: {timings.get('decode', 0.0):.1f} 秒, 处理: {timings.get('process', 0.0):.1f} 秒, "
+                f"编码: {timings.get('encode', 0.0):.1f} 秒（各工作进程合计）"
+            )
+            for path, error in result.get("errors", [])[:5]:
+                self.logger.warning("Batch processing failed: path=%s, error=%s", path, error)
+            QMessageBox.information(self, title, message)
         else:
             QMessageBox.critical(self, "处理错误", "批量处理失败。")
     
@@ -0,0 +1,166 @@
+"""
+Asynchronous full-image loader for the photo viewer.
+
+Images are decoded off the GUI thread at a requested level: a bounded size
+(screen resolution) for display and 0 for full resolution when zooming in.
+Decoded pixmaps are kept in a byte-budgeted LRU shared by every viewer, and
+neighbouring photos can be prefetched at low priority so stepping through an
+album is served from memory. Requests are tagged with the file's generation,
+so a decode that finishes after invalidate() is dropped instead of cached.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap
+
+from .pixmap_cache import PixmapLRUCache
+
+
+DEFAULT_VIEWER_CACHE_MB = 256
+FULL_RESOLUTION = 0  # 级别0表示原始分辨率
+
+# 线程池优先级：显示请求先于预取
+PRIORITY_DISPLAY = 10
+PRIORITY_PREFETCH = 0
+
+logger = logging.getLogger("picman.gui.image_loader")
+
+
+def decode_image(file_path: str, max_side: int = FULL_RESOLUTION) -> QImage:
+    """Decode an image upright (EXIF orientation applied), at most max_side on the long edge.
+
+    Safe to call from worker threads. Qt's reader scales during decode where
+    the format supports it; formats Qt cannot read fall back to Pillow.
+    """
+    reader = QImageReader(file_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if max_side and size.isValid() and max(size.width(), size.height()) > max_side:
+        reader.setScaledSize(size.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull():
+        return image
+
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(file_path) as pil_image:
+            if max_side:
+                pil_image.draft("RGB", (max_side, max_side))
+            pil_image = ImageOps.exif_transpose(pil_image)
+            if max_side:
+                pil_image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            pil_image = pil_image.convert("RGBA")
+            data = pil_image.tobytes()
+            # copy()让QImage拥有自己的像素数据，不再引用data
+            return QImage(data, pil_image.width, pil_image.height, pil_image.width * 4,
+                          QImage.Format.Format_RGBA8888).copy()
+    except Exception as e:
+        logger.warning("Failed to decode image: path=%s, error=%s, qt_error=%s",
+                       file_path, str(e), reader.errorString())
+        return QImage()
+
+
+class ImageDecodeTask(QRunnable):
+    """Decode one image level in the thread pool and report it through a signal."""
+
+    def __init__(self, file_path: str, max_side: int, generation: int, callback):
+        super().__init__()
+        self.file_path = file_path
+        self.max_side = max_side
+        self.generation = generation
+        self.callback = callback
+
+    def run(self):
+        try:
+            image = decode_image(self.file_path, self.max_side)
+        except Exception:
+            image = QImage()
+        self.callback.emit(self.file_path, self.max_side, self.generation, image)
+
+
+class ViewerImageLoader(QObject):
+    """Decodes viewer images in the background and caches the resulting pixmaps.
+
+    image_ready is emitted for every finished request, including failures
+    (with a null pixmap); receivers filter on the path they are showing.
+    """
+
+    image_ready = pyqtSignal(str, int, QPixmap)  # file_path, max_side, pixmap
+    _decoded = pyqtSignal(str, int, int, QImage)  # file_path, max_side, generation, image
+
+    def __init__(self, max_bytes: int = DEFAULT_VIEWER_CACHE_MB * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.cache = PixmapLRUCache(max_bytes)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)
+        self._pending = set()  # (file_path, max_side)
+        self._generations: Dict[str, int] = {}  # invalidate()每次加一，旧请求的结果被丢弃
+        self._decoded.connect(self._on_decoded)
+
+    @staticmethod
+    def _key(file_path: str, max_side: int) -> Tuple[str, int, int]:
+        return (file_path, max_side, max_side)
+
+    def cached(self, file_path: str, max_side: int) -> Optional[QPixmap]:
+        return self.cache.get(self._key(file_path, max_side))
+
+    def request(self, file_path: str, max_side: int, prefetch: bool = False) -> Optional[QPixmap]:
+        """Cached pixmap for a level, or None after scheduling its decode."""
+        pixmap = self.cached(file_path, max_side)
+        if pixmap is not None:
+            return pixmap
+        if (file_path, max_side) not in self._pending:
+            self._pending.add((file_path, max_side))
+            self.thread_pool.start(ImageDecodeTask(file_path, max_side, self._generations.get(file_path, 0),
+                                                   self._decoded),
+                                   PRIORITY_PREFETCH if prefetch else PRIORITY_DISPLAY)
+        return None
+
+    def prefetch(self, file_paths: Iterable[str], max_side: int):
+        """Decode images ahead of time at low priority."""
+        for file_path in file_paths:
+            if file_path:
+                self.request(file_path, max_side, prefetch=True)
+
+    def load(self, file_path: str, max_side: int) -> QPixmap:
+        """Blocking load through the cache (GUI thread)."""
+        pixmap = self.cached(file_path, max_side)
+        if pixmap is None:
+            image = decode_image(file_path, max_side)
+            pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+            self.cache.put(self._key(file_path, max_side), pixmap)
+        return pixmap
+
+    def invalidate(self, file_path: str):
+        """Forget every cached level of a file (after it was modified).
+
+        Decodes still running for the file are discarded when they finish.
+        """
+        self._generations[file_path] = self._generations.get(file_path, 0) + 1
+        self._pending = {(path, max_side) for path, max_side in self._pending if path != file_path}
+        self.cache.invalidate(file_path)
+
+    def set_cache_budget(self, max_bytes: int):
+        self.cache.set_budget(max_bytes)
+
+    def _on_decoded(self, file_path: str, max_side: int, generation: int, image: QImage):
+        if generation != self._generations.get(file_path, 0):
+            return  # 解码期间文件已被invalidate，结果已过期
+        self._pending.discard((file_path, max_side))
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+        self.cache.put(self._key(file_path, max_side), pixmap)
+        self.image_ready.emit(file_path, max_side, pixmap)
+
+
+_shared_loader: Optional[ViewerImageLoader] = None
+
+
+def shared_image_loader() -> ViewerImageLoader:
+    """Loader shared by all photo viewers (GUI thread only)."""
+    global _shared_loader
+    if _shared_loader is None:
+        _shared_loader = ViewerImageLoader()
+    return _shared_loader
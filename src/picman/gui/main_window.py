@@ -5,6 +5,7 @@ Main application window for PyPhotoManager.
 import os
 import sys
 import logging
+import threading
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from PyQt6.QtWidgets import (
@@ -32,6 +33,8 @@ from .photo_viewer import PhotoViewer
 from .janus_generate_page import JanusGeneratePage
 
 from .thumbnail_widget import ThumbnailWidget
+from .pixmap_cache import shared_pixmap_cache
+from .image_loader import shared_image_loader
 from .album_manager import AlbumManager
 
 from .settings_dialog import SettingsDialog
@@ -92,9 +95,10 @@ class ImportWorkerWithTags(QThread):
 
 
 class OptimizedImportWorker(QThread):
-    """高性能导入工作线程，使用多线程和批量操作。"""
+    """高性能导入工作线程，使用流式流水线和批量操作。"""
     
     progress = pyqtSignal(str)  # 进度信息
+    batch_committed = pyqtSignal(int)  # 一批新照片已写入数据库（数量）
     finished = pyqtSignal(dict)  # 结果
     error = pyqtSignal(str)
     
@@ -109,19 +113,34 @@ class OptimizedImportWorker(QThread):
         self.tag_settings = tag_settings or {}
         self.max_workers = max_workers
         self.batch_size = batch_size
+        self._cancel_event = threading.Event()
+    
+    def cancel(self):
+        """请求停止导入，已提交的批次会保留。"""
+        self._cancel_event.set()
+    
+    def _on_progress(self, stats: dict):
+        self.progress.emit(
+            f"已扫描 {stats['scanned']} 个文件，已处理 {stats['processed']} 个\n"
+            f"新导入 {stats['imported']}，跳过 {stats['skipped']}，错误 {stats['errors']}\n"
+            f"速度 {stats['rate']:.1f} 个/秒"
+        )
     
     def run(self):
         try:
             self.progress.emit("开始扫描目录...")
             
-            # 使用高性能导入方法
+            # 使用高性能流式导入方法
             result = self.photo_manager.import_directory_optimized(
                 self.directory,
                 self.recursive,
                 self.album_id,
                 self.tag_settings,
                 self.max_workers,
-                self.batch_size
+                self.batch_size,
+                progress_callback=self._on_progress,
+                batch_callback=lambda photo_ids: self.batch_committed.emit(len(photo_ids)),
+                cancel_event=self._cancel_event
             )
             
             self.finished.emit(result)
@@ -224,6 +243,8 @@ class ImportConfigDialog(QDialog):
 class MainWindow(QMainWindow):
     """Main application window."""
     
+    thumbnails_generated = pyqtSignal(list)  # 后台缩略图服务生成完成的(照片ID, 缩略图引用)
+    
     def __init__(self):
         super().__init__()
         
@@ -278,6 +299,8 @@ class MainWindow(QMainWindow):
         # Create UI after language is set
         self.init_ui()
         self.load_settings()
+        self.apply_image_cache_settings()
+        self.start_thumbnail_service()
         
         self.logger.info("Application started")    
     
@@ -648,15 +671,8 @@ class MainWindow(QMainWindow):
     def on_janus_generate_requested(self, payload: dict):
         """处理 Janus 生图请求 - 调用独立插件"""
         try:
-            # 获取 Janus 文生图插件 - 使用字典结构
-            plugin = None
-            for plugin_name, plugin_obj in self.plugin_manager.plugins.items():
-                try:
-                    if hasattr(plugin_obj, 'get_info') and plugin_obj.get_info().name == "Janus文生图":
-                        plugin = plugin_obj
-                        break
-                except Exception:
-                    continue
+            # 获取 Janus 文生图插件（延迟加载的插件在此首次导入）
+            plugin = self.plugin_manager.get_plugin("Janus文生图")
             
             if plugin is None:
                 QMessageBox.warning(self, "错误", "Janus文生图插件未加载")
@@ -1006,6 +1022,11 @@ class MainWindow(QMainWindow):
         repair_paths_action.triggered.connect(self.repair_file_paths)
         tools_menu.addAction(repair_paths_action)
         
+        # 缩略图缓存清理
+        cleanup_thumbnails_action = QAction(self.get_text("Clean Thumbnail Cache", "清理缩略图缓存"), self)
+        cleanup_thumbnails_action.triggered.connect(self.cleanup_thumbnail_cache)
+        tools_menu.addAction(cleanup_thumbnails_action)
+        
         plugin_manager_action = QAction(self.get_text("Plugin Manager", "插件管理器"), self)
         plugin_manager_action.triggered.connect(self.show_plugin_manager)
         tools_menu.addAction(plugin_manager_action)
@@ -1395,7 +1416,15 @@ class MainWindow(QMainWindow):
                 settings.get("batch_size", 50)
             )
             
+            # 每批提交后节流刷新照片列表，导入过程中即可看到新照片
+            self.import_refresh_timer = QTimer(self)
+            self.import_refresh_timer.setSingleShot(True)
+            self.import_refresh_timer.setInterval(1000)
+            self.import_refresh_timer.timeout.connect(self.refresh_photos)
+            
             self.optimized_import_worker.progress.connect(self.update_optimized_import_progress)
+            self.optimized_import_worker.batch_committed.connect(self.on_optimized_import_batch_committed)
+            self.import_progress_dialog.canceled.connect(self.optimized_import_worker.cancel)
             self.optimized_import_worker.finished.connect(self.on_optimized_import_finished)
             self.optimized_import_worker.error.connect(self.on_optimized_import_error)
             self.optimized_import_worker.start()
@@ -1411,8 +1440,15 @@ class MainWindow(QMainWindow):
             self.import_progress_dialog.setLabelText(message)
             QApplication.processEvents()
 
+    def on_optimized_import_batch_committed(self, count: int):
+        """一批照片已写入数据库，稍后刷新照片列表。"""
+        if hasattr(self, 'import_refresh_timer') and not self.import_refresh_timer.isActive():
+            self.import_refresh_timer.start()
+
     def on_optimized_import_finished(self, result: dict):
         """高性能导入完成处理。"""
+        if hasattr(self, 'import_refresh_timer'):
+            self.import_refresh_timer.stop()
         if hasattr(self, 'import_progress_dialog') and self.import_progress_dialog:
             self.import_progress_dialog.close()
         
@@ -1430,7 +1466,10 @@ class MainWindow(QMainWindow):
 扫描时间: {performance_info.get("scan_time", "0.00s")}
 预处理时间: {performance_info.get("preprocess_time", "0.00s")}
 导入时间: {performance_info.get("import_time", "0.00s")}
-总时间: {performance_info.get("total_time", "0.00s")}"""
+总时间: {performance_info.get("total_time", "0.00s")}
+处理速度: {performance_info.get("throughput", "-")}"""
+            if result.get("cancelled"):
+                message = "导入已取消，已提交的照片已保留。\n\n" + message
             
             QMessageBox.information(self, "高性能导入完成", message)
             
@@ -1678,8 +1717,8 @@ class MainWindow(QMainWindow):
             
             self.logger.info(f"开始搜索照片: query='{query}', favorites_only={favorites_only}, rating_min={rating_min}, album_ids={album_ids}")
             
-            # 执行搜索
-            results = self.photo_manager.search_photos(
+            # 执行搜索（按游标分页，滚动时再从数据库拉取后续结果）
+            filters = dict(
                 query=query,
                 favorites_only=favorites_only,
                 rating_min=rating_min,
@@ -1689,26 +1728,33 @@ class MainWindow(QMainWindow):
                 camera_filter=camera_filter,
                 date_from=date_from,
                 date_to=date_to,
-                album_ids=album_ids,
-                limit=100
+                album_ids=album_ids
             )
             
-            self.logger.info(f"搜索完成，找到 {len(results)} 张照片")
+            def fetch_page(cursor, page_size):
+                return self.photo_manager.search_photos_page(page_size=page_size, cursor=cursor,
+                                                             summary_only=True, **filters)
             
+            total_count = self.photo_manager.count_search_results(**filters)["count"]
+            self.logger.info(f"搜索完成，找到 {total_count} 张照片")
+            
+            results = []
             # 更新搜索结果显示
             if hasattr(self, 'search_results_widget'):
-                self.search_results_widget.display_photos(results)
+                self.search_results_widget.display_paged(fetch_page, total_count)
+                results = self.search_results_widget.photos
             
             # 同时更新主窗口的缩略图显示
             if self.thumbnail_widget:
-                self.thumbnail_widget.display_photos(results)
-                self.logger.info("搜索结果已更新到主缩略图显示: count=%d", len(results))
+                self.thumbnail_widget.display_paged(fetch_page, total_count)
+                results = self.thumbnail_widget.photos
+                self.logger.info("搜索结果已更新到主缩略图显示: loaded=%d, total=%d", len(results), total_count)
             
-            # 保存搜索结果用于导航
+            # 保存搜索结果用于导航（与缩略图列表共享，滚动加载后同步增长）
             self.current_search_results = results
             
             # 更新照片计数
-            self.update_photo_count(len(results))
+            self.update_photo_count(total_count)
             
         except Exception as e:
             self.logger.error(f"搜索照片失败: {str(e)}")
@@ -1912,14 +1958,14 @@ class MainWindow(QMainWindow):
             elif hasattr(self, 'current_album_id') and self.current_album_id:
                 # 如果选中了相册，显示相册中的照片
                 try:
-                    photos = self.db_manager.get_album_photos(self.current_album_id)
+                    photos = self.db_manager.get_album_photos(self.current_album_id, summary_only=True)
                     self.logger.info("Displaying album photos: album_id=%s, count=%d", self.current_album_id, len(photos))
                 except Exception as e:
                     self.logger.error("Failed to get album photos: album_id=%s, error=%s", self.current_album_id, str(e))
                     photos = []
             else:
                 # 默认显示所有照片
-                photos = self.photo_manager.search_photos(limit=1000)
+                photos = self.photo_manager.search_photos(limit=1000, summary_only=True)
                 self.logger.info("Displaying all photos: count=%d", len(photos))
             
             # 更新显示
@@ -2010,13 +2056,15 @@ class MainWindow(QMainWindow):
             
             if current_index is None or current_index <= 0:
                 # 已经是第一张，循环到最后一张
-                next_photo = current_photos[-1]
+                new_index = len(current_photos) - 1
             else:
                 # 显示上一张
-                next_photo = current_photos[current_index - 1]
+                new_index = current_index - 1
+            next_photo = current_photos[new_index]
             
             # 显示照片
             self.on_photo_selected(next_photo.get('id'))
+            self.prefetch_adjacent_photos(current_photos, new_index, step=-1)
             
         except Exception as e:
             self.logger.error("Failed to show previous photo: error=%s", str(e))
@@ -2043,17 +2091,28 @@ class MainWindow(QMainWindow):
             
             if current_index is None or current_index >= len(current_photos) - 1:
                 # 已经是最后一张，循环到第一张
-                next_photo = current_photos[0]
+                new_index = 0
             else:
                 # 显示下一张
-                next_photo = current_photos[current_index + 1]
+                new_index = current_index + 1
+            next_photo = current_photos[new_index]
             
             # 显示照片
             self.on_photo_selected(next_photo.get('id'))
+            self.prefetch_adjacent_photos(current_photos, new_index, step=1)
             
         except Exception as e:
             self.logger.error("Failed to show next photo: error=%s", str(e))
     
+    def prefetch_adjacent_photos(self, photos: list, index: int, step: int = 1):
+        """Decode the photos around index in the background, the browsing direction first."""
+        if not photos or not self.photo_viewer:
+            return
+        count = len(photos)
+        offsets = [step, -step, 2 * step]
+        neighbours = [photos[(index + offset) % count] for offset in offsets if abs(offset) < count]
+        self.photo_viewer.prefetch_photos(neighbours)
+    
     def get_current_photo_list(self) -> list:
         """获取当前显示的照片列表"""
         # 根据当前状态返回相应的照片列表
@@ -2063,7 +2122,7 @@ class MainWindow(QMainWindow):
             return self.current_album_photos
         else:
             # 返回所有照片
-            return self.db_manager.search_photos(limit=1000)
+            return self.db_manager.search_photos(limit=1000, summary_only=True)
     
     def get_current_photo_id(self) -> int:
         """获取当前显示的照片ID"""
@@ -2416,6 +2475,71 @@ class MainWindow(QMainWindow):
             self.logger.error("Failed to show proxy config: error=%s", str(e))
             QMessageBox.critical(self, "错误", f"无法打开代理配置对话框：{str(e)}")
     
+    def apply_image_cache_settings(self):
+        """Apply the memory budgets of the grid thumbnail and viewer image caches."""
+        memory_cache_mb = self.config_manager.get("thumbnail.memory_cache_mb", 128)
+        shared_pixmap_cache().set_budget(max(1, int(memory_cache_mb)) * 1024 * 1024)
+        viewer_cache_mb = self.config_manager.get("ui.viewer_cache_mb", 256)
+        shared_image_loader().set_cache_budget(max(1, int(viewer_cache_mb)) * 1024 * 1024)
+    
+    def start_thumbnail_service(self):
+        """Connect the background thumbnail service to the grids and resume its queue."""
+        service = self.photo_manager.thumbnail_service
+        service.on_generated = lambda results: self.thumbnails_generated.emit(list(results))
+        self.thumbnails_generated.connect(self.on_thumbnails_generated)
+        for widget in self.get_thumbnail_widgets():
+            widget.missing_thumbnail_handler = service.request_visible
+        service.resume()
+        
+        # 队列非空时在状态栏显示进度
+        self.thumbnail_status_timer = QTimer(self)
+        self.thumbnail_status_timer.setInterval(2000)
+        self.thumbnail_status_timer.timeout.connect(self.update_thumbnail_service_status)
+        self.thumbnail_status_timer.start()
+    
+    def update_thumbnail_service_status(self):
+        """Show background thumbnail progress in the status bar while work is pending."""
+        stats = self.photo_manager.thumbnail_service.stats()
+        if stats["queue_depth"] or stats["in_progress"]:
+            self.statusBar().showMessage(
+                self.get_text(
+                    f"Generating thumbnails: {stats['queue_depth']} pending, {stats['throughput']:.1f}/s",
+                    f"正在生成缩略图：剩余 {stats['queue_depth']} 张，{stats['throughput']:.1f} 张/秒"
+                ), 2500)
+    
+    def get_thumbnail_widgets(self) -> List[ThumbnailWidget]:
+        """All thumbnail grids in the window."""
+        widgets = [self.thumbnail_widget, getattr(self, "search_results_widget", None)]
+        if self.album_manager:
+            widgets.append(getattr(self.album_manager, "thumbnail_widget", None))
+        return [widget for widget in widgets if widget is not None]
+    
+    def on_thumbnails_generated(self, results: list):
+        """Reload grid items whose thumbnails were just generated in the background."""
+        for widget in self.get_thumbnail_widgets():
+            widget.on_thumbnails_generated(results)
+    
+    def cleanup_thumbnail_cache(self):
+        """Remove thumbnails of photos no longer in the library and compact thumbnail packs."""
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            result = self.photo_manager.cleanup_thumbnail_cache()
+        finally:
+            QApplication.restoreOverrideCursor()
+        
+        if result.get("success"):
+            QMessageBox.information(
+                self, self.get_text("Thumbnail Cache", "缩略图缓存"),
+                self.get_text(
+                    f"Removed {result['removed_files'] + result['removed_packed']} orphaned thumbnails, "
+                    f"reclaimed {result['bytes_reclaimed'] / 1024 / 1024:.1f} MB.",
+                    f"已删除 {result['removed_files'] + result['removed_packed']} 个无效缩略图，"
+                    f"回收 {result['bytes_reclaimed'] / 1024 / 1024:.1f} MB 空间。"
+                )
+            )
+        else:
+            QMessageBox.critical(self, self.get_text("Error", "错误"), result.get("error", ""))
+    
     def repair_file_paths(self):
         """Repair missing file paths by searching for moved files."""
         try:
@@ -2689,6 +2813,12 @@ class MainWindow(QMainWindow):
         # Unload plugins
         self.plugin_manager.unload_all_plugins()
         
+        # 停止后台缩略图服务，未完成的照片留在队列中下次继续
+        self.photo_manager.thumbnail_service.stop()
+        
+        # Close pooled database connections
+        self.db_manager.close()
+        
         self.logger.info("Application closing")
         event.accept()
 
@@ -2920,6 +3050,12 @@ class MainWindow(QMainWindow):
         # Unload plugins
         self.plugin_manager.unload_all_plugins()
         
+        # 停止后台缩略图服务，未完成的照片留在队列中下次继续
+        self.photo_manager.thumbnail_service.stop()
+        
+        # Close pooled database connections
+        self.db_manager.close()
+        
         self.logger.info("Application closing")
         event.accept()
 
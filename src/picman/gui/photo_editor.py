@@ -9,13 +9,47 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
     QSlider, QSpinBox, QGroupBox, QScrollArea, QWidget,
     QFileDialog, QMessageBox, QSplitter, QFrame, QCheckBox,
-    QComboBox, QTabWidget, QGridLayout, QButtonGroup, QRadioButton
+    QComboBox, QTabWidget, QGridLayout, QButtonGroup, QRadioButton, QApplication
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QRect, QPoint
+from PyQt6.QtCore import Qt, pyqtSignal, QRect, QPoint, QTimer, QThreadPool, QRunnable
 from PyQt6.QtGui import QPixmap, QPainter, QPen, QColor, QTransform, QImage
 import logging
-from PIL import Image, ImageEnhance, ImageFilter
-import numpy as np
+from PIL import Image
+
+from ..core.edit_pipeline import EditHistory, EditState, FILTER_NONE, make_proxy, render
+
+
+# 交互预览使用的缩小图长边，以及滑块停止多久后开始渲染
+PREVIEW_MAX_SIDE = 1600
+PREVIEW_DEBOUNCE_MS = 40
+
+
+def pil_to_qimage(pil_image: Image.Image) -> QImage:
+    """将PIL图像转换为QImage（可在工作线程中调用）"""
+    if pil_image.mode != "RGBA":
+        pil_image = pil_image.convert("RGBA")
+    data = pil_image.tobytes("raw", "RGBA")
+    # copy()让QImage拥有自己的像素数据
+    return QImage(data, pil_image.width, pil_image.height, pil_image.width * 4,
+                  QImage.Format.Format_RGBA8888).copy()
+
+
+class PreviewRenderTask(QRunnable):
+    """在工作线程中把编辑参数应用到预览图"""
+    
+    def __init__(self, generation: int, proxy: Image.Image, state: EditState, callback):
+        super().__init__()
+        self.generation = generation
+        self.proxy = proxy
+        self.state = state
+        self.callback = callback
+    
+    def run(self):
+        try:
+            image = pil_to_qimage(render(self.proxy, self.state))
+        except Exception:
+            image = QImage()
+        self.callback.emit(self.generation, image)
 
 
 class CropWidget(QWidget):
@@ -156,23 +190,38 @@ class CropWidget(QWidget):
 
 
 class PhotoEditorDialog(QDialog):
-    """Photo editor dialog with basic editing tools."""
+    """Photo editor dialog with basic editing tools.
+    
+    Edits are non-destructive: they are kept as an operation list
+    (EditHistory), previews are rendered from a downscaled copy in a worker
+    thread, and the full-resolution image is only processed on save.
+    """
+    
+    preview_rendered = pyqtSignal(int, QImage)  # generation, image
     
     def __init__(self, photo_path: str, parent=None):
         super().__init__(parent)
         self.photo_path = photo_path
-        self.original_image = None
-        self.current_image = None
+        self.original_image = None  # 预览用的缩小图
+        self.current_image = None  # 当前预览结果（QImage）
         # 配置标准logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger("picman.gui.photo_editor")
         
-        # 编辑参数
-        self.brightness = 1.0
-        self.contrast = 1.0
-        self.saturation = 1.0
-        self.sharpness = 1.0
-        self.rotation_angle = 0
+        # 编辑操作列表（撤销/重做只移动游标）
+        self.history = EditHistory()
+        
+        # 预览渲染：防抖后提交到单线程池，只显示最新一次的结果
+        self.render_pool = QThreadPool(self)
+        self.render_pool.setMaxThreadCount(1)
+        self.render_generation = 0
+        self.render_in_flight = False
+        self.render_pending = False
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self.render_timer.timeout.connect(self.start_preview_render)
+        self.preview_rendered.connect(self.on_preview_rendered)
         
         self.init_ui()
         self.load_image()
@@ -446,22 +495,22 @@ class PhotoEditorDialog(QDialog):
         layout.addLayout(button_layout)
     
     def load_image(self):
-        """加载图片"""
+        """加载图片（只解码预览所需的分辨率）"""
         try:
-            self.original_image = Image.open(self.photo_path)
-            self.current_image = self.original_image.copy()
-            self.update_display()
-            self.logger.info("Image loaded successfully: %s", self.photo_path)
+            with Image.open(self.photo_path) as image:
+                image.draft("RGB", (PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE))
+                self.original_image = make_proxy(image, PREVIEW_MAX_SIDE)
+            self.schedule_preview(immediate=True)
+            self.logger.info("Image loaded successfully: %s, preview_size=%s", self.photo_path,
+                             self.original_image.size)
         except Exception as e:
             self.logger.error("Failed to load image: %s", str(e))
             QMessageBox.critical(self, "错误", f"无法加载图片: {str(e)}")
     
     def update_display(self):
         """更新显示"""
-        if self.current_image:
-            # 转换为QPixmap
-            qimage = self.pil_to_qimage(self.current_image)
-            pixmap = QPixmap.fromImage(qimage)
+        if self.current_image is not None and not self.current_image.isNull():
+            pixmap = QPixmap.fromImage(self.current_image)
             
             # 缩放以适应显示区域
             scaled_pixmap = self.scale_pixmap(pixmap)
@@ -479,97 +528,102 @@ class PhotoEditorDialog(QDialog):
             Qt.TransformationMode.SmoothTransformation
         )
     
-    def pil_to_qimage(self, pil_image: Image.Image) -> QImage:
-        """将PIL图像转换为QImage"""
-        if pil_image.mode == "RGB":
-            r, g, b = pil_image.split()
-            pil_image = Image.merge("RGB", (b, g, r))
-        elif pil_image.mode == "RGBA":
-            r, g, b, a = pil_image.split()
-            pil_image = Image.merge("RGBA", (b, g, r, a))
-        
-        im_data = pil_image.tobytes("raw", pil_image.mode)
-        qimage = QImage(im_data, pil_image.size[0], pil_image.size[1], 
-                       QImage.Format.Format_RGB888)
-        return qimage
-    
     def on_brightness_changed(self, value):
         """亮度改变"""
-        self.brightness = value / 100.0
         self.brightness_spinbox.setValue(value)
-        self.apply_adjustments()
+        self.record_operation("brightness", value / 100.0)
     
     def on_contrast_changed(self, value):
         """对比度改变"""
-        self.contrast = value / 100.0
         self.contrast_spinbox.setValue(value)
-        self.apply_adjustments()
+        self.record_operation("contrast", value / 100.0)
     
     def on_saturation_changed(self, value):
         """饱和度改变"""
-        self.saturation = value / 100.0
         self.saturation_spinbox.setValue(value)
-        self.apply_adjustments()
+        self.record_operation("saturation", value / 100.0)
     
     def on_sharpness_changed(self, value):
         """锐化改变"""
-        self.sharpness = value / 100.0
         self.sharpness_spinbox.setValue(value)
-        self.apply_adjustments()
+        self.record_operation("sharpness", value / 100.0)
+    
+    def record_operation(self, name: str, value=None):
+        """记录一次编辑操作并刷新预览"""
+        state = self.history.state()
+        if name in EditHistory.MERGEABLE and getattr(state, name) == value:
+            return
+        if name == "filter" and state.filter_name == value:
+            return
+        self.history.push(name, value)
+        self.update_history_buttons()
+        self.schedule_preview()
     
     def apply_adjustments(self):
-        """应用调整"""
-        if not self.original_image:
+        """应用调整（刷新预览）"""
+        self.schedule_preview()
+    
+    def schedule_preview(self, immediate: bool = False):
+        """防抖：滑块连续变化时只渲染最后一次"""
+        if immediate:
+            self.render_timer.stop()
+            self.start_preview_render()
+        else:
+            self.render_timer.start()
+    
+    def start_preview_render(self):
+        if self.original_image is None:
             return
-        
-        try:
-            # 从原图开始应用调整
-            image = self.original_image.copy()
-            
-            # 应用亮度
-            if self.brightness != 1.0:
-                enhancer = ImageEnhance.Brightness(image)
-                image = enhancer.enhance(self.brightness)
-            
-            # 应用对比度
-            if self.contrast != 1.0:
-                enhancer = ImageEnhance.Contrast(image)
-                image = enhancer.enhance(self.contrast)
-            
-            # 应用饱和度
-            if self.saturation != 1.0:
-                enhancer = ImageEnhance.Color(image)
-                image = enhancer.enhance(self.saturation)
-            
-            # 应用锐化
-            if self.sharpness != 1.0:
-                enhancer = ImageEnhance.Sharpness(image)
-                image = enhancer.enhance(self.sharpness)
-            
-            # 应用旋转
-            if self.rotation_angle != 0:
-                image = image.rotate(self.rotation_angle, expand=True)
-            
+        if self.render_in_flight:
+            # 上一次渲染完成后再开始，避免排队
+            self.render_pending = True
+            return
+        self.render_in_flight = True
+        self.render_pending = False
+        self.render_generation += 1
+        self.render_pool.start(PreviewRenderTask(self.render_generation, self.original_image,
+                                                 self.history.state(), self.preview_rendered))
+    
+    def on_preview_rendered(self, generation: int, image: QImage):
+        self.render_in_flight = False
+        if generation == self.render_generation and not image.isNull():
             self.current_image = image
             self.update_display()
-            
-        except Exception as e:
-            self.logger.error("Failed to apply adjustments: %s", str(e))
+        if self.render_pending:
+            self.start_preview_render()
+    
+    def done(self, result):
+        # 等待进行中的预览渲染结束，避免信号发往已关闭的对话框
+        self.render_timer.stop()
+        self.render_pool.waitForDone()
+        super().done(result)
+    
+    def sync_controls(self):
+        """按当前参数同步控件（不产生新的操作）"""
+        state = self.history.state()
+        controls = [
+            (self.brightness_slider, self.brightness_spinbox, state.brightness),
+            (self.contrast_slider, self.contrast_spinbox, state.contrast),
+            (self.saturation_slider, self.saturation_spinbox, state.saturation),
+            (self.sharpness_slider, self.sharpness_spinbox, state.sharpness),
+        ]
+        for slider, spinbox, factor in controls:
+            for widget in (slider, spinbox):
+                widget.blockSignals(True)
+                widget.setValue(int(round(factor * 100)))
+                widget.blockSignals(False)
+        self.filter_combo.blockSignals(True)
+        self.filter_combo.setCurrentText(state.filter_name)
+        self.filter_combo.blockSignals(False)
+    
+    def update_history_buttons(self):
+        self.undo_btn.setEnabled(self.history.can_undo())
+        self.redo_btn.setEnabled(self.history.can_redo())
     
     def reset_adjustments(self):
         """重置调整"""
-        self.brightness = 1.0
-        self.contrast = 1.0
-        self.saturation = 1.0
-        self.sharpness = 1.0
-        self.rotation_angle = 0
-        
-        self.brightness_slider.setValue(100)
-        self.contrast_slider.setValue(100)
-        self.saturation_slider.setValue(100)
-        self.sharpness_slider.setValue(100)
-        
-        self.apply_adjustments()
+        self.record_operation("reset")
+        self.sync_controls()
     
     def apply_crop(self):
         """应用裁剪"""
@@ -578,61 +632,43 @@ class PhotoEditorDialog(QDialog):
     
     def apply_filter(self, filter_name: str):
         """应用滤镜"""
-        if not self.current_image:
-            return
-        
-        try:
-            image = self.current_image.copy()
-            
-            if filter_name == "黑白":
-                image = image.convert("L").convert("RGB")
-            elif filter_name == "复古":
-                # 简单的复古效果
-                enhancer = ImageEnhance.Color(image)
-                image = enhancer.enhance(0.8)
-                enhancer = ImageEnhance.Contrast(image)
-                image = enhancer.enhance(1.2)
-            elif filter_name == "冷色调":
-                # 简单的冷色调效果
-                enhancer = ImageEnhance.Color(image)
-                image = enhancer.enhance(0.7)
-            elif filter_name == "暖色调":
-                # 简单的暖色调效果
-                enhancer = ImageEnhance.Color(image)
-                image = enhancer.enhance(1.3)
-            elif filter_name == "模糊":
-                image = image.filter(ImageFilter.BLUR)
-            elif filter_name == "锐化":
-                image = image.filter(ImageFilter.SHARPEN)
-            
-            self.current_image = image
-            self.update_display()
-            
-        except Exception as e:
-            self.logger.error("Failed to apply filter: %s", str(e))
+        self.record_operation("filter", filter_name or FILTER_NONE)
     
     def rotate_image(self, angle: int):
         """旋转图片"""
-        self.rotation_angle = (self.rotation_angle + angle) % 360
-        self.apply_adjustments()
+        self.record_operation("rotate", angle)
     
     def undo(self):
         """撤销操作"""
-        # TODO: 实现撤销功能
-        pass
+        if self.history.undo():
+            self.sync_controls()
+            self.update_history_buttons()
+            self.schedule_preview(immediate=True)
     
     def redo(self):
         """重做操作"""
-        # TODO: 实现重做功能
-        pass
+        if self.history.redo():
+            self.sync_controls()
+            self.update_history_buttons()
+            self.schedule_preview(immediate=True)
+    
+    def render_full_resolution(self) -> Image.Image:
+        """把编辑应用到原始分辨率的图片（保存时调用）"""
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            with Image.open(self.photo_path) as image:
+                image.load()
+                return render(image, self.history.state())
+        finally:
+            QApplication.restoreOverrideCursor()
     
     def save_image(self):
         """保存图片"""
-        if not self.current_image:
+        if self.original_image is None:
             return
         
         try:
-            self.current_image.save(self.photo_path)
+            self.render_full_resolution().save(self.photo_path)
             QMessageBox.information(self, "成功", "图片保存成功！")
             self.accept()
         except Exception as e:
@@ -641,7 +677,7 @@ class PhotoEditorDialog(QDialog):
     
     def save_as_image(self):
         """另存为图片"""
-        if not self.current_image:
+        if self.original_image is None:
             return
         
         file_path, _ = QFileDialog.getSaveFileName(
@@ -650,7 +686,7 @@ class PhotoEditorDialog(QDialog):
         
         if file_path:
             try:
-                self.current_image.save(file_path)
+                self.render_full_resolution().save(file_path)
                 QMessageBox.information(self, "成功", "图片保存成功！")
             except Exception as e:
                 self.logger.error("Failed to save image as: %s", str(e))
@@ -7,13 +7,21 @@ from typing import Optional
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
     QPushButton, QScrollArea, QFrame, QSpinBox,
-    QCheckBox, QTextEdit, QGroupBox
+    QCheckBox, QTextEdit, QGroupBox, QStackedWidget
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QSize, QEvent, QPoint
 from PyQt6.QtGui import QPixmap, QPainter, QFont, QTransform
 from PyQt6.QtWidgets import QApplication
 import logging
 
+from ..core.thumbnail_generator import read_best_thumbnail
+from .image_loader import shared_image_loader, FULL_RESOLUTION
+from .tiled_image_view import TiledImageView, TILED_VIEW_MIN_PIXELS
+
+
+# 当前显示图片的级别：缩略图占位 < 屏幕尺寸 < 原始分辨率
+LEVEL_THUMBNAIL = -1
+
 
 class PhotoViewer(QWidget):
     """Widget for viewing and editing individual photos."""
@@ -41,6 +49,12 @@ class PhotoViewer(QWidget):
         self.drag_start_pos = None
         self.scroll_offset = QPoint(0, 0)  # 滚动偏移量
         
+        # 异步加载：先显示缩略图，屏幕尺寸的图片解码完成后替换，放大时再加载原图
+        self.image_loader = shared_image_loader()
+        self.image_loader.image_ready.connect(self.on_image_ready)
+        self.loaded_level = None
+        self.tiled_mode = False  # 超大图片放大后改用分块渲染
+        
         # 初始化旋转角度显示
         self.update_rotation_label()
         
@@ -62,7 +76,14 @@ class PhotoViewer(QWidget):
         self.image_label.setText("未选择照片")
         
         self.scroll_area.setWidget(self.image_label)
-        layout.addWidget(self.scroll_area, 1)
+        
+        # 超大图片放大时的分块渲染视图，与普通显示区域叠放切换
+        self.tiled_view = TiledImageView()
+        self.tiled_view.zoom_changed.connect(self.on_tiled_zoom_changed)
+        self.image_stack = QStackedWidget()
+        self.image_stack.addWidget(self.scroll_area)
+        self.image_stack.addWidget(self.tiled_view)
+        layout.addWidget(self.image_stack, 1)
         
         # Toolbar for image controls (4区下方 - 图片控制工具栏)
         toolbar_layout = QHBoxLayout()
@@ -405,6 +426,7 @@ class PhotoViewer(QWidget):
             return
         
         # 新照片，重新加载
+        self.leave_tiled_mode()
         self.current_photo = photo_data
         self.zoom_factor = 1.0
         # 不重置旋转角度，保持用户的旋转设置
@@ -417,21 +439,39 @@ class PhotoViewer(QWidget):
         original_found = False
         
         if file_path and Path(file_path).exists():
-            # 加载并处理EXIF方向的图片
-            pixmap = self.load_image_with_exif_orientation(file_path)
-            if not pixmap.isNull():
+            original_found = True
+            preview_side = self.preview_max_side()
+            pixmap = self.image_loader.request(file_path, preview_side)
+            if pixmap is not None and not pixmap.isNull():
+                self.loaded_level = preview_side
+                self.logger.info("Original image displayed from cache: %s", file_path)
+            else:
+                # 解码在后台进行，先显示最合适的缩略图级别
+                pixmap = self.load_thumbnail_pixmap(photo_data)
+                self.loaded_level = LEVEL_THUMBNAIL
+            if pixmap is not None and not pixmap.isNull():
                 self.original_pixmap = pixmap
                 self.current_pixmap = pixmap
                 self.image_label.setPixmap(self.scale_pixmap(pixmap))
                 self.image_label.setText("")
-                original_found = True
-                self.logger.info("Original image displayed with EXIF orientation: %s", file_path)
+            else:
+                self.original_pixmap = None
+                self.current_pixmap = None
+                self.image_label.clear()
+                self.image_label.setText("加载中...")
+            self.image_label.setStyleSheet("")
         
         # 如果原图不存在，尝试显示缩略图
         if not original_found:
+            # 选用缩略图金字塔中最适合显示区域的级别（文件缓存或缩略图包）
             thumbnail_path = photo_data.get("thumbnail_path", "")
-            if thumbnail_path and Path(thumbnail_path).exists():
-                pixmap = QPixmap(thumbnail_path)
+            thumbnail_data = read_best_thumbnail(photo_data.get("file_hash", ""), (800, 600))
+            if thumbnail_data or (thumbnail_path and Path(thumbnail_path).exists()):
+                pixmap = QPixmap()
+                if thumbnail_data:
+                    pixmap.loadFromData(thumbnail_data)
+                else:
+                    pixmap.load(thumbnail_path)
                 if not pixmap.isNull():
                     # 放大缩略图以更好地显示
                     scaled_pixmap = pixmap.scaled(
@@ -483,8 +523,126 @@ class PhotoViewer(QWidget):
         else:
             self.filename_label.setStyleSheet("")
     
+    def preview_max_side(self) -> int:
+        """Long edge used for the display level: the screen resolution."""
+        screen = self.screen() or QApplication.primaryScreen()
+        if screen is None:
+            return 2048
+        size = screen.size() * screen.devicePixelRatio()
+        return max(1024, size.width(), size.height())
+    
+    def load_thumbnail_pixmap(self, photo_data: dict) -> Optional[QPixmap]:
+        """Best thumbnail level of a photo for the display area, or None."""
+        thumbnail_path = photo_data.get("thumbnail_path", "")
+        thumbnail_data = read_best_thumbnail(photo_data.get("file_hash", ""), (800, 600))
+        pixmap = QPixmap()
+        if thumbnail_data:
+            pixmap.loadFromData(thumbnail_data)
+        elif thumbnail_path and Path(thumbnail_path).exists():
+            pixmap.load(thumbnail_path)
+        return pixmap if not pixmap.isNull() else None
+    
+    @staticmethod
+    def _level_rank(level: Optional[int]) -> int:
+        if level is None:
+            return -1
+        if level == LEVEL_THUMBNAIL:
+            return 0
+        return 2 if level == FULL_RESOLUTION else 1
+    
+    def on_image_ready(self, file_path: str, level: int, pixmap: QPixmap):
+        """后台解码完成：如果仍是当前照片且比正在显示的级别更清晰，则替换"""
+        if not self.current_photo or self.current_photo.get("filepath") != file_path:
+            return
+        if pixmap.isNull():
+            if self.original_pixmap is None:
+                self.image_label.setText("无法加载图片")
+            return
+        if self._level_rank(level) <= self._level_rank(self.loaded_level):
+            return
+        self.upgrade_pixmap(pixmap, level)
+    
+    def upgrade_pixmap(self, pixmap: QPixmap, level: int):
+        """用更清晰的图片替换当前图片，保持旋转和显示大小不变"""
+        if self.original_pixmap and not self.original_pixmap.isNull() and self.zoom_factor != 1.0:
+            self.zoom_factor *= self.original_pixmap.width() / max(1, pixmap.width())
+            self.update_zoom_label()
+        # 只有正在显示的是旋转后的图片时才重新应用旋转，避免替换时画面突然转向
+        rotated = self.current_pixmap is not None and self.current_pixmap is not self.original_pixmap
+        self.original_pixmap = pixmap
+        self.current_pixmap = pixmap
+        self.loaded_level = level
+        self.image_label.setText("")
+        if self.tiled_mode:
+            self.tiled_view.set_backdrop(pixmap)
+        if rotated:
+            self.update_display()
+        else:
+            self.apply_zoom_and_display()
+        self.logger.info("Viewer image upgraded: level=%s, size=%sx%s", level, pixmap.width(), pixmap.height())
+    
+    def request_full_resolution(self):
+        """放大超过屏幕尺寸级别时加载原始分辨率；超大图片改为分块渲染"""
+        if (not self.current_photo or self.zoom_factor <= 1.0 or self.tiled_mode
+                or self.loaded_level == FULL_RESOLUTION):
+            return
+        file_path = self.current_photo.get("filepath")
+        if not file_path or not Path(file_path).exists():
+            return
+        width = self.current_photo.get("width") or 0
+        height = self.current_photo.get("height") or 0
+        source_side = max(width, height)
+        if self.original_pixmap and source_side and source_side <= max(self.original_pixmap.width(),
+                                                                        self.original_pixmap.height()):
+            return
+        if width * height >= TILED_VIEW_MIN_PIXELS and self.enter_tiled_mode():
+            return
+        pixmap = self.image_loader.request(file_path, FULL_RESOLUTION)
+        if pixmap is not None and not pixmap.isNull():
+            self.upgrade_pixmap(pixmap, FULL_RESOLUTION)
+    
+    def enter_tiled_mode(self) -> bool:
+        """切换到分块渲染：只解码可见区域，旋转作为视图变换"""
+        if not self.tiled_view.set_image(self.current_photo.get("filepath"), self.original_pixmap,
+                                         self.zoom_factor, self.rotation_angle):
+            return False
+        self.tiled_mode = True
+        self.image_stack.setCurrentWidget(self.tiled_view)
+        self.logger.info("Tiled rendering enabled: photo_id=%s", self.current_photo.get("id"))
+        return True
+    
+    def leave_tiled_mode(self):
+        if not self.tiled_mode:
+            return
+        self.tiled_mode = False
+        self.tiled_view.clear()
+        self.image_stack.setCurrentWidget(self.scroll_area)
+    
+    def on_tiled_zoom_changed(self, zoom_factor: float):
+        """分块视图中滚轮缩放"""
+        self.zoom_factor = zoom_factor
+        self.update_zoom_label()
+    
+    def prefetch_photos(self, photos: list):
+        """预先在后台解码即将浏览的照片（屏幕尺寸级别）"""
+        preview_side = self.preview_max_side()
+        self.image_loader.prefetch(
+            [photo.get("filepath") for photo in photos
+             if photo and photo.get("filepath") and Path(photo.get("filepath")).exists()],
+            preview_side)
+    
+    def reload_current_photo(self, *file_paths: str):
+        """文件被修改后丢弃缓存并重新加载当前照片"""
+        for file_path in file_paths:
+            if file_path:
+                self.image_loader.invalidate(file_path)
+        self.original_pixmap = None
+        self.loaded_level = None
+        self.display_photo(self.current_photo)
+    
     def display_photo_info_only(self, photo_data: dict):
         """显示照片信息但不显示图片（当原图不存在时）。"""
+        self.leave_tiled_mode()
         self.current_photo = photo_data
         self.zoom_factor = 1.0
         # 不重置旋转角度，保持用户的旋转设置
@@ -804,6 +962,7 @@ class PhotoViewer(QWidget):
         self.zoom_factor *= 1.25
         self.update_zoom_label()
         self.update_display()
+        self.request_full_resolution()
     
     def zoom_out(self):
         """Zoom out from the image."""
@@ -984,6 +1143,10 @@ class PhotoViewer(QWidget):
     def apply_rotation_and_display(self):
         """应用旋转并立即显示 - 这是修复后的核心方法"""
         try:
+            if self.tiled_mode:
+                self.tiled_view.set_view(self.zoom_factor, self.rotation_angle)
+                return
+            
             if not self.original_pixmap or self.original_pixmap.isNull():
                 self.logger.warning("无法应用旋转：没有有效的原图")
                 return
@@ -1081,6 +1244,10 @@ class PhotoViewer(QWidget):
         
         简化版本：旋转由apply_rotation方法处理，这里只处理缩放
         """
+        if self.tiled_mode:
+            self.tiled_view.set_view(self.zoom_factor, self.rotation_angle)
+            return
+        
         if not self.original_pixmap or self.original_pixmap.isNull():
             self.logger.warning("无法更新显示：没有有效的图片")
             return
@@ -1100,6 +1267,10 @@ class PhotoViewer(QWidget):
     
     def apply_zoom_and_display(self):
         """应用缩放并显示图片"""
+        if self.tiled_mode:
+            self.tiled_view.set_view(self.zoom_factor, self.rotation_angle)
+            return
+        
         if not self.current_pixmap or self.current_pixmap.isNull():
             return
         
@@ -1599,7 +1770,7 @@ class PhotoViewer(QWidget):
             self.update_rotation_label()
             
             # 重新加载图片
-            self.display_photo(self.current_photo)
+            self.reload_current_photo(original_path, save_path)
             
             QMessageBox.information(self, "成功", "图片旋转已保存")
             
@@ -1625,7 +1796,7 @@ class PhotoViewer(QWidget):
             editor = PhotoEditorDialog(self.current_photo['filepath'], self)
             if editor.exec() == PhotoEditorDialog.DialogCode.Accepted:
                 # 重新加载图片
-                self.display_photo(self.current_photo)
+                self.reload_current_photo(self.current_photo['filepath'])
                 self.photo_updated.emit(self.current_photo['id'])
                 self.logger.info("Photo edited and saved: photo_id=%s", self.current_photo['id'])
         except ImportError as e:
@@ -1634,123 +1805,19 @@ class PhotoViewer(QWidget):
             self.logger.error("Failed to open photo editor: %s", str(e))
     
     def load_image_with_exif_orientation(self, file_path: str) -> QPixmap:
-        """加载图片并处理EXIF方向信息 - 重新设计版本
-        
-        这个方法的职责：
-        1. 加载原始图片
-        2. 处理EXIF方向信息，确保图片以正确方向显示
-        3. 返回处理后的图片作为新的"标准方向"
+        """同步加载屏幕尺寸的图片（已按EXIF方向摆正），经过共享缓存
         
-        注意：处理完成后，这个图片就是新的参考系，用户的所有旋转都基于这个方向
+        处理完成后，这个图片就是新的参考系，用户的所有旋转都基于这个方向
         """
         try:
-            # 检查缓存
-            if hasattr(self, '_image_cache') and file_path in self._image_cache:
-                self.logger.info("使用缓存的图片: path=%s", file_path)
-                return self._image_cache[file_path]
-            
-            # 检查PIL依赖是否可用
-            try:
-                from PIL import Image, ImageOps
-                pil_available = True
-            except ImportError:
-                self.logger.warning("PIL库不可用，使用基础图片加载方式: %s", file_path)
-                pil_available = False
-            
-            if pil_available:
-                try:
-                    import io
-                    
-                    # 使用PIL加载图片
-                    pil_image = Image.open(file_path)
-                    
-                    # 获取EXIF方向信息
-                    exif = pil_image.getexif()
-                    orientation = exif.get(274)  # 274 是 Orientation 标签
-                    
-                    self.logger.info("加载图片EXIF信息: path=%s, orientation=%s, original_size=%s", 
-                                   file_path, orientation, f"{pil_image.width}x{pil_image.height}")
-                    
-                    # 根据EXIF方向信息旋转图片到标准方向
-                    if orientation and orientation != 1:  # 1是正常方向，不需要处理
-                        # EXIF方向值对应的旋转角度（PIL的rotate是逆时针）
-                        orientation_rotations = {
-                            1: 0,    # 正常
-                            2: 0,    # 水平翻转
-                            3: 180,  # 旋转180度
-                            4: 0,    # 垂直翻转
-                            5: 0,    # 水平翻转+旋转90度
-                            6: 270,  # 旋转90度（顺时针90度，PIL需要逆时针270度）
-                            7: 0,    # 水平翻转+旋转270度
-                            8: 90,   # 旋转270度（逆时针90度，PIL需要顺时针90度）
-                        }
-                        
-                        rotation_angle = orientation_rotations.get(orientation, 0)
-                        
-                        if rotation_angle != 0:
-                            # 旋转图片到标准方向
-                            pil_image = pil_image.rotate(rotation_angle, expand=True)
-                            self.logger.info("应用EXIF方向旋转到标准方向: original_orientation=%s, rotation_angle=%s, final_size=%s", 
-                                           orientation, rotation_angle, f"{pil_image.width}x{pil_image.height}")
-                        
-                        # 处理翻转
-                        if orientation in [2, 4, 5, 7]:
-                            if orientation in [2, 4]:  # 水平或垂直翻转
-                                pil_image = ImageOps.mirror(pil_image)
-                            elif orientation in [5, 7]:  # 需要先旋转再翻转
-                                pil_image = ImageOps.mirror(pil_image)
-                            self.logger.info("应用EXIF翻转: orientation=%s", orientation)
-                    
-                    # 优化：对于大图片，先压缩以提高性能
-                    max_size = 2048
-                    if pil_image.width > max_size or pil_image.height > max_size:
-                        # 计算缩放比例
-                        ratio = min(max_size / pil_image.width, max_size / pil_image.height)
-                        new_width = int(pil_image.width * ratio)
-                        new_height = int(pil_image.height * ratio)
-                        pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        self.logger.info("压缩大图片以提高性能: original_size=%s, compressed_size=%s", 
-                                       f"{pil_image.width}x{pil_image.height}", f"{new_width}x{new_height}")
-                    
-                    # 转换回QPixmap
-                    buffer = io.BytesIO()
-                    pil_image.save(buffer, format='PNG')
-                    buffer.seek(0)
-                    
-                    pixmap = QPixmap()
-                    if pixmap.loadFromData(buffer.getvalue()):
-                        # 缓存结果
-                        if not hasattr(self, '_image_cache'):
-                            self._image_cache = {}
-                        self._image_cache[file_path] = pixmap
-                        
-                        # 限制缓存大小，避免内存泄漏
-                        if len(self._image_cache) > 10:
-                            # 删除最旧的缓存项
-                            oldest_key = next(iter(self._image_cache))
-                            del self._image_cache[oldest_key]
-                        
-                        self.logger.info("图片加载完成，已处理EXIF方向: final_size=%s", 
-                                       f"{pixmap.width()}x{pixmap.height()}")
-                        
-                        return pixmap
-                    else:
-                        self.logger.warning("PIL转换QPixmap失败，回退到基础加载方式: %s", file_path)
-                        raise Exception("PIL转换QPixmap失败")
-                        
-                except Exception as pil_error:
-                    self.logger.warning("PIL处理失败，回退到基础加载方式: %s, error=%s", file_path, str(pil_error))
-                    # 如果PIL处理失败，回退到基础加载方式
-                    return self._load_image_basic(file_path)
-            else:
-                # PIL不可用，使用基础加载方式
-                return self._load_image_basic(file_path)
-            
+            pixmap = self.image_loader.load(file_path, self.preview_max_side())
+            if not pixmap.isNull():
+                self.loaded_level = self.preview_max_side()
+                return pixmap
         except Exception as e:
-            self.logger.error("图片加载完全失败，使用基础加载方式: path=%s, error=%s", 
-                            file_path, str(e))
-            # 如果所有方法都失败，使用基础加载方式
-            return self._load_image_basic(file_path)
+            self.logger.error("图片加载失败，使用基础加载方式: path=%s, error=%s", file_path, str(e))
+        self.loaded_level = FULL_RESOLUTION
+        return self._load_image_basic(file_path)
     
     def _load_image_basic(self, file_path: str) -> QPixmap:
         """基础图片加载方式，不依赖PIL"""
@@ -1816,6 +1883,7 @@ class PhotoViewer(QWidget):
     def clear_display(self):
         """清空显示内容"""
         try:
+            self.leave_tiled_mode()
             self.current_photo = None
             self.current_pixmap = None
             self.original_pixmap = None
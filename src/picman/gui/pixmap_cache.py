@@ -0,0 +1,96 @@
+"""
+In-memory LRU cache of decoded pixmaps.
+
+Entries are keyed by (photo id, width, height) and evicted by an estimated
+byte cost rather than an item count, so large previews and small grid
+thumbnails share one memory budget. Pixmaps are GUI-thread objects: the
+cache must only be used from the GUI thread.
+"""
+
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from PyQt6.QtGui import QPixmap
+
+
+DEFAULT_BUDGET_MB = 128
+
+CacheKey = Tuple[Hashable, int, int]
+
+
+def pixmap_cost(pixmap: QPixmap) -> int:
+    """Approximate memory held by a pixmap in bytes."""
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+class PixmapLRUCache:
+    """Byte-budgeted LRU of ready-to-paint pixmaps."""
+
+    def __init__(self, max_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, QPixmap]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Optional[QPixmap]:
+        pixmap = self._entries.get(key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return pixmap
+
+    def put(self, key: CacheKey, pixmap: QPixmap):
+        if pixmap is None or pixmap.isNull():
+            return
+        cost = pixmap_cost(pixmap)
+        if cost > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= pixmap_cost(old)
+        self._entries[key] = pixmap
+        self._bytes += cost
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= pixmap_cost(evicted)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._entries
+
+    def invalidate(self, photo_id: Hashable):
+        """Drop every cached size of a photo."""
+        for key in [key for key in self._entries if key[0] == photo_id]:
+            self._bytes -= pixmap_cost(self._entries.pop(key))
+
+    def set_budget(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= pixmap_cost(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_shared_cache: Optional[PixmapLRUCache] = None
+
+
+def shared_pixmap_cache() -> PixmapLRUCache:
+    """Cache shared by all thumbnail grids in the process."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = PixmapLRUCache()
+    return _shared_cache
@@ -103,9 +103,8 @@ class RenameToolDialog(QDialog):
         if not self.photo_manager:
             return None
         try:
-            file_hash = self.photo_manager._calculate_file_hash(abs_path)
-            info = self.photo_manager.get_photo_by_hash(file_hash)
-            return info
+            # 先按路径/指纹/文件大小查找，只有可能匹配时才计算完整哈希
+            return self.photo_manager.find_photo_by_file(abs_path)
         except Exception:
             return None
 
@@ -1,619 +1,609 @@
 """
 Thumbnail grid widget for displaying photo thumbnails.
+
+The grid is a QListView over ThumbnailListModel: cells are painted by
+ThumbnailDelegate, so only the cells on screen cost anything and a loaded
+thumbnail updates exactly one row.
 """
 
-from typing import List, Dict, Any, Optional
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from pathlib import Path
 from PyQt6.QtWidgets import (
-    QWidget, QGridLayout, QLabel, QScrollArea, 
-    QFrame, QVBoxLayout, QHBoxLayout, QPushButton,
-    QMenu, QMessageBox, QApplication, QCheckBox
+    QListView, QAbstractItemView, QStyledItemDelegate, QStyle, QStyleOptionViewItem,
+    QMenu, QMessageBox
+)
+from PyQt6.QtCore import (
+    Qt, pyqtSignal, QSize, QRect, QPoint, QUrl, QMimeData, QTimer, QThreadPool, QRunnable,
+    QAbstractListModel, QModelIndex, QItemSelection, QItemSelectionModel
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QSize, QThread, QUrl, QMimeData, QTimer, QThreadPool, QRunnable
-from PyQt6.QtGui import QPixmap, QContextMenuEvent, QAction, QPainter, QFont, QDrag
+from PyQt6.QtGui import QPixmap, QImage, QImageReader, QContextMenuEvent, QPainter, QFont, QColor, QPen
 import logging
-import time
+
+from ..core.thumbnail_generator import read_best_thumbnail
+from .pixmap_cache import shared_pixmap_cache
+
+
+# 网格中缩略图的显示尺寸（与缩略图金字塔的网格级别一致）
+THUMBNAIL_DISPLAY_SIZE = (180, 135)
+# 网格单元尺寸（缩略图 + 文件名 + 评分）
+CELL_SIZE = (200, 180)
+
+# 模型角色
+PhotoIdRole = Qt.ItemDataRole.UserRole + 1
+PhotoDataRole = Qt.ItemDataRole.UserRole + 2
+
 
 
 class ThumbnailLoader(QRunnable):
-    """异步缩略图加载器"""
+    """异步缩略图加载器
+    
+    在工作线程中只解码为QImage（QPixmap只能在GUI线程创建），由GUI线程
+    转换为QPixmap并放入缓存。开始解码前检查照片是否仍在显示，滚出视图的
+    加载直接取消。
+    """
     
-    def __init__(self, photo_data: Dict[str, Any], callback):
+    def __init__(self, photo_data: Dict[str, Any], callback,
+                 size: Tuple[int, int] = THUMBNAIL_DISPLAY_SIZE,
+                 is_wanted: Optional[Callable[[int], bool]] = None):
         super().__init__()
         self.photo_data = photo_data
         self.callback = callback
         self.photo_id = photo_data.get("id", 0)
-        
+        self.size = size
+        self.is_wanted = is_wanted
+    
     def run(self):
         """在后台线程中加载缩略图"""
+        image = QImage()
         try:
+            if self.is_wanted is not None and not self.is_wanted(self.photo_id):
+                return
+            
+            width, height = self.size
             thumbnail_path = self.photo_data.get("thumbnail_path", "")
             filepath = self.photo_data.get("filepath", "")
             
-            pixmap = None
-            
-            # 优先加载缩略图
-            if thumbnail_path and Path(thumbnail_path).exists():
-                pixmap = QPixmap(thumbnail_path)
-                if not pixmap.isNull():
-                    pixmap = pixmap.scaled(
-                        180, 135,
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation
-                    )
+            # 优先使用与网格尺寸一致的金字塔级别（文件缓存或缩略图包），无需再缩放
+            thumbnail_data = read_best_thumbnail(self.photo_data.get("file_hash", ""), self.size)
+            if thumbnail_data:
+                image.loadFromData(thumbnail_data)
+            elif thumbnail_path and Path(thumbnail_path).exists():
+                image.load(thumbnail_path)
             
-            # 如果没有缩略图，加载原图
-            if not pixmap or pixmap.isNull():
-                if filepath and Path(filepath).exists():
-                    pixmap = QPixmap(filepath)
-                    if not pixmap.isNull():
-                        pixmap = pixmap.scaled(
-                            180, 135,
-                            Qt.AspectRatioMode.KeepAspectRatio,
-                            Qt.TransformationMode.SmoothTransformation
-                        )
+            if not image.isNull() and (image.width() > width or image.height() > height):
+                image = image.scaled(
+                    width, height,
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation
+                )
             
-            # 回调到主线程更新UI
-            if pixmap and not pixmap.isNull():
-                self.callback.emit(self.photo_id, pixmap)
-            else:
-                # 创建一个空的QPixmap而不是None
-                empty_pixmap = QPixmap(180, 135)
-                empty_pixmap.fill(Qt.GlobalColor.transparent)
-                self.callback.emit(self.photo_id, empty_pixmap)
+            # 如果没有缩略图，按显示尺寸解码原图（JPEG可直接缩小解码）
+            if image.isNull() and filepath and Path(filepath).exists():
+                reader = QImageReader(filepath)
+                reader.setAutoTransform(True)
+                source_size = reader.size()
+                if source_size.isValid():
+                    reader.setScaledSize(source_size.scaled(width, height, Qt.AspectRatioMode.KeepAspectRatio))
+                image = reader.read()
             
-        except Exception as e:
-            # 加载失败时发送空QPixmap
-            empty_pixmap = QPixmap(180, 135)
-            empty_pixmap.fill(Qt.GlobalColor.transparent)
-            self.callback.emit(self.photo_id, empty_pixmap)
+        except Exception:
+            image = QImage()
+        finally:
+            # 无论成功、失败还是取消都回调，调度器据此释放并发名额
+            self.callback.emit(self.photo_id, image)
 
 
-class ThumbnailItem(QFrame):
-    """Individual thumbnail item widget."""
+class ThumbnailListModel(QAbstractListModel):
+    """List model over photo summary dicts.
+    
+    The photo list is held by reference so callers that share it (e.g.
+    search result navigation) see pages appended by fetchMore(). Thumbnails
+    are requested lazily the first time a row's decoration is asked for,
+    i.e. when the view paints it.
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.photos: List[Dict[str, Any]] = []
+        self.row_by_id: Dict[int, int] = {}
+        self.pixmap_cache = shared_pixmap_cache()
+        self.requested_ids = set()  # 已请求、尚未加载完成的照片
+        self.failed_ids = set()  # 无法解码的照片，显示“无图片”且不再请求
+        self.thumbnail_requester: Optional[Callable[[Dict[str, Any]], None]] = None
+        
+        # 分页数据源（滚动到底部时视图调用fetchMore按游标拉取下一批）
+        self.page_fetcher: Optional[Callable[[Optional[str], int], Dict[str, Any]]] = None
+        self.next_cursor: Optional[str] = None
+        self.page_size = 50
+        self._fetching_page = False
+        self.logger = logging.getLogger("picman.gui.thumbnail_model")
+    
+    def set_photos(self, photos: List[Dict[str, Any]]):
+        self.beginResetModel()
+        self.photos = photos
+        self.row_by_id = {photo.get("id", 0): row for row, photo in enumerate(photos)}
+        self.requested_ids.clear()
+        self.failed_ids.clear()
+        self.page_fetcher = None
+        self.next_cursor = None
+        self.endResetModel()
+    
+    def set_page_source(self, fetch_page: Callable[[Optional[str], int], Dict[str, Any]],
+                        next_cursor: Optional[str]):
+        self.page_fetcher = fetch_page
+        self.next_cursor = next_cursor
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.photos)
+    
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.photos):
+            return None
+        photo = self.photos[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return photo.get("filename", "Unknown")
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnail(photo)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return photo.get("filepath", "")
+        if role == PhotoIdRole:
+            return photo.get("id", 0)
+        if role == PhotoDataRole:
+            return photo
+        return None
+    
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsDragEnabled
+    
+    def thumbnail(self, photo: Dict[str, Any]) -> Optional[QPixmap]:
+        """Cached pixmap of a photo; requests a load and returns None on a miss."""
+        photo_id = photo.get("id", 0)
+        pixmap = self.pixmap_cache.get((photo_id,) + THUMBNAIL_DISPLAY_SIZE)
+        if pixmap is None and photo_id not in self.requested_ids and photo_id not in self.failed_ids:
+            self.requested_ids.add(photo_id)
+            if self.thumbnail_requester:
+                self.thumbnail_requester(photo)
+        return pixmap
+    
+    def is_failed(self, photo_id: int) -> bool:
+        return photo_id in self.failed_ids
+    
+    def row_of(self, photo_id: int) -> Optional[int]:
+        return self.row_by_id.get(photo_id)
+    
+    def photo(self, photo_id: int) -> Optional[Dict[str, Any]]:
+        row = self.row_by_id.get(photo_id)
+        return self.photos[row] if row is not None else None
+    
+    def update_photo(self, photo_id: int, **changes):
+        """Replace a row's photo with a copy that has some fields changed, and repaint it."""
+        row = self.row_by_id.get(photo_id)
+        if row is None:
+            return
+        photo = self.photos[row]
+        # PhotoSummary不可原地修改；替换列表中的元素，共享同一列表的调用方也能看到
+        self.photos[row] = photo.replace(**changes) if hasattr(photo, "replace") else {**photo, **changes}
+        self.refresh_photo(photo_id)
+    
+    def thumbnail_ready(self, photo_id: int, pixmap: Optional[QPixmap]):
+        """Store a loaded thumbnail and repaint its row; None marks the photo as failed."""
+        self.requested_ids.discard(photo_id)
+        if pixmap is None or pixmap.isNull():
+            self.failed_ids.add(photo_id)
+        else:
+            self.pixmap_cache.put((photo_id,) + THUMBNAIL_DISPLAY_SIZE, pixmap)
+        self.refresh_photo(photo_id)
     
-    clicked = pyqtSignal(int)  # photo_id
-    context_menu_requested = pyqtSignal(int, object)  # photo_id, position
-    thumbnail_loaded = pyqtSignal(int, QPixmap)  # photo_id, pixmap
+    def thumbnail_cancelled(self, photo_id: int):
+        """Forget a load that was skipped; the row re-requests it when painted again."""
+        self.requested_ids.discard(photo_id)
     
-    def __init__(self, photo_data: Dict[str, Any]):
-        super().__init__()
-        self.photo_data = photo_data
-        self.photo_id = photo_data.get("id", 0)
-        self.logger = logging.getLogger("picman.gui.thumbnail_item")
-        self.is_selected = False
-        self.thumbnail_loaded = False
-        
-        # 延迟初始化UI，避免频繁创建时的性能开销
-        self._ui_initialized = False
-        self.init_ui()
-        self.show_loading_placeholder()
+    def invalidate(self, photo_id: int):
+        """Drop the cached thumbnail so the row reloads it."""
+        self.pixmap_cache.invalidate(photo_id)
+        self.failed_ids.discard(photo_id)
+        self.refresh_photo(photo_id)
     
-    def init_ui(self):
-        """Initialize the thumbnail item UI."""
-        if self._ui_initialized:
-            return
-            
-        self.setFrameStyle(QFrame.Shape.StyledPanel)
-        self.setFixedSize(200, 180)
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5)
-        
-        # Thumbnail image
-        self.image_label = QLabel()
-        self.image_label.setFixedSize(180, 135)
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.image_label.setStyleSheet("border: 1px solid #ccc; background-color: #f5f5f5;")
-        layout.addWidget(self.image_label)
-        
-        # Photo info
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(2)
-        
-        # Filename
-        filename = self.photo_data.get("filename", "Unknown")
-        if len(filename) > 20:
-            filename = filename[:17] + "..."
-        
-        self.filename_label = QLabel(filename)
-        self.filename_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        font = self.filename_label.font()
-        font.setPointSize(8)
-        self.filename_label.setFont(font)
-        info_layout.addWidget(self.filename_label)
-        
-        # Rating and favorite indicator
-        status_layout = QHBoxLayout()
-        status_layout.setContentsMargins(0, 0, 0, 0)
-        
-        # Rating stars
-        rating = self.photo_data.get("rating", 0)
-        rating_text = "★" * rating + "☆" * (5 - rating)
-        self.rating_label = QLabel(rating_text)
-        self.rating_label.setStyleSheet("color: gold;")
-        font = self.rating_label.font()
-        font.setPointSize(8)
-        self.rating_label.setFont(font)
-        status_layout.addWidget(self.rating_label)
-        
-        # Favorite indicator
-        if self.photo_data.get("is_favorite", False):
-            favorite_label = QLabel("♥")
-            favorite_label.setStyleSheet("color: red;")
-            font = favorite_label.font()
-            font.setPointSize(10)
-            favorite_label.setFont(font)
-            status_layout.addWidget(favorite_label)
-        
-        status_layout.addStretch()
-        info_layout.addLayout(status_layout)
-        
-        layout.addLayout(info_layout)
-    
-        self._ui_initialized = True
-    
-    def show_loading_placeholder(self):
-        """显示加载占位符"""
-        self.image_label.setText("加载中...")
-        self.image_label.setStyleSheet("""
-            QLabel {
-                border: 1px solid #ccc; 
-                background-color: #f5f5f5;
-                color: #999;
-                font-size: 10px;
-            }
-        """)
-    
-    def set_thumbnail(self, pixmap: QPixmap):
-        """设置缩略图"""
-        try:
-            if pixmap and not pixmap.isNull():
-                self.image_label.setPixmap(pixmap)
-                self.thumbnail_loaded = True
-            else:
-                self.image_label.setText("无图片")
-                self.image_label.setStyleSheet("""
-                    QLabel {
-                        border: 1px solid #ccc; 
-                        background-color: #f5f5f5;
-                        color: #999;
-                        font-size: 10px;
-                    }
-                """)
-        except RuntimeError as e:
-            # 如果image_label已被删除，忽略错误
-            self.logger.warning("Image label deleted when setting thumbnail: %s", str(e))
-
-    def set_selected(self, selected: bool):
-        """Set the selection state of the thumbnail."""
-        self.is_selected = selected
-        
-        if selected:
-            # Highlight the thumbnail and show checkmark
-            self.setStyleSheet("""
-                QFrame {
-                    border: 3px solid #0078d4 !important;
-                    background-color: #e3f2fd !important;
-                    border-radius: 5px;
-                }
-                QLabel {
-                    background-color: transparent;
-                }
-            """)
-
-            self.show_checkmark()
-            # 强制刷新显示
-            self.update()
-            self.repaint()
-        else:
-            # Remove highlight and hide checkmark
-            self.setStyleSheet("")
-            self.hide_checkmark()
-            # 强制刷新显示
-            self.update()
-            self.repaint()
-    
-    def show_checkmark(self):
-        """Show selection checkmark."""
-        if not hasattr(self, 'checkmark_label'):
-            self.checkmark_label = QLabel("✓")
-            self.checkmark_label.setStyleSheet("""
-                QLabel {
-                    color: white;
-                    background-color: #0078d4;
-                    border-radius: 10px;
-                    padding: 2px 6px;
-                    font-weight: bold;
-                }
-            """)
-            self.checkmark_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.checkmark_label.setFixedSize(20, 20)
-            self.checkmark_label.setParent(self)
-            
-            # Position checkmark in top-right corner using absolute positioning
-            self.checkmark_label.move(self.width() - 25, 5)
+    def refresh_photo(self, photo_id: int):
+        row = self.row_by_id.get(photo_id)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+    
+    def refresh_all(self):
+        if self.photos:
+            self.dataChanged.emit(self.index(0), self.index(len(self.photos) - 1))
+    
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and bool(self.page_fetcher and self.next_cursor) and not self._fetching_page
+    
+    def fetchMore(self, parent=QModelIndex()):
+        self.fetch_next_page()
+    
+    def fetch_next_page(self) -> int:
+        """Append the next page from the page source; returns rows added."""
+        if not self.page_fetcher or not self.next_cursor or self._fetching_page:
+            return 0
         
-        self.checkmark_label.show()
-        self.checkmark_label.raise_()  # 确保显示在最顶层
+        self._fetching_page = True
+        try:
+            result = self.page_fetcher(self.next_cursor, self.page_size)
+            new_photos = result.get("photos", [])
+            self.next_cursor = result.get("next_cursor")
+            if new_photos:
+                first = len(self.photos)
+                self.beginInsertRows(QModelIndex(), first, first + len(new_photos) - 1)
+                # 原地扩展，外部持有的同一列表引用（如搜索结果导航）同步可见
+                self.photos.extend(new_photos)
+                for row, photo in enumerate(new_photos, first):
+                    self.row_by_id[photo.get("id", 0)] = row
+                self.endInsertRows()
+            return len(new_photos)
+        except Exception as e:
+            self.logger.error("Failed to fetch next result page: %s", str(e))
+            self.next_cursor = None
+            return 0
+        finally:
+            self._fetching_page = False
     
-    def hide_checkmark(self):
-        """Hide selection checkmark."""
-        if hasattr(self, 'checkmark_label'):
-            self.checkmark_label.hide()
+    def mimeTypes(self) -> List[str]:
+        return ["text/uri-list"]
     
-    def mousePressEvent(self, event):
-        """Handle mouse press events."""
-        if event.button() == Qt.MouseButton.LeftButton:
+    def mimeData(self, indexes) -> QMimeData:
+        mime_data = QMimeData()
+        file_paths = []
+        for index in indexes:
+            filepath = self.photos[index.row()].get("filepath", "")
+            if filepath and Path(filepath).exists():
+                file_paths.append(filepath)
+        if file_paths:
+            mime_data.setUrls([QUrl.fromLocalFile(path) for path in file_paths])
+        return mime_data
+    
+    def supportedDragActions(self):
+        return Qt.DropAction.CopyAction | Qt.DropAction.MoveAction
 
-            
-            # Get the thumbnail widget
-            thumbnail_widget = None
-            parent = self.parent()
-            while parent:
-                if hasattr(parent, 'multi_select_mode'):
-                    thumbnail_widget = parent
-                    break
-                parent = parent.parent()
-            
-            if thumbnail_widget and thumbnail_widget.multi_select_mode:
-                # Toggle selection in multi-select mode
 
-                thumbnail_widget.toggle_item_selection(self.photo_id)
-            else:
-                # Normal single selection
+class ThumbnailDelegate(QStyledItemDelegate):
+    """Paints a grid cell: thumbnail, file name, rating, favorite and selection."""
     
-                self.clicked.emit(self.photo_id)
-        super().mousePressEvent(event)
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(*CELL_SIZE)
     
-    def contextMenuEvent(self, event: QContextMenuEvent):
-        """Handle context menu events."""
-        self.context_menu_requested.emit(self.photo_id, event.globalPos())
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex):
+        photo = index.data(PhotoDataRole)
+        if photo is None:
+            return
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        cell = option.rect.adjusted(1, 1, -1, -1)
+        
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        
+        # 单元背景与选中高亮
+        if selected:
+            painter.setPen(QPen(QColor("#0078d4"), 3))
+            painter.setBrush(QColor("#e3f2fd"))
+        else:
+            painter.setPen(QPen(QColor("#ccc"), 1))
+            painter.setBrush(option.palette.base())
+        painter.drawRoundedRect(cell, 5, 5)
+        
+        # 缩略图
+        image_rect = QRect(cell.x() + (cell.width() - THUMBNAIL_DISPLAY_SIZE[0]) // 2, cell.y() + 5,
+                           *THUMBNAIL_DISPLAY_SIZE)
+        painter.setPen(QPen(QColor("#ccc"), 1))
+        painter.setBrush(QColor("#f5f5f5"))
+        painter.drawRect(image_rect)
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            target = QRect(0, 0, pixmap.width(), pixmap.height())
+            target.moveCenter(image_rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            model = index.model()
+            failed = hasattr(model, "is_failed") and model.is_failed(photo.get("id", 0))
+            font = QFont(option.font)
+            font.setPointSize(8)
+            painter.setFont(font)
+            painter.setPen(QColor("#999"))
+            painter.drawText(image_rect, Qt.AlignmentFlag.AlignCenter, "无图片" if failed else "加载中...")
+        
+        # 文件名
+        font = QFont(option.font)
+        font.setPointSize(8)
+        painter.setFont(font)
+        painter.setPen(option.palette.text().color())
+        text_rect = QRect(cell.x() + 5, image_rect.bottom() + 3, cell.width() - 10, 14)
+        filename = painter.fontMetrics().elidedText(photo.get("filename", "Unknown"),
+                                                    Qt.TextElideMode.ElideRight, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, filename)
+        
+        # 评分与收藏
+        rating = photo.get("rating", 0) or 0
+        status_rect = QRect(text_rect.x(), text_rect.bottom() + 2, text_rect.width(), 14)
+        painter.setPen(QColor("gold"))
+        painter.drawText(status_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         "★" * rating + "☆" * (5 - rating))
+        if photo.get("is_favorite", False):
+            font.setPointSize(10)
+            painter.setFont(font)
+            painter.setPen(QColor("red"))
+            star_width = painter.fontMetrics().horizontalAdvance("★" * 5)
+            painter.drawText(status_rect.adjusted(star_width + 4, 0, 0, 0),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, "♥")
+        
+        # 选中标记
+        if selected:
+            check_rect = QRect(cell.right() - 25, cell.y() + 5, 20, 20)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor("#0078d4"))
+            painter.drawEllipse(check_rect)
+            font.setPointSize(9)
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(QColor("white"))
+            painter.drawText(check_rect, Qt.AlignmentFlag.AlignCenter, "✓")
+        
+        painter.restore()
 
 
-class ThumbnailWidget(QScrollArea):
+class ThumbnailWidget(QListView):
     """Widget for displaying a grid of photo thumbnails."""
     
     photo_selected = pyqtSignal(int)  # photo_id
     photos_updated = pyqtSignal()
     selection_changed = pyqtSignal(list)  # list of photo_ids
-    thumbnail_loaded = pyqtSignal(int, QPixmap)  # photo_id, pixmap
+    thumbnail_loaded = pyqtSignal(int, QImage)  # photo_id, image（解码失败或取消时为空）
     
     def __init__(self):
         super().__init__()
-        self.photos = []
-        self.thumbnail_items = []
-        self.columns = 3
-        self.selected_items = []
         self.logger = logging.getLogger("picman.gui.thumbnail_widget")
-        self.drag_start_position = None
         self.multi_select_mode = False
-        self._displaying_photos = False
+        self.page_size = 50  # 分页数据源每次拉取的数量
+        self.total_count: Optional[int] = None
         
-        # 性能优化相关
+        # 异步加载：工作线程解码QImage，GUI线程转换并放入缓存
         self.thread_pool = QThreadPool()
         self.thread_pool.setMaxThreadCount(4)  # 限制并发线程数
-        self.loading_queue = []  # 待加载队列
-        self.loading_timer = QTimer()
-        self.loading_timer.timeout.connect(self.process_loading_queue)
-        self.loading_timer.setInterval(50)  # 50ms间隔处理队列
-        
-        # 虚拟化相关
-        self.visible_range = (0, 0)  # 当前可见范围
-        self.page_size = 50  # 每页显示数量
-        self.current_page = 0
-        self.max_visible_items = 150  # 最大可见项数量，超过时回收
-        
-        # 滚动优化相关
-        self.scroll_throttle_timer = QTimer()
-        self.scroll_throttle_timer.setSingleShot(True)
-        self.scroll_throttle_timer.timeout.connect(self.process_scroll_event)
-        self.pending_scroll_event = False
-        self.last_scroll_value = 0
-        
-        # 缩略图项缓存（暂时禁用，避免UI组件删除问题）
-        self.thumbnail_item_cache = []  # 缓存未使用的缩略图项
-        self.max_cache_size = 0  # 暂时禁用缓存
-        
-        # 可见性检测
-        self.visibility_timer = QTimer()
-        self.visibility_timer.timeout.connect(self.check_visibility_and_optimize)
-        self.visibility_timer.setInterval(500)  # 500ms检查一次可见性
+        self.loading_queue = deque()  # 待加载的照片
+        self.loading_in_flight = 0  # 已提交到线程池、尚未回调的加载数
+        self.max_in_flight = self.thread_pool.maxThreadCount() * 2
+        self.visible_rows = (0, 0)  # 当前可见的行范围 [start, end)
+        self._queue_scheduled = False
+        
+        # 可见但还没有缩略图的照片ID回调（后台缩略图服务据此优先生成）
+        self.missing_thumbnail_handler: Optional[Callable[[List[int]], None]] = None
+        self._missing_ids: List[int] = []
         
         self.init_ui()
         self.thumbnail_loaded.connect(self.on_thumbnail_loaded)
     
     def init_ui(self):
         """Initialize the thumbnail widget UI."""
-        # Create main widget
-        self.main_widget = QWidget()
-        self.setWidget(self.main_widget)
-        self.setWidgetResizable(True)
+        self.thumbnail_model = ThumbnailListModel(self)
+        self.thumbnail_model.page_size = self.page_size
+        self.thumbnail_model.thumbnail_requester = self.request_thumbnail
+        self.setModel(self.thumbnail_model)
+        self.setItemDelegate(ThumbnailDelegate(self))
+        
+        # 列表模式+换行+统一尺寸：布局按行列计算，不为每项保存几何信息
+        self.setViewMode(QListView.ViewMode.ListMode)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setSpacing(10)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         
         # 启用拖放
+        self.setDragEnabled(True)
         self.setAcceptDrops(True)
+        self.setDragDropMode(QAbstractItemView.DragDropMode.DragDrop)
         
-        # Create grid layout
-        self.grid_layout = QGridLayout(self.main_widget)
-        self.grid_layout.setSpacing(10)
-        self.grid_layout.setContentsMargins(10, 10, 10, 10)
-        
-        # 连接滚动条信号
-        self.verticalScrollBar().valueChanged.connect(self.on_scroll)
-        
-        # Show placeholder initially
-        self.show_placeholder()
+        self.clicked.connect(self.on_index_clicked)
+        self.selectionModel().selectionChanged.connect(self.on_selection_model_changed)
+        self.verticalScrollBar().valueChanged.connect(self.update_visible_rows)
     
-    def show_placeholder(self):
-        """Show placeholder when no photos are available."""
-        placeholder = QLabel("没有照片")
-        placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        placeholder.setStyleSheet("color: #999; font-size: 16px;")
-        self.grid_layout.addWidget(placeholder, 0, 0)
+    @property
+    def photos(self) -> List[Dict[str, Any]]:
+        return self.thumbnail_model.photos
+    
+    @property
+    def selected_items(self) -> List[int]:
+        """IDs of the selected photos in display order."""
+        rows = sorted(index.row() for index in self.selectionModel().selectedIndexes())
+        return [self.thumbnail_model.photos[row].get("id", 0) for row in rows]
     
     def display_photos(self, photos: List[Dict[str, Any]]):
-        """Display a list of photos as thumbnails with virtualization."""
+        """Display a list of photos as thumbnails."""
         try:
-            # Prevent recursive calls
-            if hasattr(self, '_displaying_photos') and self._displaying_photos:
-                return
-            self._displaying_photos = True
-            
-            # 停止之前的可见性监控
-            self.stop_visibility_monitoring()
-            
-            # Clear existing thumbnails
-            self.clear_thumbnails()
-            
-            self.photos = photos
-            self.selected_items = []
-            self.current_page = 0
-            
-            if not photos:
-                self.show_placeholder()
-                return
-            
-            # Calculate columns based on widget width
-            self.update_columns()
-            
-            # 计算总页数
-            total_pages = (len(photos) + self.page_size - 1) // self.page_size
-            
-            # 只显示第一页的缩略图
-            self.display_page(0)
-            
-            # 开始异步加载
-            self.start_async_loading()
-            
-            # 启动可见性监控
-            self.start_visibility_monitoring()
-            
-            self.logger.info("Displayed thumbnails with virtualization: count=%d, total_pages=%d, page_size=%d, multi_select_mode=%s", 
-                           len(photos), total_pages, self.page_size, self.multi_select_mode)
-            
+            self.loading_queue.clear()
+            self.thumbnail_model.set_photos(photos)
+            self.total_count = None
+            self.scrollToTop()
+            self.update_visible_rows()
+            self.selection_changed.emit([])
+            self.logger.info("Displayed thumbnails: count=%d, multi_select_mode=%s",
+                             len(photos), self.multi_select_mode)
         except Exception as e:
             self.logger.error("Failed to display photos: %s", str(e))
-        finally:
-            self._displaying_photos = False
     
-    def display_page(self, page: int):
-        """显示指定页的缩略图（使用缓存优化）"""
-        start_idx = page * self.page_size
-        end_idx = min(start_idx + self.page_size, len(self.photos))
+    def display_paged(self, fetch_page: Callable[[Optional[str], int], Dict[str, Any]],
+                      total_count: Optional[int] = None):
+        """Display results served page by page from a cursor-based source.
         
-        # 回收当前显示的缩略图项到缓存
-        for item in self.thumbnail_items:
-            self.recycle_thumbnail_item(item)
-        
-        # 清空当前项列表
-        self.thumbnail_items.clear()
-        
-        # 创建当前页的缩略图项（使用缓存）
-        for i in range(start_idx, end_idx):
-            photo = self.photos[i]
-            row = (i - start_idx) // self.columns
-            col = (i - start_idx) % self.columns
-            
-            # 使用缓存创建缩略图项
-            thumbnail_item = self.create_thumbnail_item(photo)
-            thumbnail_item.clicked.connect(self.on_thumbnail_clicked)
-            thumbnail_item.context_menu_requested.connect(self.show_context_menu)
-            
-            self.grid_layout.addWidget(thumbnail_item, row, col)
-            self.thumbnail_items.append(thumbnail_item)
-        
-        self.current_page = page
-        self.visible_range = (start_idx, end_idx)
+        fetch_page(cursor, page_size) must return a dict with "photos" and
+        "next_cursor" (None when exhausted); only the first page is fetched
+        here, further pages are pulled as the user scrolls.
+        """
+        try:
+            result = fetch_page(None, self.page_size)
+        except Exception as e:
+            self.logger.error("Failed to fetch first result page: %s", str(e))
+            result = {"photos": [], "next_cursor": None}
+        
+        self.display_photos(list(result.get("photos", [])))
+        self.thumbnail_model.set_page_source(fetch_page, result.get("next_cursor"))
+        self.total_count = total_count
+        self.logger.info("Paged display started: first_page=%d, total=%s, has_more=%s",
+                         len(self.photos), total_count, self.thumbnail_model.next_cursor is not None)
+    
+    def fetch_next_result_page(self) -> int:
+        """Pull the next page from the page source into self.photos; returns rows added."""
+        return self.thumbnail_model.fetch_next_page()
+    
+    def refresh_display(self):
+        """Repaint every cell (e.g. after ratings or favorites changed)."""
+        self.thumbnail_model.refresh_all()
+    
+    def update_visible_rows(self, *args):
+        """Recompute the row range on screen; loads for other rows are cancelled."""
+        rows = self.thumbnail_model.rowCount()
+        if not rows:
+            self.visible_rows = (0, 0)
+            return
+        rect = self.viewport().rect()
+        first = self.indexAt(rect.topLeft() + QPoint(5, 5))
+        last = self.indexAt(rect.bottomRight() - QPoint(5, 5))
+        start = first.row() if first.isValid() else 0
+        end = last.row() + 1 if last.isValid() else rows
+        # 上下各多保留一屏，减少来回滚动时的重复解码
+        span = max(end - start, 1)
+        self.visible_rows = (max(0, start - span), min(rows, end + span))
+    
+    def is_photo_wanted(self, photo_id: int) -> bool:
+        """Whether a photo is still on (or near) screen; called from loader threads."""
+        row = self.thumbnail_model.row_of(photo_id)
+        start, end = self.visible_rows
+        return row is not None and start <= row < end
+    
+    def request_thumbnail(self, photo: Dict[str, Any]):
+        """Model callback for a painted row whose thumbnail is not cached."""
+        self.loading_queue.append(photo)
+        if not photo.get("thumbnail_path"):
+            self._missing_ids.append(photo.get("id", 0))
+        # 在绘制过程中被调用，延后到事件循环中调度
+        if not self._queue_scheduled:
+            self._queue_scheduled = True
+            QTimer.singleShot(0, self.process_loading_queue)
     
-    def start_async_loading(self):
-        """开始异步加载缩略图"""
-        # 清空加载队列
-        self.loading_queue.clear()
-        
-        # 将当前可见的缩略图加入加载队列
-        for i in range(self.visible_range[0], self.visible_range[1]):
-            if i < len(self.photos):
-                self.loading_queue.append(i)
+    def process_loading_queue(self):
+        """把请求提交到线程池直到并发上限；已滚出视图的请求直接取消"""
+        self._queue_scheduled = False
+        if self._missing_ids:
+            missing_ids, self._missing_ids = self._missing_ids, []
+            if self.missing_thumbnail_handler:
+                self.missing_thumbnail_handler(missing_ids)
+        
+        while self.loading_queue and self.loading_in_flight < self.max_in_flight:
+            photo = self.loading_queue.popleft()
+            photo_id = photo.get("id", 0)
+            if not self.is_photo_wanted(photo_id):
+                self.thumbnail_model.thumbnail_cancelled(photo_id)
+                continue
+            self.loading_in_flight += 1
+            self.thread_pool.start(ThumbnailLoader(photo, self.thumbnail_loaded,
+                                                   THUMBNAIL_DISPLAY_SIZE, self.is_photo_wanted))
+    
+    def on_thumbnail_loaded(self, photo_id: int, image: QImage):
+        """缩略图加载完成回调（GUI线程）：转换为QPixmap并只刷新对应的行"""
+        self.loading_in_flight = max(0, self.loading_in_flight - 1)
+        
+        if not image.isNull():
+            self.thumbnail_model.thumbnail_ready(photo_id, QPixmap.fromImage(image))
+        elif self.is_photo_wanted(photo_id):
+            self.thumbnail_model.thumbnail_ready(photo_id, None)
+        else:
+            # 加载被取消
+            self.thumbnail_model.thumbnail_cancelled(photo_id)
         
-        # 启动加载定时器
-        if not self.loading_timer.isActive():
-            self.loading_timer.start()
+        self.process_loading_queue()
     
-    def process_loading_queue(self):
-        """处理加载队列"""
-        if not self.loading_queue:
-            self.loading_timer.stop()
-            return
+    def on_thumbnails_generated(self, results: List[Tuple[int, str]]):
+        """后台服务生成了缩略图：先把缩略图引用写入行数据，再让对应的行重新加载
         
-        # 每次处理几个缩略图
-        batch_size = 3
-        for _ in range(min(batch_size, len(self.loading_queue))):
-            if self.loading_queue:
-                photo_idx = self.loading_queue.pop(0)
-                if photo_idx < len(self.photos):
-                    self.load_thumbnail_async(photo_idx)
-    
-    def load_thumbnail_async(self, photo_idx: int):
-        """异步加载单个缩略图"""
-        photo = self.photos[photo_idx]
-        loader = ThumbnailLoader(photo, self.thumbnail_loaded)
-        self.thread_pool.start(loader)
-    
-    def on_thumbnail_loaded(self, photo_id: int, pixmap: QPixmap):
-        """缩略图加载完成回调"""
-        # 找到对应的缩略图项并更新
-        for item in self.thumbnail_items:
-            if item.photo_id == photo_id:
-                try:
-                    # 检查item是否仍然有效
-                    if item and not item.isHidden() and hasattr(item, 'image_label'):
-                        item.set_thumbnail(pixmap)
-                except RuntimeError as e:
-                    # 如果QLabel已被删除，忽略错误
-                    self.logger.warning("Thumbnail item UI component deleted: photo_id=%s, error=%s", photo_id, str(e))
-                break
+        行数据的thumbnail_path为空时重新加载会再次把照片报告为缺失缩略图，导致重复生成。
+        """
+        for photo_id, thumbnail_ref in results:
+            if self.thumbnail_model.row_of(photo_id) is None:
+                continue
+            self.thumbnail_model.update_photo(photo_id, thumbnail_path=thumbnail_ref)
+            self.thumbnail_model.invalidate(photo_id)
     
     def clear_thumbnails(self):
-        """Clear all thumbnail items (使用缓存回收)."""
-        # 回收所有缩略图项到缓存
-        for item in self.thumbnail_items:
-            self.recycle_thumbnail_item(item)
-        
-        # Remove all widgets from layout
-        while self.grid_layout.count():
-            child = self.grid_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        
-        self.thumbnail_items.clear()
-    
-    def clear_thumbnail_items(self):
-        """只清除缩略图项，保留布局"""
-        for item in self.thumbnail_items:
-            self.grid_layout.removeWidget(item)
-            item.deleteLater()
-        self.thumbnail_items.clear()
-    
-    def update_columns(self):
-        """Update number of columns based on widget width."""
-        widget_width = self.width()
-        item_width = 220  # thumbnail width + margins
-        
-        new_columns = max(1, widget_width // item_width)
-        
-        if new_columns != self.columns:
-            self.columns = new_columns
-            # Redisplay current page with new column count
-            if self.photos and hasattr(self, '_displaying_photos') and not self._displaying_photos:
-                self._displaying_photos = True
-                self.display_page(self.current_page)
-                self._displaying_photos = False
-    
-    def on_thumbnail_clicked(self, photo_id: int):
+        """Remove all photos from the grid."""
+        self.display_photos([])
+    
+    def on_index_clicked(self, index: QModelIndex):
         """Handle thumbnail click events."""
+        photo_id = index.data(PhotoIdRole)
         self.logger.info("Thumbnail clicked: photo_id=%d, multi_select_mode=%s", photo_id, self.multi_select_mode)
-
-        
-        # 注意：这个方法只在单选模式下被调用
-        # 多选模式的处理在mousePressEvent中直接调用toggle_item_selection
         if not self.multi_select_mode:
-            # In single-select mode, clear previous selections and select this item
-            self.clear_selection()
-            # Select the clicked item (this will emit selection_changed signal)
-            self.select_item(photo_id)
-            # Emit selection signal
             self.logger.info("Emitting photo_selected signal: photo_id=%d", photo_id)
             self.photo_selected.emit(photo_id)
     
+    def on_selection_model_changed(self, selected: QItemSelection, deselected: QItemSelection):
+        self.selection_changed.emit(self.selected_items)
+    
     def toggle_item_selection(self, photo_id: int):
         """Toggle selection state of an item."""
-        for item in self.thumbnail_items:
-            if item.photo_id == photo_id:
-                if photo_id in self.selected_items:
-                    # Deselect
-                    item.set_selected(False)
-                    self.selected_items.remove(photo_id)
-                else:
-                    # Select
-                    item.set_selected(True)
-                    self.selected_items.append(photo_id)
-                break
-        
-        # Emit selection changed signal
-        self.selection_changed.emit(self.selected_items.copy())
+        row = self.thumbnail_model.row_of(photo_id)
+        if row is not None:
+            self.selectionModel().select(self.thumbnail_model.index(row),
+                                         QItemSelectionModel.SelectionFlag.Toggle)
     
     def select_item(self, photo_id: int):
         """Select a specific item."""
-        for item in self.thumbnail_items:
-            if item.photo_id == photo_id:
-                item.set_selected(True)
-                if photo_id not in self.selected_items:
-                    self.selected_items.append(photo_id)
-                break
-        
-        # Log for debugging
-        self.logger.info("Item selected: photo_id=%d, selected_items=%s", photo_id, self.selected_items.copy())
-        
-        # Emit selection changed signal
-        self.selection_changed.emit(self.selected_items.copy())
+        row = self.thumbnail_model.row_of(photo_id)
+        if row is not None:
+            self.selectionModel().select(self.thumbnail_model.index(row),
+                                         QItemSelectionModel.SelectionFlag.Select)
+        self.logger.info("Item selected: photo_id=%d, selected_items=%s", photo_id, self.selected_items)
     
     def clear_selection(self):
         """Clear all selections."""
-        for item in self.thumbnail_items:
-            item.set_selected(False)
-        self.selected_items.clear()
-        self.selection_changed.emit([])
+        self.clearSelection()
     
     def select_all(self):
-        """Select all visible items."""
-        for item in self.thumbnail_items:
-            item.set_selected(True)
-            if item.photo_id not in self.selected_items:
-                self.selected_items.append(item.photo_id)
-        self.selection_changed.emit(self.selected_items.copy())
+        """Select all loaded items."""
+        self.selectAll()
     
     def deselect_all(self):
         """Deselect all items."""
-        for item in self.thumbnail_items:
-            item.set_selected(False)
-        self.selected_items.clear()
-        self.selection_changed.emit([])
+        self.clearSelection()
     
     def set_multi_select_mode(self, enabled: bool):
         """Enable or disable multi-select mode."""
         self.multi_select_mode = enabled
+        self.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection if enabled
+                              else QAbstractItemView.SelectionMode.SingleSelection)
         if not enabled:
             # Clear selection when exiting multi-select mode
             self.clear_selection()
     
-    def on_thumbnail_selection_changed(self, photo_id: int, selected: bool):
-        """Handle thumbnail selection change."""
-        if selected and photo_id not in self.selected_items:
-            self.selected_items.append(photo_id)
-        elif not selected and photo_id in self.selected_items:
-            self.selected_items.remove(photo_id)
-        
-        self.selection_changed.emit(self.selected_items.copy())
-    
     def get_selected_photos(self) -> List[Dict[str, Any]]:
         """Get list of selected photo data."""
-        selected_photos = []
-        for photo in self.photos:
-            if photo.get("id") in self.selected_items:
-                selected_photos.append(photo)
-        return selected_photos
+        return [self.thumbnail_model.photos[index.row()]
+                for index in sorted(self.selectionModel().selectedIndexes(), key=lambda index: index.row())]
+    
+    def contextMenuEvent(self, event: QContextMenuEvent):
+        """Handle context menu events."""
+        index = self.indexAt(event.pos())
+        if index.isValid():
+            self.show_context_menu(index.data(PhotoIdRole), event.globalPos())
     
     def show_context_menu(self, photo_id: int, position):
         """Show context menu for a photo."""
         menu = QMenu(self)
         
         # Get photo data
-        photo_data = None
-        for photo in self.photos:
-            if photo.get("id") == photo_id:
-                photo_data = photo
-                break
+        photo_data = self.thumbnail_model.photo(photo_id)
         
         if not photo_data:
             return
@@ -666,10 +656,12 @@ class ThumbnailWidget(QScrollArea):
                 success = main_window.photo_manager.toggle_favorite(photo_id)
                 if success:
                     self.logger.info("收藏状态切换成功: photo_id=%d", photo_id)
+                    photo_data = self.thumbnail_model.photo(photo_id)
+                    if photo_data is not None:
+                        self.thumbnail_model.update_photo(
+                            photo_id, is_favorite=not photo_data.get("is_favorite", False))
                     # 发送照片更新信号
                     self.photos_updated.emit()
-                    # 刷新显示
-                    self.refresh_display()
                 else:
                     self.logger.error("收藏状态切换失败: photo_id=%d", photo_id)
             else:
@@ -717,250 +709,29 @@ class ThumbnailWidget(QScrollArea):
     def resizeEvent(self, event):
         """Handle resize events."""
         super().resizeEvent(event)
-        self.update_columns()
-    
-    def mousePressEvent(self, event):
-        """Handle mouse press events."""
-        if event.button() == Qt.MouseButton.LeftButton:
-            self.drag_start_position = event.position().toPoint()
-        super().mousePressEvent(event)
-    
-    def mouseMoveEvent(self, event):
-        """Handle mouse move events for drag and drop."""
-        if not (event.buttons() & Qt.MouseButton.LeftButton):
-            return
-        
-        if not self.drag_start_position:
-            return
-        
-        if ((event.position().toPoint() - self.drag_start_position).manhattanLength() < 
-            QApplication.startDragDistance()):
-            return
-        
-        # Get selected photos
-        selected_photos = self.get_selected_photos()
-        if not selected_photos:
-            return
-        
-        # Create drag object
-        drag = QDrag(self)
-        mime_data = QMimeData()
-        
-        # Add file paths to mime data
-        file_paths = []
-        for photo in selected_photos:
-            filepath = photo.get("filepath", "")
-            if filepath and Path(filepath).exists():
-                file_paths.append(filepath)
-        
-        if file_paths:
-            mime_data.setUrls([QUrl.fromLocalFile(path) for path in file_paths])
-        drag.setMimeData(mime_data)
-        
-            # Start drag
-        drag.exec(Qt.DropAction.CopyAction | Qt.DropAction.MoveAction)
+        self.update_visible_rows()
     
     def dragEnterEvent(self, event):
         """Handle drag enter events."""
-        if event.mimeData().hasUrls():
+        if event.mimeData().hasUrls() and event.source() is not self:
             event.acceptProposedAction()
+        else:
+            super().dragEnterEvent(event)
+    
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls() and event.source() is not self:
+            event.acceptProposedAction()
+        else:
+            event.ignore()
     
     def dropEvent(self, event):
         """Handle drop events."""
+        if event.source() is self:
+            event.ignore()
+            return
         urls = event.mimeData().urls()
         file_paths = [url.toLocalFile() for url in urls]
         
         # This would typically handle file import
         self.logger.info("Files dropped: count=%d", len(file_paths))
         event.acceptProposedAction()
-
-    def on_scroll(self, value):
-        """处理滚动事件，实现无限滚动加载（带节流）"""
-        # 节流处理：避免频繁触发
-        if abs(value - self.last_scroll_value) < 50:  # 滚动距离小于50像素时不处理
-            return
-        
-        self.last_scroll_value = value
-        
-        # 如果已经有待处理的滚动事件，不重复设置
-        if self.pending_scroll_event:
-            return
-        
-        self.pending_scroll_event = True
-        self.scroll_throttle_timer.start(100)  # 100ms节流
-    
-    def process_scroll_event(self):
-        """处理节流后的滚动事件"""
-        self.pending_scroll_event = False
-        
-        scrollbar = self.verticalScrollBar()
-        if not scrollbar:
-            return
-        
-        # 检查是否滚动到底部
-        if scrollbar.value() >= scrollbar.maximum() - 200:  # 距离底部200像素时开始加载
-            self.load_next_page()
-        
-        # 检查是否需要优化可见项
-        if len(self.thumbnail_items) > self.max_visible_items:
-            # 立即优化，不等待定时器
-            self.optimize_visible_items()
-    
-    def load_next_page(self):
-        """加载下一页照片"""
-        if not self.photos:
-            return
-        
-        total_pages = (len(self.photos) + self.page_size - 1) // self.page_size
-        
-        if self.current_page < total_pages - 1:
-            next_page = self.current_page + 1
-            self.append_page(next_page)
-            self.current_page = next_page
-            
-            # 开始异步加载新页的缩略图
-            self.load_page_thumbnails_async(next_page)
-    
-    def append_page(self, page: int):
-        """追加显示指定页的缩略图（使用缓存优化）"""
-        start_idx = page * self.page_size
-        end_idx = min(start_idx + self.page_size, len(self.photos))
-        
-        # 计算当前网格的行数
-        current_rows = len(self.thumbnail_items) // self.columns
-        if len(self.thumbnail_items) % self.columns != 0:
-            current_rows += 1
-        
-        # 创建新页的缩略图项（使用缓存）
-        for i in range(start_idx, end_idx):
-            photo = self.photos[i]
-            row = current_rows + (i - start_idx) // self.columns
-            col = (i - start_idx) % self.columns
-            
-            # 使用缓存创建缩略图项
-            thumbnail_item = self.create_thumbnail_item(photo)
-            thumbnail_item.clicked.connect(self.on_thumbnail_clicked)
-            thumbnail_item.context_menu_requested.connect(self.show_context_menu)
-            
-            self.grid_layout.addWidget(thumbnail_item, row, col)
-            self.thumbnail_items.append(thumbnail_item)
-        
-        # 更新可见范围
-        self.visible_range = (0, len(self.thumbnail_items))
-    
-    def load_page_thumbnails_async(self, page: int):
-        """异步加载指定页的缩略图"""
-        start_idx = page * self.page_size
-        end_idx = min(start_idx + self.page_size, len(self.photos))
-        
-        # 将新页的缩略图加入加载队列
-        for i in range(start_idx, end_idx):
-            if i < len(self.photos):
-                self.loading_queue.append(i)
-        
-        # 启动加载定时器
-        if not self.loading_timer.isActive():
-            self.loading_timer.start()
-    
-    def create_thumbnail_item(self, photo: Dict[str, Any]) -> ThumbnailItem:
-        """创建缩略图项（使用缓存优化）"""
-        # 尝试从缓存中获取
-        if self.thumbnail_item_cache:
-            try:
-                item = self.thumbnail_item_cache.pop()
-                # 重新初始化项
-                item.photo_data = photo
-                item.photo_id = photo.get("id", 0)
-                item.is_selected = False
-                item.thumbnail_loaded = False
-                item._ui_initialized = False  # 重置UI初始化状态
-                item.show()  # 显示项
-                item.show_loading_placeholder()
-                return item
-            except RuntimeError as e:
-                # 如果缓存项已被删除，创建新项
-                self.logger.warning("Cached thumbnail item deleted, creating new one: %s", str(e))
-                return ThumbnailItem(photo)
-        
-        # 缓存为空，创建新项
-        return ThumbnailItem(photo)
-    
-    def recycle_thumbnail_item(self, item: ThumbnailItem):
-        """回收缩略图项到缓存"""
-        try:
-            if len(self.thumbnail_item_cache) < self.max_cache_size:
-                # 清理项的状态
-                item.photo_data = {}
-                item.photo_id = 0
-                item.is_selected = False
-                item.thumbnail_loaded = False
-                item.hide()
-                self.thumbnail_item_cache.append(item)
-            else:
-                # 缓存已满，直接删除
-                item.deleteLater()
-        except RuntimeError as e:
-            # 如果item已经被删除，忽略错误
-            self.logger.warning("Failed to recycle thumbnail item: %s", str(e))
-
-    def check_visibility_and_optimize(self):
-        """检查可见性并优化内存使用"""
-        if not self.photos or not self.thumbnail_items:
-            return
-        
-        # 如果可见项数量超过限制，回收不可见的项
-        if len(self.thumbnail_items) > self.max_visible_items:
-            self.optimize_visible_items()
-    
-    def optimize_visible_items(self):
-        """优化可见项，回收不可见的项"""
-        if not self.thumbnail_items:
-            return
-        
-        # 计算当前可见区域
-        scrollbar = self.verticalScrollBar()
-        if not scrollbar:
-            return
-        
-        viewport_height = self.viewport().height()
-        scroll_value = scrollbar.value()
-        
-        # 计算可见范围（扩大一些以提供缓冲）
-        buffer_height = 200  # 缓冲区高度
-        visible_start = max(0, scroll_value - buffer_height)
-        visible_end = scroll_value + viewport_height + buffer_height
-        
-        # 计算每个项的大概位置
-        item_height = 200  # 缩略图项高度（包含间距）
-        items_per_row = self.columns
-        
-        # 回收不可见的项
-        items_to_remove = []
-        for i, item in enumerate(self.thumbnail_items):
-            row = i // items_per_row
-            item_top = row * item_height
-            item_bottom = item_top + item_height
-            
-            # 如果项完全不可见，标记为回收
-            if item_bottom < visible_start or item_top > visible_end:
-                items_to_remove.append((i, item))
-        
-        # 从后往前移除，避免索引变化
-        for i, item in reversed(items_to_remove):
-            self.grid_layout.removeWidget(item)
-            self.thumbnail_items.pop(i)
-            self.recycle_thumbnail_item(item)
-        
-        if items_to_remove:
-            self.logger.info("Optimized visible items: removed_count=%s", len(items_to_remove),
-                           remaining_count=len(self.thumbnail_items))
-    
-    def start_visibility_monitoring(self):
-        """开始可见性监控"""
-        if not self.visibility_timer.isActive():
-            self.visibility_timer.start()
-    
-    def stop_visibility_monitoring(self):
-        """停止可见性监控"""
-        if self.visibility_timer.isActive():
-            self.visibility_timer.stop()
\ No newline at end of file
@@ -0,0 +1,341 @@
+"""
+Tiled rendering of very large images.
+
+The image is treated as a pyramid of power-of-two levels cut into fixed-size
+tiles. Only the tiles that intersect the viewport at the level matching the
+current zoom are decoded (one clipped region per repaint), and decoded tiles
+are kept in a byte-budgeted LRU, so memory follows the viewport rather than
+the image size. Formats whose reader cannot decode a clipped region (PNG,
+for one) are decoded once per level and every tile is cut from that image.
+EXIF orientation and user rotation are applied as a painter transform
+instead of transforming pixels.
+"""
+
+import math
+import logging
+from typing import List, Optional, Tuple
+
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QRect, QRectF, QPointF, QSize, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QImageIOHandler, QPainter, QPixmap, QTransform
+
+from .pixmap_cache import PixmapLRUCache
+
+
+TILE_SIZE = 512  # 每个分块在所在级别中的边长（像素）
+TILE_CACHE_MB = 96
+LEVEL_IMAGE_CACHE_MB = 256  # 不支持裁剪读取时整级解码结果的内存上限（最近一级总是保留）
+TILED_VIEW_MIN_PIXELS = 50 * 1000 * 1000  # 超过该像素数的图片放大时使用分块渲染
+
+logger = logging.getLogger("picman.gui.tiled_image_view")
+
+
+def orientation_transform(transformation) -> QTransform:
+    """Painter transform equivalent to QImageReader's auto-transform for an orientation.
+
+    Qt mirrors/flips first, then rotates 90 degrees clockwise.
+    """
+    Transformation = QImageIOHandler.Transformation
+    transform = QTransform()
+    if transformation & Transformation.TransformationRotate90:
+        transform.rotate(90)
+    transform.scale(-1 if transformation & Transformation.TransformationMirror else 1,
+                    -1 if transformation & Transformation.TransformationFlip else 1)
+    return transform
+
+
+class TileDecodeTask(QRunnable):
+    """Decode a tile-aligned region of one level and cut it into tiles.
+
+    When the reader cannot clip, the whole level is decoded instead and
+    emitted alongside the tiles so later requests can cut from it; pass it
+    back as level_image to skip decoding.
+    """
+
+    def __init__(self, generation: int, file_path: str, level: int, region: QRect,
+                 tiles: List[Tuple[int, int]], callback, level_image: Optional[QImage] = None):
+        super().__init__()
+        self.generation = generation
+        self.file_path = file_path
+        self.level = level
+        self.region = region
+        self.tiles = tiles
+        self.callback = callback
+        self.level_image = level_image
+
+    def run(self):
+        results = []
+        level_image = None
+        try:
+            factor = 1 << self.level
+            origin_x = origin_y = 0
+            if self.level_image is not None:
+                image = self.level_image
+            else:
+                reader = QImageReader(self.file_path)
+                reader.setAutoTransform(False)
+                clip_supported = reader.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+                if clip_supported:
+                    reader.setClipRect(self.region)
+                    size = self.region.size()
+                    origin_x = self.region.x() // factor
+                    origin_y = self.region.y() // factor
+                else:
+                    # 不支持裁剪读取时每次都会解码整张图，改为整级解码一次，之后的分块都从中裁切
+                    size = reader.size()
+                if self.level:
+                    reader.setScaledSize(QSize(max(1, math.ceil(size.width() / factor)),
+                                               max(1, math.ceil(size.height() / factor))))
+                image = reader.read()
+                if not clip_supported and not image.isNull():
+                    level_image = image
+            for tx, ty in self.tiles:
+                tile = None
+                if not image.isNull():
+                    x = tx * TILE_SIZE - origin_x
+                    y = ty * TILE_SIZE - origin_y
+                    width = min(TILE_SIZE, image.width() - x)
+                    height = min(TILE_SIZE, image.height() - y)
+                    if width > 0 and height > 0:
+                        tile = image.copy(QRect(x, y, width, height))
+                results.append((tx, ty, tile))
+        except Exception as e:
+            logger.warning("Failed to decode tiles: path=%s, level=%s, error=%s", self.file_path, self.level, str(e))
+            results = [(tx, ty, None) for tx, ty in self.tiles]
+        self.callback.emit(self.generation, self.level, results, level_image)
+
+
+class TiledImageView(QWidget):
+    """Zoomable, pannable view that paints an image from decoded tiles.
+
+    Zoom follows PhotoViewer's convention: 1.0 fits the window, any other
+    value is relative to the pixel size of the backdrop (the screen-size
+    preview shown while tiles load).
+    """
+
+    zoom_changed = pyqtSignal(float)
+    _tiles_decoded = pyqtSignal(int, int, list, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file_path: Optional[str] = None
+        self.raw_size = QSize()
+        self.orientation = QTransform()
+        self.rotation_angle = 0
+        self.zoom_factor = 1.0
+        self.base_scale = 1.0
+        self.center = QPointF()
+        self.backdrop = QPixmap()
+
+        self.tile_cache = PixmapLRUCache(TILE_CACHE_MB * 1024 * 1024)
+        self.pending = set()  # (level, tx, ty)
+        self.level_images = {}  # level -> QImage，仅用于不支持裁剪读取的格式
+        self.level_decodes = set()  # 正在整级解码的级别
+        self.clip_supported = True  # 读取器能否只解码裁剪区域，由set_image确定
+        self.generation = 0
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)
+        self._tiles_decoded.connect(self.on_tiles_decoded)
+
+        self.drag_start_pos = None
+        self.setMouseTracking(False)
+        self.setCursor(Qt.CursorShape.OpenHandCursor)
+
+    def set_image(self, file_path: str, backdrop: Optional[QPixmap], zoom_factor: float = 1.0,
+                  rotation_angle: int = 0) -> bool:
+        """Show file_path; False if its size cannot be read."""
+        reader = QImageReader(file_path)
+        raw_size = reader.size()
+        if not raw_size.isValid() or raw_size.isEmpty():
+            return False
+
+        self.clear()
+        self.file_path = file_path
+        self.raw_size = raw_size
+        self.orientation = orientation_transform(reader.transformation())
+        self.clip_supported = reader.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+        self.center = QPointF(raw_size.width() / 2, raw_size.height() / 2)
+        self.set_backdrop(backdrop)
+        self.set_view(zoom_factor, rotation_angle)
+        logger.info("Tiled view started: path=%s, size=%sx%s", file_path, raw_size.width(), raw_size.height())
+        return True
+
+    def set_backdrop(self, backdrop: Optional[QPixmap]):
+        """Low-resolution image drawn under missing tiles; defines the zoom reference."""
+        self.backdrop = backdrop if backdrop is not None else QPixmap()
+        raw_side = max(self.raw_size.width(), self.raw_size.height(), 1)
+        if not self.backdrop.isNull():
+            self.base_scale = max(self.backdrop.width(), self.backdrop.height()) / raw_side
+        self.update()
+
+    def clear(self):
+        self.generation += 1
+        self.file_path = None
+        self.raw_size = QSize()
+        self.backdrop = QPixmap()
+        self.tile_cache.clear()
+        self.pending.clear()
+        self.level_images.clear()
+        self.level_decodes.clear()
+        self.clip_supported = True
+        self.update()
+
+    def set_view(self, zoom_factor: float, rotation_angle: int):
+        self.zoom_factor = zoom_factor
+        self.rotation_angle = rotation_angle
+        self.update()
+
+    def fit_scale(self) -> float:
+        if self.raw_size.isEmpty():
+            return 1.0
+        linear = self.orientation * QTransform().rotate(self.rotation_angle)
+        bounds = linear.mapRect(QRectF(0, 0, self.raw_size.width(), self.raw_size.height()))
+        return max(1e-6, min((self.width() - 20) / max(bounds.width(), 1),
+                             (self.height() - 20) / max(bounds.height(), 1)))
+
+    def scale(self) -> float:
+        """Screen pixels per source pixel."""
+        if self.zoom_factor == 1.0:
+            return self.fit_scale()
+        return self.zoom_factor * self.base_scale
+
+    def _linear_transform(self) -> QTransform:
+        scale = self.scale()
+        return self.orientation * QTransform().rotate(self.rotation_angle) * QTransform().scale(scale, scale)
+
+    def view_transform(self) -> QTransform:
+        """Source (unrotated file) coordinates to widget coordinates."""
+        return (QTransform.fromTranslate(-self.center.x(), -self.center.y())
+                * self._linear_transform()
+                * QTransform.fromTranslate(self.width() / 2, self.height() / 2))
+
+    def level_for_scale(self, scale: float) -> int:
+        """Coarsest pyramid level that still has at least one source pixel per screen pixel."""
+        if scale >= 1.0:
+            return 0
+        max_level = max(0, int(math.log2(max(self.raw_size.width(), self.raw_size.height(), 1) / TILE_SIZE)))
+        return min(max_level, int(math.floor(math.log2(1.0 / scale))))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().window())
+        if not self.file_path:
+            return
+
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        image_rect = QRectF(0, 0, self.raw_size.width(), self.raw_size.height())
+        if not self.backdrop.isNull():
+            # 背景图已按EXIF方向摆正，在方向变换之后的坐标系中绘制
+            scale = self.scale()
+            oriented_center = self.orientation.map(self.center)
+            painter.setTransform(QTransform.fromTranslate(-oriented_center.x(), -oriented_center.y())
+                                 * QTransform().rotate(self.rotation_angle)
+                                 * QTransform().scale(scale, scale)
+                                 * QTransform.fromTranslate(self.width() / 2, self.height() / 2))
+            painter.drawPixmap(self.orientation.mapRect(image_rect), self.backdrop, QRectF(self.backdrop.rect()))
+
+        transform = self.view_transform()
+        painter.setTransform(transform)
+
+        inverted, invertible = transform.inverted()
+        if not invertible:
+            return
+        visible = inverted.mapRect(QRectF(self.rect())).intersected(image_rect)
+        if visible.isEmpty():
+            return
+
+        level = self.level_for_scale(self.scale())
+        span = TILE_SIZE * (1 << level)  # 一个分块覆盖的原图像素
+        missing = []
+        for ty in range(int(visible.top() // span), int(math.ceil(visible.bottom() / span))):
+            for tx in range(int(visible.left() // span), int(math.ceil(visible.right() / span))):
+                tile = self.tile_cache.get(((self.generation, level), tx, ty))
+                if tile is None:
+                    missing.append((tx, ty))
+                    continue
+                factor = 1 << level
+                painter.drawPixmap(QRectF(tx * span, ty * span, tile.width() * factor, tile.height() * factor),
+                                   tile, QRectF(tile.rect()))
+        if missing:
+            self.request_tiles(level, missing)
+
+    def request_tiles(self, level: int, tiles: List[Tuple[int, int]]):
+        """Decode the missing tiles of a level as one clipped region."""
+        tiles = [(tx, ty) for tx, ty in tiles if (level, tx, ty) not in self.pending]
+        if not tiles:
+            return
+        level_image = self.level_images.get(level)
+        if level_image is None and not self.clip_supported:
+            if level in self.level_decodes:
+                return  # 整级解码完成后重绘时再从中裁切
+            self.level_decodes.add(level)
+        span = TILE_SIZE * (1 << level)
+        xs = [tx for tx, _ in tiles]
+        ys = [ty for _, ty in tiles]
+        region = QRect(min(xs) * span, min(ys) * span,
+                       (max(xs) - min(xs) + 1) * span, (max(ys) - min(ys) + 1) * span)
+        region = region.intersected(QRect(0, 0, self.raw_size.width(), self.raw_size.height()))
+        for tx, ty in tiles:
+            self.pending.add((level, tx, ty))
+        self.thread_pool.start(TileDecodeTask(self.generation, self.file_path, level, region,
+                                              tiles, self._tiles_decoded, level_image))
+
+    def on_tiles_decoded(self, generation: int, level: int, results: list, level_image: Optional[QImage]):
+        if generation != self.generation:
+            return
+        self.level_decodes.discard(level)
+        if level_image is not None:
+            self._store_level_image(level, level_image)
+        for tx, ty, image in results:
+            self.pending.discard((level, tx, ty))
+            if image is not None and not image.isNull():
+                self.tile_cache.put(((generation, level), tx, ty), QPixmap.fromImage(image))
+        self.update()
+
+    def _store_level_image(self, level: int, image: QImage):
+        """Keep decoded levels within LEVEL_IMAGE_CACHE_MB, dropping the oldest first."""
+        self.level_images.pop(level, None)
+        self.level_images[level] = image
+        budget = LEVEL_IMAGE_CACHE_MB * 1024 * 1024
+        while (len(self.level_images) > 1
+               and sum(image.sizeInBytes() for image in self.level_images.values()) > budget):
+            del self.level_images[next(iter(self.level_images))]
+
+    def _map_to_source_delta(self, delta: QPointF) -> QPointF:
+        inverted, invertible = self._linear_transform().inverted()
+        return inverted.map(delta) if invertible else QPointF()
+
+    def wheelEvent(self, event):
+        """Zoom around the cursor."""
+        if not self.file_path:
+            return
+        factor = 1.25 if event.angleDelta().y() > 0 else 1 / 1.25
+        position = event.position()
+        inverted, _ = self.view_transform().inverted()
+        anchor = inverted.map(position)
+
+        self.zoom_factor = self.scale() * factor / max(self.base_scale, 1e-6)
+        offset = position - QPointF(self.width() / 2, self.height() / 2)
+        self.center = anchor - self._map_to_source_delta(offset)
+        self.zoom_changed.emit(self.zoom_factor)
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.drag_start_pos = event.position()
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start_pos is not None:
+            delta = event.position() - self.drag_start_pos
+            self.drag_start_pos = event.position()
+            self.center -= self._map_to_source_delta(delta)
+            self.update()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.drag_start_pos = None
+            self.setCursor(Qt.CursorShape.OpenHandCursor)
+        super().mouseReleaseEvent(event)
@@ -0,0 +1,355 @@
+"""
+Persistent caption cache shared by the reverse-inference plugins.
+
+Captions are keyed by image content (the same SHA-256 file_hash the photo
+database stores), the model id and revision, the description level and a
+digest of the generation parameters, so a photo that was moved, renamed or
+imported twice is not captioned again. The hash is taken from the photo
+database when the file is in the library and unchanged there; other files
+are hashed once and memoized by (path, size, mtime_ns).
+Entries are evicted by last use once they are older than max_age_days or
+the cached text exceeds max_bytes.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from ..core.file_hasher import compute_file_digest
+
+
+DEFAULT_CACHE_PATH = "data/caption_cache.db"
+DEFAULT_MAX_MB = 64
+DEFAULT_MAX_AGE_DAYS = 180
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".ckpt")
+
+logger = logging.getLogger("picman.plugins.caption_cache")
+
+
+@dataclass(frozen=True)
+class CaptionKey:
+    """What a caption depends on besides the image content."""
+    model_id: str
+    revision: str
+    level: str
+    params_hash: str
+
+
+def make_caption_key(model_id: str, revision: str, level: str = "",
+                     params: Optional[Dict[str, Any]] = None) -> CaptionKey:
+    """Build a key; params (prompt, sampling settings, precision...) are hashed as sorted JSON."""
+    encoded = json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+    params_hash = hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+    return CaptionKey(str(model_id or ""), str(revision or ""), str(level or ""), params_hash)
+
+
+def model_revision(model: Any) -> str:
+    """Identify loaded weights.
+
+    Uses the hub commit hash transformers records in the model config; for
+    models loaded from a local directory, a digest of the weight files'
+    names, sizes and modification times.
+    """
+    config = getattr(model, "config", None)
+    commit_hash = getattr(config, "_commit_hash", None)
+    if commit_hash:
+        return str(commit_hash)
+
+    name_or_path = getattr(config, "_name_or_path", None) or getattr(model, "name_or_path", None)
+    if name_or_path and os.path.isdir(name_or_path):
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            for entry in sorted(Path(name_or_path).iterdir()):
+                if entry.suffix in WEIGHT_SUFFIXES or entry.name == "config.json":
+                    stat = entry.stat()
+                    digest.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+            return digest.hexdigest()
+        except OSError as e:
+            logger.warning("Failed to fingerprint model directory: path=%s, error=%s", name_or_path, str(e))
+    return str(name_or_path or "")
+
+
+class CaptionCache:
+    """SQLite store of captions keyed by image content hash and CaptionKey.
+
+    One connection is shared by the plugin worker threads behind a lock.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 max_age_days: int = DEFAULT_MAX_AGE_DAYS, photo_db_path: Optional[str] = None):
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.photo_db_path = photo_db_path
+        self._photo_conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_database()
+        logger.info("Caption cache opened: path=%s, max_mb=%s, max_age_days=%s",
+                    self.db_path, max_bytes // (1024 * 1024), max_age_days)
+
+    def _init_database(self):
+        with self._lock, self._conn:
+            if self.db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS captions (
+                    file_hash TEXT NOT NULL,
+                    model_id TEXT NOT NULL,
+                    revision TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    params_hash TEXT NOT NULL,
+                    caption TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_time REAL NOT NULL,
+                    last_used_time REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (file_hash, model_id, revision, level, params_hash)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_captions_last_used ON captions(last_used_time)")
+            # 路径 -> 内容哈希的备忘，文件大小或修改时间变化时重新计算
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_digests (
+                    filepath TEXT PRIMARY KEY,
+                    file_size INTEGER NOT NULL,
+                    file_mtime_ns INTEGER NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    last_seen_time REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            if self._photo_conn is not None:
+                self._photo_conn.close()
+                self._photo_conn = None
+
+    def _library_hash(self, image_path: str, stat: os.stat_result) -> Optional[str]:
+        """file_hash the photo database stores for this path, if its size and mtime still match.
+
+        Caller holds the lock.
+        """
+        if self._photo_conn is None:
+            if not self.photo_db_path or not os.path.exists(self.photo_db_path):
+                return None
+            try:
+                uri = Path(self.photo_db_path).resolve().as_uri() + "?mode=ro"
+                self._photo_conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            except sqlite3.Error as e:
+                logger.warning("Failed to open photo database: path=%s, error=%s", self.photo_db_path, str(e))
+                self.photo_db_path = None
+                return None
+        try:
+            rows = self._photo_conn.execute(
+                "SELECT file_hash, file_size, file_mtime_ns FROM photos WHERE filepath IN (?, ?)",
+                (image_path, os.path.abspath(image_path))).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Failed to read photo hash: path=%s, error=%s", image_path, str(e))
+            return None
+        for file_hash, file_size, file_mtime_ns in rows:
+            # 指纹不一致说明文件在入库后被修改过，库中的哈希已过期
+            if file_hash and file_size == stat.st_size and file_mtime_ns in (None, stat.st_mtime_ns):
+                return file_hash
+        return None
+
+    def file_hash(self, image_path: str) -> Optional[str]:
+        """Content hash of a file; None if it cannot be read.
+
+        Looked up in the photo database first, then in the memo of files
+        hashed before; only files found in neither are read and hashed.
+        """
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        filepath = os.path.abspath(image_path)
+        with self._lock:
+            library_hash = self._library_hash(image_path, stat)
+            if library_hash:
+                return library_hash
+            row = self._conn.execute(
+                "SELECT file_size, file_mtime_ns, file_hash FROM file_digests WHERE filepath = ?",
+                (filepath,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        try:
+            digest = compute_file_digest(image_path)
+        except OSError as e:
+            logger.warning("Failed to hash image: path=%s, error=%s", image_path, str(e))
+            return None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_digests VALUES (?, ?, ?, ?, ?)",
+                (filepath, stat.st_size, stat.st_mtime_ns, digest, time.time()))
+        return digest
+
+    def lookup(self, image_paths: Iterable[str], key: CaptionKey) -> Dict[str, str]:
+        """Cached captions for the given images: {image_path: caption} for hits only."""
+        hashes = {image_path: self.file_hash(image_path) for image_path in image_paths}
+        wanted = sorted({file_hash for file_hash in hashes.values() if file_hash})
+        found: Dict[str, str] = {}
+        now = time.time()
+
+        with self._lock, self._conn:
+            # 分段查询，避免超过SQLite的参数数量限制
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                params = [key.model_id, key.revision, key.level, key.params_hash, *chunk]
+                rows = self._conn.execute(f"""
+                    SELECT file_hash, caption FROM captions
+                    WHERE model_id = ? AND revision = ? AND level = ? AND params_hash = ?
+                    AND file_hash IN ({placeholders})
+                """, params).fetchall()
+                if not rows:
+                    continue
+                found.update(rows)
+                self._conn.execute(f"""
+                    UPDATE captions SET last_used_time = ?, hit_count = hit_count + 1
+                    WHERE model_id = ? AND revision = ? AND level = ? AND params_hash = ?
+                    AND file_hash IN ({",".join("?" * len(rows))})
+                """, [now, *params[:4], *(file_hash for file_hash, _ in rows)])
+
+            hits = {image_path: found[file_hash] for image_path, file_hash in hashes.items() if file_hash in found}
+            self._count(len(hits), len(hashes) - len(hits))
+
+        logger.info("Caption cache lookup: model=%s, level=%s, hits=%s, misses=%s",
+                    key.model_id, key.level, len(hits), len(hashes) - len(hits))
+        return hits
+
+    def _count(self, hits: int, misses: int):
+        """Update session and persisted hit/miss counters (caller holds the lock)."""
+        self.hits += hits
+        self.misses += misses
+        self._conn.executemany("""
+            INSERT INTO cache_stats (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        """, [("hits", hits), ("misses", misses)])
+
+    def store(self, key: CaptionKey, captions: Iterable[Tuple[str, str]]) -> int:
+        """Cache (image_path, caption) pairs; returns how many were written."""
+        now = time.time()
+        rows = []
+        for image_path, caption in captions:
+            file_hash = self.file_hash(image_path)
+            if file_hash and caption:
+                rows.append((file_hash, key.model_id, key.revision, key.level, key.params_hash,
+                             caption, len(caption.encode("utf-8")), now, now))
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO captions
+                (file_hash, model_id, revision, level, params_hash, caption, size_bytes,
+                 created_time, last_used_time, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+            """, rows)
+        return len(rows)
+
+    def evict(self, max_bytes: Optional[int] = None, max_age_days: Optional[int] = None) -> int:
+        """Drop entries unused for max_age_days, then least recently used ones above max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        removed = 0
+        with self._lock, self._conn:
+            if max_age_days and max_age_days > 0:
+                cutoff = time.time() - max_age_days * 86400
+                removed += self._conn.execute(
+                    "DELETE FROM captions WHERE last_used_time < ?", (cutoff,)).rowcount
+                self._conn.execute("""
+                    DELETE FROM file_digests WHERE last_seen_time < ?
+                    AND file_hash NOT IN (SELECT file_hash FROM captions)
+                """, (cutoff,))
+            if max_bytes and max_bytes > 0:
+                removed += self._conn.execute("""
+                    DELETE FROM captions WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, SUM(size_bytes) OVER (
+                                ORDER BY last_used_time DESC, rowid DESC) AS running_bytes
+                            FROM captions)
+                        WHERE running_bytes > ?)
+                """, (max_bytes,)).rowcount
+        if removed:
+            logger.info("Caption cache evicted: entries=%s", removed)
+        return removed
+
+    def clear(self) -> int:
+        with self._lock, self._conn:
+            removed = self._conn.execute("DELETE FROM captions").rowcount
+            self._conn.execute("DELETE FROM file_digests")
+            self._conn.execute("DELETE FROM cache_stats")
+        self.hits = self.misses = 0
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entry count and size, plus hit/miss counts for this session and in total."""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM captions").fetchone()
+            totals = dict(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+        total_hits = totals.get("hits", 0)
+        total_misses = totals.get("misses", 0)
+        lookups = total_hits + total_misses
+        return {
+            "entries": entries,
+            "size_bytes": total_bytes,
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+            "total_hits": total_hits,
+            "total_misses": total_misses,
+            "hit_rate": total_hits / lookups if lookups else 0.0,
+        }
+
+
+_settings: Dict[str, Any] = {
+    "db_path": DEFAULT_CACHE_PATH,
+    "max_bytes": DEFAULT_MAX_MB * 1024 * 1024,
+    "max_age_days": DEFAULT_MAX_AGE_DAYS,
+    "photo_db_path": None,
+}
+_shared_cache: Optional[CaptionCache] = None
+_shared_lock = threading.Lock()
+
+
+def configure_caption_cache(db_path: str = DEFAULT_CACHE_PATH, max_mb: int = DEFAULT_MAX_MB,
+                            max_age_days: int = DEFAULT_MAX_AGE_DAYS, photo_db_path: Optional[str] = None):
+    """Set where and how large the shared cache is, and the photo database whose
+    stored hashes it reuses; takes effect when it is first opened."""
+    _settings.update(db_path=db_path, max_bytes=max(0, int(max_mb)) * 1024 * 1024,
+                     max_age_days=int(max_age_days), photo_db_path=photo_db_path)
+
+
+def shared_caption_cache() -> Optional[CaptionCache]:
+    """Cache shared by all plugins, opened (and evicted) on first use; None if it cannot be opened."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = CaptionCache(**_settings)
+                _shared_cache.evict()
+            except Exception as e:
+                logger.error("Failed to open caption cache: path=%s, error=%s", _settings["db_path"], str(e))
+                return None
+        return _shared_cache
@@ -0,0 +1,136 @@
+"""
+Prefetching image loader for model plugins.
+
+Caption plugins feed images to a model one batch at a time. ImagePrefetcher
+decodes the next images in worker threads while the current batch is being
+inferred: JPEGs are decoded at reduced size (draft mode), EXIF orientation is
+applied and the image is resized to what the model's processor expects. At
+most `prefetch` decoded images exist ahead of the consumer, so memory stays
+bounded however long the list is.
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger("picman.plugins.image_prefetch")
+
+# (image_path, image or None, error message or None)
+PrefetchedImage = Tuple[str, Optional[Image.Image], Optional[str]]
+
+
+def processor_image_size(processor: Any) -> Optional[Tuple[int, int]]:
+    """(width, height) a HuggingFace-style processor resizes images to, if it says."""
+    image_processor = getattr(processor, "image_processor", None)
+    if image_processor is None:
+        return None
+    size = getattr(image_processor, "size", None) or getattr(image_processor, "crop_size", None)
+    if isinstance(size, dict):
+        if "width" in size and "height" in size:
+            return int(size["width"]), int(size["height"])
+        if "shortest_edge" in size:
+            return int(size["shortest_edge"]), int(size["shortest_edge"])
+    if isinstance(size, int):
+        return size, size
+    image_size = getattr(image_processor, "image_size", None)
+    if isinstance(image_size, int):
+        return image_size, image_size
+    return None
+
+
+def load_image(image_path: str, size: Optional[Tuple[int, int]] = None, max_side: int = 0,
+               resample: Image.Resampling = Image.Resampling.BICUBIC) -> Image.Image:
+    """Decode an RGB image upright, resized for a model.
+
+    Args:
+        size: exact (width, height) to resize to (the processor's input size).
+        max_side: otherwise, shrink so the long edge is at most max_side.
+
+    JPEGs are decoded with draft() to the smallest scale that still covers
+    the target, which skips most of the IDCT work for large photos.
+    """
+    with Image.open(image_path) as image:
+        target = size or ((max_side, max_side) if max_side else None)
+        if target:
+            # EXIF旋转90°时宽高互换，草稿尺寸按较大边取，保证仍不小于目标
+            side = max(target)
+            image.draft("RGB", (side, side))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.width == 0 or image.height == 0:
+            raise ValueError(f"图片尺寸无效: {image.size}")
+        if size:
+            if image.size != tuple(size):
+                image = image.resize(tuple(size), resample)
+        elif max_side and max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), resample)
+        image.load()
+        return image
+
+
+class ImagePrefetcher:
+    """Iterates (path, image, error) in input order, decoding ahead in worker threads.
+
+    PIL releases the GIL while decoding and resampling, so threads overlap
+    with inference without pickling images across processes. Use as a
+    context manager (or call close()) so pending work is cancelled when the
+    consumer stops early.
+    """
+
+    def __init__(self, image_paths: List[str], load: Optional[Callable[[str], Image.Image]] = None,
+                 prefetch: int = 4, workers: int = 2):
+        self.image_paths = list(image_paths)
+        self.load = load or load_image
+        self.prefetch = max(1, prefetch)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image-prefetch")
+        self._pending: Deque = deque()
+        self._next_index = 0
+
+    def __enter__(self) -> "ImagePrefetcher":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _load(self, image_path: str) -> PrefetchedImage:
+        try:
+            return image_path, self.load(image_path), None
+        except Exception as e:
+            logger.warning("Failed to load image: path=%s, error=%s", image_path, str(e))
+            return image_path, None, str(e)
+
+    def _fill(self):
+        while len(self._pending) < self.prefetch and self._next_index < len(self.image_paths):
+            image_path = self.image_paths[self._next_index]
+            self._next_index += 1
+            self._pending.append(self._executor.submit(self._load, image_path))
+
+    def __iter__(self) -> Iterator[PrefetchedImage]:
+        self._fill()
+        while self._pending:
+            future = self._pending.popleft()
+            # 先补充队列再等待，让解码与调用方的推理重叠
+            self._fill()
+            yield future.result()
+
+    def batches(self, batch_size: int) -> Iterator[List[PrefetchedImage]]:
+        """Group the prefetched images into lists of batch_size (last may be shorter)."""
+        batch: List[PrefetchedImage] = []
+        for item in self:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,337 @@
+"""
+Out-of-process inference worker for caption plugins.
+
+Model loading, tokenization and generate loops run in a separate process so
+they neither compete with the GUI for the GIL nor take the application down
+when model code crashes. The worker is started on first use and kept warm:
+job functions keep their models loaded in module state between jobs.
+
+Jobs are named by import path ("package.module:function") and called in the
+worker as function(job, **kwargs); the job handle streams progress and
+partial results back over a queue and reports cancellation. At most
+max_jobs jobs run at once, later ones wait in the worker's queue. If the
+worker dies, its running jobs fail and the next submission starts a new one.
+
+The worker applies the application's model memory budget and caption cache
+settings. Both processes register models in their own ModelRegistry; each
+counts the other's resident models against the shared budget, and the
+worker reports its registry statistics back for the system monitor.
+"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+import importlib
+import itertools
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .caption_cache import configure_caption_cache
+from .model_registry import configure_model_registry, get_model_registry
+
+
+DEFAULT_MAX_JOBS = 1  # 模型通常独占GPU，默认同一时间只运行一个任务
+POLL_INTERVAL = 0.2  # 等待结果时检查取消请求的间隔（秒）
+SHUTDOWN_TIMEOUT = 10.0
+STATS_INTERVAL = 5.0  # 推理进程空闲时上报模型注册表统计的间隔（秒）
+
+logger = logging.getLogger("picman.plugins.inference_worker")
+
+
+class InferenceWorkerError(RuntimeError):
+    """A job failed in the worker, or the worker exited while running it."""
+
+
+class JobContext:
+    """Handle passed to a job function inside the worker process."""
+
+    def __init__(self, job_id: int, events, cancelled: set):
+        self.job_id = job_id
+        self._events = events
+        self._cancelled = cancelled
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job_id in self._cancelled
+
+    def progress(self, step: str, progress: int, message: str):
+        self._events.put(("progress", self.job_id, (step, progress, message)))
+
+    def emit(self, results: List[Dict[str, Any]]):
+        """Send partial results to the submitting side as soon as they are ready."""
+        self._events.put(("results", self.job_id, results))
+
+
+def _resolve_target(target: str) -> Callable:
+    module_name, _, function_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _send_model_stats(events):
+    events.put(("models", None, get_model_registry().get_stats()))
+
+
+def _run_job(job_id: int, target: str, kwargs: Dict[str, Any], events, cancelled: set, active: set):
+    try:
+        if job_id in cancelled:
+            events.put(("cancelled", job_id, None))
+            return
+        events.put(("started", job_id, os.getpid()))
+        result = _resolve_target(target)(JobContext(job_id, events, cancelled), **kwargs)
+        events.put(("cancelled" if job_id in cancelled else "done", job_id, result))
+    except Exception as e:
+        logging.getLogger("picman.plugins.inference_worker").error(
+            "Inference job failed: job_id=%s, target=%s, error=%s", job_id, target, str(e))
+        events.put(("error", job_id, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+    finally:
+        cancelled.discard(job_id)
+        active.discard(job_id)
+        _send_model_stats(events)
+
+
+def _worker_main(requests, events, max_jobs: int, process_settings: Dict[str, Any]):
+    """Worker process entry point: run submitted jobs until told to shut down."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    worker_logger = logging.getLogger("picman.plugins.inference_worker")
+    worker_logger.info("Inference worker started: pid=%s, max_jobs=%s", os.getpid(), max_jobs)
+    configure_model_registry(**process_settings.get("model_registry", {}))
+    configure_caption_cache(**process_settings.get("caption_cache", {}))
+
+    cancelled: set = set()
+    active: set = set()
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="inference-job") as executor:
+        while True:
+            try:
+                kind, job_id, payload = requests.get(timeout=STATS_INTERVAL)
+            except queue.Empty:
+                # 空闲释放模型等变化也要让主进程知道
+                _send_model_stats(events)
+                continue
+            if kind == "submit":
+                target, kwargs, host_model_bytes = payload
+                get_model_registry().set_external_bytes(host_model_bytes)
+                active.add(job_id)
+                executor.submit(_run_job, job_id, target, kwargs, events, cancelled, active)
+            elif kind == "cancel":
+                if job_id in active:
+                    cancelled.add(job_id)
+            elif kind == "shutdown":
+                # 排队中的任务直接取消，运行中的任务在下一批之前停止
+                cancelled.update(active)
+                break
+    events.put(("exit", None, None))
+
+
+class InferenceWorker:
+    """Host side of the worker process: submits jobs and routes their events back.
+
+    Safe to use from several threads (e.g. one QThread per plugin run); each
+    caller blocks in run() on its own job's event queue, which releases the GIL.
+    """
+
+    def __init__(self, max_jobs: int = DEFAULT_MAX_JOBS, process_settings: Optional[Dict[str, Any]] = None):
+        self.max_jobs = max(1, max_jobs)
+        self.process_settings = process_settings or {}
+        self.model_stats: Optional[Dict[str, Any]] = None  # 推理进程最近上报的模型注册表统计
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._requests = None
+        self._jobs: Dict[int, queue.Queue] = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.starts = 0
+        self.jobs_submitted = 0
+        self.jobs_failed = 0
+        self.jobs_cancelled = 0
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """Start the worker process if it is not running."""
+        with self._lock:
+            if self.is_alive():
+                return
+            requests = self._context.Queue()
+            events = self._context.Queue()
+            process = self._context.Process(target=_worker_main, args=(requests, events, self.max_jobs, self.process_settings),
+                                            name="picman-inference-worker", daemon=True)
+            process.start()
+            self._process, self._requests = process, requests
+            self.starts += 1
+            threading.Thread(target=self._dispatch, args=(process, events),
+                             name="inference-worker-events", daemon=True).start()
+        logger.info("Inference worker launched: pid=%s, max_jobs=%s", process.pid, self.max_jobs)
+
+    def submit(self, target: str, **kwargs) -> int:
+        """Queue a job; returns its id. Use run() to wait for it."""
+        self.start()
+        with self._lock:
+            job_id = next(self._job_ids)
+            self._jobs[job_id] = queue.Queue()
+            self._requests.put(("submit", job_id, (target, kwargs, get_model_registry().host_resident_size())))
+            self.jobs_submitted += 1
+        return job_id
+
+    def cancel(self, job_id: int):
+        with self._lock:
+            if self._requests is not None and self.is_alive():
+                self._requests.put(("cancel", job_id, None))
+
+    def run(self, target: str, kwargs: Dict[str, Any],
+            on_progress: Optional[Callable[[str, int, str], None]] = None,
+            on_results: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+            should_cancel: Optional[Callable[[], bool]] = None,
+            poll_interval: float = POLL_INTERVAL) -> Any:
+        """Run a job and wait for it; returns the job function's return value, or None if cancelled.
+
+        on_progress and on_results are called in the calling thread as events
+        arrive. should_cancel is polled at least every poll_interval seconds
+        while waiting (a GUI-thread caller can process events there). Raises
+        InferenceWorkerError if the job fails or the worker exits.
+        """
+        job_id = self.submit(target, **kwargs)
+        job_events = self._jobs[job_id]
+        cancel_sent = False
+        try:
+            while True:
+                if should_cancel is not None and should_cancel() and not cancel_sent:
+                    self.cancel(job_id)
+                    cancel_sent = True
+                try:
+                    kind, payload = job_events.get(timeout=poll_interval)
+                except queue.Empty:
+                    continue
+                if kind == "progress" and on_progress is not None:
+                    on_progress(*payload)
+                elif kind == "results" and on_results is not None:
+                    on_results(payload)
+                elif kind == "done":
+                    return payload
+                elif kind == "cancelled":
+                    self.jobs_cancelled += 1
+                    return None
+                elif kind == "error":
+                    self.jobs_failed += 1
+                    raise InferenceWorkerError(payload)
+        finally:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+
+    def _dispatch(self, process, events):
+        """Route events from one worker process to the waiting jobs until it exits."""
+        while True:
+            try:
+                kind, job_id, payload = events.get(timeout=1.0)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                self._on_worker_exit(process)
+                return
+            except (EOFError, OSError):
+                self._on_worker_exit(process)
+                return
+            if kind == "exit":
+                return
+            if kind == "models":
+                self._on_model_stats(payload)
+                continue
+            with self._lock:
+                job_events = self._jobs.get(job_id)
+            if job_events is not None:
+                job_events.put((kind, payload))
+
+    def _on_model_stats(self, stats: Optional[Dict[str, Any]]):
+        """Count the worker's resident models against this process's budget."""
+        self.model_stats = stats
+        get_model_registry().set_external_bytes(int(stats["host_mb"] * 1024 * 1024) if stats else 0)
+
+    def _on_worker_exit(self, process):
+        logger.error("Inference worker exited unexpectedly: pid=%s, exitcode=%s", process.pid, process.exitcode)
+        with self._lock:
+            if self._process is process:
+                self._process, self._requests = None, None
+            waiting = list(self._jobs.values())
+        self._on_model_stats(None)
+        for job_events in waiting:
+            job_events.put(("error", f"推理进程异常退出 (exit code {process.exitcode})"))
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Stop the worker; running jobs are cancelled, then it is terminated if it does not exit."""
+        with self._lock:
+            process, requests = self._process, self._requests
+            self._process, self._requests = None, None
+        if process is None:
+            return
+        self._on_model_stats(None)
+        try:
+            requests.put(("shutdown", None, None))
+            process.join(timeout)
+        finally:
+            if process.is_alive():
+                logger.warning("Inference worker did not exit, terminating: pid=%s", process.pid)
+                process.terminate()
+                process.join(timeout)
+        logger.info("Inference worker stopped: pid=%s, exitcode=%s", process.pid, process.exitcode)
+
+    def restart(self):
+        """Replace the worker process (e.g. after a model crash or to free its memory)."""
+        self.shutdown()
+        self.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "alive": self.is_alive(),
+                "pid": self._process.pid if self._process is not None else None,
+                "max_jobs": self.max_jobs,
+                "starts": self.starts,
+                "jobs_running": len(self._jobs),
+                "jobs_submitted": self.jobs_submitted,
+                "jobs_failed": self.jobs_failed,
+                "jobs_cancelled": self.jobs_cancelled,
+                "model_stats": self.model_stats,
+            }
+
+
+_settings: Dict[str, Any] = {"enabled": True, "max_jobs": DEFAULT_MAX_JOBS, "process_settings": {}}
+_worker: Optional[InferenceWorker] = None
+_worker_lock = threading.Lock()
+
+
+def configure_inference_worker(enabled: bool = True, max_jobs: int = DEFAULT_MAX_JOBS,
+                               model_registry: Optional[Dict[str, Any]] = None,
+                               caption_cache: Optional[Dict[str, Any]] = None):
+    """Enable or disable the shared worker; takes effect when it is next requested.
+
+    model_registry and caption_cache are the keyword arguments for
+    configure_model_registry and configure_caption_cache in the worker.
+    """
+    _settings.update(enabled=bool(enabled), max_jobs=max(1, int(max_jobs)),
+                     process_settings={"model_registry": model_registry or {}, "caption_cache": caption_cache or {}})
+
+
+def get_inference_worker() -> Optional[InferenceWorker]:
+    """Worker shared by all plugins, or None when out-of-process inference is disabled.
+
+    Plugins then run inference in their own thread as before.
+    """
+    global _worker
+    if not _settings["enabled"] or getattr(sys, "frozen", False):
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = InferenceWorker(_settings["max_jobs"], _settings["process_settings"])
+            atexit.register(_worker.shutdown)
+        return _worker
+
+
+def worker_model_stats() -> Optional[Dict[str, Any]]:
+    """Model registry statistics last reported by the worker, or None if it is not running."""
+    worker = _worker
+    return worker.model_stats if worker is not None else None
@@ -1,9 +1,17 @@
 """
 Plugin manager for PyPhotoManager.
+
+Directory plugins may ship a static manifest (plugin.json) describing their
+name, version, menu/toolbar actions and entry point. Such plugins are
+discovered without importing any of their code; a "lazy" plugin's module is
+imported and initialized on the first use of one of its actions. Plugins
+without a manifest are discovered the old way, by importing the module.
 """
 
 import os
 import sys
+import json
+import time
 import importlib
 import importlib.util
 from pathlib import Path
@@ -12,6 +20,12 @@ import logging
 
 from ..config.manager import ConfigManager
 from .base import Plugin, PluginInfo
+from .caption_cache import configure_caption_cache
+from .model_registry import configure_model_registry
+from .inference_worker import configure_inference_worker
+
+
+PLUGIN_MANIFEST = "plugin.json"
 
 
 class PluginManager:
@@ -22,7 +36,32 @@ class PluginManager:
         self.logger = logging.getLogger("picman.plugins.manager")
         self.plugins: Dict[str, Plugin] = {}
         self.plugin_classes: Dict[str, Type[Plugin]] = {}
+        self.manifests: Dict[str, Dict[str, Any]] = {}  # 来自plugin.json的插件描述
+        self.deferred: Dict[str, Dict[str, Any]] = {}  # 已启用、等待首次使用时加载的插件
+        self.startup_timings: Dict[str, Dict[str, Any]] = {}  # 每个插件的发现/导入/初始化耗时（毫秒）
         self.app_context: Dict[str, Any] = {}
+        
+        # 反推插件共享的描述缓存，首次使用时才打开
+        caption_cache_settings = {
+            "db_path": self.config.get("plugins.caption_cache_path", "data/caption_cache.db"),
+            "max_mb": self.config.get("plugins.caption_cache_max_mb", 64),
+            "max_age_days": self.config.get("plugins.caption_cache_max_age_days", 180),
+            "photo_db_path": self.config.get("database.path", "data/picman.db"),
+        }
+        configure_caption_cache(**caption_cache_settings)
+        # 插件加载的模型共享一个内存预算
+        model_registry_settings = {
+            "budget_mb": self.config.get("plugins.model_memory_budget_mb", 0),
+            "idle_offload_minutes": self.config.get("plugins.model_idle_offload_minutes", 0),
+        }
+        configure_model_registry(**model_registry_settings)
+        # 反推推理在独立的常驻进程中运行，首次提交任务时启动；推理进程使用相同的预算和缓存设置
+        configure_inference_worker(
+            self.config.get("plugins.inference_worker_enabled", True),
+            self.config.get("plugins.inference_worker_max_jobs", 1),
+            model_registry=model_registry_settings,
+            caption_cache=caption_cache_settings,
+        )
     
     def set_app_context(self, context: Dict[str, Any]):
         """Set application context for plugins."""
@@ -43,9 +82,17 @@ class PluginManager:
         # Look for directory-based plugins first (优先级更高)
         for dir_path in plugin_path.iterdir():
             if dir_path.is_dir() and not dir_path.name.startswith("__"):
+                started = time.perf_counter()
                 try:
-                    discovered = self._discover_plugin_from_directory(dir_path)
+                    manifest = self._read_manifest(dir_path)
+                    if manifest is not None:
+                        discovered = [manifest]
+                    else:
+                        discovered = self._discover_plugin_from_directory(dir_path)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
                     for plugin in discovered:
+                        self._record_timing(plugin["name"], discover_ms=elapsed_ms / len(discovered),
+                                            source="manifest" if manifest is not None else "import")
                         if plugin["name"] not in discovered_names:
                             discovered_plugins.append(plugin)
                             discovered_names.add(plugin["name"])
@@ -76,6 +123,83 @@ class PluginManager:
         self.logger.info(f"Discovered plugins - count: {len(discovered_plugins)}")
         return discovered_plugins
     
+    def _record_timing(self, plugin_name: str, **values):
+        self.startup_timings.setdefault(plugin_name, {}).update(values)
+    
+    def _read_manifest(self, dir_path: Path) -> Optional[Dict[str, Any]]:
+        """Read a plugin's static manifest without importing it (None if it has none)."""
+        manifest_path = dir_path / PLUGIN_MANIFEST
+        if not manifest_path.exists():
+            return None
+        
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        
+        module_file, _, class_name = manifest["entry_point"].partition(":")
+        plugin_data = {
+            "name": manifest["name"],
+            "version": manifest.get("version", ""),
+            "description": manifest.get("description", ""),
+            "author": manifest.get("author", ""),
+            "module": f"{dir_path.name}.{module_file}",
+            "class_name": class_name,
+            "path": str(dir_path / f"{module_file}.py"),
+            "type": "manifest",
+            "plugin_dir": str(dir_path),
+            "lazy": manifest.get("lazy", True),
+            "menu_actions": manifest.get("menu_actions", []),
+            "toolbar_actions": manifest.get("toolbar_actions", []),
+        }
+        self.manifests[plugin_data["name"]] = plugin_data
+        return plugin_data
+    
+    def _import_plugin_module(self, dir_path: Path, file_path: Path):
+        """Execute a plugin module with its directory importable (as directory discovery does)."""
+        module_name = f"{dir_path.name}.{file_path.stem}"
+        
+        # Add directory and parent to Python path temporarily
+        original_path = sys.path.copy()
+        sys.path.insert(0, str(dir_path))  # Add plugin directory
+        sys.path.insert(0, str(dir_path.parent))  # Add parent directory
+        
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, file_path)
+            if spec is None or spec.loader is None:
+                return None
+            
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module  # Add module to sys.modules
+            spec.loader.exec_module(module)
+            return module
+        
+        finally:
+            # Restore original path
+            sys.path = original_path
+            # Clean up sys.modules
+            if module_name in sys.modules:
+                del sys.modules[module_name]
+    
+    def _import_manifest_plugin(self, plugin_name: str) -> bool:
+        """Import the entry point named by a plugin's manifest."""
+        manifest = self.manifests[plugin_name]
+        started = time.perf_counter()
+        try:
+            module = self._import_plugin_module(Path(manifest["plugin_dir"]), Path(manifest["path"]))
+            plugin_class = getattr(module, manifest["class_name"], None) if module is not None else None
+            if not (isinstance(plugin_class, type) and issubclass(plugin_class, Plugin)):
+                self.logger.error(f"Plugin entry point not found - name: {plugin_name}, path: {manifest['path']}, class_name: {manifest['class_name']}")
+                return False
+            
+            self.plugin_classes[plugin_name] = plugin_class
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Failed to import plugin - name: {plugin_name}, path: {manifest['path']}, error: {str(e)}")
+            return False
+        
+        finally:
+            self._record_timing(plugin_name, import_ms=(time.perf_counter() - started) * 1000)
+    
     def _discover_plugin_from_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """Discover plugins from a single Python file."""
         discovered_plugins = []
@@ -147,66 +271,44 @@ class PluginManager:
             plugin_files = list(dir_path.glob("*.py"))
         
         for file_path in plugin_files:
+            module_name = f"{dir_path.name}.{file_path.stem}"
             try:
-                # Create module name that includes directory
-                module_name = f"{dir_path.name}.{file_path.stem}"
-                
-                # Add directory and parent to Python path temporarily
-                original_path = sys.path.copy()
-                sys.path.insert(0, str(dir_path))  # Add plugin directory
-                sys.path.insert(0, str(dir_path.parent))  # Add parent directory
+                module = self._import_plugin_module(dir_path, file_path)
+                if module is None:
+                    continue
                 
-                try:
-                    spec = importlib.util.spec_from_file_location(module_name, file_path)
-                    if spec is None or spec.loader is None:
-                        continue
-                    
-                    module = importlib.util.module_from_spec(spec)
-                    sys.modules[module_name] = module  # Add module to sys.modules
-                    spec.loader.exec_module(module)
-                    
-                    # Find plugin classes
-                    for attr_name in dir(module):
-                        attr = getattr(module, attr_name)
-                        if (isinstance(attr, type) and 
-                            issubclass(attr, Plugin) and 
-                            attr is not Plugin):
+                # Find plugin classes
+                for attr_name in dir(module):
+                    attr = getattr(module, attr_name)
+                    if (isinstance(attr, type) and 
+                        issubclass(attr, Plugin) and 
+                        attr is not Plugin):
+                        
+                        # Create temporary instance to get info
+                        try:
+                            plugin_instance = attr()
+                            plugin_info = plugin_instance.get_info()
                             
-                            # Create temporary instance to get info
-                            try:
-                                plugin_instance = attr()
-                                plugin_info = plugin_instance.get_info()
-                                
-                                plugin_data = {
-                                    "name": plugin_info.name,
-                                    "version": plugin_info.version,
-                                    "description": plugin_info.description,
-                                    "author": plugin_info.author,
-                                    "module": module_name,
-                                    "class_name": attr_name,
-                                    "path": str(file_path),
-                                    "type": "directory",
-                                    "plugin_dir": str(dir_path)
-                                }
-                                
-                                discovered_plugins.append(plugin_data)
-                                self.plugin_classes[plugin_info.name] = attr
-                                
-                            except Exception as e:
-                                self.logger.error(f"Failed to get plugin info - module: {module_name}, class_name: {attr_name}, error: {str(e)}")
-                
-                except Exception as e:
-                    self.logger.error(f"Failed to load plugin from directory - path: {str(file_path)}, error: {str(e)}")
+                            plugin_data = {
+                                "name": plugin_info.name,
+                                "version": plugin_info.version,
+                                "description": plugin_info.description,
+                                "author": plugin_info.author,
+                                "module": module_name,
+                                "class_name": attr_name,
+                                "path": str(file_path),
+                                "type": "directory",
+                                "plugin_dir": str(dir_path)
+                            }
+                            
+                            discovered_plugins.append(plugin_data)
+                            self.plugin_classes[plugin_info.name] = attr
+                            
+                        except Exception as e:
+                            self.logger.error(f"Failed to get plugin info - module: {module_name}, class_name: {attr_name}, error: {str(e)}")
                 
-                finally:
-                    # Restore original path
-                    sys.path = original_path
-                    # Clean up sys.modules
-                    if module_name in sys.modules:
-                        del sys.modules[module_name]
-                    
             except Exception as e:
-                self.logger.error(f"Failed to load plugin from directory - path: {file_path}, error: {str(e)}")
+                self.logger.error(f"Failed to load plugin from directory - path: {str(file_path)}, error: {str(e)}")
         
         return discovered_plugins
     
@@ -217,6 +319,8 @@ class PluginManager:
             enabled_plugins = self.config.get("plugins.enabled_plugins", [])
             auto_load = self.config.get("plugins.auto_load", True)
             
+            started = time.perf_counter()
+            
             # Discover available plugins
             discovered = self.discover_plugins()
             
@@ -224,12 +328,17 @@ class PluginManager:
             if auto_load:
                 enabled_plugins = [p["name"] for p in discovered]
             
-            # Load and initialize each enabled plugin
+            # Load and initialize each enabled plugin; lazy manifest plugins wait for first use
             for plugin_name in enabled_plugins:
-                if plugin_name in self.plugin_classes:
+                manifest = self.manifests.get(plugin_name)
+                if manifest is not None and manifest["lazy"]:
+                    self.deferred[plugin_name] = manifest
+                elif plugin_name in self.plugin_classes or manifest is not None:
                     self.load_plugin(plugin_name)
             
-            self.logger.info(f"Loaded plugins - count: {len(self.plugins)}")
+            self.logger.info(f"Loaded plugins - count: {len(self.plugins)}, deferred: {len(self.deferred)}, "
+                             f"elapsed_ms: {(time.perf_counter() - started) * 1000:.1f}")
+            self.log_startup_report()
             return True
             
         except Exception as e:
@@ -243,12 +352,20 @@ class PluginManager:
                 self.logger.warning(f"Plugin already loaded - name: {plugin_name}")
                 return True
             
+            self.deferred.pop(plugin_name, None)
+            
+            # 清单插件在这里才导入模块
+            if plugin_name not in self.plugin_classes and plugin_name in self.manifests:
+                if not self._import_manifest_plugin(plugin_name):
+                    return False
+            
             if plugin_name not in self.plugin_classes:
                 self.logger.error(f"Plugin not found - name: {plugin_name}")
                 return False
             
             # Create plugin instance with proper error handling
             plugin_class = self.plugin_classes[plugin_name]
+            started = time.perf_counter()
             
             try:
                 plugin = plugin_class()
@@ -260,7 +377,9 @@ class PluginManager:
             try:
                 if plugin.initialize(self.app_context):
                     self.plugins[plugin_name] = plugin
-                    self.logger.info(f"Plugin loaded - name: {plugin_name}")
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    self._record_timing(plugin_name, initialize_ms=elapsed_ms)
+                    self.logger.info(f"Plugin loaded - name: {plugin_name}, initialize_ms: {elapsed_ms:.1f}")
                     return True
                 else:
                     self.logger.error(f"Plugin initialization failed - name: {plugin_name}")
@@ -277,6 +396,10 @@ class PluginManager:
     def unload_plugin(self, plugin_name: str) -> bool:
         """Unload a specific plugin."""
         try:
+            if self.deferred.pop(plugin_name, None) is not None:
+                self.logger.info(f"Deferred plugin disabled - name: {plugin_name}")
+                return True
+            
             if plugin_name not in self.plugins:
                 self.logger.warning(f"Plugin not loaded - name: {plugin_name}")
                 return True  # 插件未加载不算错误
@@ -310,10 +433,43 @@ class PluginManager:
         
         return success
     
-    def get_plugin(self, plugin_name: str) -> Optional[Plugin]:
-        """Get a loaded plugin by name."""
+    def get_plugin(self, plugin_name: str, load: bool = True) -> Optional[Plugin]:
+        """Get a plugin by name, loading a deferred plugin on first use unless load is False."""
+        if load and plugin_name in self.deferred:
+            self.logger.info(f"Loading deferred plugin on first use - name: {plugin_name}")
+            self.load_plugin(plugin_name)
         return self.plugins.get(plugin_name)
     
+    def get_plugins(self) -> List[Plugin]:
+        """Get all loaded plugin instances (deferred plugins are not loaded)."""
+        return list(self.plugins.values())
+    
+    def is_deferred(self, plugin_name: str) -> bool:
+        """Whether a plugin is enabled but not yet imported."""
+        return plugin_name in self.deferred
+    
+    def get_startup_report(self) -> List[Dict[str, Any]]:
+        """Per-plugin discovery/import/initialize times in milliseconds."""
+        report = []
+        for name, timing in self.startup_timings.items():
+            status = "loaded" if name in self.plugins else "deferred" if name in self.deferred else "disabled"
+            report.append({
+                "name": name,
+                "status": status,
+                "source": timing.get("source", ""),
+                "discover_ms": timing.get("discover_ms", 0.0),
+                "import_ms": timing.get("import_ms", 0.0),
+                "initialize_ms": timing.get("initialize_ms", 0.0),
+            })
+        return report
+    
+    def log_startup_report(self):
+        """Log how long each plugin took to discover, import and initialize."""
+        for entry in self.get_startup_report():
+            self.logger.info(f"Plugin startup timing - name: {entry['name']}, status: {entry['status']}, "
+                             f"source: {entry['source']}, discover_ms: {entry['discover_ms']:.1f}, "
+                             f"import_ms: {entry['import_ms']:.1f}, initialize_ms: {entry['initialize_ms']:.1f}")
+    
     def get_loaded_plugins(self) -> List[Dict[str, Any]]:
         """Get information about all loaded plugins."""
         loaded_plugins = []
@@ -333,6 +489,11 @@ class PluginManager:
             if actions:
                 menu_actions[name] = actions
         
+        # 未加载的插件使用清单中声明的动作
+        for name, manifest in self.deferred.items():
+            if manifest["menu_actions"]:
+                menu_actions[name] = manifest["menu_actions"]
+        
         return menu_actions
     
     def get_plugin_toolbar_actions(self) -> Dict[str, List[Dict[str, Any]]]:
@@ -344,4 +505,8 @@ class PluginManager:
             if actions:
                 toolbar_actions[name] = actions
         
+        for name, manifest in self.deferred.items():
+            if manifest["toolbar_actions"]:
+                toolbar_actions[name] = manifest["toolbar_actions"]
+        
         return toolbar_actions
\ No newline at end of file
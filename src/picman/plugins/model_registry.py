@@ -0,0 +1,349 @@
+"""
+Host-wide registry of models loaded by plugins.
+
+Every captioning plugin registers the models it loads here instead of
+keeping a private cache, so the application sees one memory budget across
+plugins. Each entry's resident size is measured per device from its
+tensors. The budget limits host RAM only: bytes on CUDA/MPS devices are
+reported but not counted. When a new model would exceed the budget, the
+least recently used models that are not in use are evicted. Models idle for longer than the offload timeout are
+released as well. Their weights stay on disk, so a plugin simply reloads
+them on next use. Owners get an on_evict callback to drop their own
+references, otherwise the memory would not actually be freed.
+"""
+
+import gc
+import sys
+import time
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".ckpt")
+AUTO_BUDGET_FRACTION = 0.5  # 未配置预算时使用物理内存的一半
+
+logger = logging.getLogger("picman.plugins.model_registry")
+
+
+def resident_bytes(value: Any) -> Dict[str, int]:
+    """Bytes held by the tensors of a model (or a dict/list/tuple of them), per device type."""
+    sizes: Dict[str, int] = {}
+    seen = set()
+
+    def visit(obj):
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        if isinstance(obj, dict):
+            for item in obj.values():
+                visit(item)
+        elif isinstance(obj, (list, tuple)):
+            for item in obj:
+                visit(item)
+        elif hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+            for tensor in itertools.chain(obj.parameters(), obj.buffers()):
+                device = tensor.device.type
+                sizes[device] = sizes.get(device, 0) + tensor.numel() * tensor.element_size()
+
+    visit(value)
+    return sizes
+
+
+def host_bytes(device_bytes: Dict[str, int], size_bytes: int) -> int:
+    """Bytes counted against the RAM budget: the CPU-resident share, or size_bytes when unmeasured."""
+    return device_bytes.get("cpu", 0) if device_bytes else size_bytes
+
+
+def estimate_model_bytes(model_path: str) -> int:
+    """Size of the weight files in a model directory, an estimate of its resident size."""
+    try:
+        return sum(path.stat().st_size for path in Path(model_path).rglob("*")
+                   if path.is_file() and path.suffix in WEIGHT_SUFFIXES)
+    except OSError:
+        return 0
+
+
+def default_budget_bytes() -> int:
+    """Half of physical memory, or 0 (no limit) when it cannot be determined."""
+    if not PSUTIL_AVAILABLE:
+        return 0
+    return int(psutil.virtual_memory().total * AUTO_BUDGET_FRACTION)
+
+
+@dataclass
+class RegisteredModel:
+    key: str
+    owner: str
+    value: Any
+    size_bytes: int
+    device_bytes: Dict[str, int]
+    host_bytes: int
+    on_evict: Optional[Callable[[str, Any], None]] = None
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    use_count: int = 0
+    pins: int = 0
+
+
+class ModelRegistry:
+    """LRU of loaded models under a byte budget shared by all plugins.
+
+    Keys are chosen by the owner (e.g. "Florence2:microsoft/Florence-2-base").
+    Models pinned with using() are never evicted, so a captioner running in
+    one thread cannot lose its model to another plugin's load.
+    """
+
+    def __init__(self, budget_bytes: int = 0, idle_offload_seconds: float = 0):
+        self.budget_bytes = budget_bytes
+        self.idle_offload_seconds = idle_offload_seconds
+        self.external_bytes = 0  # 其他进程（推理进程/主进程）中模型占用的内存，计入同一预算
+        self.entries: Dict[str, RegisteredModel] = {}
+        self.evictions = 0
+        self.offloads = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def configure(self, budget_bytes: int, idle_offload_seconds: float):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self.idle_offload_seconds = idle_offload_seconds
+        self._evict(self._select_over_budget(0))
+        self._start_watcher()
+
+    def set_external_bytes(self, size_bytes: int):
+        """Memory held by models of the other process, so both processes share one budget."""
+        with self._lock:
+            self.external_bytes = max(0, int(size_bytes))
+
+    def get(self, key: str) -> Optional[Any]:
+        """The registered value for key (marking it recently used), or None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.last_used = time.time()
+            entry.use_count += 1
+            return entry.value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """The registered value without counting a use."""
+        with self._lock:
+            entry = self.entries.get(key)
+            return entry.value if entry is not None else None
+
+    def put(self, key: str, value: Any, owner: str = "", size_bytes: Optional[int] = None,
+            on_evict: Optional[Callable[[str, Any], None]] = None):
+        """Register a loaded model, evicting least recently used ones to stay within the budget.
+
+        size_bytes defaults to the measured size of value's tensors.
+        """
+        device_bytes = resident_bytes(value)
+        if size_bytes is None:
+            size_bytes = sum(device_bytes.values())
+        incoming_bytes = host_bytes(device_bytes, size_bytes)
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            victims = self._select_over_budget(incoming_bytes)
+            self.entries[key] = RegisteredModel(key, owner, value, size_bytes, device_bytes,
+                                                incoming_bytes, on_evict)
+        if previous is not None and previous.value is not value:
+            victims.append(previous)
+        self._evict(victims)
+        logger.info("Model registered: key=%s, owner=%s, size_mb=%.1f, host_mb=%.1f, resident_mb=%.1f",
+                    key, owner, size_bytes / (1024 * 1024), incoming_bytes / (1024 * 1024),
+                    self.resident_size() / (1024 * 1024))
+        self._start_watcher()
+
+    def make_room(self, size_bytes: int) -> int:
+        """Evict before loading a model of about size_bytes; returns how many models were evicted.
+
+        The destination device is not known before loading, so size_bytes counts as host memory.
+        """
+        with self._lock:
+            victims = self._select_over_budget(size_bytes)
+        self._evict(victims)
+        return len(victims)
+
+    def remove(self, key: str) -> bool:
+        """Unregister a model the owner is unloading itself (no on_evict callback)."""
+        with self._lock:
+            entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self._release_memory()
+        logger.info("Model unregistered: key=%s", key)
+        return True
+
+    def keys(self, owner: Optional[str] = None) -> List[str]:
+        with self._lock:
+            return [key for key, entry in self.entries.items() if owner is None or entry.owner == owner]
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self.entries
+
+    @contextmanager
+    def using(self, key: str) -> Iterator[Optional[Any]]:
+        """Pin a model for the duration of an inference run."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.pins += 1
+                entry.last_used = time.time()
+        try:
+            yield entry.value if entry is not None else None
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry.pins -= 1
+                    entry.last_used = time.time()
+
+    def resident_size(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self.entries.values())
+
+    def host_resident_size(self) -> int:
+        """Bytes counted against the budget (models held in host RAM)."""
+        with self._lock:
+            return sum(entry.host_bytes for entry in self.entries.values())
+
+    def _budget(self) -> int:
+        return self.budget_bytes if self.budget_bytes > 0 else default_budget_bytes()
+
+    def _select_over_budget(self, incoming_bytes: int) -> List[RegisteredModel]:
+        """Remove least recently used unpinned entries until incoming_bytes of host memory fits (caller holds the lock)."""
+        budget = self._budget()
+        if budget <= 0:
+            return []
+        victims = []
+        used = self.external_bytes + sum(entry.host_bytes for entry in self.entries.values())
+        for entry in sorted(self.entries.values(), key=lambda e: e.last_used):
+            if used + incoming_bytes <= budget:
+                break
+            if entry.pins or not entry.host_bytes:
+                continue  # 显存中的模型不占内存预算，淘汰它们腾不出内存
+            del self.entries[entry.key]
+            victims.append(entry)
+            used -= entry.host_bytes
+        if used + incoming_bytes > budget:
+            logger.warning("Model memory budget exceeded: budget_mb=%s, needed_mb=%s",
+                           budget // (1024 * 1024), (used + incoming_bytes) // (1024 * 1024))
+        self.evictions += len(victims)
+        return victims
+
+    def offload_idle(self, idle_seconds: Optional[float] = None) -> int:
+        """Release models unused for idle_seconds (default: the configured offload timeout)."""
+        idle_seconds = self.idle_offload_seconds if idle_seconds is None else idle_seconds
+        if not idle_seconds or idle_seconds <= 0:
+            return 0
+        cutoff = time.time() - idle_seconds
+        with self._lock:
+            victims = [entry for entry in self.entries.values() if not entry.pins and entry.last_used < cutoff]
+            for entry in victims:
+                del self.entries[entry.key]
+            self.offloads += len(victims)
+        self._evict(victims)
+        return len(victims)
+
+    def _evict(self, victims: List[RegisteredModel]):
+        """Let owners drop their references, then return the memory (outside the lock)."""
+        if not victims:
+            return
+        for entry in victims:
+            logger.info("Model evicted: key=%s, owner=%s, size_mb=%.1f, idle_seconds=%.0f",
+                        entry.key, entry.owner, entry.size_bytes / (1024 * 1024), time.time() - entry.last_used)
+            if entry.on_evict is not None:
+                try:
+                    entry.on_evict(entry.key, entry.value)
+                except Exception as e:
+                    logger.error("Model eviction callback failed: key=%s, error=%s", entry.key, str(e))
+            entry.value = None
+        self._release_memory()
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _start_watcher(self):
+        """Background check for idle models; runs only while offloading is enabled and models are loaded."""
+        with self._lock:
+            if self.idle_offload_seconds <= 0 or not self.entries:
+                return
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(target=self._watch_idle, name="model-registry-idle", daemon=True)
+            self._watcher.start()
+
+    def _watch_idle(self):
+        while True:
+            with self._lock:
+                if self.idle_offload_seconds <= 0 or not self.entries:
+                    self._watcher = None
+                    return
+                interval = min(60.0, max(1.0, self.idle_offload_seconds / 4))
+            time.sleep(interval)
+            self.offload_idle()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Resident models and counters, for the system monitor and plugin dialogs."""
+        now = time.time()
+        with self._lock:
+            models = [{
+                "key": entry.key,
+                "owner": entry.owner,
+                "size_mb": entry.size_bytes / (1024 * 1024),
+                "host_mb": entry.host_bytes / (1024 * 1024),
+                "device_mb": {device: size / (1024 * 1024) for device, size in entry.device_bytes.items()},
+                "use_count": entry.use_count,
+                "in_use": entry.pins > 0,
+                "idle_seconds": now - entry.last_used,
+            } for entry in sorted(self.entries.values(), key=lambda e: e.last_used, reverse=True)]
+            return {
+                "resident_models": len(models),
+                "resident_mb": sum(model["size_mb"] for model in models),
+                "host_mb": sum(model["host_mb"] for model in models),
+                "budget_mb": self._budget() / (1024 * 1024),
+                "external_mb": self.external_bytes / (1024 * 1024),
+                "idle_offload_seconds": self.idle_offload_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "offloads": self.offloads,
+                "models": models,
+            }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Registry shared by all plugins."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+def configure_model_registry(budget_mb: int = 0, idle_offload_minutes: float = 0):
+    """Set the shared host RAM budget (0: half of physical memory) and idle offload timeout (0: never)."""
+    get_model_registry().configure(max(0, int(budget_mb)) * 1024 * 1024, max(0.0, float(idle_offload_minutes)) * 60)
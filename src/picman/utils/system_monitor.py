@@ -32,6 +32,8 @@ class SystemSnapshot:
     db_size_mb: float
     cache_hit_rate: float
     active_operations: int
+    model_memory_mb: float = 0.0
+    resident_models: int = 0
 
 
 class SystemMonitor:
@@ -158,6 +160,23 @@ class SystemMonitor:
             except Exception:
                 pass
             
+            # 插件模型常驻内存（来自共享模型注册表，包括推理进程）
+            model_memory_mb = 0.0
+            resident_models = 0
+            try:
+                from ..plugins.model_registry import get_model_registry
+                model_stats = get_model_registry().get_stats()
+                model_memory_mb = model_stats["resident_mb"]
+                resident_models = model_stats["resident_models"]
+                # 加上推理进程中的模型
+                from ..plugins.inference_worker import worker_model_stats
+                worker_stats = worker_model_stats()
+                if worker_stats:
+                    model_memory_mb += worker_stats["resident_mb"]
+                    resident_models += worker_stats["resident_models"]
+            except Exception:
+                pass
+            
             return SystemSnapshot(
                 timestamp=time.time(),
                 cpu_percent=cpu_percent,
@@ -169,7 +188,9 @@ class SystemMonitor:
                 threads=threads,
                 db_size_mb=db_size_mb,
                 cache_hit_rate=cache_hit_rate,
-                active_operations=active_operations
+                active_operations=active_operations,
+                model_memory_mb=model_memory_mb,
+                resident_models=resident_models
             )
             
         except Exception as e:
@@ -280,6 +301,8 @@ class SystemMonitor:
                 "db_size_mb": latest.db_size_mb,
                 "cache_hit_rate": latest.cache_hit_rate,
                 "active_operations": latest.active_operations,
+                "model_memory_mb": latest.model_memory_mb,
+                "resident_models": latest.resident_models,
                 "monitoring": self._monitoring,
                 "alerts_sent": self._alerts_sent
             }
@@ -303,7 +326,9 @@ class SystemMonitor:
                         "threads": snapshot.threads,
                         "db_size_mb": snapshot.db_size_mb,
                         "cache_hit_rate": snapshot.cache_hit_rate,
-                        "active_operations": snapshot.active_operations
+                        "active_operations": snapshot.active_operations,
+                        "model_memory_mb": snapshot.model_memory_mb,
+                        "resident_models": snapshot.resident_models
                     })
             
             return history
@@ -0,0 +1,90 @@
+"""
+相册网格加载基准：比较完整解码的字典行、惰性解码的Photo记录和PhotoSummary行
+
+在临时数据库中生成带EXIF/标签JSON的照片并放入一个相册，分别测量加载耗时
+（多次取最小值）和加载结果在内存中保留的大小（tracemalloc）。
+"完整解码"等同于引入Photo/PhotoSummary之前每行立即json.loads所有JSON列的做法。
+
+不是pytest用例（文件名不以test_开头），手动运行：
+    python tests/bench_photo_summary.py --photos 3000
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from picman.database.manager import DatabaseManager  # noqa: E402
+
+
+def make_photo(index: int) -> dict:
+    exif = {f"Tag{key}": f"value-{index}-{key}" for key in range(40)}
+    exif.update({"Make": "Camera", "Model": "Model X", "FNumber": 2.8, "ISOSpeedRatings": 200})
+    tags = [f"tag{index % 50}_{n}" for n in range(8)]
+    return {
+        "filename": f"IMG_{index:05d}.jpg",
+        "filepath": f"/library/2024/IMG_{index:05d}.jpg",
+        "file_hash": f"{index:064x}",
+        "file_size": 3_000_000 + index,
+        "width": 4000,
+        "height": 3000,
+        "thumbnail_path": f"data/thumbnails/{index:064x}_256x256_q85.jpg",
+        "exif_data": exif,
+        "tags": tags,
+        "simple_tags": tags[:3],
+        "normal_tags": tags[:6],
+        "detailed_tags": tags,
+        "tag_translations": {tag: f"标签{tag}" for tag in tags},
+        "ai_metadata": {"caption": "a photo of something " * 10, "model": "florence2", "scores": [0.5] * 16},
+    }
+
+
+def measure(load, repeat: int):
+    gc.collect()
+    tracemalloc.start()
+    rows = load()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return retained, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(str(Path(tmp) / "bench.db"))
+        db.batch_insert_photos([make_photo(index) for index in range(args.photos)])
+        album_id = db.create_album({"name": "bench"})
+        photo_ids = [photo["id"] for photo in db.search_photos(limit=args.photos, summary_only=True)]
+        db.batch_add_photos_to_album(photo_ids, album_id)
+
+        loads = {
+            "eager dicts": lambda: [dict(photo) for photo in db.get_album_photos(album_id)],
+            "Photo records": lambda: db.get_album_photos(album_id),
+            "PhotoSummary": lambda: db.get_album_photos(album_id, summary_only=True),
+        }
+        print(f"{args.photos} photos, best of {args.repeat}")
+        for name, load in loads.items():
+            retained, seconds = measure(load, args.repeat)
+            print(f"{name:>14}: retained {retained / 1e6:6.2f} MB, load {seconds * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
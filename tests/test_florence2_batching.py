@@ -0,0 +1,198 @@
+"""
+Florence2批量推理测试：批量结果与逐张推理一致（包括需要填充对齐的批次），解码失败时保持输入顺序
+
+使用随机初始化的微型BART语言模型（加一个线性图像投影，结构同Florence2），无需下载权重。
+"""
+
+import importlib.util
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import numpy as np
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+IMAGE_SIZE = 32
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>"]
+PROMPT_TOKENS = ["MORE", "DETAILED", "CAPTION", "<img>"]
+VOCAB = SPECIAL_TOKENS + PROMPT_TOKENS + [f"w{i}" for i in range(20)]
+BOS, PAD, EOS = 0, 1, 2
+LEVELS = ["simple", "normal", "detailed"]  # 提示词分别为1、2、3个词
+
+
+def load_engine_module():
+    # 直接按文件加载，避免插件包的__init__导入PyQt界面
+    path = ROOT / "plugins" / "florence2_reverse_plugin" / "core" / "inference_engine.py"
+    spec = importlib.util.spec_from_file_location("florence2_inference_engine", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TinyTokenizer:
+    eos_token_id = EOS
+    pad_token_id = PAD
+
+    def encode(self, text):
+        # "<MORE_DETAILED_CAPTION>" -> <s> MORE DETAILED CAPTION </s>
+        return [BOS] + [VOCAB.index(word) for word in text.strip("<>").split("_")] + [EOS]
+
+    def decode(self, ids, skip_special_tokens=False):
+        tokens = [VOCAB[int(i)] for i in ids]
+        if skip_special_tokens:
+            tokens = [token for token in tokens if token not in SPECIAL_TOKENS]
+        return " ".join(tokens)
+
+    def batch_decode(self, sequences, skip_special_tokens=False):
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+
+class TinyImageProcessor:
+    size = {"height": IMAGE_SIZE, "width": IMAGE_SIZE}
+
+
+class TinyProcessor:
+    def __init__(self):
+        self.tokenizer = TinyTokenizer()
+        self.image_processor = TinyImageProcessor()
+
+    def __call__(self, text, images, return_tensors="pt", padding=False, do_rescale=False):
+        texts = text if isinstance(text, list) else [text]
+        images = images if isinstance(images, list) else [images]
+        pixel_values = torch.stack([
+            torch.from_numpy(np.asarray(image, dtype=np.float32) / 255.0).permute(2, 0, 1)
+            for image in images
+        ])
+        # 像部分多模态processor一样按图片插入数量不等的图像占位词，同一批次的序列长度因此不同
+        sequences = [self.tokenizer.encode(t)[:-1] + [VOCAB.index("<img>")] * self.image_tokens(pixels) + [EOS]
+                     for t, pixels in zip(texts, pixel_values)]
+        length = max(len(sequence) for sequence in sequences)
+        if len(set(map(len, sequences))) > 1 and not padding:
+            raise ValueError("sequences of different lengths need padding=True")
+        # 右侧填充，attention_mask标出真实词
+        input_ids = torch.tensor([sequence + [PAD] * (length - len(sequence)) for sequence in sequences])
+        attention_mask = torch.tensor([[1] * len(sequence) + [0] * (length - len(sequence)) for sequence in sequences])
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "pixel_values": pixel_values,
+        }
+
+    @staticmethod
+    def image_tokens(pixels) -> int:
+        return int(pixels.mean().item() * 1000) % 4
+
+
+class TinyFlorence2(torch.nn.Module):
+    """图像特征投影后拼接在提示词嵌入之前，送入BART编码器"""
+
+    def __init__(self):
+        super().__init__()
+        config = transformers.BartConfig(
+            vocab_size=len(VOCAB), d_model=16, encoder_layers=1, decoder_layers=1,
+            encoder_attention_heads=2, decoder_attention_heads=2,
+            encoder_ffn_dim=32, decoder_ffn_dim=32, max_position_embeddings=64,
+            bos_token_id=BOS, pad_token_id=PAD, eos_token_id=EOS,
+            decoder_start_token_id=EOS, forced_bos_token_id=None, forced_eos_token_id=None,
+            init_std=1.0,
+        )
+        self.language_model = transformers.BartForConditionalGeneration(config)
+        self.image_projection = torch.nn.Linear(3, config.d_model)
+        self.generate_batch_sizes = []
+        self.padded_batches = 0
+
+    def generate(self, input_ids, attention_mask, pixel_values, **kwargs):
+        self.generate_batch_sizes.append(input_ids.shape[0])
+        self.padded_batches += int((attention_mask == 0).any())
+        image_features = torch.nn.functional.adaptive_avg_pool2d(pixel_values, 2).flatten(2).transpose(1, 2)
+        image_embeds = self.image_projection(image_features)
+        text_embeds = self.language_model.get_input_embeddings()(input_ids)
+        inputs_embeds = torch.cat([image_embeds, text_embeds], dim=1)
+        attention_mask = torch.cat([attention_mask.new_ones(image_embeds.shape[:2]), attention_mask], dim=1)
+        return self.language_model.generate(inputs_embeds=inputs_embeds, attention_mask=attention_mask, **kwargs)
+
+
+class StubConfigManager:
+    def get_inference_config(self):
+        return {"max_new_tokens": 8}
+
+    def get_performance_config(self):
+        return {"batch_size": 4}
+
+
+class StubModelManager:
+    def __init__(self, model, processor):
+        self.model = model
+        self.processor = processor
+
+    def is_model_loaded(self):
+        return True
+
+    @contextmanager
+    def model_in_use(self):
+        yield
+
+
+@pytest.fixture
+def engine():
+    torch.manual_seed(0)
+    module = load_engine_module()
+    model = TinyFlorence2().eval()
+    engine = module.InferenceEngine()
+    engine.config_manager = StubConfigManager()
+    engine.model_manager = StubModelManager(model, TinyProcessor())
+    engine.device = torch.device("cpu")
+    return engine
+
+
+@pytest.fixture
+def image_paths(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"image_{index}.png"
+        pixels = rng.integers(0, 256, size=(48, 40, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def infer(engine, image_paths, batch_size, level="simple"):
+    return engine.infer_images(image_paths, "tiny-florence2", level,
+                               batch_size=batch_size, use_caption_cache=False)
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_batched_outputs_match_per_image_outputs(engine, image_paths, level):
+    model = engine.model_manager.model
+    single = infer(engine, image_paths, batch_size=1, level=level)
+    assert model.padded_batches == 0
+    batched = infer(engine, image_paths, batch_size=4, level=level)
+
+    assert all(result["success"] for result in single + batched)
+    assert [r["result"] for r in batched] == [r["result"] for r in single]
+    assert model.generate_batch_sizes == [1] * 5 + [4, 1]
+    # 批次内序列长度不同，确实走了填充路径
+    assert model.padded_batches > 0
+
+
+def test_failed_decode_keeps_input_order(engine, image_paths, tmp_path):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    paths = image_paths[:2] + [str(broken)] + image_paths[2:]
+
+    expected = {r["image_path"]: r["result"] for r in infer(engine, image_paths, batch_size=1)}
+    results = infer(engine, paths, batch_size=4)
+
+    assert [r["image_path"] for r in results] == paths
+    assert not results[2]["success"]
+    assert all(r["success"] and r["result"] == expected[r["image_path"]]
+               for i, r in enumerate(results) if i != 2)